@@ -0,0 +1,329 @@
+"""
+Cliente HTTP compartido para el backend FastAPI.
+
+Todas las vistas usan este módulo en lugar de llamar a ``requests.post``
+directamente: cada proceso mantiene un único ``Session`` con un pool de
+conexiones keep-alive hacia ``BACKEND_API_URL``, timeouts de conexión/lectura
+por endpoint y reintentos acotados (con backoff) solo para las llamadas
+idempotentes. Una venta o transferencia con clave de idempotencia solo se
+reintenta si la petición no llegó a salir (no se pudo abrir la conexión),
+salvo que ``BACKEND_RESPETA_IDEMPOTENCIA`` indique que el backend descarta
+las repetidas.
+"""
+import asyncio
+import os
+import threading
+import time
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from django.conf import settings
+
+from api import metricas, resiliencia
+
+try:
+    import httpx
+except ImportError:  # httpx solo es necesario para las vistas async (ASGI)
+    httpx = None
+
+# ==================== Endpoints del backend ====================
+
+# nombre -> (ruta, grupo, idempotente)
+# Las llamadas idempotentes (login, detección) pueden reintentarse sin riesgo;
+# las de ventas NO, porque un reintento podría registrar la venta dos veces
+# (salvo que la llamada lleve una clave de idempotencia, ver api/idempotencia.py).
+ENDPOINTS = {
+    'login': ('/api/home/login/', 'auth', True),
+    'detectar_objetos': ('/api/caja/detectarobjetos/', 'deteccion', True),
+    'confirmar_compra': ('/api/caja/confirmarcompra/', 'ventas', False),
+    'confirmar_sin_cliente': ('/api/caja/confirmarsincliente/', 'ventas', False),
+    'crear_transferencia': ('/api/deposito/crearTransferencia/', 'deposito', False),
+    'confirmar_transferencia': ('/api/deposito/confirmarTransferencia/', 'deposito', False),
+    'listar_transferencias': ('/api/deposito/listarTransferencia/', 'deposito', True),
+    'listar_productos': ('/api/productos/listarProductos/', 'catalogo', True),
+    'validar_cliente': ('/api/caja/validarcliente/', 'clientes', True),
+    'registrar_cliente': ('/api/caja/registrarcliente/', 'clientes', False),
+}
+
+# Timeouts (conexión, lectura) en segundos por grupo de endpoints
+DEFAULT_TIMEOUTS = {
+    'auth': (3.05, 10),
+    'deteccion': (3.05, 30),
+    'ventas': (3.05, 10),
+    'deposito': (3.05, 10),
+    'catalogo': (3.05, 10),
+    'clientes': (3.05, 5),
+}
+
+# Códigos HTTP que indican un fallo transitorio del backend o de un proxy
+RETRY_STATUS = (502, 503, 504)
+
+# Qué fallas de una llamada se reintentan
+TRANSITORIAS = 'transitorias'   # errores de conexión y RETRY_STATUS
+SIN_ENVIAR = 'sin_enviar'       # solo si la petición no llegó al backend
+
+_session = None
+_session_pid = None
+_lock = threading.Lock()
+
+# Un AsyncClient por event loop: los sockets de httpx no pueden compartirse
+# entre loops distintos
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_base_url():
+    """Devuelve la URL base del backend sin la barra final"""
+    return getattr(settings, 'BACKEND_API_URL', 'http://localhost:8000').rstrip('/')
+
+
+def get_timeout(grupo):
+    """Devuelve la tupla (conexión, lectura) configurada para un grupo"""
+    timeouts = {**DEFAULT_TIMEOUTS, **getattr(settings, 'BACKEND_TIMEOUTS', {})}
+    return tuple(timeouts[grupo])
+
+
+def get_session():
+    """
+    Devuelve el Session del proceso actual, creándolo la primera vez.
+    Si el proceso fue forkeado (gunicorn --preload) se crea uno nuevo para
+    no compartir sockets con el proceso padre.
+    """
+    global _session, _session_pid
+
+    pid = os.getpid()
+    if _session is not None and _session_pid == pid:
+        return _session
+
+    with _lock:
+        if _session is None or _session_pid != pid:
+            pool_size = getattr(settings, 'BACKEND_POOL_SIZE', 10)
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=pool_size,
+                max_retries=0,
+            )
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['Connection'] = 'keep-alive'
+            _session = session
+            _session_pid = pid
+    return _session
+
+
+def close_session():
+    """Cierra el Session actual y sus conexiones (útil en tests y al apagar)"""
+    global _session, _session_pid
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _session_pid = None
+
+
+def _backoff(intento):
+    base = getattr(settings, 'BACKEND_BACKOFF', 0.2)
+    return base * (2 ** intento)
+
+
+def _timeout(grupo, kwargs):
+    """
+    ``(conexion, lectura, recortado)`` para un intento: el timeout explícito
+    de ``kwargs`` o el del grupo, limitado por el plazo de la petición
+    """
+    if 'timeout' in kwargs:
+        return kwargs['timeout'], None, False
+    return resiliencia.recortar_timeout(*get_timeout(grupo))
+
+
+def _headers_idempotencia(kwargs, idempotente):
+    """
+    ``(headers, reintentar)`` de la llamada: con ``clave_idempotencia`` la
+    clave se manda al backend. Un endpoint que no es idempotente reintenta
+    solo lo que no llegó a salir (``SIN_ENVIAR``): un 5xx o una conexión
+    cortada pueden venir de una venta ya registrada, y reintentarla cobraría
+    dos veces si el backend no descarta la clave repetida.
+    """
+    headers = kwargs.pop('headers', None)
+    clave = kwargs.pop('clave_idempotencia', None)
+    if clave is not None:
+        headers = {**(headers or {}), 'Idempotency-Key': clave}
+    if idempotente:
+        return headers, TRANSITORIAS
+    if clave is None:
+        return headers, None
+    if getattr(settings, 'BACKEND_RESPETA_IDEMPOTENCIA', False):
+        return headers, TRANSITORIAS
+    return headers, SIN_ENVIAR
+
+
+def _sin_enviar(e):
+    """El error fue al abrir la conexión: la petición no llegó al backend"""
+    if isinstance(e, requests.exceptions.ConnectTimeout):
+        return True
+    razon = getattr(e.args[0], 'reason', None) if e.args else None
+    return isinstance(e, requests.exceptions.ConnectionError) and isinstance(razon, NewConnectionError)
+
+
+def _reintentable(e, reintentar):
+    if reintentar == TRANSITORIAS:
+        return isinstance(e, requests.exceptions.ConnectionError)
+    return _sin_enviar(e)
+
+
+def _areintentable(e, reintentar):
+    """Las mismas reglas que :func:`_reintentable` con las excepciones de httpx"""
+    if reintentar == TRANSITORIAS:
+        return isinstance(e, (httpx.NetworkError, httpx.RemoteProtocolError, httpx.ConnectTimeout))
+    return isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+
+
+def _alcanza_para_reintentar(espera):
+    queda = resiliencia.restante()
+    return queda is None or queda > espera
+
+
+def post(endpoint, **kwargs):
+    """
+    Hace un POST al endpoint indicado (clave de ``ENDPOINTS``).
+
+    Acepta los mismos argumentos que ``requests.post`` salvo ``timeout``, que
+    se toma de la configuración del grupo del endpoint si no se indica.
+    Las llamadas idempotentes se reintentan ante errores de conexión o
+    respuestas 502/503/504; los timeouts de lectura nunca se reintentan
+    para no multiplicar la espera del usuario. Con ``clave_idempotencia``
+    la clave viaja en el header ``Idempotency-Key`` y las de ventas y
+    depósito se reintentan solo si no se pudo conectar (con
+    ``BACKEND_RESPETA_IDEMPOTENCIA`` como las idempotentes).
+
+    La llamada pasa por el circuito del grupo y respeta el plazo de la
+    petición (ver ``api/resiliencia.py``): lanza ``CircuitoAbierto`` o
+    ``PlazoAgotado`` en lugar de esperar a un backend caído.
+    """
+    return _llamar('POST', endpoint, **kwargs)
+
+
+def get(endpoint, **kwargs):
+    """GET al endpoint indicado; mismas reglas que :func:`post`"""
+    return _llamar('GET', endpoint, **kwargs)
+
+
+def _llamar(metodo, endpoint, **kwargs):
+    ruta, grupo, idempotente = ENDPOINTS[endpoint]
+    headers, reintentar = _headers_idempotencia(kwargs, idempotente)
+    reintentos = getattr(settings, 'BACKEND_REINTENTOS', 2) if reintentar else 0
+    url = f'{get_base_url()}{ruta}'
+    session = get_session()
+
+    circuito = resiliencia.get_circuito(grupo)
+    sonda = circuito.permitir()
+    falla = None
+    try:
+        for intento in range(reintentos + 1):
+            conexion, lectura, recortado = _timeout(grupo, kwargs)
+            timeout = conexion if lectura is None else (conexion, lectura)
+            opciones = {**kwargs, 'timeout': timeout, 'headers': resiliencia.headers_plazo(headers)}
+            ultimo = intento == reintentos or not _alcanza_para_reintentar(_backoff(intento))
+            inicio = time.perf_counter()
+            try:
+                response = session.request(metodo, url, **opciones)
+            except requests.exceptions.RequestException as e:
+                metricas.registrar_backend(endpoint, 'error', time.perf_counter() - inicio)
+                if recortado and isinstance(e, requests.exceptions.Timeout):
+                    # Lo que se agotó es el plazo del cliente, no la paciencia con el backend
+                    raise resiliencia.PlazoAgotado('Se agotó el tiempo de espera de la petición') from e
+                falla = True
+                # Solo los errores de conexión se reintentan
+                if ultimo or not _reintentable(e, reintentar):
+                    raise
+            else:
+                metricas.registrar_backend(endpoint, response.status_code, time.perf_counter() - inicio)
+                falla = response.status_code >= 500
+                if response.status_code not in RETRY_STATUS or reintentar != TRANSITORIAS or ultimo:
+                    return response
+                response.close()
+            time.sleep(_backoff(intento))
+    finally:
+        circuito.registrar(falla, sonda)
+
+
+# ==================== Cliente async (ASGI) ====================
+
+def get_async_client():
+    """
+    Devuelve el ``httpx.AsyncClient`` del event loop actual, creándolo la
+    primera vez con el mismo tamaño de pool que el Session sync.
+    """
+    if httpx is None:
+        raise RuntimeError('Las vistas async requieren el paquete httpx')
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        pool_size = getattr(settings, 'BACKEND_POOL_SIZE', 10)
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+            ),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def aclose_async_client():
+    """Cierra el AsyncClient del event loop actual si existe"""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def apost(endpoint, **kwargs):
+    """
+    Versión async de :func:`post` sobre el AsyncClient compartido.
+    Mismas reglas de timeout, reintentos, circuito y plazo que la versión sync.
+    """
+    return await _allamar('POST', endpoint, **kwargs)
+
+
+async def aget(endpoint, **kwargs):
+    """Versión async de :func:`get`"""
+    return await _allamar('GET', endpoint, **kwargs)
+
+
+async def _allamar(metodo, endpoint, **kwargs):
+    ruta, grupo, idempotente = ENDPOINTS[endpoint]
+    headers, reintentar = _headers_idempotencia(kwargs, idempotente)
+    reintentos = getattr(settings, 'BACKEND_REINTENTOS', 2) if reintentar else 0
+    url = f'{get_base_url()}{ruta}'
+    client = get_async_client()
+
+    circuito = resiliencia.get_circuito(grupo)
+    sonda = circuito.permitir()
+    falla = None
+    try:
+        for intento in range(reintentos + 1):
+            conexion, lectura, recortado = _timeout(grupo, kwargs)
+            timeout = conexion if lectura is None else httpx.Timeout(lectura, connect=conexion)
+            opciones = {**kwargs, 'timeout': timeout, 'headers': resiliencia.headers_plazo(headers)}
+            ultimo = intento == reintentos or not _alcanza_para_reintentar(_backoff(intento))
+            inicio = time.perf_counter()
+            try:
+                response = await client.request(metodo, url, **opciones)
+            except httpx.HTTPError as e:
+                metricas.registrar_backend(endpoint, 'error', time.perf_counter() - inicio)
+                if recortado and isinstance(e, httpx.TimeoutException):
+                    raise resiliencia.PlazoAgotado('Se agotó el tiempo de espera de la petición') from e
+                falla = True
+                if ultimo or not _areintentable(e, reintentar):
+                    raise
+            else:
+                metricas.registrar_backend(endpoint, response.status_code, time.perf_counter() - inicio)
+                falla = response.status_code >= 500
+                if response.status_code not in RETRY_STATUS or reintentar != TRANSITORIAS or ultimo:
+                    return response
+            await asyncio.sleep(_backoff(intento))
+    finally:
+        circuito.registrar(falla, sonda)
@@ -0,0 +1,242 @@
+"""
+Cache de resultados de detección direccionado por contenido.
+
+La clave es el SHA-256 de los bytes de la imagen ya normalizada, así que
+volver a procesar la misma foto (doble click en "procesar", reintentos del
+navegador) no repite el viaje al detector. El backend de almacenamiento es
+configurable con ``CACHE_DETECCION['backend']``:
+
+- ``'memoria'``: LRU en el proceso con presupuesto de bytes y TTL.
+- ``'archivo'``: un archivo JSON por clave en un directorio compartido, para
+  que varios workers de la misma máquina compartan resultados.
+- ``'django'``: cualquier cache configurado en ``CACHES`` (memcached, redis...).
+- ``None``: desactivado.
+
+``estadisticas()`` expone los contadores de hits, misses y evictions.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+DEFAULT_CONFIG = {
+    'backend': 'memoria',
+    'ttl': 300,
+    'max_bytes': 32 * 2**20,
+    'directorio': None,
+    'alias': 'default',
+}
+
+_contadores = {'hits': 0, 'misses': 0, 'evictions': 0}
+_contadores_lock = threading.Lock()
+
+_backend = None
+_backend_config = None
+_backend_lock = threading.Lock()
+
+
+def _contar(nombre, cantidad=1):
+    with _contadores_lock:
+        _contadores[nombre] += cantidad
+
+
+def estadisticas():
+    """Contadores del proceso: hits, misses y evictions"""
+    with _contadores_lock:
+        return dict(_contadores)
+
+
+def clave_imagen(archivo):
+    """SHA-256 del contenido del archivo, leído por chunks"""
+    digest = hashlib.sha256()
+    for chunk in archivo.chunks():
+        digest.update(chunk)
+    archivo.seek(0)
+    return digest.hexdigest()
+
+
+# ==================== Backends ====================
+
+class MemoriaBackend:
+    """LRU en memoria del proceso, acotado por bytes serializados y TTL"""
+    bloqueante = False
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._datos = OrderedDict()  # clave -> (expira, valor serializado)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _quitar(self, clave):
+        _, valor = self._datos.pop(clave)
+        self._bytes -= len(valor)
+
+    def get(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            expira, valor = entrada
+            if expira < time.monotonic():
+                self._quitar(clave)
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def set(self, clave, valor):
+        if len(valor) > self.max_bytes:
+            return
+        with self._lock:
+            if clave in self._datos:
+                self._quitar(clave)
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+            self._bytes += len(valor)
+
+            while self._bytes > self.max_bytes:
+                _, (_, viejo) = self._datos.popitem(last=False)
+                self._bytes -= len(viejo)
+                _contar('evictions')
+
+
+class ArchivoBackend:
+    """
+    Un archivo por clave en un directorio compartido entre workers.
+    El TTL se mide con el mtime, que se renueva en cada hit (LRU aproximado).
+    """
+    bloqueante = True
+
+    # Cada cuántas escrituras se revisa el presupuesto del directorio
+    REVISAR_CADA = 50
+
+    def __init__(self, directorio, max_bytes, ttl):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._escrituras = 0
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, f'{clave}.json')
+
+    def get(self, clave):
+        ruta = self._ruta(clave)
+        try:
+            if os.path.getmtime(ruta) + self.ttl < time.time():
+                os.unlink(ruta)
+                return None
+            with open(ruta, 'rb') as f:
+                valor = f.read()
+            os.utime(ruta)
+            return valor
+        except FileNotFoundError:
+            return None
+
+    def set(self, clave, valor):
+        if len(valor) > self.max_bytes:
+            return
+        # Escritura atómica: otro worker nunca lee un archivo a medias
+        fd, temporal = tempfile.mkstemp(dir=self.directorio, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(valor)
+        os.replace(temporal, self._ruta(clave))
+
+        self._escrituras += 1
+        if self._escrituras % self.REVISAR_CADA == 0:
+            self._recortar()
+
+    def _recortar(self):
+        archivos = []
+        total = 0
+        with os.scandir(self.directorio) as entradas:
+            for entrada in entradas:
+                if not entrada.name.endswith('.json'):
+                    continue
+                try:
+                    stat = entrada.stat()
+                except FileNotFoundError:
+                    continue
+                archivos.append((stat.st_mtime, stat.st_size, entrada.path))
+                total += stat.st_size
+
+        ahora = time.time()
+        for mtime, tamano, ruta in sorted(archivos):
+            if total <= self.max_bytes and mtime + self.ttl >= ahora:
+                break
+            try:
+                os.unlink(ruta)
+            except FileNotFoundError:
+                continue
+            total -= tamano
+            if mtime + self.ttl >= ahora:
+                _contar('evictions')
+
+
+class DjangoCacheBackend:
+    """Usa un cache de ``CACHES``; el TTL y la eviction los maneja ese cache"""
+    bloqueante = True
+    PREFIJO = 'deteccion:'
+
+    def __init__(self, alias, ttl):
+        from django.core.cache import caches
+        self.cache = caches[alias]
+        self.ttl = ttl
+
+    def get(self, clave):
+        return self.cache.get(self.PREFIJO + clave)
+
+    def set(self, clave, valor):
+        self.cache.set(self.PREFIJO + clave, valor, timeout=self.ttl)
+
+
+def get_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, 'CACHE_DETECCION', {})}
+
+
+def get_backend():
+    """Devuelve el backend configurado (o ``None`` si el cache está desactivado)"""
+    global _backend, _backend_config
+
+    config = get_config()
+    if _backend_config == config:
+        return _backend
+
+    with _backend_lock:
+        if _backend_config != config:
+            tipo = config['backend']
+            if tipo == 'memoria':
+                _backend = MemoriaBackend(config['max_bytes'], config['ttl'])
+            elif tipo == 'archivo':
+                directorio = config['directorio'] or os.path.join(
+                    settings.BASE_DIR, 'cache_deteccion'
+                )
+                _backend = ArchivoBackend(str(directorio), config['max_bytes'], config['ttl'])
+            elif tipo == 'django':
+                _backend = DjangoCacheBackend(config['alias'], config['ttl'])
+            elif tipo is None:
+                _backend = None
+            else:
+                raise ValueError(f'Backend de cache de detección desconocido: {tipo}')
+            _backend_config = config
+    return _backend
+
+
+# ==================== API ====================
+
+def obtener(backend, clave):
+    """Devuelve el resultado cacheado para la clave, o ``None``"""
+    valor = backend.get(clave)
+    if valor is None:
+        _contar('misses')
+        return None
+    _contar('hits')
+    return json.loads(valor)
+
+
+def guardar(backend, clave, datos):
+    backend.set(clave, json.dumps(datos, ensure_ascii=False).encode())
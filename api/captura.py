@@ -0,0 +1,99 @@
+"""
+Compresión de las fotos en el navegador antes de subirlas (caja y depósito).
+
+Las páginas de foto reducen cada captura (o archivo elegido) a
+``lado_maximo`` píxeles en su lado mayor y la codifican en ``formato`` con
+``calidad`` dentro de un Web Worker con ``OffscreenCanvas``
+(``api/static/api/js/captura.js``), así el hilo de la página no se traba y la
+subida pesa una fracción del cuadro original. La configuración sale de
+``CAPTURA`` (:func:`config_navegador`), para ajustarla sin tocar las páginas.
+Con el modo mosaico activo (``api/mosaico.py``) la página de depósito sube la
+foto hasta ``MOSAICO['lado_captura']``: el servidor la parte en teselas.
+
+Después de cada envío el navegador manda por ``sendBeacon`` lo que subió
+(:func:`registrar`): el tamaño de cada foto antes y después de comprimirla,
+cuánto tardó en comprimirla y el tiempo hasta la respuesta del servidor,
+contado desde el envío y desde la captura. Queda en ``/api/metrics``.
+"""
+from django.conf import settings
+from django.templatetags.static import static
+from django.urls import reverse
+
+from api import metricas, mosaico
+
+DEFAULT_CONFIG = {
+    'lado_maximo': 1280,        # píxeles del lado mayor de la foto subida
+    'formato': 'image/jpeg',    # 'image/jpeg' o 'image/webp'
+    'calidad': 0.8,             # 0 a 1
+}
+
+FORMATOS = ('image/jpeg', 'image/webp')
+PAGINAS = ('caja', 'deposito')
+
+# Límites de lo que se acepta del navegador
+MAX_IMAGENES = 50
+MAX_SEGUNDOS = 3600
+
+
+def get_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, 'CAPTURA', {})}
+
+
+def config_navegador(pagina):
+    """Objeto ``CAPTURA`` de las páginas de foto"""
+    config = get_config()
+    formato = config['formato'] if config['formato'] in FORMATOS else DEFAULT_CONFIG['formato']
+    lado_maximo = int(config['lado_maximo'])
+    if pagina == 'deposito' and mosaico.activo():
+        lado_maximo = max(lado_maximo, int(mosaico.get_config()['lado_captura']))
+    return {
+        'pagina': pagina,
+        'ladoMaximo': max(1, lado_maximo),
+        'formato': formato,
+        'calidad': min(1.0, max(0.1, float(config['calidad']))),
+        'workerUrl': static('api/js/captura_worker.js'),
+        'metricasUrl': reverse('metricas_captura'),
+    }
+
+
+# ==================== Métricas del navegador ====================
+
+def _numero(valor, maximo):
+    """Número entre 0 y ``maximo``, o ``None`` si no vino o no es válido"""
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+        return None
+    if not 0 <= valor <= maximo:
+        return None
+    return valor
+
+
+def registrar(datos):
+    """
+    Registra las métricas de un envío de fotos informado por el navegador.
+    Lanza ``ValueError`` si el cuerpo no tiene la forma esperada.
+    """
+    if not isinstance(datos, dict):
+        raise ValueError('Se esperaba un objeto JSON')
+    pagina = datos.get('pagina')
+    if pagina not in PAGINAS:
+        raise ValueError(f'Página inválida: {pagina}')
+    imagenes = datos.get('imagenes')
+    if not isinstance(imagenes, list) or not 0 < len(imagenes) <= MAX_IMAGENES:
+        raise ValueError(f'Se esperaban entre 1 y {MAX_IMAGENES} imágenes')
+
+    max_bytes = getattr(settings, 'UPLOAD_IMAGEN_MAX_BYTES', 15 * 2**20) * 4
+    for imagen in imagenes:
+        if not isinstance(imagen, dict):
+            continue
+        for etapa in ('original', 'subida'):
+            valor = _numero(imagen.get(etapa), max_bytes)
+            if valor is not None:
+                metricas.captura_bytes.observar(valor, pagina=pagina, etapa=etapa)
+        segundos = _numero(imagen.get('segundos_compresion'), MAX_SEGUNDOS)
+        if segundos is not None:
+            metricas.captura_compresion_segundos.observar(segundos, pagina=pagina)
+
+    for desde in ('envio', 'captura'):
+        segundos = _numero(datos.get(f'segundos_{desde}'), MAX_SEGUNDOS)
+        if segundos is not None:
+            metricas.captura_respuesta_segundos.observar(segundos, pagina=pagina, desde=desde)
@@ -0,0 +1,203 @@
+"""
+Carrito de productos detectados, compartido por caja y depósito.
+
+Cada producto ocupa una sola línea indexada por su id (o por el nombre si el
+detector no devolvió id), así que volver a detectar el mismo producto suma la
+cantidad en lugar de agregar una fila repetida. Los totales se mantienen al
+agregar cada línea, con ``Decimal`` redondeado a centavos para los importes.
+
+En la sesión se guarda una forma compacta::
+
+    {'l': {clave: [id, nombre, cantidad, precio_unitario]}, 't': '2400.00', 'c': 2}
+
+``cargar``/``guardar`` leen y escriben el carrito con la API sync de la
+sesión y ``acargar``/``aguardar`` con la async.
+"""
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+CENTAVO = Decimal('0.01')
+
+CLAVES_SESION = {
+    'caja': 'carrito_caja',
+    'deposito': 'carrito_deposito',
+}
+
+# Claves con las que se guardaba la lista de productos antes del carrito
+CLAVES_ANTERIORES = {
+    'caja': ('productos_caja', 'total_caja'),
+    'deposito': ('productos_deposito', 'total_deposito'),
+}
+
+
+def a_decimal(valor):
+    """Convierte un importe (str, int o float) a ``Decimal``; ``None`` si no es válido"""
+    if valor is None or valor == '':
+        return None
+    try:
+        return Decimal(str(valor).replace('$', '').strip()).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        return None
+
+
+def a_cantidad(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return 0
+
+
+class Carrito:
+    """Líneas por producto con total de importe y de unidades"""
+
+    def __init__(self):
+        self._lineas = {}  # clave -> [id, nombre, cantidad, precio_unitario]
+        self.total = Decimal('0.00')
+        self.total_cantidad = 0
+
+    def __len__(self):
+        return len(self._lineas)
+
+    def __bool__(self):
+        return bool(self._lineas)
+
+    @staticmethod
+    def _clave(producto_id, nombre, posicion):
+        if producto_id not in (None, '', 0, '0'):
+            return f'id:{producto_id}'
+        if nombre:
+            return f'nombre:{nombre}'
+        # Sin id ni nombre no hay con qué unificar: queda como línea propia
+        return f'linea:{posicion}'
+
+    def agregar(self, producto):
+        """Suma un producto tal como lo devuelve el detector o el navegador"""
+        producto_id = producto.get('id')
+        nombre = producto.get('nombre', '')
+        cantidad = a_cantidad(producto.get('cantidad', 1))
+
+        precio = a_decimal(producto.get('precio_unitario'))
+        if precio is None and cantidad:
+            subtotal = a_decimal(producto.get('subtotal'))
+            if subtotal is not None:
+                precio = (subtotal / cantidad).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+
+        clave = self._clave(producto_id, nombre, len(self._lineas))
+        linea = self._lineas.get(clave)
+        if linea is None:
+            self._lineas[clave] = [producto_id, nombre, cantidad, precio]
+        else:
+            linea[2] += cantidad
+            if linea[3] is None:
+                # La línea no tenía precio: el subtotal acumulado se recalcula con el nuevo
+                linea[3] = precio
+                if precio is not None:
+                    self.total += precio * (linea[2] - cantidad)
+            precio = linea[3]
+
+        self.total_cantidad += cantidad
+        if precio is not None:
+            self.total += precio * cantidad
+
+    def agregar_varios(self, productos):
+        for producto in productos:
+            self.agregar(producto)
+
+    @classmethod
+    def desde_productos(cls, productos):
+        carrito = cls()
+        carrito.agregar_varios(productos)
+        return carrito
+
+    def productos(self):
+        """Lista de productos con el formato que usan las plantillas y el JSON de respuesta"""
+        resultado = []
+        for producto_id, nombre, cantidad, precio in self._lineas.values():
+            producto = {
+                'id': producto_id,
+                'nombre': nombre,
+                'cantidad': cantidad,
+            }
+            if precio is not None:
+                producto['precio_unitario'] = str(precio)
+                producto['subtotal'] = str(precio * cantidad)
+            resultado.append(producto)
+        return resultado
+
+    def para_backend(self):
+        """Líneas ``{id, cantidad}`` para los endpoints de confirmación"""
+        return [
+            {'id': producto_id or 0, 'cantidad': cantidad}
+            for producto_id, _, cantidad, _ in self._lineas.values()
+        ]
+
+    # ==================== Sesión ====================
+
+    def a_sesion(self):
+        return {
+            'l': {
+                clave: [producto_id, nombre, cantidad, None if precio is None else str(precio)]
+                for clave, (producto_id, nombre, cantidad, precio) in self._lineas.items()
+            },
+            't': str(self.total),
+            'c': self.total_cantidad,
+        }
+
+    @classmethod
+    def desde_sesion(cls, datos):
+        carrito = cls()
+        if datos:
+            carrito._lineas = {
+                clave: [producto_id, nombre, cantidad, a_decimal(precio)]
+                for clave, (producto_id, nombre, cantidad, precio) in datos['l'].items()
+            }
+            carrito.total = Decimal(datos['t'])
+            carrito.total_cantidad = datos['c']
+        return carrito
+
+
+def cargar(session, tipo):
+    """Carrito de ``tipo`` ('caja' o 'deposito') guardado en la sesión"""
+    datos = session.get(CLAVES_SESION[tipo])
+    if datos is None:
+        # Sesiones previas al carrito: se migra la lista de productos
+        anteriores = session.get(CLAVES_ANTERIORES[tipo][0])
+        if anteriores:
+            return Carrito.desde_productos(anteriores)
+    return Carrito.desde_sesion(datos)
+
+
+def guardar(session, tipo, carrito):
+    """
+    Guarda el carrito en la sesión. Si no cambió no se asigna, así la sesión
+    no queda marcada como modificada y no se vuelve a escribir.
+    """
+    datos = carrito.a_sesion()
+    if session.get(CLAVES_SESION[tipo]) != datos:
+        session[CLAVES_SESION[tipo]] = datos
+    for clave in CLAVES_ANTERIORES[tipo]:
+        session.pop(clave, None)
+
+
+def limpiar(session, tipo):
+    session.pop(CLAVES_SESION[tipo], None)
+    for clave in CLAVES_ANTERIORES[tipo]:
+        session.pop(clave, None)
+
+
+async def acargar(session, tipo):
+    """Versión async de :func:`cargar`"""
+    datos = await session.aget(CLAVES_SESION[tipo])
+    if datos is None:
+        anteriores = await session.aget(CLAVES_ANTERIORES[tipo][0])
+        if anteriores:
+            return Carrito.desde_productos(anteriores)
+    return Carrito.desde_sesion(datos)
+
+
+async def aguardar(session, tipo, carrito):
+    """Versión async de :func:`guardar`"""
+    datos = carrito.a_sesion()
+    if await session.aget(CLAVES_SESION[tipo]) != datos:
+        await session.aset(CLAVES_SESION[tipo], datos)
+    for clave in CLAVES_ANTERIORES[tipo]:
+        await session.apop(clave, None)
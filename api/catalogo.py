@@ -0,0 +1,356 @@
+"""
+Catálogo de productos en memoria para la carga manual y el autocompletado.
+
+El catálogo se pide una vez al backend (``listarProductos``) y queda en el
+proceso como un ``Indice``: productos por id (precio sin ir al backend) y
+los nombres normalizados (sin tildes ni mayúsculas) ordenados para buscar:
+
+1. nombres que empiezan con lo escrito (``bisect`` sobre la lista ordenada);
+2. nombres con alguna palabra que empieza con lo escrito;
+3. nombres que contienen lo escrito en cualquier parte (``str.find`` sobre
+   un solo texto con todos los nombres). Con varias palabras, el nombre
+   tiene que contenerlas todas.
+
+Pasados ``refresco`` segundos, la próxima consulta pide en segundo plano los
+cambios desde la ``version`` que mandó el backend (``?desde=<version>``) y
+reemplaza el índice cuando llegan; mientras tanto se sigue respondiendo con
+el anterior. Si el backend manda ``completo: true`` (o no se le pasó
+``desde``) la lista reemplaza al catálogo; si no, se mezcla con él y los
+productos con ``activo: false`` se quitan.
+
+Hasta que el backend responde por primera vez se usa ``PRODUCTOS_INICIALES``
+(la lista fija que tenían las páginas de resumen). Configuración en
+``CATALOGO_PRODUCTOS``.
+"""
+import bisect
+import threading
+import time
+import unicodedata
+from collections import namedtuple
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from api import backend_client, carrito, coalescencia, logs, metricas
+
+logger = logs.get_logger(__name__)
+
+DEFAULT_CONFIG = {
+    'refresco': 300,        # segundos entre consultas incrementales al backend
+    'reintento': 30,        # segundos hasta reintentar si el backend falló
+    'limite': 10,           # resultados del autocompletado
+    'max_limite': 50,
+}
+
+# Catálogo fijo hasta que el backend devuelva el suyo
+PRODUCTOS_INICIALES = [
+    {'id': 4, 'nombre': 'Pure de Tomate', 'precio_unitario': '150.00'},
+    {'id': 5, 'nombre': 'Lata choclo cremoso', 'precio_unitario': '180.00'},
+    {'id': 6, 'nombre': 'Arroz Gallo Oro', 'precio_unitario': '250.00'},
+    {'id': 7, 'nombre': 'Galletitas Toddy', 'precio_unitario': '120.00'},
+]
+
+Producto = namedtuple('Producto', ['id', 'nombre', 'precio_unitario', 'clave'])
+
+_indice = None
+_vence = 0.0                # time.monotonic() en que toca refrescar
+_refrescando = False
+_lock = threading.Lock()
+
+
+def get_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, 'CATALOGO_PRODUCTOS', {})}
+
+
+def normalizar(texto):
+    """Minúsculas, sin tildes y con un solo espacio entre palabras"""
+    descompuesto = unicodedata.normalize('NFKD', str(texto or ''))
+    sin_tildes = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return ' '.join(sin_tildes.casefold().split())
+
+
+def _id(valor):
+    """Los ids llegan como número o como texto según de dónde vengan"""
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return valor
+
+
+def _producto(datos):
+    precio = carrito.a_decimal(datos.get('precio_unitario'))
+    nombre = str(datos.get('nombre') or '')
+    return Producto(_id(datos.get('id')), nombre, None if precio is None else str(precio),
+                    normalizar(nombre))
+
+
+# ==================== Índice ====================
+
+class Indice:
+    """Catálogo inmutable; cada actualización arma uno nuevo"""
+
+    def __init__(self, productos, version=None):
+        self.version = version
+        self.por_id = {producto.id: producto for producto in productos}
+        self._productos = sorted(self.por_id.values(), key=lambda p: (p.clave, str(p.id)))
+        self._claves = [producto.clave for producto in self._productos]
+
+        palabras = sorted(
+            (palabra, posicion)
+            for posicion, clave in enumerate(self._claves)
+            for palabra in set(clave.split())
+        )
+        self._palabras = [palabra for palabra, _ in palabras]
+        self._posiciones = [posicion for _, posicion in palabras]
+
+        # Todas las claves en un texto, con el inicio de cada una
+        self._texto = '\n'.join(self._claves)
+        self._inicios = []
+        inicio = 0
+        for clave in self._claves:
+            self._inicios.append(inicio)
+            inicio += len(clave) + 1
+
+    def __len__(self):
+        return len(self._productos)
+
+    @classmethod
+    def desde_datos(cls, productos, version=None):
+        return cls([_producto(datos) for datos in productos if datos.get('id') is not None], version)
+
+    def con_cambios(self, cambios, version):
+        """Índice nuevo con ``cambios`` aplicados (altas, modificaciones y bajas)"""
+        productos = dict(self.por_id)
+        for datos in cambios:
+            producto_id = _id(datos.get('id'))
+            if producto_id is None:
+                continue
+            if datos.get('activo', True) is False:
+                productos.pop(producto_id, None)
+            else:
+                productos[producto_id] = _producto(datos)
+        return Indice(productos.values(), version)
+
+    def precio(self, producto_id):
+        """Precio unitario (texto con dos decimales) o ``None`` si no se conoce"""
+        producto = self.por_id.get(_id(producto_id))
+        return producto.precio_unitario if producto is not None else None
+
+    def _prefijo(self, consulta):
+        posicion = bisect.bisect_left(self._claves, consulta)
+        while posicion < len(self._claves) and self._claves[posicion].startswith(consulta):
+            yield posicion
+            posicion += 1
+
+    def _prefijo_palabra(self, consulta):
+        posicion = bisect.bisect_left(self._palabras, consulta)
+        while posicion < len(self._palabras) and self._palabras[posicion].startswith(consulta):
+            yield self._posiciones[posicion]
+            posicion += 1
+
+    def _contiene(self, consulta):
+        palabras = consulta.split()
+        # Se busca la palabra más larga (la más selectiva) y se filtran las demás
+        guia = max(palabras, key=len)
+        desde = 0
+        while True:
+            encontrado = self._texto.find(guia, desde)
+            if encontrado < 0:
+                return
+            posicion = bisect.bisect_right(self._inicios, encontrado) - 1
+            clave = self._claves[posicion]
+            if all(palabra in clave for palabra in palabras):
+                yield posicion
+            # La próxima búsqueda arranca en la clave siguiente
+            desde = self._inicios[posicion] + len(clave) + 1
+
+    def buscar(self, texto, limite):
+        """Hasta ``limite`` productos para ``texto``: prefijo, palabra y subcadena"""
+        consulta = normalizar(texto)
+        if not consulta:
+            return self._productos[:limite]
+
+        resultado = []
+        vistos = set()
+        for grupo in (self._prefijo(consulta), self._prefijo_palabra(consulta), self._contiene(consulta)):
+            for posicion in grupo:
+                if posicion not in vistos:
+                    vistos.add(posicion)
+                    resultado.append(self._productos[posicion])
+                    if len(resultado) >= limite:
+                        return resultado
+        return resultado
+
+
+# ==================== Carga desde el backend ====================
+
+def _leer_respuesta(response, indice):
+    """Índice nuevo a partir de la respuesta del backend, o ``None`` si falló"""
+    if response.status_code != 200:
+        return None
+    datos = response.json()
+    if not datos.get('success', True):
+        return None
+    productos = datos.get('productos') or []
+    version = datos.get('version')
+    if indice is None or datos.get('completo', indice.version is None):
+        return Indice.desde_datos(productos, version)
+    return indice.con_cambios(productos, version)
+
+
+def _parametros(indice):
+    if indice is None or indice.version is None:
+        return {}
+    return {'params': {'desde': indice.version}}
+
+
+def _publicar(nuevo, anterior):
+    """Deja ``nuevo`` como catálogo del proceso (o el anterior si no hay nuevo)"""
+    global _indice, _vence
+
+    config = get_config()
+    with _lock:
+        if nuevo is not None:
+            _indice = nuevo
+            _vence = time.monotonic() + config['refresco']
+        else:
+            if _indice is None:
+                _indice = anterior or Indice.desde_datos(PRODUCTOS_INICIALES)
+            _vence = time.monotonic() + config['reintento']
+        indice = _indice
+
+    if nuevo is None:
+        metricas.catalogo_actualizaciones_total.inc(resultado='error')
+        logger.warning('📚 No se pudo actualizar el catálogo, se sigue usando el anterior',
+                       productos=len(indice))
+    else:
+        metricas.catalogo_actualizaciones_total.inc(
+            resultado='completa' if anterior is None or nuevo.version is None else 'incremental')
+        logger.info('📚 Catálogo actualizado', productos=len(nuevo), version=nuevo.version)
+    return indice
+
+
+def _pedir(indice):
+    try:
+        with metricas.etapa('backend'):
+            return _leer_respuesta(backend_client.get('listar_productos', **_parametros(indice)), indice)
+    except Exception as e:
+        logger.warning('❌ Error al pedir el catálogo al backend', error=str(e))
+        return None
+
+
+async def _apedir(indice):
+    try:
+        with metricas.etapa('backend'):
+            response = await backend_client.aget('listar_productos', **_parametros(indice))
+            return _leer_respuesta(response, indice)
+    except Exception as e:
+        logger.warning('❌ Error al pedir el catálogo al backend', error=str(e))
+        return None
+
+
+def _refrescar():
+    global _refrescando
+    try:
+        anterior = _indice
+        _publicar(_pedir(anterior), anterior)
+    finally:
+        with _lock:
+            _refrescando = False
+
+
+def _refrescar_si_vencio():
+    """Si el catálogo venció, lo actualiza en un thread aparte (uno a la vez)"""
+    global _refrescando
+    with _lock:
+        if _refrescando or time.monotonic() < _vence:
+            return
+        _refrescando = True
+    threading.Thread(target=_refrescar, name='catalogo', daemon=True).start()
+
+
+def obtener():
+    """
+    Índice del catálogo. La primera vez espera la respuesta del backend (una
+    sola llamada aunque lleguen varias consultas a la vez); después nunca
+    espera: si venció, lo actualiza en segundo plano.
+    """
+    if _indice is None:
+        indice, _ = coalescencia.compartir(
+            'catalogo', lambda: _indice or _publicar(_pedir(None), None), endpoint='listar_productos')
+        return indice
+    _refrescar_si_vencio()
+    return _indice
+
+
+async def aobtener():
+    """Versión async de :func:`obtener`"""
+    if _indice is None:
+        async def cargar():
+            return _indice or _publicar(await _apedir(None), None)
+
+        indice, _ = await coalescencia.acompartir('catalogo', cargar, endpoint='listar_productos')
+        return indice
+    _refrescar_si_vencio()
+    return _indice
+
+
+def cantidad():
+    """Productos en el catálogo cargado (0 si todavía no se cargó)"""
+    indice = _indice
+    return len(indice) if indice is not None else 0
+
+
+def reiniciar():
+    """Descarta el catálogo del proceso (útil en tests y benchmarks)"""
+    global _indice, _vence
+    with _lock:
+        _indice = None
+        _vence = 0.0
+
+
+def completar_precios(productos):
+    """
+    Completa ``precio_unitario`` de los productos que no lo traen con el del
+    catálogo ya cargado (no lo pide al backend si todavía no está).
+    """
+    indice = _indice
+    if indice is None:
+        return productos
+    for producto in productos:
+        if carrito.a_decimal(producto.get('precio_unitario')) is None:
+            precio = indice.precio(producto.get('id'))
+            if precio is not None:
+                producto['precio_unitario'] = precio
+    return productos
+
+
+# ==================== Consulta ====================
+
+def leer_limite(params):
+    """``limite`` de ``request.GET`` acotado a ``max_limite``; ``ValueError`` si no es un número"""
+    config = get_config()
+    valor = params.get('limite')
+    if valor in (None, ''):
+        return config['limite']
+    try:
+        limite = int(valor)
+    except ValueError:
+        raise ValueError('El parámetro limite debe ser un número')
+    return max(1, min(limite, config['max_limite']))
+
+
+def respuesta(indice, texto, limite):
+    with metricas.etapa('respuesta'):
+        productos = indice.buscar(texto, limite)
+    response = JsonResponse({
+        'success': True,
+        'productos': [
+            {'id': p.id, 'nombre': p.nombre, 'precio_unitario': p.precio_unitario}
+            for p in productos
+        ],
+        'version': indice.version,
+    })
+    # El navegador puede reutilizar la misma búsqueda un rato
+    response['Cache-Control'] = 'private, max-age=60'
+    return response
@@ -0,0 +1,220 @@
+"""
+Búsqueda de clientes por DNI con cache, para el cobro en caja.
+
+El navegador ya no llama a ``validarcliente`` del backend: pasa por
+:func:`buscar`, que guarda cada respuesta en un LRU del proceso (hasta
+``max_entradas`` DNIs) durante ``ttl`` segundos, así los clientes habituales
+se encuentran sin salir de la app. Que un DNI no exista también se guarda,
+pero solo ``ttl_negativo`` segundos: suele ser el paso previo a registrarlo.
+
+:func:`registrar` manda el alta a ``registrarcliente`` y, si salió bien, deja
+al cliente nuevo en el cache (write-through): la próxima búsqueda de ese DNI
+no vuelve al backend. Si el alta falla se descarta lo que hubiera guardado.
+
+Varias búsquedas del mismo DNI a la vez comparten una sola llamada
+(``coalescencia``). Configuración en ``CLIENTES``.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from api import backend_client, coalescencia, metricas
+
+DEFAULT_CONFIG = {
+    'ttl': 600,             # segundos que se reutiliza un cliente encontrado
+    'ttl_negativo': 30,     # segundos que se recuerda que un DNI no existe
+    'max_entradas': 5000,   # DNIs en el LRU del proceso
+}
+
+MENSAJE_ENCONTRADO = 'Cliente encontrado'
+MENSAJE_NO_ENCONTRADO = 'Cliente no encontrado'
+
+_cache = None
+_lock = threading.Lock()
+
+
+def get_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, 'CLIENTES', {})}
+
+
+def normalizar_dni(valor):
+    """DNI sin espacios; ``ValueError`` si está vacío o no es un número"""
+    dni = str(valor or '').strip()
+    if not dni:
+        raise ValueError('Por favor ingrese un DNI')
+    if not dni.isdigit():
+        raise ValueError('El DNI debe tener solo números')
+    return dni
+
+
+# ==================== Cache ====================
+
+class CacheClientes:
+    """LRU por DNI; cada entrada vence según sea un cliente o un DNI inexistente"""
+
+    def __init__(self, max_entradas):
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()  # dni -> (expira, status, respuesta)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._datos)
+
+    def get(self, dni):
+        """``(status, respuesta)`` guardados para ``dni`` o ``None``"""
+        with self._lock:
+            entrada = self._datos.get(dni)
+            if entrada is None:
+                return None
+            expira, status, respuesta = entrada
+            if expira < time.monotonic():
+                del self._datos[dni]
+                return None
+            self._datos.move_to_end(dni)
+            return status, respuesta
+
+    def set(self, dni, status, respuesta, ttl):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._datos.pop(dni, None)
+            self._datos[dni] = (time.monotonic() + ttl, status, respuesta)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def quitar(self, dni):
+        with self._lock:
+            self._datos.pop(dni, None)
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = CacheClientes(get_config()['max_entradas'])
+    return _cache
+
+
+def cantidad():
+    """DNIs guardados en el cache del proceso"""
+    cache = _cache
+    return len(cache) if cache is not None else 0
+
+
+def reiniciar():
+    """Descarta el cache del proceso (útil en tests y benchmarks)"""
+    global _cache
+    with _lock:
+        _cache = None
+
+
+# ==================== Búsqueda ====================
+
+def _json(response):
+    try:
+        return response.json()
+    except ValueError:
+        return {}
+
+
+def _guardar_busqueda(dni, response):
+    """
+    ``(status, respuesta)`` de ``validarcliente``. Se guardan los clientes
+    encontrados y, por menos tiempo, los DNIs que no existen; los errores no.
+    """
+    datos = _json(response)
+    config = get_config()
+    if response.status_code == 200 and datos.get('success') and datos.get('cliente'):
+        ttl = config['ttl']
+    elif response.status_code == 404 or (response.status_code == 200 and not datos.get('success')):
+        datos = {'message': MENSAJE_NO_ENCONTRADO, **datos, 'success': False}
+        ttl = config['ttl_negativo']
+    else:
+        return response.status_code, datos
+    get_cache().set(dni, response.status_code, datos, ttl)
+    return response.status_code, datos
+
+
+def _desde_cache(dni):
+    guardado = get_cache().get(dni)
+    if guardado is not None:
+        status, datos = guardado
+        metricas.clientes_busquedas_total.inc(resultado='cache' if datos.get('success') else 'cache_negativo')
+    return guardado
+
+
+def buscar(dni):
+    """``(status, respuesta)`` de la búsqueda de ``dni``, del cache o del backend"""
+    guardado = _desde_cache(dni)
+    if guardado is not None:
+        return guardado
+
+    def pedir():
+        with metricas.etapa('backend'):
+            response = backend_client.post('validar_cliente', json={'dni': dni})
+        return _guardar_busqueda(dni, response)
+
+    resultado, _ = coalescencia.compartir(f'cliente:{dni}', pedir, endpoint='validar_cliente')
+    metricas.clientes_busquedas_total.inc(resultado='backend')
+    return resultado
+
+
+async def abuscar(dni):
+    """Versión async de :func:`buscar`"""
+    guardado = _desde_cache(dni)
+    if guardado is not None:
+        return guardado
+
+    async def pedir():
+        with metricas.etapa('backend'):
+            response = await backend_client.apost('validar_cliente', json={'dni': dni})
+        return _guardar_busqueda(dni, response)
+
+    resultado, _ = await coalescencia.acompartir(f'cliente:{dni}', pedir, endpoint='validar_cliente')
+    metricas.clientes_busquedas_total.inc(resultado='backend')
+    return resultado
+
+
+# ==================== Registro ====================
+
+def leer_registro(data):
+    """Datos del alta a partir del JSON del navegador; ``ValueError`` si falta algo"""
+    datos = {
+        'dni': normalizar_dni(data.get('dni')),
+        'nombre': str(data.get('nombre') or '').strip(),
+        'telefono': str(data.get('telefono') or '').strip(),
+    }
+    if not datos['nombre'] or not datos['telefono']:
+        raise ValueError('Complete todos los campos')
+    return datos
+
+
+def _guardar_registro(datos, response):
+    """``(status, respuesta)`` del alta; si salió bien, el cliente queda en el cache"""
+    respuesta = _json(response)
+    cache = get_cache()
+    if response.status_code < 300 and respuesta.get('success', True):
+        cliente = respuesta.get('cliente') or datos
+        cache.set(datos['dni'], 200, {'success': True, 'cliente': cliente, 'message': MENSAJE_ENCONTRADO},
+                  get_config()['ttl'])
+    else:
+        # Lo guardado ya no es confiable (por ejemplo, "el cliente ya existe")
+        cache.quitar(datos['dni'])
+    return response.status_code, respuesta
+
+
+def registrar(datos):
+    """Da de alta al cliente en el backend y devuelve ``(status, respuesta)``"""
+    with metricas.etapa('backend'):
+        response = backend_client.post('registrar_cliente', json=datos)
+    return _guardar_registro(datos, response)
+
+
+async def aregistrar(datos):
+    """Versión async de :func:`registrar`"""
+    with metricas.etapa('backend'):
+        response = await backend_client.apost('registrar_cliente', json=datos)
+    return _guardar_registro(datos, response)
@@ -0,0 +1,140 @@
+"""
+Single-flight: peticiones idénticas en vuelo comparten una sola llamada.
+
+Un doble toque en "procesar" o un reintento del navegador mandan la misma
+foto dos o tres veces a la vez; el cache de detección no alcanza porque
+ninguna de esas llamadas terminó todavía. Con :func:`compartir` la primera
+petición para una clave (el SHA-256 de la imagen normalizada) hace la
+llamada y las que llegan mientras tanto esperan su resultado::
+
+    resultado, compartido = coalescencia.compartir(clave, llamar_backend)
+
+Si la llamada falla, todas reciben el mismo error. Si lo que corta al líder
+es algo propio de su petición (su plazo se agotó o, en async, se canceló),
+las demás no heredan el corte: una de ellas vuelve a intentar como líder.
+
+:func:`acompartir` es la versión para las vistas async; la llamada corre en
+una tarea propia, así que cancelar la petición del líder no la interrumpe
+para las demás. ``reconocimiento_backend_llamadas_ahorradas_total`` cuenta
+las llamadas que se evitaron.
+"""
+import asyncio
+import threading
+import weakref
+
+from api import metricas, resiliencia
+
+
+class _Llamada:
+    def __init__(self):
+        self.listo = threading.Event()
+        self.resultado = None
+        self.error = None
+
+
+_llamadas = {}
+_lock = threading.Lock()
+
+# clave -> tarea, por event loop (las tareas no se comparten entre loops)
+_tareas = weakref.WeakKeyDictionary()
+
+
+def _es_propio_del_lider(error):
+    """Errores que dependen de la petición del líder y no del backend"""
+    return isinstance(error, (resiliencia.PlazoAgotado, asyncio.CancelledError))
+
+
+def _esperar(llamada):
+    """Espera al líder sin pasarse del plazo de esta petición"""
+    queda = resiliencia.restante()
+    if not llamada.listo.wait(timeout=None if queda is None else max(0, queda)):
+        raise resiliencia.PlazoAgotado('Se agotó el tiempo de espera de la petición')
+
+
+async def _aesperar(tarea):
+    """Versión async de :func:`_esperar`"""
+    queda = resiliencia.restante()
+    try:
+        return await asyncio.wait_for(asyncio.shield(tarea), None if queda is None else max(0, queda))
+    except asyncio.TimeoutError:
+        raise resiliencia.PlazoAgotado('Se agotó el tiempo de espera de la petición')
+
+
+def compartir(clave, funcion, endpoint='detectar_objetos'):
+    """
+    Llama a ``funcion()`` una sola vez por ``clave`` entre los threads que
+    la piden a la vez. Devuelve ``(resultado, compartido)``; ``compartido``
+    es ``True`` si el resultado vino de la llamada de otra petición.
+    """
+    while True:
+        with _lock:
+            llamada = _llamadas.get(clave)
+            lider = llamada is None
+            if lider:
+                llamada = _llamadas[clave] = _Llamada()
+
+        if lider:
+            try:
+                llamada.resultado = funcion()
+                return llamada.resultado, False
+            except BaseException as e:
+                llamada.error = e
+                raise
+            finally:
+                with _lock:
+                    del _llamadas[clave]
+                llamada.listo.set()
+
+        with metricas.etapa('backend'):
+            _esperar(llamada)
+        if llamada.error is None:
+            metricas.llamadas_ahorradas_total.inc(endpoint=endpoint)
+            return llamada.resultado, True
+        if not _es_propio_del_lider(llamada.error):
+            metricas.llamadas_ahorradas_total.inc(endpoint=endpoint)
+            raise llamada.error
+        # El líder se cortó por su cuenta: se reintenta (quizás como líder)
+
+
+async def acompartir(clave, funcion, endpoint='detectar_objetos'):
+    """Versión async de :func:`compartir`; ``funcion`` devuelve una corrutina"""
+    tareas = _tareas.setdefault(asyncio.get_running_loop(), {})
+
+    def soltar(tarea):
+        if tareas.get(clave) is tarea:
+            del tareas[clave]
+
+    while True:
+        tarea = tareas.get(clave)
+        compartido = tarea is not None
+        if not compartido:
+            tarea = tareas[clave] = asyncio.ensure_future(funcion())
+            tarea.add_done_callback(soltar)
+
+        try:
+            if compartido:
+                with metricas.etapa('backend'):
+                    resultado = await _aesperar(tarea)
+            else:
+                # shield: si se cancela esta petición la llamada sigue para las demás
+                resultado = await asyncio.shield(tarea)
+        except (asyncio.CancelledError, Exception) as e:
+            if not compartido or not tarea.done():
+                raise
+            if tarea.cancelled() or _es_propio_del_lider(e):
+                # El líder se cortó por su cuenta: se reintenta (quizás como líder)
+                soltar(tarea)
+                continue
+            metricas.llamadas_ahorradas_total.inc(endpoint=endpoint)
+            raise
+
+        if compartido:
+            metricas.llamadas_ahorradas_total.inc(endpoint=endpoint)
+        return resultado, compartido
+
+
+def en_vuelo():
+    """Cantidad de claves con una llamada en curso (threads y event loops)"""
+    with _lock:
+        total = len(_llamadas)
+    return total + sum(len(tareas) for tareas in list(_tareas.values()))
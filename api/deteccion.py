@@ -0,0 +1,203 @@
+"""
+Pipeline de detección compartido por las vistas de caja y depósito.
+
+    imagen subida → normalización → hash → cache → single-flight → detectarobjetos
+
+``detectar`` lo corre para las vistas sync y ``adetectar`` para las async;
+las dos devuelven un ``ResultadoDeteccion`` y dejan a cada vista decidir
+cómo acumular los productos en la sesión. ``detectar_lote``/``adetectar_lote``
+procesan varias imágenes en paralelo con un límite de concurrencia.
+
+Entre el cache y el backend, las detecciones de la misma imagen que llegan a
+la vez se unifican en una sola llamada (``api/coalescencia.py``).
+
+Los productos que el detector devuelve sin precio toman el del catálogo
+cargado en memoria (``api/catalogo.py``), sin otra llamada al backend.
+
+``progreso``, si se pasa, se llama con ``'preprocesada'`` al terminar la
+normalización y con ``'enviada'`` antes de esperar al detector (los
+trabajos lo usan para su stream de eventos).
+
+Con ``normalizar=False`` la imagen va tal cual: las teselas del modo mosaico
+ya vienen re-codificadas y, si se achicaran, sus cajas quedarían en otra
+escala que la de su posición en la foto.
+"""
+import asyncio
+import contextvars
+import copy
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from api import backend_client, cache_deteccion, catalogo, coalescencia, metricas, preprocesamiento, resiliencia, uploads
+
+ResultadoDeteccion = namedtuple('ResultadoDeteccion', ['status_code', 'datos', 'desde_cache'])
+
+
+def _clave(imagen_file, cache):
+    """Digest de la imagen y el resultado cacheado, si hay"""
+    if cache is None:
+        return cache_deteccion.clave_imagen(imagen_file), None
+    with metricas.etapa('cache'):
+        clave = cache_deteccion.clave_imagen(imagen_file)
+        return clave, cache_deteccion.obtener(cache, clave)
+
+
+def _copia_compartida(resultado, compartido):
+    # Cada petición recibe su propio JSON: ninguna ve lo que otra le cambie
+    if compartido and resultado.datos is not None:
+        return resultado._replace(datos=copy.deepcopy(resultado.datos))
+    return resultado
+
+
+def _avisar(progreso, evento, **datos):
+    if progreso is not None:
+        progreso(evento, **datos)
+
+
+def detectar(imagen_file, progreso=None, normalizar=True):
+    """
+    Detecta los productos de la imagen. ``datos`` es el JSON del backend
+    cuando ``status_code`` es 200 y ``None`` en otro caso. Las peticiones
+    simultáneas con la misma imagen comparten una sola llamada al backend.
+    """
+    if normalizar:
+        with metricas.etapa('preprocesamiento'):
+            imagen_file, _ = preprocesamiento.normalizar(imagen_file)
+    _avisar(progreso, 'preprocesada', bytes=imagen_file.size)
+
+    cache = cache_deteccion.get_backend()
+    clave, datos = _clave(imagen_file, cache)
+    if datos is not None:
+        return ResultadoDeteccion(200, datos, True)
+
+    def llamar_backend():
+        with metricas.etapa('backend'):
+            cuerpo = uploads.MultipartImagen(imagen_file)
+            response = backend_client.post('detectar_objetos', data=cuerpo, headers=cuerpo.headers)
+            if response.status_code != 200:
+                return ResultadoDeteccion(response.status_code, None, False)
+            datos = response.json()
+        catalogo.completar_precios(datos.get('productos') or [])
+
+        if cache is not None:
+            cache_deteccion.guardar(cache, clave, datos)
+        return ResultadoDeteccion(200, datos, False)
+
+    _avisar(progreso, 'enviada')
+    return _copia_compartida(*coalescencia.compartir(clave, llamar_backend))
+
+
+async def adetectar(imagen_file, progreso=None, normalizar=True):
+    """Versión async de :func:`detectar`"""
+    if normalizar:
+        with metricas.etapa('preprocesamiento'):
+            imagen_file, _ = await preprocesamiento.anormalizar(imagen_file)
+    _avisar(progreso, 'preprocesada', bytes=imagen_file.size)
+
+    cache = cache_deteccion.get_backend()
+    if cache is not None and cache.bloqueante:
+        clave, datos = await sync_to_async(_clave)(imagen_file, cache)
+    else:
+        clave, datos = _clave(imagen_file, cache)
+    if datos is not None:
+        return ResultadoDeteccion(200, datos, True)
+
+    async def llamar_backend():
+        with metricas.etapa('backend'):
+            cuerpo = uploads.MultipartImagen(imagen_file)
+            response = await backend_client.apost(
+                'detectar_objetos', content=cuerpo.asincrono(), headers=cuerpo.headers
+            )
+            if response.status_code != 200:
+                return ResultadoDeteccion(response.status_code, None, False)
+            datos = response.json()
+        catalogo.completar_precios(datos.get('productos') or [])
+
+        if cache is not None:
+            if cache.bloqueante:
+                await sync_to_async(cache_deteccion.guardar)(cache, clave, datos)
+            else:
+                cache_deteccion.guardar(cache, clave, datos)
+        return ResultadoDeteccion(200, datos, False)
+
+    _avisar(progreso, 'enviada')
+    return _copia_compartida(*await coalescencia.acompartir(clave, llamar_backend))
+
+
+# ==================== Lotes ====================
+
+DEFAULT_LOTE = {
+    'max_imagenes': 10,
+    'concurrencia': 4,
+}
+
+
+def get_config_lote():
+    return {**DEFAULT_LOTE, **getattr(settings, 'DETECCION_LOTE', {})}
+
+
+def detectar_lote(imagenes, concurrencia=None, normalizar=True):
+    """
+    Detecta varias imágenes con a lo sumo ``concurrencia`` llamadas al
+    backend en simultáneo. Devuelve, en el orden de ``imagenes``, un
+    ``ResultadoDeteccion`` o la excepción que produjo cada una.
+    """
+    concurrencia = concurrencia or get_config_lote()['concurrencia']
+
+    def detectar_una(imagen):
+        try:
+            return detectar(imagen, normalizar=normalizar)
+        except Exception as e:
+            return e
+
+    # Cada thread corre con una copia del contexto para que las métricas
+    # sigan asociadas a la vista que recibió el lote
+    contexto = contextvars.copy_context()
+
+    def en_contexto(imagen):
+        return contexto.copy().run(detectar_una, imagen)
+
+    with ThreadPoolExecutor(max_workers=min(concurrencia, len(imagenes))) as pool:
+        return list(pool.map(en_contexto, imagenes))
+
+
+async def adetectar_lote(imagenes, concurrencia=None, normalizar=True):
+    """Versión async de :func:`detectar_lote`"""
+    semaforo = asyncio.Semaphore(concurrencia or get_config_lote()['concurrencia'])
+
+    async def detectar_una(imagen):
+        async with semaforo:
+            try:
+                return await adetectar(imagen, normalizar=normalizar)
+            except Exception as e:
+                return e
+
+    return await asyncio.gather(*(detectar_una(imagen) for imagen in imagenes))
+
+
+def combinar_lote(imagenes, resultados):
+    """
+    Junta los productos detectados en todas las imágenes del lote.
+    Devuelve ``(productos, errores)``; cada error indica la imagen que falló.
+    """
+    productos = []
+    errores = []
+    for imagen, resultado in zip(imagenes, resultados):
+        if isinstance(resultado, resiliencia.BackendNoDisponible):
+            errores.append({'imagen': imagen.name, 'error': str(resultado)})
+        elif isinstance(resultado, Exception):
+            errores.append({
+                'imagen': imagen.name,
+                'error': f'Error conectando con el servidor: {str(resultado)}'
+            })
+        elif resultado.status_code != 200:
+            errores.append({
+                'imagen': imagen.name,
+                'error': 'Error, no se han identificado productos en la imagen'
+            })
+        else:
+            productos.extend(resultado.datos.get('productos', []))
+    return productos, errores
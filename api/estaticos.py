@@ -0,0 +1,218 @@
+"""
+Archivos estáticos con hash en el nombre, precomprimidos y con cache largo.
+
+Los estilos y scripts de las páginas viven en ``api/static/api/`` y los
+templates los enlazan con ``{% static %}``. Con ``DEBUG`` apagado:
+
+``AlmacenamientoComprimido``
+    Es el storage de ``staticfiles`` (``STORAGES['staticfiles']``).
+    ``collectstatic`` copia cada archivo con el hash de su contenido en el
+    nombre (``resumen_caja.3f2a9c1b7d4e.js``), escribe el manifest que usa
+    ``{% static %}`` y deja al lado una copia ``.gz`` y, si está instalado
+    el paquete ``brotli``, una ``.br`` de los archivos de texto.
+
+``EstaticosMiddleware``
+    Sirve ``STATIC_URL`` desde ``STATIC_ROOT`` sin pasar por sesiones ni
+    vistas. Elige la copia comprimida según ``Accept-Encoding`` y manda los
+    nombres con hash con ``Cache-Control: immutable`` por un año: si el
+    archivo cambia, cambia su nombre y el navegador pide el nuevo. Los demás
+    (pedidos por su nombre original) se cachean ``max_age`` segundos y se
+    revalidan con ``ETag``. Los archivos leídos quedan en memoria.
+
+Con ``DEBUG`` prendido el middleware no se instala y los estáticos se sirven
+sin hash desde ``api/static`` como siempre.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+from api import logs, metricas
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logs.get_logger(__name__)
+
+DEFAULT_CONFIG = {
+    'max_age_hash': 31536000,   # un año para los nombres con hash
+    'max_age': 300,             # segundos para los nombres sin hash
+    'comprimir': ('.css', '.js', '.svg', '.json', '.txt', '.map', '.html'),
+    'min_bytes': 512,           # debajo de esto comprimir no ahorra nada
+}
+
+# Content-Encoding -> extensión de la copia precomprimida, en orden de preferencia
+CODIFICACIONES = (('br', '.br'), ('gzip', '.gz'))
+
+
+def get_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, 'ESTATICOS', {})}
+
+
+# ==================== Storage ====================
+
+class AlmacenamientoComprimido(ManifestStaticFilesStorage):
+    """``ManifestStaticFilesStorage`` que además deja copias ``.gz``/``.br``"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        config = get_config()
+        comprimidos = ahorrados = 0
+        for nombre in set(self.hashed_files.values()):
+            if not nombre.endswith(config['comprimir']) or not self.exists(nombre):
+                continue
+            with self.open(nombre) as archivo:
+                contenido = archivo.read()
+            if len(contenido) < config['min_bytes']:
+                continue
+            for extension, datos in _comprimir(contenido):
+                # Solo vale la pena si la copia es más chica que el original
+                if len(datos) < len(contenido):
+                    with open(self.path(nombre) + extension, 'wb') as destino:
+                        destino.write(datos)
+                    comprimidos += 1
+                    ahorrados += len(contenido) - len(datos)
+        logger.info('🗜️ Estáticos precomprimidos', archivos=comprimidos, bytes_ahorrados=ahorrados,
+                    brotli=brotli is not None)
+
+
+def _comprimir(contenido):
+    yield '.gz', gzip.compress(contenido, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield '.br', brotli.compress(contenido, quality=11)
+
+
+# ==================== Middleware ====================
+
+def _ruta_relativa(path):
+    """Ruta dentro de ``STATIC_ROOT`` para ``path``, o ``None`` si no es válida"""
+    relativa = posixpath.normpath(path[len(settings.STATIC_URL):]).lstrip('/')
+    if relativa in ('', '.') or relativa.startswith('..'):
+        return None
+    return relativa
+
+
+@lru_cache(maxsize=256)
+def _cargar(relativa):
+    """
+    ``(content_type, {codificacion: (contenido, etag)})`` del archivo y sus
+    copias comprimidas, o ``None`` si no existe.
+    """
+    ruta = os.path.join(settings.STATIC_ROOT, *relativa.split('/'))
+    if not os.path.isfile(ruta):
+        return None
+
+    content_type, _ = mimetypes.guess_type(ruta)
+    content_type = content_type or 'application/octet-stream'
+    if content_type.startswith('text/') or content_type in ('application/json', 'image/svg+xml'):
+        content_type += '; charset=utf-8'
+
+    variantes = {}
+    for codificacion, extension in (('identity', ''),) + CODIFICACIONES:
+        if os.path.isfile(ruta + extension):
+            with open(ruta + extension, 'rb') as archivo:
+                contenido = archivo.read()
+            variantes[codificacion] = (contenido, '"%s"' % hashlib.md5(contenido).hexdigest())
+    return content_type, variantes
+
+
+def _aceptadas(request):
+    """Codificaciones que acepta el cliente (las que no tienen ``q=0``)"""
+    aceptadas = set()
+    for parte in request.headers.get('Accept-Encoding', '').split(','):
+        nombre, _, parametros = parte.partition(';')
+        clave, _, valor = parametros.strip().partition('=')
+        try:
+            calidad = float(valor) if clave.strip() == 'q' else 1.0
+        except ValueError:
+            calidad = 1.0
+        if calidad > 0:
+            aceptadas.add(nombre.strip().lower())
+    return aceptadas
+
+
+@lru_cache(maxsize=1)
+def _nombres_con_hash():
+    return frozenset(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+
+def servir(request, relativa):
+    """Respuesta para el estático ``relativa``, o ``None`` si no existe"""
+    archivo = _cargar(relativa)
+    if archivo is None:
+        return None
+    content_type, variantes = archivo
+
+    aceptadas = _aceptadas(request)
+    codificacion = next((nombre for nombre, _ in CODIFICACIONES
+                         if nombre in variantes and nombre in aceptadas), 'identity')
+    contenido, etag = variantes[codificacion]
+
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(b'' if request.method == 'HEAD' else contenido,
+                                content_type=content_type)
+        response['Content-Length'] = str(len(contenido))
+        if codificacion != 'identity':
+            response['Content-Encoding'] = codificacion
+    metricas.estaticos_total.inc(codificacion=codificacion, status=response.status_code)
+
+    config = get_config()
+    if relativa in _nombres_con_hash():
+        response['Cache-Control'] = f'public, max-age={config["max_age_hash"]}, immutable'
+    else:
+        response['Cache-Control'] = f'public, max-age={config["max_age"]}'
+    response['ETag'] = etag
+    if len(variantes) > 1:
+        response['Vary'] = 'Accept-Encoding'
+    response['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+
+class EstaticosMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.DEBUG or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def _responder(self, request):
+        if request.method not in ('GET', 'HEAD') or not request.path.startswith(settings.STATIC_URL):
+            return None
+        relativa = _ruta_relativa(request.path)
+        return servir(request, relativa) if relativa is not None else None
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        response = self._responder(request)
+        if response is None:
+            response = self.get_response(request)
+        return response
+
+    async def __acall__(self, request):
+        # Sin sync_to_async: los archivos quedan en memoria después de la primera lectura
+        response = self._responder(request)
+        if response is None:
+            response = await self.get_response(request)
+        return response
@@ -0,0 +1,235 @@
+"""
+Claves de idempotencia para las confirmaciones de caja y depósito.
+
+El navegador genera una clave por operación y la manda en el header
+``Idempotency-Key`` en cada intento. Las vistas decoradas con
+:func:`idempotente` ejecutan la operación una sola vez por clave:
+
+* la primera petición reserva la clave en el cache (``cache.add``), llama al
+  backend y guarda la respuesta durante ``retencion`` segundos;
+* los reintentos con la misma clave reciben esa respuesta guardada (con
+  ``Idempotent-Replayed: true``) sin volver a llamar al backend;
+* los duplicados que llegan mientras la primera sigue en curso esperan su
+  resultado si están en el mismo proceso (``coalescencia``); si están en
+  otro worker reciben 409 con ``Retry-After`` y el navegador reintenta;
+* si la misma clave llega con otro cuerpo se responde 422.
+
+Solo se guardan las respuestas con un resultado definitivo (2xx y 4xx). Los
+5xx y los errores de conexión liberan la clave para que el reintento vuelva a
+intentar; la clave viaja al backend en el mismo header para que también él
+pueda descartar la venta repetida, y ``backend_client`` reintenta esas
+llamadas aunque el endpoint no sea idempotente.
+
+Sin header la vista se comporta como siempre. Configuración en
+``IDEMPOTENCIA``; el cache es el alias ``alias`` de ``CACHES`` (con varios
+workers tiene que ser uno compartido).
+"""
+import functools
+import hashlib
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+
+from api import coalescencia, metricas
+
+DEFAULT_CONFIG = {
+    'retencion': 24 * 3600,  # segundos que se repite la respuesta guardada
+    'en_curso': 60,          # segundos que la clave queda reservada mientras dura la llamada
+    'alias': 'default',      # alias de CACHES
+}
+
+HEADER = 'Idempotency-Key'
+MAX_LARGO = 200
+
+EN_CURSO = 'en_curso'
+LISTA = 'lista'
+
+# Headers de la respuesta que se guardan junto con el cuerpo
+HEADERS_GUARDADOS = ('Retry-After',)
+
+
+def get_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, 'IDEMPOTENCIA', {})}
+
+
+def _cache():
+    return caches[get_config()['alias']]
+
+
+def clave(request):
+    """La clave de idempotencia de la petición, o ``None`` si no mandó una"""
+    return request.headers.get(HEADER) or None
+
+
+def _valida(valor):
+    return len(valor) <= MAX_LARGO and valor.isascii() and valor.isprintable()
+
+
+def _huella(request):
+    return hashlib.sha256(request.body).hexdigest()
+
+
+# ==================== Respuestas ====================
+
+def _registro(response, huella):
+    """La respuesta de la vista como algo que se puede guardar en el cache"""
+    return {
+        'estado': LISTA,
+        'huella': huella,
+        'status': response.status_code,
+        'contenido': response.content,
+        'content_type': response['Content-Type'],
+        'headers': {nombre: response[nombre] for nombre in HEADERS_GUARDADOS if response.has_header(nombre)},
+    }
+
+
+def _guardable(registro):
+    # Los 5xx no son un resultado: el reintento tiene que poder volver a intentar
+    return registro['status'] < 500
+
+
+def _desde_registro(registro, repetida):
+    response = HttpResponse(registro['contenido'], status=registro['status'],
+                            content_type=registro['content_type'])
+    for nombre, valor in registro['headers'].items():
+        response[nombre] = valor
+    if repetida:
+        response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _respuesta_invalida():
+    return JsonResponse({
+        'success': False,
+        'error': f'El header {HEADER} debe tener hasta {MAX_LARGO} caracteres imprimibles'
+    }, status=400)
+
+
+def _respuesta_guardada(registro, huella, alcance):
+    """Respuesta para una clave que ya estaba en el cache"""
+    if registro['huella'] != huella:
+        metricas.idempotencia_total.inc(alcance=alcance, resultado='conflicto')
+        return JsonResponse({
+            'success': False,
+            'error': 'La clave de idempotencia ya se usó con otros datos'
+        }, status=422)
+    if registro['estado'] == EN_CURSO:
+        metricas.idempotencia_total.inc(alcance=alcance, resultado='en_curso')
+        response = JsonResponse({
+            'success': False,
+            'error': 'La operación ya se está procesando, reintente en un momento'
+        }, status=409)
+        response['Retry-After'] = '1'
+        return response
+    metricas.idempotencia_total.inc(alcance=alcance, resultado='repetida')
+    return _desde_registro(registro, repetida=True)
+
+
+# ==================== Ejecución ====================
+
+def ejecutar(request, alcance, vista, *args, **kwargs):
+    """Ejecuta ``vista`` una sola vez por clave de idempotencia de ``alcance``"""
+    valor = clave(request)
+    if request.method != 'POST' or valor is None:
+        return vista(request, *args, **kwargs)
+    if not _valida(valor):
+        return _respuesta_invalida()
+
+    cache = _cache()
+    config = get_config()
+    clave_cache = f'idempotencia:{alcance}:{valor}'
+    huella = _huella(request)
+
+    guardado = cache.get(clave_cache)
+    if guardado is not None and guardado['estado'] == LISTA:
+        return _respuesta_guardada(guardado, huella, alcance)
+
+    def primera():
+        if not cache.add(clave_cache, {'estado': EN_CURSO, 'huella': huella}, config['en_curso']):
+            return cache.get(clave_cache), False
+        try:
+            registro = _registro(vista(request, *args, **kwargs), huella)
+        except BaseException:
+            cache.delete(clave_cache)
+            raise
+        if _guardable(registro):
+            cache.set(clave_cache, registro, config['retencion'])
+        else:
+            cache.delete(clave_cache)
+        return registro, True
+
+    resultado, compartido = coalescencia.compartir(clave_cache, primera, endpoint=alcance)
+    return _resultado(*resultado, huella, alcance, compartido)
+
+
+async def aejecutar(request, alcance, vista, *args, **kwargs):
+    """Versión async de :func:`ejecutar` para vistas async"""
+    valor = clave(request)
+    if request.method != 'POST' or valor is None:
+        return await vista(request, *args, **kwargs)
+    if not _valida(valor):
+        return _respuesta_invalida()
+
+    cache = _cache()
+    config = get_config()
+    clave_cache = f'idempotencia:{alcance}:{valor}'
+    huella = _huella(request)
+
+    guardado = await cache.aget(clave_cache)
+    if guardado is not None and guardado['estado'] == LISTA:
+        return _respuesta_guardada(guardado, huella, alcance)
+
+    async def primera():
+        if not await cache.aadd(clave_cache, {'estado': EN_CURSO, 'huella': huella}, config['en_curso']):
+            return await cache.aget(clave_cache), False
+        try:
+            registro = _registro(await vista(request, *args, **kwargs), huella)
+        except BaseException:
+            await cache.adelete(clave_cache)
+            raise
+        if _guardable(registro):
+            await cache.aset(clave_cache, registro, config['retencion'])
+        else:
+            await cache.adelete(clave_cache)
+        return registro, True
+
+    resultado, compartido = await coalescencia.acompartir(clave_cache, primera, endpoint=alcance)
+    return _resultado(*resultado, huella, alcance, compartido)
+
+
+def _resultado(registro, ejecutada, huella, alcance, compartido):
+    """
+    Respuesta a partir de lo que devolvió :func:`ejecutar`: la vista se
+    ejecutó (en esta petición o, si ``compartido``, en otra del proceso) o la
+    clave ya estaba tomada por otro worker.
+    """
+    if registro is None:
+        # La reserva de otro worker venció justo entre el add y el get
+        registro = {'estado': EN_CURSO, 'huella': huella}
+    if not ejecutada or registro['huella'] != huella:
+        return _respuesta_guardada(registro, huella, alcance)
+    metricas.idempotencia_total.inc(alcance=alcance, resultado='compartida' if compartido else 'nueva')
+    return _desde_registro(registro, repetida=compartido)
+
+
+def idempotente(alcance):
+    """
+    Decorador para las vistas de confirmación (sync o async)::
+
+        @csrf_exempt
+        @idempotencia.idempotente('confirmar_orden_caja')
+        def confirmar_orden_caja(request): ...
+    """
+    def decorador(vista):
+        if iscoroutinefunction(vista):
+            @functools.wraps(vista)
+            async def envoltura(request, *args, **kwargs):
+                return await aejecutar(request, alcance, vista, *args, **kwargs)
+        else:
+            @functools.wraps(vista)
+            def envoltura(request, *args, **kwargs):
+                return ejecutar(request, alcance, vista, *args, **kwargs)
+        return envoltura
+    return decorador
@@ -0,0 +1,145 @@
+"""
+Inventarios de depósito confirmados en esta app, guardados en la base.
+
+``confirmar_inventario_deposito`` guarda cada inventario como una
+:class:`~api.models.Transferencia` con sus líneas (una por producto, ya
+unificadas por el carrito) en una sola transacción: la cabecera con
+``create`` y todas las líneas con un ``bulk_create``.
+
+El historial (:func:`pagina`) filtra con los mismos parámetros que el de
+transferencias del backend (``transferencias.leer_consulta``) y deja en la
+base los conteos por estado, la suma de unidades y el corte de la página; de
+las líneas solo se leen (en una consulta) las de las transferencias de esa
+página. Las columnas por las que se filtra (origen, destino, estado y fecha)
+tienen índice.
+"""
+import math
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from api import transferencias
+from api.models import Transferencia, TransferenciaLinea
+
+ESTADOS = transferencias.ESTADOS
+
+
+def leer_consulta(params):
+    """``(filtros, pagina, por_pagina)`` igual que en el historial del backend"""
+    return transferencias.leer_consulta(params)
+
+
+def leer_deposito(valor, respaldo=None):
+    """
+    ``{'id', 'nombre'}`` a partir de lo que mande el navegador: un objeto
+    con id y nombre, solo el id o nada (se usa ``respaldo``, el de la sesión).
+    """
+    if isinstance(valor, dict):
+        deposito = valor
+    elif valor not in (None, ''):
+        deposito = {'id': valor, 'nombre': str(valor)}
+    else:
+        deposito = respaldo or {}
+    try:
+        deposito_id = int(deposito.get('id'))
+    except (TypeError, ValueError):
+        deposito_id = None
+    return {'id': deposito_id, 'nombre': str(deposito.get('nombre') or '')[:100]}
+
+
+# ==================== Registro ====================
+
+def registrar(carrito, origen, destino, user_dni=''):
+    """Guarda el inventario del ``carrito`` con todas sus líneas y lo devuelve"""
+    with transaction.atomic():
+        transferencia = Transferencia.objects.create(
+            deposito_origen_id=origen['id'],
+            deposito_origen_nombre=origen['nombre'],
+            deposito_destino_id=destino['id'],
+            deposito_destino_nombre=destino['nombre'],
+            estado=Transferencia.CONFIRMADA,
+            user_dni=user_dni or '',
+        )
+        TransferenciaLinea.objects.bulk_create([
+            TransferenciaLinea(
+                transferencia=transferencia,
+                producto_id=str(producto['id'] or ''),
+                nombre=producto['nombre'][:200],
+                cantidad=max(producto['cantidad'], 0),
+            )
+            for producto in carrito.productos()
+        ])
+    return transferencia
+
+
+# ==================== Historial ====================
+
+def _inicio_del_dia(dia):
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def filtrar(filtros):
+    """Queryset de las transferencias que pasan los filtros"""
+    consulta = Transferencia.objects.all()
+    if filtros['estado']:
+        consulta = consulta.filter(estado=filtros['estado'])
+    if filtros['origen'] is not None:
+        consulta = consulta.filter(deposito_origen_id=filtros['origen'])
+    if filtros['destino'] is not None:
+        consulta = consulta.filter(deposito_destino_id=filtros['destino'])
+    # Rangos sobre la fecha (no ``fecha__date``) para que use el índice
+    if filtros['desde']:
+        consulta = consulta.filter(fecha__gte=_inicio_del_dia(filtros['desde']))
+    if filtros['hasta']:
+        consulta = consulta.filter(fecha__lt=_inicio_del_dia(filtros['hasta'] + timedelta(days=1)))
+    return consulta
+
+
+def _fila(transferencia):
+    lineas = transferencia.lineas.all()
+    return {
+        'id': transferencia.id,
+        'fecha': timezone.localtime(transferencia.fecha).isoformat(),
+        'deposito_origen': {'id': transferencia.deposito_origen_id,
+                            'nombre': transferencia.deposito_origen_nombre},
+        'deposito_destino': {'id': transferencia.deposito_destino_id,
+                             'nombre': transferencia.deposito_destino_nombre},
+        'estado': transferencia.estado,
+        'total_productos': len(lineas),
+        'total_cantidad': sum(linea.cantidad for linea in lineas),
+        'productos': [
+            {'id': linea.producto_id, 'nombre': linea.nombre, 'cantidad': linea.cantidad}
+            for linea in lineas
+        ],
+    }
+
+
+def pagina(filtros, numero, por_pagina):
+    """Página ``numero`` del historial con los conteos, todo calculado en la base"""
+    consulta = filtrar(filtros)
+
+    conteos = dict.fromkeys(ESTADOS, 0)
+    for fila in consulta.order_by().values('estado').annotate(cantidad=Count('id')):
+        conteos[fila['estado']] = fila['cantidad']
+    total = sum(conteos.values())
+    total_cantidad = TransferenciaLinea.objects.filter(
+        transferencia__in=consulta.order_by().values('id')
+    ).aggregate(total=Sum('cantidad'))['total'] or 0
+
+    paginas = max(1, math.ceil(total / por_pagina))
+    numero = min(numero, paginas)
+    inicio = (numero - 1) * por_pagina
+    # Las líneas se traen en una sola consulta, solo las de esta página
+    filas = consulta.prefetch_related('lineas')[inicio:inicio + por_pagina]
+    return {
+        'success': True,
+        'transferencias': [_fila(transferencia) for transferencia in filas],
+        'pagina': numero,
+        'por_pagina': por_pagina,
+        'paginas': paginas,
+        'total': total,
+        'total_cantidad': total_cantidad,
+        'conteos': conteos,
+    }
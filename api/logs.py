@@ -0,0 +1,128 @@
+"""
+Logging estructurado de la app ``api``.
+
+Las vistas usan ``get_logger`` en lugar de ``print``::
+
+    logger = logs.get_logger(__name__)
+    logger.info('💾 Productos guardados', cantidad=len(carrito), total=carrito.total)
+
+Los campos extra viajan en el record y ``FormatoEstructurado`` los agrega
+como ``clave=valor`` (o como JSON). Nada se formatea si el nivel está
+desactivado, y el formateo se hace en el thread de ``ColaHandler``, no en el
+de la petición.
+
+Los payloads grandes (JSON del backend, carrito completo) se registran con
+:func:`payload`: solo en nivel DEBUG, con muestreo y truncados según
+``LOG_PAYLOADS``. La serialización ocurre recién al escribir la línea.
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+from django.conf import settings
+
+DEFAULT_PAYLOADS = {
+    'muestreo': 1.0,         # fracción de payloads que se registran
+    'max_caracteres': 4000,  # los más largos se truncan
+}
+
+# Argumentos propios de Logger.log que no son campos estructurados
+_ARGUMENTOS_LOG = ('exc_info', 'stack_info', 'stacklevel', 'extra')
+
+
+def get_config_payloads():
+    return {**DEFAULT_PAYLOADS, **getattr(settings, 'LOG_PAYLOADS', {})}
+
+
+class LoggerEstructurado(logging.LoggerAdapter):
+    """Acepta campos como keyword arguments: ``logger.info('msg', clave=valor)``"""
+
+    def process(self, msg, kwargs):
+        campos = {k: kwargs.pop(k) for k in list(kwargs) if k not in _ARGUMENTOS_LOG}
+        if campos:
+            kwargs['extra'] = {**kwargs.get('extra', {}), 'campos': campos}
+        return msg, kwargs
+
+
+def get_logger(nombre):
+    return LoggerEstructurado(logging.getLogger(nombre), {})
+
+
+class Carga:
+    """Payload que se serializa a JSON recién cuando se escribe la línea"""
+
+    def __init__(self, datos, max_caracteres):
+        self.datos = datos
+        self.max_caracteres = max_caracteres
+
+    def __str__(self):
+        texto = json.dumps(self.datos, ensure_ascii=False, default=str)
+        if len(texto) > self.max_caracteres:
+            return f'{texto[:self.max_caracteres]}... ({len(texto)} caracteres)'
+        return texto
+
+
+def payload(logger, mensaje, datos, **campos):
+    """Registra ``datos`` en DEBUG, respetando el muestreo de ``LOG_PAYLOADS``"""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    config = get_config_payloads()
+    if config['muestreo'] < 1 and random.random() >= config['muestreo']:
+        return
+    logger.debug(mensaje, payload=Carga(datos, config['max_caracteres']), **campos)
+
+
+class FormatoEstructurado(logging.Formatter):
+    """
+    ``nivel logger mensaje | clave=valor ...`` o, con ``como_json=True``, una
+    línea JSON por record.
+    """
+
+    def __init__(self, *args, como_json=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.como_json = como_json
+
+    def format(self, record):
+        campos = getattr(record, 'campos', {})
+        if self.como_json:
+            linea = {
+                'ts': self.formatTime(record),
+                'nivel': record.levelname,
+                'logger': record.name,
+                'mensaje': record.getMessage(),
+                **{k: str(v) if isinstance(v, Carga) else v for k, v in campos.items()},
+            }
+            if record.exc_info:
+                linea['excepcion'] = self.formatException(record.exc_info)
+            return json.dumps(linea, ensure_ascii=False, default=str)
+
+        texto = super().format(record)
+        if campos:
+            texto += ' | ' + ' '.join(f'{k}={v}' for k, v in campos.items())
+        return texto
+
+
+class ColaHandler(QueueHandler):
+    """
+    Handler no bloqueante: la petición solo encola el record y un thread
+    (``QueueListener``) lo formatea y lo escribe en stdout.
+    """
+
+    def __init__(self):
+        super().__init__(queue.SimpleQueue())
+        self.salida = logging.StreamHandler(sys.stdout)
+        self.listener = QueueListener(self.queue, self.salida)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self.salida.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Sin formatear: el mensaje y los payloads se arman en el thread del listener
+        return record
@@ -0,0 +1,44 @@
+"""
+Entregador del outbox en primer plano (ver ``api/outbox.py``).
+
+Para servidores con ``OUTBOX['hilo']`` en ``False`` (por ejemplo, varios
+workers y un solo entregador aparte):
+
+    python manage.py entregar_outbox
+    python manage.py entregar_outbox --una-vez
+    python manage.py entregar_outbox --reencolar          # todos los fallidos
+    python manage.py entregar_outbox --reencolar 12 15    # solo esos envíos
+"""
+from django.core.management.base import BaseCommand
+
+from api import outbox
+
+
+class Command(BaseCommand):
+    help = 'Entrega al backend las confirmaciones guardadas en el outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true',
+                            help='hacer una sola ronda de entregas y salir')
+        parser.add_argument('--intervalo', type=float, default=None,
+                            help='segundos entre rondas sin envíos listos (por defecto OUTBOX["intervalo"])')
+        parser.add_argument('--reencolar', nargs='*', type=int, metavar='ID',
+                            help='volver a poner en cola los envíos fallidos (todos o los indicados) y salir')
+
+    def handle(self, *args, **options):
+        if options['reencolar'] is not None:
+            cantidad = outbox.reencolar_fallidos(options['reencolar'])
+            self.stdout.write(f'{cantidad} envío(s) vuelven a la cola')
+            return
+
+        if options['una_vez']:
+            resueltos = outbox.ejecutar(una_vez=True)
+            self.stdout.write(f'{resueltos} envío(s) resueltos')
+            self.stdout.write(str(outbox.estadisticas()))
+            return
+
+        self.stdout.write('Entregando el outbox (Ctrl+C para salir)...')
+        try:
+            outbox.ejecutar(intervalo=options['intervalo'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,461 @@
+"""
+Prueba de carga: cajeros y operarios de depósito simulados recorriendo la app.
+
+Cada cliente repite sesiones completas, como las haría el navegador:
+
+    caja:     login → foto → procesar imagen → resumen → guardar temporales →
+              foto (agregar más) → procesar imagen → resumen → confirmar →
+              limpiar sesión
+    depósito: login → guardar selección → foto → procesar imagen → resumen →
+              guardar temporales → foto (agregar más) → procesar imagen →
+              resumen → crear transferencia → limpiar sesión → confirmada →
+              historial
+
+Por defecto las peticiones se atienden dentro del proceso (``django.test.Client``)
+contra el backend falso de ``benchmarks/fake_backend.py``, con la latencia,
+tasa de error y tamaño de respuesta que se pidan. Con ``--url`` se le pega a
+un servidor ya levantado (``runserver``, gunicorn, uvicorn) y con
+``--backend-url`` se usa otro backend en lugar del falso. Ejemplos:
+
+    python manage.py prueba_carga --clientes 32 --sesiones 5
+    python manage.py prueba_carga --flujo deposito --latencia lognormal:0.4,0.5 \\
+        --tasa-error 0.02 --productos 12
+    python manage.py prueba_carga --url http://127.0.0.1:8001 --pid 4242 \\
+        --backend-url http://127.0.0.1:8000
+
+Reporta throughput, percentiles de latencia por paso y memoria (RSS) del
+proceso medido, y guarda el resultado completo como JSON.
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks import fake_backend
+
+PERCENTILES = (50, 90, 95, 99)
+
+DEPOSITOS = {
+    'depositoOrigen': {'id': 1, 'nombre': 'Deposito 1'},
+    'depositoDestino': {'id': 2, 'nombre': 'Deposito 2'},
+}
+
+
+# ==================== Clientes ====================
+
+class ClienteDjango:
+    """Navegador simulado dentro del proceso (sin servidor HTTP)"""
+
+    def __init__(self):
+        from django.test import Client
+        self.client = Client()
+
+    def get(self, ruta):
+        return _respuesta(self.client.get(ruta))
+
+    def post(self, ruta, datos=None, imagen=None):
+        if imagen is not None:
+            from django.core.files.uploadedfile import SimpleUploadedFile
+            archivo = SimpleUploadedFile('foto.jpg', imagen, 'image/jpeg')
+            return _respuesta(self.client.post(ruta, {'image': archivo}))
+        return _respuesta(self.client.post(ruta, json.dumps(datos or {}),
+                                           content_type='application/json'))
+
+    def cerrar(self):
+        pass
+
+
+class ClienteHttp:
+    """Navegador simulado contra un servidor levantado (cookies en un ``Session``)"""
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.session = requests.Session()
+
+    def get(self, ruta):
+        return _respuesta(self.session.get(self.url + ruta, timeout=60))
+
+    def post(self, ruta, datos=None, imagen=None):
+        if imagen is not None:
+            response = self.session.post(self.url + ruta, timeout=60,
+                                         files={'image': ('foto.jpg', imagen, 'image/jpeg')})
+        else:
+            response = self.session.post(self.url + ruta, json=datos or {}, timeout=60)
+        return _respuesta(response)
+
+    def cerrar(self):
+        self.session.close()
+
+
+def _respuesta(response):
+    """``(status, json o None)`` para Django ``Client`` y ``requests``"""
+    datos = None
+    if 'json' in response.headers.get('Content-Type', ''):
+        try:
+            datos = response.json()
+        except ValueError:
+            pass
+    return response.status_code, datos
+
+
+# ==================== Sesiones ====================
+
+class Sesion:
+    """Una vuelta completa de un usuario; guarda los productos como lo haría la página"""
+
+    def __init__(self, cliente, imagen, repetir_imagen=False):
+        self.cliente = cliente
+        self.imagen = imagen
+        self.repetir_imagen = repetir_imagen
+        self.productos = []
+
+    def foto(self):
+        if self.repetir_imagen:
+            return self.imagen
+        # Cada foto distinta: el cache de detección no oculta la latencia del detector
+        return self.imagen[:-16] + os.urandom(16)
+
+    def login(self):
+        return self.cliente.post('/api/login-process/', {'dni': '30111222', 'password': 'carga'})
+
+    def procesar(self, tipo):
+        status, datos = self.cliente.post(f'/api/{tipo}/procesar-imagen/', imagen=self.foto())
+        if datos and datos.get('success'):
+            self.productos = datos.get('productos', [])
+        return status, datos
+
+    def guardar_temporales(self, tipo):
+        return self.cliente.post(f'/api/{tipo}/guardar-temporales/', {'productos': self.productos})
+
+    def confirmar_caja(self):
+        return self.cliente.post('/api/caja/confirmar/', {'productos': self.productos})
+
+    def crear_transferencia(self):
+        datos = {
+            'depositoOrigen': DEPOSITOS['depositoOrigen']['id'],
+            'depositoDestino': DEPOSITOS['depositoDestino']['id'],
+            'productos': self.productos,
+        }
+        return self.cliente.post('/api/deposito/transferencias/crear/', datos)
+
+
+def pasos_caja(sesion):
+    return (
+        ('login', sesion.login),
+        ('foto', lambda: sesion.cliente.get('/api/caja/foto/')),
+        ('procesar_imagen', lambda: sesion.procesar('caja')),
+        ('resumen', lambda: sesion.cliente.get('/api/caja/resumen/')),
+        ('guardar_temporales', lambda: sesion.guardar_temporales('caja')),
+        ('foto_agregar', lambda: sesion.cliente.get('/api/caja/foto/?agregar=true')),
+        ('procesar_imagen', lambda: sesion.procesar('caja')),
+        ('resumen', lambda: sesion.cliente.get('/api/caja/resumen/')),
+        ('confirmar', sesion.confirmar_caja),
+        ('limpiar_sesion', lambda: sesion.cliente.post('/api/caja/limpiar-sesion/')),
+    )
+
+
+def pasos_deposito(sesion):
+    return (
+        ('login', sesion.login),
+        ('guardar_seleccion', lambda: sesion.cliente.post('/api/deposito/guardar-seleccion/',
+                                                          DEPOSITOS)),
+        ('foto', lambda: sesion.cliente.get('/api/deposito/foto/')),
+        ('procesar_imagen', lambda: sesion.procesar('deposito')),
+        ('resumen', lambda: sesion.cliente.get('/api/deposito/resumen/')),
+        ('guardar_temporales', lambda: sesion.guardar_temporales('deposito')),
+        ('foto_agregar', lambda: sesion.cliente.get('/api/deposito/foto/?agregar=true')),
+        ('procesar_imagen', lambda: sesion.procesar('deposito')),
+        ('resumen', lambda: sesion.cliente.get('/api/deposito/resumen/')),
+        ('crear_transferencia', sesion.crear_transferencia),
+        ('limpiar_sesion', lambda: sesion.cliente.post('/api/deposito/limpiar-sesion/')),
+        ('confirmada', lambda: sesion.cliente.get('/api/deposito/confirmada/')),
+        ('historial', lambda: sesion.cliente.get('/api/deposito/transferencias/')),
+    )
+
+
+FLUJOS = {
+    'caja': pasos_caja,
+    'deposito': pasos_deposito,
+}
+
+
+def _exitoso(status, datos):
+    # Las vistas responden algunos errores con 200 y success=False (p. ej. login)
+    if status >= 400:
+        return False
+    return not (isinstance(datos, dict) and datos.get('success') is False)
+
+
+# ==================== Memoria ====================
+
+class MuestreoMemoria:
+    """Muestrea el RSS de un proceso en un thread mientras dura la prueba"""
+
+    def __init__(self, pid, intervalo=0.2):
+        self.pid = pid
+        self.intervalo = intervalo
+        self.muestras = []
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._correr, daemon=True)
+
+    def rss_mb(self):
+        try:
+            with open(f'/proc/{self.pid}/status') as status:
+                for linea in status:
+                    if linea.startswith('VmRSS:'):
+                        return int(linea.split()[1]) / 1024
+        except OSError:
+            pass
+        if self.pid == os.getpid():
+            # Sin /proc (macOS): solo el pico, en KB en Linux y en bytes en macOS
+            maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return maximo / (1024 * 1024 if maximo > 2**32 else 1024)
+        return None
+
+    def _correr(self):
+        while not self._parar.wait(self.intervalo):
+            self._agregar()
+
+    def _agregar(self):
+        rss = self.rss_mb()
+        if rss is not None:
+            self.muestras.append(rss)
+
+    def __enter__(self):
+        self._agregar()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+        self._agregar()
+
+    def resumen(self):
+        if not self.muestras:
+            return {'pid': self.pid, 'disponible': False}
+        return {
+            'pid': self.pid,
+            'rss_inicial_mb': round(self.muestras[0], 1),
+            'rss_pico_mb': round(max(self.muestras), 1),
+            'rss_final_mb': round(self.muestras[-1], 1),
+            'muestras': len(self.muestras),
+        }
+
+
+# ==================== Estadísticas ====================
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, round(p / 100 * (len(ordenados) - 1)))
+    return ordenados[indice]
+
+
+def _estadisticas(mediciones, duracion):
+    latencias = [latencia for latencia, _, _ in mediciones]
+    resultado = {
+        'peticiones': len(mediciones),
+        'errores': sum(1 for _, _, ok in mediciones if not ok),
+        'por_seg': round(len(mediciones) / duracion, 1) if duracion else 0,
+    }
+    if latencias:
+        for p in PERCENTILES:
+            resultado[f'p{p}_ms'] = round(_percentil(latencias, p) * 1000, 1)
+        resultado['max_ms'] = round(max(latencias) * 1000, 1)
+    estados = {}
+    for _, status, _ in mediciones:
+        estados[str(status)] = estados.get(str(status), 0) + 1
+    resultado['estados'] = estados
+    return resultado
+
+
+class Command(BaseCommand):
+    help = 'Prueba de carga de los flujos de caja y depósito contra un backend falso'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=16,
+                            help='usuarios simultáneos')
+        parser.add_argument('--sesiones', type=int, default=5,
+                            help='sesiones completas que recorre cada usuario')
+        parser.add_argument('--flujo', choices=('caja', 'deposito', 'mixto'), default='mixto',
+                            help='recorrido a simular (mixto alterna caja y depósito)')
+        parser.add_argument('--imagen-kb', type=int, default=200,
+                            help='tamaño de cada foto subida')
+        parser.add_argument('--repetir-imagen', action='store_true',
+                            help='subir siempre la misma foto (mide el cache de detección)')
+        parser.add_argument('--url',
+                            help='servidor a probar; sin esto se atiende dentro del proceso')
+        parser.add_argument('--pid', type=int,
+                            help='proceso cuyo RSS medir con --url (por defecto, este)')
+        parser.add_argument('--backend-url',
+                            help='backend ya levantado; sin esto se levanta el falso')
+        parser.add_argument('--salida',
+                            help='archivo JSON con el resultado '
+                                 '(por defecto benchmarks/resultados/prueba_carga-<fecha>.json)')
+        fake_backend.agregar_argumentos(parser)
+
+    def handle(self, *args, **options):
+        if options['clientes'] < 1 or options['sesiones'] < 1:
+            raise CommandError('--clientes y --sesiones deben ser mayores que cero')
+        if options['url'] and not options['backend_url']:
+            self.stderr.write('⚠️  Con --url el servidor no conoce el backend falso de esta '
+                              'prueba: levantarlo aparte y pasar --backend-url')
+
+        if options['backend_url']:
+            resultado = self._correr(options, options['backend_url'].rstrip('/'), None)
+        else:
+            try:
+                backend = fake_backend.desde_argumentos(argparse.Namespace(**options))
+            except ValueError as e:
+                raise CommandError(str(e))
+            with backend:
+                resultado = self._correr(options, backend.url, backend)
+
+        self._mostrar(resultado)
+        self._guardar(resultado, options['salida'])
+
+    def _correr(self, options, backend_url, backend):
+        en_proceso = not options['url']
+        if en_proceso:
+            settings.BACKEND_API_URL = backend_url
+            if 'testserver' not in settings.ALLOWED_HOSTS and '*' not in settings.ALLOWED_HOSTS:
+                settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+
+        imagen = b'\xff\xd8\xff' + os.urandom(max(0, options['imagen_kb'] * 1024 - 3))
+        flujos = (['caja', 'deposito'] if options['flujo'] == 'mixto' else [options['flujo']])
+
+        def usuario(numero):
+            cliente = ClienteDjango() if en_proceso else ClienteHttp(options['url'])
+            mediciones = {}   # (flujo, paso) -> [(latencia, status, ok)]
+            sesiones = {'completas': 0, 'fallidas': 0}
+            try:
+                for vuelta in range(options['sesiones']):
+                    flujo = flujos[(numero + vuelta) % len(flujos)]
+                    sesion = Sesion(cliente, imagen, options['repetir_imagen'])
+                    completa = True
+                    for paso, accion in FLUJOS[flujo](sesion):
+                        inicio = time.perf_counter()
+                        try:
+                            status, datos = accion()
+                        except Exception:
+                            status, datos = 599, None
+                        ok = _exitoso(status, datos)
+                        mediciones.setdefault((flujo, paso), []).append(
+                            (time.perf_counter() - inicio, status, ok))
+                        if not ok:
+                            # Un usuario real no sigue después de un error
+                            completa = False
+                            break
+                    sesiones['completas' if completa else 'fallidas'] += 1
+            finally:
+                cliente.cerrar()
+            return mediciones, sesiones
+
+        # Los logs de cada petición no son parte de la medición
+        loggers = [logging.getLogger(nombre) for nombre in ('api', 'django.request')]
+        niveles = [logger.level for logger in loggers]
+        if options['verbosity'] < 2:
+            for logger in loggers:
+                logger.setLevel(logging.CRITICAL)
+
+        pid = os.getpid() if en_proceso or options['pid'] is None else options['pid']
+        self.stdout.write(
+            f'{options["clientes"]} usuarios x {options["sesiones"]} sesiones '
+            f'({options["flujo"]}) contra {options["url"] or "el proceso actual"}, '
+            f'backend {backend_url}'
+        )
+        try:
+            with MuestreoMemoria(pid) as memoria:
+                inicio = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=options['clientes']) as pool:
+                    resultados = list(pool.map(usuario, range(options['clientes'])))
+                duracion = time.perf_counter() - inicio
+        finally:
+            for logger, nivel in zip(loggers, niveles):
+                logger.setLevel(nivel)
+
+        por_paso = {}
+        sesiones = {'completas': 0, 'fallidas': 0}
+        for mediciones, conteo in resultados:
+            for clave, valores in mediciones.items():
+                por_paso.setdefault(clave, []).extend(valores)
+            for estado, cantidad in conteo.items():
+                sesiones[estado] += cantidad
+        todas = [m for valores in por_paso.values() for m in valores]
+        total_sesiones = sesiones['completas'] + sesiones['fallidas']
+
+        return {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'config': {
+                'clientes': options['clientes'],
+                'sesiones_por_cliente': options['sesiones'],
+                'flujo': options['flujo'],
+                'imagen_kb': options['imagen_kb'],
+                'repetir_imagen': options['repetir_imagen'],
+                'url': options['url'] or 'en_proceso',
+                'backend_url': backend_url,
+                'backend_falso': None if backend is None else {
+                    'latencia': options['latencia'],
+                    'latencia_endpoint': options['latencia_endpoint'] or [],
+                    'tasa_error': options['tasa_error'] or [],
+                    'productos': options['productos'],
+                },
+                'session_engine': settings.SESSION_ENGINE if en_proceso else None,
+                'async': getattr(settings, 'ASYNC_VIEWS', False) if en_proceso else None,
+            },
+            'duracion_s': round(duracion, 2),
+            'sesiones': {
+                **sesiones,
+                'por_seg': round(total_sesiones / duracion, 2) if duracion else 0,
+            },
+            'total': _estadisticas(todas, duracion),
+            'pasos': {
+                f'{flujo}.{paso}': _estadisticas(valores, duracion)
+                for (flujo, paso), valores in por_paso.items()
+            },
+            'memoria': memoria.resumen(),
+            'backend': None if backend is None else dict(sorted(backend.estado.respuestas.items())),
+        }
+
+    def _mostrar(self, resultado):
+        total = resultado['total']
+        sesiones = resultado['sesiones']
+        self.stdout.write(
+            f'\n{resultado["duracion_s"]}s | {total["peticiones"]} peticiones '
+            f'({total["por_seg"]} req/s) | {sesiones["completas"]} sesiones completas, '
+            f'{sesiones["fallidas"]} fallidas ({sesiones["por_seg"]} sesiones/s)\n'
+        )
+        encabezado = ' '.join(f'{f"p{p} ms":>8}' for p in PERCENTILES)
+        self.stdout.write(f'{"paso":<30} {"n":>6} {"err":>5} {encabezado} {"max ms":>8}')
+        for nombre, datos in [*resultado['pasos'].items(), ('total', total)]:
+            percentiles = ' '.join(f'{datos.get(f"p{p}_ms", 0):>8}' for p in PERCENTILES)
+            self.stdout.write(f'{nombre:<30} {datos["peticiones"]:>6} {datos["errores"]:>5} '
+                              f'{percentiles} {datos.get("max_ms", 0):>8}')
+
+        memoria = resultado['memoria']
+        if memoria.get('disponible', True):
+            self.stdout.write(
+                f'\nMemoria (pid {memoria["pid"]}): {memoria["rss_inicial_mb"]} MB al inicio, '
+                f'pico {memoria["rss_pico_mb"]} MB, {memoria["rss_final_mb"]} MB al final'
+            )
+
+    def _guardar(self, resultado, salida):
+        if salida:
+            ruta = Path(salida)
+        else:
+            fecha = datetime.now().strftime('%Y%m%d-%H%M%S')
+            ruta = settings.BASE_DIR / 'benchmarks' / 'resultados' / f'prueba_carga-{fecha}.json'
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        ruta.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(f'Resultado guardado en {ruta}'))
+
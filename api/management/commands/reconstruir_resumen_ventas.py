@@ -0,0 +1,18 @@
+"""
+Recalcula los totales de ventas por día, cajero y producto desde el libro de
+ventas local (ver ``api/ventas.py``). Útil si se borraron o corrigieron ventas
+a mano o si los totales quedaron desparejos:
+
+    python manage.py reconstruir_resumen_ventas
+"""
+from django.core.management.base import BaseCommand
+
+from api import ventas
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los totales de ventas desde el libro de ventas local'
+
+    def handle(self, *args, **options):
+        filas = ventas.reconstruir()
+        self.stdout.write(f'{filas} fila(s) de totales reconstruidas')
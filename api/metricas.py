@@ -0,0 +1,376 @@
+"""
+Métricas del proceso en formato de texto de Prometheus.
+
+Registro mínimo de contadores, medidores (gauges) e histogramas con labels,
+sin dependencias externas. ``MetricasMiddleware`` (``api/middleware.py``)
+mide cada petición y las vistas de detección marcan sus etapas con
+:func:`etapa`::
+
+    with metricas.etapa('backend'):
+        response = backend_client.post(...)
+
+La etapa se registra con el nombre de la vista que atiende la petición
+(guardado en un ``contextvars`` por el middleware). ``exportar()`` arma el
+texto que sirve ``/api/metrics``.
+
+Las métricas son por proceso: con varios workers, Prometheus debe scrapear
+cada uno o agregarlas por su cuenta.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Límites de los buckets en segundos y en bytes
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BUCKETS_BYTES = (1024, 10 * 1024, 100 * 1024, 512 * 1024, 2**20, 5 * 2**20, 15 * 2**20)
+
+_vista_actual = contextvars.ContextVar('vista_actual', default='')
+
+_registro = []
+_colectores = []
+
+
+def _formatear_labels(nombres, valores, extra=()):
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    pares.extend(f'{n}="{v}"' for n, v in extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nombre, ayuda, labels=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.labels = tuple(labels)
+        self._valores = {}
+        self._lock = threading.Lock()
+        _registro.append(self)
+
+    def _clave(self, labels):
+        return tuple(str(labels.get(n, '')) for n in self.labels)
+
+    def exportar(self):
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} {self.tipo}']
+        with self._lock:
+            valores = sorted(self._valores.items())
+        for clave, valor in valores:
+            lineas.extend(self._lineas(clave, valor))
+        return lineas
+
+    def _lineas(self, clave, valor):
+        return [f'{self.nombre}{_formatear_labels(self.labels, clave)} {_numero(valor)}']
+
+
+class Contador(_Metrica):
+    tipo = 'counter'
+
+    def inc(self, cantidad=1, **labels):
+        clave = self._clave(labels)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+
+class Medidor(_Metrica):
+    tipo = 'gauge'
+
+    def inc(self, cantidad=1, **labels):
+        clave = self._clave(labels)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def dec(self, cantidad=1, **labels):
+        self.inc(-cantidad, **labels)
+
+
+class Histograma(_Metrica):
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, labels=(), buckets=BUCKETS_SEGUNDOS):
+        super().__init__(nombre, ayuda, labels)
+        self.buckets = tuple(buckets)
+
+    def observar(self, valor, **labels):
+        clave = self._clave(labels)
+        with self._lock:
+            datos = self._valores.get(clave)
+            if datos is None:
+                # [conteo por bucket..., suma, total]
+                datos = self._valores[clave] = [0] * len(self.buckets) + [0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    datos[i] += 1
+            datos[-2] += valor
+            datos[-1] += 1
+
+    def _lineas(self, clave, datos):
+        lineas = []
+        for limite, conteo in zip(self.buckets + (float('inf'),), datos[:len(self.buckets)] + [datos[-1]]):
+            labels = _formatear_labels(self.labels, clave, extra=[('le', _numero(float(limite)))])
+            lineas.append(f'{self.nombre}_bucket{labels} {conteo}')
+        labels = _formatear_labels(self.labels, clave)
+        lineas.append(f'{self.nombre}_sum{labels} {round(datos[-2], 6)}')
+        lineas.append(f'{self.nombre}_count{labels} {datos[-1]}')
+        return lineas
+
+
+# ==================== Métricas de la app ====================
+
+peticiones_segundos = Histograma(
+    'reconocimiento_http_peticion_segundos',
+    'Duración de las peticiones por vista',
+    labels=('vista', 'metodo'),
+)
+peticiones_total = Contador(
+    'reconocimiento_http_peticiones_total',
+    'Peticiones atendidas por vista y código de respuesta',
+    labels=('vista', 'metodo', 'status'),
+)
+peticiones_en_curso = Medidor(
+    'reconocimiento_http_peticiones_en_curso',
+    'Peticiones que se están atendiendo en este momento',
+)
+peticion_bytes = Histograma(
+    'reconocimiento_http_peticion_bytes',
+    'Tamaño del cuerpo de las peticiones por vista',
+    labels=('vista',),
+    buckets=BUCKETS_BYTES,
+)
+respuesta_bytes = Histograma(
+    'reconocimiento_http_respuesta_bytes',
+    'Tamaño del cuerpo de las respuestas por vista',
+    labels=('vista',),
+    buckets=BUCKETS_BYTES,
+)
+etapa_segundos = Histograma(
+    'reconocimiento_etapa_segundos',
+    'Duración de cada etapa dentro de una vista (lectura_upload, preprocesamiento, '
+    'cache, backend, sesion, respuesta)',
+    labels=('vista', 'etapa'),
+)
+backend_segundos = Histograma(
+    'reconocimiento_backend_segundos',
+    'Duración de cada llamada al backend FastAPI',
+    labels=('endpoint',),
+)
+backend_respuestas_total = Contador(
+    'reconocimiento_backend_respuestas_total',
+    'Respuestas del backend por endpoint y código ("error" si no hubo respuesta)',
+    labels=('endpoint', 'status'),
+)
+
+circuito_aperturas_total = Contador(
+    'reconocimiento_backend_circuito_aperturas_total',
+    'Veces que se abrió el circuito de cada grupo de endpoints',
+    labels=('grupo',),
+)
+circuito_rechazos_total = Contador(
+    'reconocimiento_backend_circuito_rechazos_total',
+    'Llamadas rechazadas sin llegar al backend por el circuito abierto',
+    labels=('grupo',),
+)
+llamadas_ahorradas_total = Contador(
+    'reconocimiento_backend_llamadas_ahorradas_total',
+    'Llamadas al backend evitadas porque una petición idéntica ya estaba en vuelo',
+    labels=('endpoint',),
+)
+historial_transferencias_total = Contador(
+    'reconocimiento_historial_transferencias_total',
+    'Consultas al historial de transferencias según de dónde salió el listado '
+    '(cache, backend o no_modificado si se respondió 304)',
+    labels=('resultado',),
+)
+flujos_eventos_abiertos = Medidor(
+    'reconocimiento_trabajos_flujos_abiertos',
+    'Conexiones SSE abiertas siguiendo el progreso de un trabajo',
+)
+catalogo_actualizaciones_total = Contador(
+    'reconocimiento_catalogo_actualizaciones_total',
+    'Actualizaciones del catálogo de productos desde el backend (completa, incremental o error)',
+    labels=('resultado',),
+)
+clientes_busquedas_total = Contador(
+    'reconocimiento_clientes_busquedas_total',
+    'Búsquedas de clientes por DNI según de dónde salió la respuesta '
+    '(cache, cache_negativo si se sabía que no existe, o backend)',
+    labels=('resultado',),
+)
+idempotencia_total = Contador(
+    'reconocimiento_idempotencia_total',
+    'Confirmaciones con clave de idempotencia por resultado (nueva, repetida, '
+    'compartida, en_curso o conflicto)',
+    labels=('alcance', 'resultado'),
+)
+outbox_encolados_total = Contador(
+    'reconocimiento_outbox_encolados_total',
+    'Confirmaciones guardadas en el outbox para entregar al backend más tarde',
+    labels=('endpoint',),
+)
+outbox_entregas_total = Contador(
+    'reconocimiento_outbox_entregas_total',
+    'Intentos de entrega del outbox por resultado (entregado, reintento o fallido)',
+    labels=('endpoint', 'resultado'),
+)
+outbox_demora_segundos = Histograma(
+    'reconocimiento_outbox_demora_segundos',
+    'Segundos entre que una confirmación entra al outbox y se entrega al backend',
+    labels=('endpoint',),
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600),
+)
+captura_bytes = Histograma(
+    'reconocimiento_captura_bytes',
+    'Tamaño de las fotos medido en el navegador: original (archivos elegidos) y subida (ya comprimida)',
+    labels=('pagina', 'etapa'),
+    buckets=BUCKETS_BYTES,
+)
+captura_compresion_segundos = Histograma(
+    'reconocimiento_captura_compresion_segundos',
+    'Segundos que tarda el navegador en reducir y comprimir cada foto',
+    labels=('pagina',),
+)
+captura_respuesta_segundos = Histograma(
+    'reconocimiento_captura_respuesta_segundos',
+    'Segundos hasta la respuesta del servidor medidos en el navegador, desde el envío o desde la captura',
+    labels=('pagina', 'desde'),
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+preprocesamiento_pool_reinicios_total = Contador(
+    'reconocimiento_preprocesamiento_pool_reinicios_total',
+    'Veces que se cayó un proceso del pool de preprocesamiento y se armó un pool nuevo',
+)
+mosaico_detecciones_total = Contador(
+    'reconocimiento_mosaico_detecciones_total',
+    'Detecciones de las teselas en modo mosaico: contadas o descartadas por repetidas en el solape',
+    labels=('resultado',),
+)
+estaticos_total = Contador(
+    'reconocimiento_estaticos_total',
+    'Archivos estáticos servidos por codificación (br, gzip, identity) y status (200 o 304)',
+    labels=('codificacion', 'status'),
+)
+
+# Valor del medidor de estado de cada circuito
+ESTADOS_CIRCUITO = {'cerrado': 0, 'semiabierto': 1, 'abierto': 2}
+
+# ==================== API ====================
+
+def set_vista(nombre):
+    """Fija la vista de la petición actual; devuelve el token para restaurarla"""
+    return _vista_actual.set(nombre)
+
+
+def reset_vista(token):
+    _vista_actual.reset(token)
+
+
+def vista_actual():
+    return _vista_actual.get()
+
+
+@contextmanager
+def etapa(nombre):
+    """Mide el bloque como la etapa ``nombre`` de la vista actual"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        etapa_segundos.observar(time.perf_counter() - inicio, vista=vista_actual(), etapa=nombre)
+
+
+def registrar_backend(endpoint, status, segundos):
+    backend_respuestas_total.inc(endpoint=endpoint, status=status)
+    backend_segundos.observar(segundos, endpoint=endpoint)
+
+
+def registrar_colector(funcion):
+    """
+    Registra una función que devuelve ``(nombre, tipo, ayuda, {labels: valor})``
+    para exponer contadores que viven en otros módulos (cache, preprocesamiento)
+    """
+    _colectores.append(funcion)
+    return funcion
+
+
+def exportar():
+    """Texto en formato de exposición de Prometheus (versión 0.0.4)"""
+    lineas = []
+    for metrica in _registro:
+        lineas.extend(metrica.exportar())
+    for colector in _colectores:
+        for nombre, tipo, ayuda, valores in colector():
+            lineas.append(f'# HELP {nombre} {ayuda}')
+            lineas.append(f'# TYPE {nombre} {tipo}')
+            for labels, valor in valores.items():
+                etiquetas = _formatear_labels([n for n, _ in labels], [v for _, v in labels])
+                lineas.append(f'{nombre}{etiquetas} {_numero(valor)}')
+    return '\n'.join(lineas) + '\n'
+
+
+@registrar_colector
+def _colector_modulos():
+    from api import cache_deteccion, catalogo, clientes, coalescencia, outbox, preprocesamiento, resiliencia, trabajos
+
+    cache = cache_deteccion.estadisticas()
+    yield (
+        'reconocimiento_cache_deteccion_total', 'counter',
+        'Consultas al cache de detección por resultado',
+        {(('resultado', nombre),): valor for nombre, valor in cache.items()},
+    )
+    totales = preprocesamiento.estadisticas()
+    yield (
+        'reconocimiento_preprocesamiento_bytes_total', 'counter',
+        'Bytes de imagen antes y después de normalizar',
+        {(('sentido', 'entrada'),): totales['bytes_entrada'],
+         (('sentido', 'salida'),): totales['bytes_salida']},
+    )
+    yield (
+        'reconocimiento_backend_circuito_estado', 'gauge',
+        'Estado del circuito por grupo (0 cerrado, 1 semiabierto, 2 abierto)',
+        {(('grupo', grupo),): ESTADOS_CIRCUITO[estado]
+         for grupo, estado in resiliencia.estados().items()},
+    )
+    yield (
+        'reconocimiento_backend_llamadas_en_vuelo', 'gauge',
+        'Llamadas de detección en curso que otras peticiones pueden compartir',
+        {(): coalescencia.en_vuelo()},
+    )
+    yield (
+        'reconocimiento_trabajos_deteccion', 'gauge',
+        'Trabajos de detección guardados en el proceso por estado',
+        {(('estado', estado),): cantidad for estado, cantidad in trabajos.estadisticas().items()},
+    )
+    yield (
+        'reconocimiento_catalogo_productos', 'gauge',
+        'Productos en el catálogo cargado en el proceso',
+        {(): catalogo.cantidad()},
+    )
+    yield (
+        'reconocimiento_clientes_cache_entradas', 'gauge',
+        'DNIs guardados en el cache de clientes del proceso',
+        {(): clientes.cantidad()},
+    )
+    estado_outbox = outbox.estadisticas()
+    if estado_outbox:
+        yield (
+            'reconocimiento_outbox_envios', 'gauge',
+            'Envíos del outbox sin entregar por estado (pendiente o fallido)',
+            {(('estado', estado),): estado_outbox[estado] for estado in ('pendiente', 'fallido')},
+        )
+        yield (
+            'reconocimiento_outbox_antiguedad_segundos', 'gauge',
+            'Segundos desde que entró el envío pendiente más viejo del outbox (0 sin pendientes)',
+            {(): round(estado_outbox['antiguedad'], 3)},
+        )
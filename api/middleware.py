@@ -0,0 +1,140 @@
+"""
+Middlewares de instrumentación (ver ``api/metricas.py``).
+
+``MetricasMiddleware`` va primero en ``MIDDLEWARE``: mide la petición completa,
+cuenta las peticiones en curso y los tamaños de cuerpo, y deja el nombre de
+la vista en el contexto para que las etapas se registren bajo esa vista.
+
+``SesionMedidaMiddleware`` reemplaza al ``SessionMiddleware`` de Django para
+medir el guardado de la sesión como la etapa ``sesion``.
+
+``PlazoMiddleware`` toma el header ``X-Timeout-Ms`` del cliente como plazo de
+la petición para las llamadas al backend (ver ``api/resiliencia.py``).
+"""
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.contrib.sessions.middleware import SessionMiddleware
+
+from api import metricas, resiliencia
+
+
+def _nombre_vista(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'sin_ruta'
+    return match.url_name or match.view_name or 'sin_nombre'
+
+
+def _largo_peticion(request):
+    try:
+        return int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return 0
+
+
+def _largo_respuesta(response):
+    if response.streaming:
+        return None
+    return len(response.content)
+
+
+class MetricasMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+
+        inicio = self._empezar()
+        try:
+            response = self.get_response(request)
+        except Exception:
+            self._terminar(request, None, inicio)
+            raise
+        self._terminar(request, response, inicio)
+        return response
+
+    async def __acall__(self, request):
+        inicio = self._empezar()
+        try:
+            response = await self.get_response(request)
+        except Exception:
+            self._terminar(request, None, inicio)
+            raise
+        self._terminar(request, response, inicio)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # La URL ya está resuelta: las etapas de la vista llevan su nombre
+        request._metricas_token = metricas.set_vista(_nombre_vista(request))
+        return None
+
+    def _empezar(self):
+        metricas.peticiones_en_curso.inc()
+        return time.perf_counter()
+
+    def _terminar(self, request, response, inicio):
+        duracion = time.perf_counter() - inicio
+        metricas.peticiones_en_curso.dec()
+
+        vista = _nombre_vista(request)
+        status = response.status_code if response is not None else 500
+        metricas.peticiones_segundos.observar(duracion, vista=vista, metodo=request.method)
+        metricas.peticiones_total.inc(vista=vista, metodo=request.method, status=status)
+        metricas.peticion_bytes.observar(_largo_peticion(request), vista=vista)
+        if response is not None:
+            largo = _largo_respuesta(response)
+            if largo is not None:
+                metricas.respuesta_bytes.observar(largo, vista=vista)
+
+        token = getattr(request, '_metricas_token', None)
+        if token is not None:
+            try:
+                metricas.reset_vista(token)
+            except ValueError:
+                # El token se creó en otro contexto (thread de sync_to_async)
+                pass
+
+
+class SesionMedidaMiddleware(SessionMiddleware):
+    """``SessionMiddleware`` que registra el guardado como la etapa ``sesion``"""
+
+    def process_response(self, request, response):
+        with metricas.etapa('sesion'):
+            return super().process_response(request, response)
+
+
+class PlazoMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+
+        token = resiliencia.set_plazo(resiliencia.leer_plazo(request))
+        try:
+            return self.get_response(request)
+        finally:
+            resiliencia.reset_plazo(token)
+
+    async def __acall__(self, request):
+        token = resiliencia.set_plazo(resiliencia.leer_plazo(request))
+        try:
+            return await self.get_response(request)
+        finally:
+            resiliencia.reset_plazo(token)
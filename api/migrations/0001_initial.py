@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:52
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnvioPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('endpoint', models.CharField(max_length=40)),
+                ('terminal', models.CharField(max_length=64)),
+                ('datos', models.JSONField()),
+                ('clave_idempotencia', models.CharField(max_length=200, unique=True)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('entregado', 'Entregado'), ('fallido', 'Fallido')], default='pendiente', max_length=10)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('creado', models.DateTimeField(default=django.utils.timezone.now)),
+                ('entregado', models.DateTimeField(blank=True, null=True)),
+                ('respuesta', models.JSONField(blank=True, null=True)),
+                ('ultimo_error', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['estado', 'terminal', 'id'], name='envio_estado_terminal'), models.Index(fields=['estado', 'proximo_intento'], name='envio_estado_proximo')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:55
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Transferencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('deposito_origen_id', models.IntegerField(blank=True, db_index=True, null=True)),
+                ('deposito_origen_nombre', models.CharField(blank=True, default='', max_length=100)),
+                ('deposito_destino_id', models.IntegerField(blank=True, db_index=True, null=True)),
+                ('deposito_destino_nombre', models.CharField(blank=True, default='', max_length=100)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('confirmada', 'Confirmada')], default='confirmada', max_length=10)),
+                ('fecha', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('user_dni', models.CharField(blank=True, default='', max_length=20)),
+            ],
+            options={
+                'ordering': ['-fecha', '-id'],
+                'indexes': [models.Index(fields=['estado', 'fecha'], name='transferencia_estado_fecha')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TransferenciaLinea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('producto_id', models.CharField(blank=True, default='', max_length=64)),
+                ('nombre', models.CharField(max_length=200)),
+                ('cantidad', models.PositiveIntegerField()),
+                ('transferencia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lineas', to='api.transferencia')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
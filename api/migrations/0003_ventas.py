@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:57
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_transferencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Venta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=200, unique=True)),
+                ('venta_id', models.CharField(blank=True, default='', max_length=64)),
+                ('user_dni', models.CharField(blank=True, default='', max_length=20)),
+                ('cliente_dni', models.CharField(blank=True, default='', max_length=20)),
+                ('fecha', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_cantidad', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-fecha', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenVentas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('dia', 'Día'), ('cajero', 'Cajero'), ('producto', 'Producto')], max_length=10)),
+                ('clave', models.CharField(blank=True, default='', max_length=200)),
+                ('dia', models.DateField()),
+                ('nombre', models.CharField(blank=True, default='', max_length=200)),
+                ('ventas', models.PositiveIntegerField(default=0)),
+                ('unidades', models.PositiveIntegerField(default=0)),
+                ('importe', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'dia', 'clave'), name='resumen_ventas_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaLinea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('producto', models.CharField(max_length=200)),
+                ('nombre', models.CharField(blank=True, default='', max_length=200)),
+                ('cantidad', models.PositiveIntegerField()),
+                ('precio_unitario', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('venta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lineas', to='api.venta')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
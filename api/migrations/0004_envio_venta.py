@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_ventas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enviopendiente',
+            name='venta',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,152 @@
+from django.db import models
+from django.utils import timezone
+
+
+class EnvioPendiente(models.Model):
+    """
+    Confirmación aceptada en la app que falta entregar al backend (outbox).
+    Ver ``api/outbox.py``.
+    """
+    PENDIENTE = 'pendiente'
+    ENTREGADO = 'entregado'
+    FALLIDO = 'fallido'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (ENTREGADO, 'Entregado'),
+        (FALLIDO, 'Fallido'),
+    ]
+
+    endpoint = models.CharField(max_length=40)
+    # Los envíos de una misma terminal se entregan en el orden en que se crearon
+    terminal = models.CharField(max_length=64)
+    datos = models.JSONField()
+    clave_idempotencia = models.CharField(max_length=200, unique=True)
+    estado = models.CharField(max_length=10, choices=ESTADOS, default=PENDIENTE)
+    intentos = models.PositiveIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    creado = models.DateTimeField(default=timezone.now)
+    entregado = models.DateTimeField(null=True, blank=True)
+    respuesta = models.JSONField(null=True, blank=True)
+    ultimo_error = models.TextField(blank=True, default='')
+    # Carrito y cajero de una venta de caja: se anota en el libro local al entregarla
+    venta = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['estado', 'terminal', 'id'], name='envio_estado_terminal'),
+            models.Index(fields=['estado', 'proximo_intento'], name='envio_estado_proximo'),
+        ]
+
+    def __str__(self):
+        return f'{self.endpoint} #{self.pk} ({self.estado})'
+
+
+class Transferencia(models.Model):
+    """
+    Inventario de depósito confirmado en esta app (``confirmar_inventario_deposito``).
+    Ver ``api/inventarios.py``.
+    """
+    PENDIENTE = 'pendiente'
+    CONFIRMADA = 'confirmada'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (CONFIRMADA, 'Confirmada'),
+    ]
+
+    deposito_origen_id = models.IntegerField(null=True, blank=True, db_index=True)
+    deposito_origen_nombre = models.CharField(max_length=100, blank=True, default='')
+    deposito_destino_id = models.IntegerField(null=True, blank=True, db_index=True)
+    deposito_destino_nombre = models.CharField(max_length=100, blank=True, default='')
+    estado = models.CharField(max_length=10, choices=ESTADOS, default=CONFIRMADA)
+    fecha = models.DateTimeField(default=timezone.now, db_index=True)
+    user_dni = models.CharField(max_length=20, blank=True, default='')
+
+    class Meta:
+        ordering = ['-fecha', '-id']
+        indexes = [
+            models.Index(fields=['estado', 'fecha'], name='transferencia_estado_fecha'),
+        ]
+
+    def __str__(self):
+        return f'Transferencia #{self.pk} ({self.estado})'
+
+
+class TransferenciaLinea(models.Model):
+    """Un producto (ya unificado) de una :class:`Transferencia`"""
+    transferencia = models.ForeignKey(Transferencia, on_delete=models.CASCADE, related_name='lineas')
+    producto_id = models.CharField(max_length=64, blank=True, default='')
+    nombre = models.CharField(max_length=200)
+    cantidad = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f'{self.cantidad} x {self.nombre}'
+
+
+class Venta(models.Model):
+    """
+    Venta confirmada en caja (libro de ventas local). Ver ``api/ventas.py``.
+    """
+    # Clave de idempotencia de la confirmación: la misma venta no se anota dos veces
+    clave = models.CharField(max_length=200, unique=True)
+    venta_id = models.CharField(max_length=64, blank=True, default='')
+    user_dni = models.CharField(max_length=20, blank=True, default='')
+    cliente_dni = models.CharField(max_length=20, blank=True, default='')
+    fecha = models.DateTimeField(default=timezone.now, db_index=True)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_cantidad = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-fecha', '-id']
+
+    def __str__(self):
+        return f'Venta #{self.pk} ${self.total}'
+
+
+class VentaLinea(models.Model):
+    """Un producto de una :class:`Venta`"""
+    venta = models.ForeignKey(Venta, on_delete=models.CASCADE, related_name='lineas')
+    producto = models.CharField(max_length=200)  # clave del producto en los resúmenes
+    nombre = models.CharField(max_length=200, blank=True, default='')
+    cantidad = models.PositiveIntegerField()
+    precio_unitario = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    subtotal = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f'{self.cantidad} x {self.nombre or self.producto}'
+
+
+class ResumenVentas(models.Model):
+    """
+    Totales de ventas por día, ya sumados: del día completo, de un cajero
+    (``clave`` = su DNI) o de un producto. Se actualizan con cada venta.
+    """
+    DIA = 'dia'
+    CAJERO = 'cajero'
+    PRODUCTO = 'producto'
+    DIMENSIONES = [
+        (DIA, 'Día'),
+        (CAJERO, 'Cajero'),
+        (PRODUCTO, 'Producto'),
+    ]
+
+    dimension = models.CharField(max_length=10, choices=DIMENSIONES)
+    clave = models.CharField(max_length=200, blank=True, default='')
+    dia = models.DateField()
+    nombre = models.CharField(max_length=200, blank=True, default='')
+    ventas = models.PositiveIntegerField(default=0)
+    unidades = models.PositiveIntegerField(default=0)
+    importe = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'dia', 'clave'], name='resumen_ventas_unico'),
+        ]
+
+    def __str__(self):
+        return f'{self.dimension} {self.clave} {self.dia}: {self.unidades} u. ${self.importe}'
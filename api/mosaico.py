@@ -0,0 +1,229 @@
+"""
+Detección por teselas (modo mosaico) para fotos de estanterías de depósito.
+
+Una foto de estante en alta resolución achicada entera al tamaño de entrada
+del detector deja los productos chicos en unos pocos píxeles, y se pierden.
+En modo mosaico la foto se parte en teselas de ``lado`` píxeles que se solapan
+una fracción ``solape`` (``preprocesamiento.cortar``, en el pool de procesos),
+las teselas se mandan a ``detectarobjetos`` en paralelo con a lo sumo
+``concurrencia`` llamadas (``deteccion.detectar_lote``: cada una pasa por el
+cache y la coalescencia como cualquier imagen, pero sin normalizarla, así las
+cajas quedan en píxeles de la tesela aunque ``max_teselas`` la haya agrandado)
+y las detecciones se juntan en una sola lista.
+
+Un producto que cae en el solape aparece en dos o más teselas. Las cajas
+(``bbox`` en píxeles de la tesela, ``[x1, y1, x2, y2]``) se llevan a
+coordenadas de la foto completa y, entre detecciones del mismo producto que
+vienen de teselas distintas, se descarta la que se superpone con una ya
+contada: IoU de al menos ``iou`` o, para el producto cortado por el borde de
+una tesela, al menos ``contencion`` de la caja más chica dentro de la otra.
+Se cuenta primero la caja más grande (la del producto entero). Si el detector
+no devuelve cajas no hay forma de separar repetidos: de cada producto se toma
+la mayor cantidad vista en una sola tesela.
+
+El solape debe ser más grande que el producto más grande del estante, así
+cada producto entra entero en alguna tesela. Una foto que entra en una sola
+tesela se detecta como siempre. Sin Pillow no se puede cortar y también se
+detecta entera. Configuración en ``MOSAICO``.
+"""
+from django.conf import settings
+
+from api import carrito, deteccion, logs, metricas, preprocesamiento
+
+logger = logs.get_logger(__name__)
+
+DEFAULT_CONFIG = {
+    'activo': False,        # procesar-imagen de depósito usa teselas (?mosaico=1/0 lo cambia por petición)
+    'lado': 1280,           # píxeles del lado de cada tesela
+    'solape': 0.2,          # fracción del lado que comparten dos teselas vecinas
+    'max_teselas': 16,      # si saldrían más, las teselas se agrandan
+    'concurrencia': 4,      # teselas en el detector a la vez
+    'iou': 0.5,
+    'contencion': 0.6,
+    'calidad': 90,          # calidad de las teselas re-codificadas
+    'lado_captura': 4096,   # lado máximo de la foto que sube la página de depósito
+}
+
+CLAVES_CAJA = ('bbox', 'caja', 'box')
+
+
+def get_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, 'MOSAICO', {})}
+
+
+def activo():
+    return bool(get_config()['activo'])
+
+
+def pedido(request):
+    """Si la petición va por teselas: ``?mosaico=1``/``0`` o, si no viene, ``activo``"""
+    valor = request.GET.get('mosaico')
+    if valor in ('1', 'true'):
+        return True
+    if valor in ('0', 'false'):
+        return False
+    return activo()
+
+
+def _args_corte(config):
+    lado = config['lado']
+    if preprocesamiento.activo():
+        # Las teselas no se normalizan: que no superen lo que se le manda al detector
+        lado = min(lado, preprocesamiento.get_config()['lado_maximo'])
+    return lado, config['solape'], config['max_teselas'], config['calidad']
+
+
+def _avisar(progreso, evento, **datos):
+    if progreso is not None:
+        progreso(evento, **datos)
+
+
+# ==================== Combinación ====================
+
+def _caja(producto):
+    for clave in CLAVES_CAJA:
+        caja = producto.get(clave)
+        if isinstance(caja, (list, tuple)) and len(caja) == 4:
+            try:
+                x1, y1, x2, y2 = (float(v) for v in caja)
+            except (TypeError, ValueError):
+                return None
+            if x2 > x1 and y2 > y1:
+                return x1, y1, x2, y2
+    return None
+
+
+def _area(caja):
+    return (caja[2] - caja[0]) * (caja[3] - caja[1])
+
+
+def _repetida(caja, otra, config):
+    ancho = min(caja[2], otra[2]) - max(caja[0], otra[0])
+    alto = min(caja[3], otra[3]) - max(caja[1], otra[1])
+    if ancho <= 0 or alto <= 0:
+        return False
+    interseccion = ancho * alto
+    union = _area(caja) + _area(otra) - interseccion
+    return (interseccion / union >= config['iou']
+            or interseccion / min(_area(caja), _area(otra)) >= config['contencion'])
+
+
+def _clave_producto(producto):
+    if producto.get('id') not in (None, ''):
+        return ('id', str(producto['id']))
+    return ('nombre', producto.get('nombre') or '')
+
+
+def _linea(producto, cantidad):
+    linea = {clave: valor for clave, valor in producto.items() if clave not in CLAVES_CAJA}
+    linea['cantidad'] = cantidad
+    precio = carrito.a_decimal(producto.get('precio_unitario'))
+    if precio is not None:
+        linea['subtotal'] = str(precio * cantidad)
+    return linea
+
+
+def combinar(teselas, resultados, config=None):
+    """
+    Junta las detecciones de las teselas en ``{'productos', 'total', 'mosaico'}``
+    sin contar dos veces lo que se vio en el solape
+    """
+    config = config or get_config()
+    con_caja = {}     # producto -> [(area, confianza, tesela, caja, producto)]
+    sin_caja = {}     # producto -> (producto, mayor cantidad en una tesela)
+    por_tesela = {}
+    for indice, (tesela, resultado) in enumerate(zip(teselas, resultados)):
+        for producto in resultado.datos.get('productos') or []:
+            clave = _clave_producto(producto)
+            caja = _caja(producto)
+            if caja is None:
+                cantidad = por_tesela.get((indice, clave), 0) + max(carrito.a_cantidad(producto.get('cantidad')), 0)
+                por_tesela[(indice, clave)] = cantidad
+                if cantidad >= sin_caja.get(clave, (None, 0))[1]:
+                    sin_caja[clave] = (producto, cantidad)
+                continue
+            x1, y1, x2, y2 = caja
+            caja = (x1 + tesela.x, y1 + tesela.y, x2 + tesela.x, y2 + tesela.y)
+            confianza = producto.get('confianza') or 0
+            con_caja.setdefault(clave, []).append((_area(caja), confianza, indice, caja, producto))
+
+    productos = []
+    detecciones = duplicadas = 0
+    for clave, candidatas in con_caja.items():
+        candidatas.sort(key=lambda c: (c[0], c[1]), reverse=True)
+        contadas = []
+        cantidad = 0
+        for _, _, indice, caja, producto in candidatas:
+            if any(otra_indice != indice and _repetida(caja, otra_caja, config)
+                   for otra_indice, otra_caja in contadas):
+                duplicadas += 1
+                continue
+            contadas.append((indice, caja))
+            cantidad += max(carrito.a_cantidad(producto.get('cantidad')), 1)
+        detecciones += len(contadas)
+        if clave in sin_caja:
+            # Vino con y sin caja en distintas teselas: se queda lo que más cuente
+            cantidad = max(cantidad, sin_caja.pop(clave)[1])
+        productos.append(_linea(candidatas[0][4], cantidad))
+    for producto, cantidad in sin_caja.values():
+        if cantidad > 0:
+            productos.append(_linea(producto, cantidad))
+
+    total = sum((carrito.a_decimal(p.get('subtotal')) or 0) for p in productos)
+    metricas.mosaico_detecciones_total.inc(detecciones, resultado='contada')
+    metricas.mosaico_detecciones_total.inc(duplicadas, resultado='duplicada')
+    return {
+        'productos': productos,
+        'total': str(carrito.a_decimal(total)),
+        'mosaico': {'teselas': len(teselas), 'detecciones': detecciones, 'duplicadas': duplicadas},
+    }
+
+
+def _resultado(teselas, resultados, config):
+    for resultado in resultados:
+        # Sin todas las teselas el conteo queda corto: falla la foto entera
+        if isinstance(resultado, Exception):
+            raise resultado
+        if resultado.status_code != 200:
+            return deteccion.ResultadoDeteccion(resultado.status_code, None, False)
+    datos = combinar(teselas.teselas, resultados, config)
+    logger.info("🧩 Detección por teselas", ancho=teselas.ancho, alto=teselas.alto, **datos['mosaico'])
+    return deteccion.ResultadoDeteccion(200, datos, all(r.desde_cache for r in resultados))
+
+
+# ==================== Detección ====================
+
+def detectar(imagen_file, progreso=None):
+    """
+    Como ``deteccion.detectar`` pero por teselas. Devuelve un
+    ``ResultadoDeteccion`` con los productos de toda la foto.
+    """
+    config = get_config()
+    with metricas.etapa('mosaico'):
+        teselas = preprocesamiento.cortar(imagen_file, *_args_corte(config))
+    if teselas is None or len(teselas.teselas) < 2:
+        return deteccion.detectar(imagen_file, progreso=progreso)
+
+    _avisar(progreso, 'preprocesada', bytes=sum(t.archivo.size for t in teselas.teselas),
+            teselas=len(teselas.teselas))
+    _avisar(progreso, 'enviada')
+    # Sin normalizar: si una tesela se achicara, sus cajas no coincidirían con su posición
+    resultados = deteccion.detectar_lote([t.archivo for t in teselas.teselas], config['concurrencia'],
+                                         normalizar=False)
+    return _resultado(teselas, resultados, config)
+
+
+async def adetectar(imagen_file, progreso=None):
+    """Versión async de :func:`detectar`"""
+    config = get_config()
+    with metricas.etapa('mosaico'):
+        teselas = await preprocesamiento.acortar(imagen_file, *_args_corte(config))
+    if teselas is None or len(teselas.teselas) < 2:
+        return await deteccion.adetectar(imagen_file, progreso=progreso)
+
+    _avisar(progreso, 'preprocesada', bytes=sum(t.archivo.size for t in teselas.teselas),
+            teselas=len(teselas.teselas))
+    _avisar(progreso, 'enviada')
+    resultados = await deteccion.adetectar_lote([t.archivo for t in teselas.teselas], config['concurrencia'],
+                                                normalizar=False)
+    return _resultado(teselas, resultados, config)
@@ -0,0 +1,346 @@
+"""
+Outbox local para las confirmaciones de venta y de transferencia (write-behind).
+
+Con ``OUTBOX['activo']`` confirmar una orden de caja (``confirmarcompra`` /
+``confirmarsincliente``) o crear una transferencia (``crearTransferencia``)
+no espera al backend: :func:`encolar` guarda el envío en la tabla
+``EnvioPendiente`` de la base de la app y la vista responde enseguida con
+202. Un entregador lo manda después:
+
+* en cada ronda toma las terminales (cajero u operario de depósito) cuyo
+  primer envío pendiente ya puede intentarse y entrega hasta ``lote`` envíos
+  en total, ``concurrencia`` terminales en paralelo;
+* dentro de una terminal respeta el orden de creación: si un envío falla, los
+  siguientes de esa terminal esperan a que se entregue;
+* los errores transitorios (conexión, 5xx, 408/409/429, circuito abierto) se
+  reintentan con backoff exponencial hasta ``max_intentos``;
+* los rechazos definitivos (4xx o ``success: false``) y los que agotan los
+  intentos quedan como ``fallido`` (dead letter) y dejan pasar al resto de la
+  terminal; ``manage.py entregar_outbox --reencolar`` los vuelve a la cola.
+
+Cada envío viaja con su clave de idempotencia (la del navegador si la mandó),
+así un reintento después de un timeout no registra la venta dos veces. Antes
+de cada intento el envío se reserva corriendo ``proximo_intento``
+``reserva`` segundos: dos entregadores no mandan el mismo envío y, si el
+proceso muere a mitad de camino, se vuelve a intentar pasada la reserva.
+
+El entregador corre en un thread de cada proceso del servidor
+(``OutboxMiddleware``, con ``hilo``) o aparte con ``manage.py entregar_outbox``.
+Configuración en ``OUTBOX``.
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, IntegrityError, close_old_connections, transaction
+from django.db.models import Count, F, Min
+from django.http import JsonResponse
+from django.utils import timezone
+
+from api import backend_client, logs, metricas, resiliencia, transferencias, ventas
+from api.models import EnvioPendiente
+
+logger = logs.get_logger(__name__)
+
+DEFAULT_CONFIG = {
+    'activo': False,
+    'hilo': True,           # entregador en un thread de cada proceso del servidor
+    'lote': 50,             # envíos por ronda
+    'concurrencia': 4,      # terminales que se entregan en paralelo
+    'intervalo': 1.0,       # segundos entre rondas sin envíos listos
+    'max_intentos': 10,
+    'backoff': 2,           # segundos hasta el primer reintento; se duplica en cada uno
+    'max_backoff': 300,
+    'reserva': 60,          # segundos que un envío queda reservado mientras se entrega
+}
+
+# Estados HTTP que no son un rechazo definitivo
+STATUS_REINTENTABLES = (408, 409, 429)
+
+_hilo = None
+_hilo_pid = None
+_despertador = threading.Event()
+_detener = threading.Event()
+_lock = threading.Lock()
+
+
+def get_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, 'OUTBOX', {})}
+
+
+def activo():
+    return bool(get_config()['activo'])
+
+
+# ==================== Encolar ====================
+
+def encolar(endpoint, terminal, datos, clave_idempotencia=None, venta=None):
+    """
+    Guarda el envío y despierta al entregador. Con una clave ya usada
+    devuelve el envío que la tiene en lugar de crear otro. ``venta``
+    (``ventas.para_outbox``) se anota en el libro local cuando se entrega.
+    """
+    clave = clave_idempotencia or uuid.uuid4().hex
+    try:
+        with transaction.atomic():
+            envio = EnvioPendiente.objects.create(
+                endpoint=endpoint,
+                terminal=terminal,
+                datos=datos,
+                clave_idempotencia=clave,
+                venta=venta,
+            )
+            transaction.on_commit(_despertador.set)
+    except IntegrityError:
+        return EnvioPendiente.objects.get(clave_idempotencia=clave)
+
+    metricas.outbox_encolados_total.inc(endpoint=endpoint)
+    logger.info('📮 Envío encolado', envio_id=envio.pk, endpoint=endpoint, terminal=terminal)
+    return envio
+
+
+async def aencolar(endpoint, terminal, datos, clave_idempotencia=None, venta=None):
+    """Versión async de :func:`encolar`"""
+    return await sync_to_async(encolar)(endpoint, terminal, datos, clave_idempotencia, venta)
+
+
+def respuesta_encolada(envio, mensaje, **extra):
+    """202: el envío quedó guardado y se entregará al backend más tarde"""
+    return JsonResponse({
+        'success': True,
+        'pendiente': True,
+        'envio_id': envio.pk,
+        'message': mensaje,
+        **extra,
+    }, status=202)
+
+
+# ==================== Entrega ====================
+
+def _terminales_listas(cantidad):
+    """Terminales cuyo primer envío pendiente ya puede intentarse, las más viejas primero"""
+    primeros = (
+        EnvioPendiente.objects.filter(estado=EnvioPendiente.PENDIENTE)
+        .values('terminal')
+        .annotate(primero=Min('id'))
+        .values('primero')
+    )
+    return list(
+        EnvioPendiente.objects.filter(id__in=primeros, proximo_intento__lte=timezone.now())
+        .order_by('id')
+        .values_list('terminal', flat=True)[:cantidad]
+    )
+
+
+def _reservar(envio, config):
+    """Toma el envío para este entregador; ``False`` si otro lo tiene o todavía no toca"""
+    ahora = timezone.now()
+    reservados = EnvioPendiente.objects.filter(
+        pk=envio.pk, estado=EnvioPendiente.PENDIENTE, proximo_intento__lte=ahora
+    ).update(proximo_intento=ahora + timedelta(seconds=config['reserva']), intentos=F('intentos') + 1)
+    envio.intentos += 1
+    return reservados == 1
+
+
+def _json(response):
+    try:
+        datos = response.json()
+    except ValueError:
+        return {}
+    return datos if isinstance(datos, dict) else {'respuesta': datos}
+
+
+def _marcar_entregado(envio, respuesta):
+    ahora = timezone.now()
+    with transaction.atomic():
+        EnvioPendiente.objects.filter(pk=envio.pk).update(
+            estado=EnvioPendiente.ENTREGADO, entregado=ahora, respuesta=respuesta, ultimo_error='')
+        if envio.venta:
+            # Recién ahora la venta está confirmada: entra al libro con la fecha del cajero
+            ventas.registrar_entregada(envio.venta, envio.clave_idempotencia,
+                                       respuesta.get('venta_id'), envio.creado)
+    metricas.outbox_entregas_total.inc(endpoint=envio.endpoint, resultado='entregado')
+    metricas.outbox_demora_segundos.observar((ahora - envio.creado).total_seconds(), endpoint=envio.endpoint)
+    if envio.endpoint == 'crear_transferencia':
+        transferencias.invalidar()
+    logger.info('📬 Envío entregado', envio_id=envio.pk, endpoint=envio.endpoint, intentos=envio.intentos)
+
+
+def _marcar_fallido(envio, error):
+    EnvioPendiente.objects.filter(pk=envio.pk).update(estado=EnvioPendiente.FALLIDO, ultimo_error=error)
+    metricas.outbox_entregas_total.inc(endpoint=envio.endpoint, resultado='fallido')
+    logger.error('📭 Envío descartado (dead letter)', envio_id=envio.pk, endpoint=envio.endpoint,
+                 intentos=envio.intentos, error=error)
+
+
+def _reintentar(envio, error, config):
+    if envio.intentos >= config['max_intentos']:
+        _marcar_fallido(envio, error)
+        return
+    espera = min(config['max_backoff'], config['backoff'] * 2 ** (envio.intentos - 1))
+    EnvioPendiente.objects.filter(pk=envio.pk).update(
+        proximo_intento=timezone.now() + timedelta(seconds=espera), ultimo_error=error)
+    metricas.outbox_entregas_total.inc(endpoint=envio.endpoint, resultado='reintento')
+    logger.warning('⏳ Envío no entregado, se reintenta', envio_id=envio.pk, endpoint=envio.endpoint,
+                   intentos=envio.intentos, espera=espera, error=error)
+
+
+def _entregar(envio, config):
+    """
+    Manda un envío ya reservado. ``True`` si la terminal puede seguir con el
+    siguiente (se entregó o quedó descartado), ``False`` si hay que reintentarlo.
+    """
+    try:
+        response = backend_client.post(envio.endpoint, json=envio.datos,
+                                       clave_idempotencia=envio.clave_idempotencia)
+    except (resiliencia.BackendNoDisponible, requests.exceptions.RequestException) as e:
+        _reintentar(envio, str(e), config)
+        return False
+
+    respuesta = _json(response)
+    if response.status_code < 300 and respuesta.get('success', True) is not False:
+        _marcar_entregado(envio, respuesta)
+        return True
+    error = f'HTTP {response.status_code}: {respuesta.get("error") or respuesta.get("message") or ""}'.strip()
+    if response.status_code >= 500 or response.status_code in STATUS_REINTENTABLES:
+        _reintentar(envio, error, config)
+        return False
+    _marcar_fallido(envio, error)
+    return True
+
+
+def _entregar_terminal(terminal, cantidad, config):
+    """Entrega en orden hasta ``cantidad`` envíos de la terminal; devuelve cuántos resolvió"""
+    resueltos = 0
+    try:
+        pendientes = EnvioPendiente.objects.filter(
+            estado=EnvioPendiente.PENDIENTE, terminal=terminal).order_by('id')[:cantidad]
+        for envio in pendientes:
+            if not _reservar(envio, config) or not _entregar(envio, config):
+                break
+            resueltos += 1
+    finally:
+        # Cada thread del pool abre su propia conexión
+        close_old_connections()
+    return resueltos
+
+
+def entregar_ronda():
+    """Una ronda de entregas; devuelve cuántos envíos se resolvieron"""
+    config = get_config()
+    terminales = _terminales_listas(config['lote'])
+    if not terminales:
+        return 0
+    por_terminal = max(1, config['lote'] // len(terminales))
+    with ThreadPoolExecutor(max_workers=config['concurrencia'], thread_name_prefix='outbox') as pool:
+        return sum(pool.map(lambda terminal: _entregar_terminal(terminal, por_terminal, config), terminales))
+
+
+def reencolar_fallidos(ids=None):
+    """Vuelve a poner en cola los envíos descartados (todos o los de ``ids``)"""
+    fallidos = EnvioPendiente.objects.filter(estado=EnvioPendiente.FALLIDO)
+    if ids:
+        fallidos = fallidos.filter(pk__in=ids)
+    cantidad = fallidos.update(estado=EnvioPendiente.PENDIENTE, intentos=0, proximo_intento=timezone.now())
+    if cantidad:
+        _despertador.set()
+    return cantidad
+
+
+# ==================== Entregador en segundo plano ====================
+
+def _bucle():
+    logger.info('📮 Entregador del outbox iniciado', pid=os.getpid())
+    while not _detener.is_set():
+        try:
+            resueltos = entregar_ronda()
+        except DatabaseError as e:
+            # Por ejemplo, la tabla todavía no existe (falta migrate)
+            logger.warning('❌ Error al leer el outbox', error=str(e))
+            resueltos = 0
+        except Exception:
+            logger.exception('❌ Error en la ronda de entregas del outbox')
+            resueltos = 0
+        finally:
+            close_old_connections()
+        if not resueltos:
+            _despertador.wait(get_config()['intervalo'])
+            _despertador.clear()
+
+
+def iniciar():
+    """Arranca el entregador en un thread del proceso (uno solo por proceso)"""
+    global _hilo, _hilo_pid
+    pid = os.getpid()
+    with _lock:
+        if _hilo is not None and _hilo.is_alive() and _hilo_pid == pid:
+            return
+        _detener.clear()
+        _hilo = threading.Thread(target=_bucle, name='outbox', daemon=True)
+        _hilo_pid = pid
+        _hilo.start()
+
+
+def detener(espera=5):
+    """Detiene el entregador del proceso (útil en tests y benchmarks)"""
+    global _hilo
+    with _lock:
+        hilo, _hilo = _hilo, None
+    if hilo is not None:
+        _detener.set()
+        _despertador.set()
+        hilo.join(espera)
+
+
+def ejecutar(intervalo=None, una_vez=False):
+    """Entregador en primer plano para ``manage.py entregar_outbox``"""
+    while True:
+        resueltos = entregar_ronda()
+        close_old_connections()
+        if una_vez:
+            return resueltos
+        if not resueltos:
+            time.sleep(get_config()['intervalo'] if intervalo is None else intervalo)
+
+
+class OutboxMiddleware:
+    """
+    No atiende peticiones: al levantar el servidor arranca el entregador del
+    proceso si el outbox está activo y ``hilo`` lo pide.
+    """
+
+    def __init__(self, get_response):
+        config = get_config()
+        if config['activo'] and config['hilo']:
+            iniciar()
+        raise MiddlewareNotUsed()
+
+
+# ==================== Métricas ====================
+
+def estadisticas():
+    """
+    Envíos pendientes y fallidos, y segundos desde el pendiente más viejo.
+    ``{}`` si la tabla todavía no existe (falta ``migrate``).
+    """
+    try:
+        por_estado = dict(
+            EnvioPendiente.objects.exclude(estado=EnvioPendiente.ENTREGADO)
+            .values_list('estado').annotate(cantidad=Count('id'))
+        )
+        mas_viejo = (EnvioPendiente.objects.filter(estado=EnvioPendiente.PENDIENTE)
+                     .aggregate(creado=Min('creado'))['creado'])
+    except DatabaseError:
+        return {}
+    return {
+        'pendiente': por_estado.get(EnvioPendiente.PENDIENTE, 0),
+        'fallido': por_estado.get(EnvioPendiente.FALLIDO, 0),
+        'antiguedad': (timezone.now() - mas_viejo).total_seconds() if mas_viejo else 0,
+    }
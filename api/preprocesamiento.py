@@ -0,0 +1,329 @@
+"""
+Normalización de imágenes antes de la detección.
+
+Las fotos de los celulares llegan en resoluciones que el detector no
+necesita. Cuando ``PREPROCESAR_IMAGENES`` está activo, antes de llamar a
+``detectarobjetos`` la imagen se reorienta según su EXIF, se achica para que
+el lado mayor no supere ``lado_maximo``, se descartan los metadatos y se
+re-codifica como JPEG o WEBP con la calidad configurada.
+
+La decodificación es CPU intensiva, así que corre en un pool de procesos
+para no retener el GIL mientras el proceso web atiende otras peticiones.
+Si un proceso del pool muere, el pool se descarta y el próximo pedido arma
+uno nuevo (``reconocimiento_preprocesamiento_pool_reinicios_total``).
+Requiere Pillow; si no está instalado la imagen se envía sin cambios.
+
+:func:`cortar` usa el mismo pool para partir una foto grande en teselas
+solapadas (modo mosaico, ``api/mosaico.py``).
+"""
+import asyncio
+import io
+import math
+import multiprocessing
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from api import logs, metricas
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow es opcional: sin él no se preprocesa
+    Image = None
+
+logger = logs.get_logger(__name__)
+
+DEFAULT_CONFIG = {
+    'lado_maximo': 1280,
+    'formato': 'JPEG',   # 'JPEG' o 'WEBP'
+    'calidad': 85,
+    'workers': 2,
+}
+
+EXTENSIONES = {'JPEG': '.jpg', 'WEBP': '.webp'}
+
+# Tag EXIF de la orientación (1 = la imagen ya está derecha)
+ORIENTACION_EXIF = 0x0112
+
+MetricasPreprocesamiento = namedtuple(
+    'MetricasPreprocesamiento', ['bytes_entrada', 'bytes_salida', 'segundos']
+)
+
+_pool = None
+_pool_pid = None
+_lock = threading.Lock()
+
+# Acumulados del proceso, ver estadisticas()
+_totales = {'imagenes': 0, 'bytes_entrada': 0, 'bytes_salida': 0, 'segundos': 0.0}
+
+
+def get_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, 'PREPROCESAMIENTO', {})}
+
+
+def activo():
+    return getattr(settings, 'PREPROCESAR_IMAGENES', False) and Image is not None
+
+
+def _get_pool():
+    global _pool, _pool_pid
+
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+
+    with _lock:
+        if _pool is None or _pool_pid != pid:
+            # spawn: hacer fork de un proceso web con threads puede dejar locks tomados
+            _pool = ProcessPoolExecutor(
+                max_workers=get_config()['workers'],
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+            _pool_pid = pid
+    return _pool
+
+
+def _descartar_pool(pool, error):
+    """Si un proceso del pool murió el executor queda roto: el próximo pedido arma otro"""
+    global _pool
+    with _lock:
+        if _pool is not pool:
+            # Otra imagen del mismo pool roto ya lo descartó
+            return
+        _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+    metricas.preprocesamiento_pool_reinicios_total.inc()
+    logger.error("❌ Se cayó un proceso del pool de preprocesamiento, se crea uno nuevo", error=str(error))
+
+
+def _en_pool(funcion, *args):
+    pool = _get_pool()
+    try:
+        return pool.submit(funcion, *args).result()
+    except BrokenProcessPool as e:
+        _descartar_pool(pool, e)
+        raise
+
+
+async def _aen_pool(funcion, *args):
+    pool = _get_pool()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, funcion, *args)
+    except BrokenProcessPool as e:
+        _descartar_pool(pool, e)
+        raise
+
+
+def _abrir(fuente):
+    # Ruta del archivo temporal del upload o, si era chico, sus bytes
+    return Image.open(fuente if isinstance(fuente, str) else io.BytesIO(fuente))
+
+
+def normalizar_bytes(fuente, lado_maximo, formato, calidad):
+    """
+    Reorienta, achica y re-codifica una imagen. Corre en los procesos del pool,
+    por eso recibe la ruta del archivo (o sus ``bytes``) y devuelve
+    ``(bytes, transformada)``: ``transformada`` indica si hubo que rotarla o
+    achicarla (entonces la original no sirve aunque pese menos).
+    """
+    with _abrir(fuente) as imagen:
+        orientacion = imagen.getexif().get(ORIENTACION_EXIF, 1)
+        imagen = ImageOps.exif_transpose(imagen)
+        tamano = imagen.size
+        imagen.thumbnail((lado_maximo, lado_maximo), Image.Resampling.LANCZOS)
+        transformada = orientacion != 1 or imagen.size != tamano
+        if imagen.mode not in ('RGB', 'L'):
+            imagen = imagen.convert('RGB')
+
+        salida = io.BytesIO()
+        # Sin exif=...: Pillow no copia los metadatos al re-codificar
+        imagen.save(salida, format=formato, quality=calidad, optimize=True)
+        return salida.getvalue(), transformada
+
+
+def _fuente(archivo):
+    """
+    Lo que recibe el proceso del pool: la ruta si el upload quedó en disco
+    (así no se copia entero en memoria ni se serializa), o los ``bytes``
+    de una imagen chica que llegó en memoria
+    """
+    if hasattr(archivo, 'temporary_file_path'):
+        archivo.file.flush()
+        return archivo.temporary_file_path()
+    archivo.seek(0)
+    datos = archivo.read()
+    archivo.seek(0)
+    return datos
+
+
+def _args_normalizacion(archivo):
+    config = get_config()
+    return _fuente(archivo), config['lado_maximo'], config['formato'], config['calidad']
+
+
+def _resultado(archivo, normalizacion, inicio):
+    bytes_entrada = archivo.size
+    normalizados, transformada = normalizacion or (None, False)
+    # Si la imagen ya estaba derecha y chica la re-codificación puede agrandarla;
+    # una rotada o achicada se manda normalizada aunque pese más
+    usar_original = normalizados is None or (not transformada and len(normalizados) >= bytes_entrada)
+    metricas = MetricasPreprocesamiento(
+        bytes_entrada=bytes_entrada,
+        bytes_salida=bytes_entrada if usar_original else len(normalizados),
+        segundos=time.perf_counter() - inicio,
+    )
+    _registrar(metricas)
+
+    if usar_original:
+        archivo.seek(0)
+        return archivo, metricas
+
+    formato = get_config()['formato']
+    nombre = os.path.splitext(archivo.name or 'imagen')[0] + EXTENSIONES.get(formato, '')
+    return SimpleUploadedFile(nombre, normalizados, f'image/{formato.lower()}'), metricas
+
+
+def _registrar(metricas):
+    with _lock:
+        _totales['imagenes'] += 1
+        _totales['bytes_entrada'] += metricas.bytes_entrada
+        _totales['bytes_salida'] += metricas.bytes_salida
+        _totales['segundos'] += metricas.segundos
+    logger.debug("🖼️ Preprocesamiento", bytes_entrada=metricas.bytes_entrada,
+                 bytes_salida=metricas.bytes_salida, segundos=round(metricas.segundos, 3))
+
+
+def estadisticas():
+    """Totales del proceso: imágenes, bytes de entrada/salida y segundos"""
+    with _lock:
+        return dict(_totales)
+
+
+def normalizar(archivo):
+    """
+    Devuelve ``(archivo, metricas)`` con la imagen normalizada, o el archivo
+    original y ``None`` si el preprocesamiento está desactivado.
+    Si Pillow no puede decodificar la imagen se envía la original.
+    """
+    if not activo():
+        return archivo, None
+
+    inicio = time.perf_counter()
+    args = _args_normalizacion(archivo)
+    try:
+        normalizacion = _en_pool(normalizar_bytes, *args)
+    except Exception as e:
+        logger.warning("⚠️ No se pudo normalizar la imagen, se envía la original", error=str(e))
+        normalizacion = None
+    return _resultado(archivo, normalizacion, inicio)
+
+
+async def anormalizar(archivo):
+    """Versión async de :func:`normalizar` para las vistas ASGI"""
+    if not activo():
+        return archivo, None
+
+    inicio = time.perf_counter()
+    args = _args_normalizacion(archivo)
+    try:
+        normalizacion = await _aen_pool(normalizar_bytes, *args)
+    except Exception as e:
+        logger.warning("⚠️ No se pudo normalizar la imagen, se envía la original", error=str(e))
+        normalizacion = None
+    return _resultado(archivo, normalizacion, inicio)
+
+
+# ==================== Teselas (modo mosaico) ====================
+
+Teselas = namedtuple('Teselas', ['ancho', 'alto', 'teselas'])
+# Recorte de la foto: su esquina superior izquierda en la foto completa y el archivo
+Tesela = namedtuple('Tesela', ['x', 'y', 'archivo'])
+
+
+def _posiciones(largo, lado, solape):
+    """Inicio de cada tesela sobre un eje, repartidas parejo y solapadas al menos ``solape``"""
+    if largo <= lado:
+        return [0]
+    cantidad = math.ceil((largo - lado) / (lado - solape)) + 1
+    paso = (largo - lado) / (cantidad - 1)
+    return [round(i * paso) for i in range(cantidad)]
+
+
+def cortar_bytes(fuente, lado, solape, max_teselas, formato, calidad):
+    """
+    Reorienta la imagen y la parte en teselas de ``lado`` píxeles que se
+    solapan ``solape`` píxeles (si saldrían más de ``max_teselas``, las
+    teselas se agrandan). Corre en los procesos del pool: devuelve
+    ``(ancho, alto, [(x, y, bytes), ...])``.
+    """
+    with _abrir(fuente) as imagen:
+        imagen = ImageOps.exif_transpose(imagen)
+        if imagen.mode not in ('RGB', 'L'):
+            imagen = imagen.convert('RGB')
+        ancho, alto = imagen.size
+
+        while True:
+            solape_px = min(int(lado * solape), lado // 2)
+            xs = _posiciones(ancho, lado, solape_px)
+            ys = _posiciones(alto, lado, solape_px)
+            if len(xs) * len(ys) <= max(1, max_teselas):
+                break
+            lado = math.ceil(lado * 1.25)
+
+        teselas = []
+        for y in ys:
+            for x in xs:
+                salida = io.BytesIO()
+                recorte = imagen.crop((x, y, min(x + lado, ancho), min(y + lado, alto)))
+                recorte.save(salida, format=formato, quality=calidad)
+                teselas.append((x, y, salida.getvalue()))
+        return ancho, alto, teselas
+
+
+def _teselas(archivo, resultado):
+    ancho, alto, teselas = resultado
+    formato = get_config()['formato']
+    base = os.path.splitext(archivo.name or 'imagen')[0]
+    return Teselas(ancho, alto, [
+        Tesela(x, y, SimpleUploadedFile(f'{base}_{x}_{y}{EXTENSIONES.get(formato, "")}',
+                                        datos, f'image/{formato.lower()}'))
+        for x, y, datos in teselas
+    ])
+
+
+def _args_corte(archivo, lado, solape, max_teselas, calidad):
+    return _fuente(archivo), lado, solape, max_teselas, get_config()['formato'], calidad
+
+
+def cortar(archivo, lado, solape, max_teselas, calidad=90):
+    """
+    Parte la imagen en teselas solapadas (``solape`` es la fracción del lado).
+    Devuelve ``Teselas(ancho, alto, teselas)`` o ``None`` si no hay Pillow o
+    no pudo decodificar la imagen.
+    """
+    if Image is None:
+        return None
+    args = _args_corte(archivo, lado, solape, max_teselas, calidad)
+    try:
+        return _teselas(archivo, _en_pool(cortar_bytes, *args))
+    except Exception as e:
+        logger.warning("⚠️ No se pudo cortar la imagen en teselas", error=str(e))
+        return None
+
+
+async def acortar(archivo, lado, solape, max_teselas, calidad=90):
+    """Versión async de :func:`cortar`"""
+    if Image is None:
+        return None
+    args = _args_corte(archivo, lado, solape, max_teselas, calidad)
+    try:
+        return _teselas(archivo, await _aen_pool(cortar_bytes, *args))
+    except Exception as e:
+        logger.warning("⚠️ No se pudo cortar la imagen en teselas", error=str(e))
+        return None
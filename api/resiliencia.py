@@ -0,0 +1,255 @@
+"""
+Circuit breaker por grupo de endpoints y plazos (deadlines) por petición.
+
+Circuito
+    Cada grupo de ``backend_client.ENDPOINTS`` (auth, deteccion, ventas,
+    deposito, catalogo, clientes) tiene su ``Circuito``. Tras ``fallas`` errores
+    consecutivos (errores de conexión, timeouts o respuestas 5xx) se abre y
+    durante ``espera`` segundos las llamadas a ese grupo fallan enseguida con
+    ``CircuitoAbierto`` en lugar de ocupar un worker hasta el timeout.
+    Pasada la espera queda semiabierto: se dejan pasar ``sondas`` llamadas
+    de prueba; si salen bien se cierra y si fallan se vuelve a abrir.
+
+Plazo
+    El cliente puede mandar el tiempo que está dispuesto a esperar en el
+    header ``X-Timeout-Ms``. ``PlazoMiddleware`` lo guarda como un instante
+    límite y ``backend_client`` usa lo que queda como timeout de cada
+    llamada (si es menor que el configurado), sin reintentar cuando ya no
+    alcanza. Lo que queda se reenvía al backend en el mismo header.
+
+Las vistas responden ambos casos con :func:`respuesta_no_disponible`.
+"""
+import contextvars
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from api import logs, metricas
+
+logger = logs.get_logger(__name__)
+
+HEADER_PLAZO = 'X-Timeout-Ms'
+
+DEFAULT_CIRCUITO = {
+    'activo': True,
+    'fallas': 5,    # fallas consecutivas que abren el circuito
+    'espera': 15,   # segundos abierto antes de probar de nuevo
+    'sondas': 1,    # llamadas de prueba simultáneas en semiabierto
+}
+
+CERRADO = 'cerrado'
+SEMIABIERTO = 'semiabierto'
+ABIERTO = 'abierto'
+
+_plazo = contextvars.ContextVar('plazo', default=None)
+
+_circuitos = {}
+_lock = threading.Lock()
+
+
+class BackendNoDisponible(Exception):
+    """La llamada al backend no se hizo (o se cortó) por el circuito o el plazo"""
+    status = 503
+
+    def __init__(self, mensaje, reintentar_en=None):
+        super().__init__(mensaje)
+        self.reintentar_en = reintentar_en
+
+
+class CircuitoAbierto(BackendNoDisponible):
+    status = 503
+
+
+class PlazoAgotado(BackendNoDisponible):
+    status = 504
+
+
+def get_config_circuito():
+    return {**DEFAULT_CIRCUITO, **getattr(settings, 'BACKEND_CIRCUITO', {})}
+
+
+# ==================== Circuito ====================
+
+NOMBRES_GRUPO = {
+    'auth': 'autenticación',
+    'deteccion': 'detección',
+    'ventas': 'ventas',
+    'deposito': 'depósito',
+    'catalogo': 'catálogo',
+    'clientes': 'clientes',
+}
+
+
+class Circuito:
+    def __init__(self, grupo, fallas, espera, sondas):
+        self.grupo = grupo
+        self.umbral = fallas
+        self.espera = espera
+        self.sondas = sondas
+        self.estado = CERRADO
+        self._fallas = 0
+        self._sondas_en_curso = 0
+        self._abierto_hasta = 0.0
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        """
+        Deja pasar la llamada o lanza ``CircuitoAbierto``. Devuelve ``True``
+        si la llamada es una sonda del estado semiabierto.
+        """
+        with self._lock:
+            if self.estado == ABIERTO:
+                restante = self._abierto_hasta - time.monotonic()
+                if restante > 0:
+                    self._rechazar(restante)
+                self.estado = SEMIABIERTO
+                self._sondas_en_curso = 0
+            if self.estado == SEMIABIERTO:
+                if self._sondas_en_curso >= self.sondas:
+                    self._rechazar(1)
+                self._sondas_en_curso += 1
+                return True
+            return False
+
+    def registrar(self, falla, sonda=False):
+        """
+        Resultado de una llamada permitida: ``True`` si falló, ``False`` si
+        salió bien y ``None`` si no dice nada del backend (p. ej. se agotó el
+        plazo del cliente antes de llamarlo).
+        """
+        with self._lock:
+            if sonda:
+                self._sondas_en_curso = max(0, self._sondas_en_curso - 1)
+            if falla is None:
+                return
+            if not falla:
+                self._fallas = 0
+                if self.estado != CERRADO:
+                    self.estado = CERRADO
+                    logger.info('🔌 Circuito cerrado', grupo=self.grupo)
+                return
+            self._fallas += 1
+            if self.estado == SEMIABIERTO or (self.estado == CERRADO and self._fallas >= self.umbral):
+                self._abrir()
+
+    def _abrir(self):
+        self.estado = ABIERTO
+        self._abierto_hasta = time.monotonic() + self.espera
+        metricas.circuito_aperturas_total.inc(grupo=self.grupo)
+        logger.warning('🔌 Circuito abierto', grupo=self.grupo, fallas=self._fallas,
+                       espera=self.espera)
+
+    def _rechazar(self, restante):
+        metricas.circuito_rechazos_total.inc(grupo=self.grupo)
+        nombre = NOMBRES_GRUPO.get(self.grupo, self.grupo)
+        raise CircuitoAbierto(
+            f'El servicio de {nombre} no está disponible en este momento, '
+            f'intente de nuevo en {math.ceil(restante)} s',
+            reintentar_en=restante,
+        )
+
+
+class _SinCircuito:
+    """Reemplazo de ``Circuito`` cuando está desactivado en settings"""
+    estado = CERRADO
+
+    def permitir(self):
+        return False
+
+    def registrar(self, falla, sonda=False):
+        pass
+
+
+def get_circuito(grupo):
+    circuito = _circuitos.get(grupo)
+    if circuito is None:
+        with _lock:
+            circuito = _circuitos.get(grupo)
+            if circuito is None:
+                config = get_config_circuito()
+                if config['activo']:
+                    circuito = Circuito(grupo, config['fallas'], config['espera'], config['sondas'])
+                else:
+                    circuito = _SinCircuito()
+                _circuitos[grupo] = circuito
+    return circuito
+
+
+def reiniciar_circuitos():
+    """Descarta el estado de todos los circuitos (útil en tests y benchmarks)"""
+    with _lock:
+        _circuitos.clear()
+
+
+def estados():
+    """``{grupo: estado}`` de los circuitos creados hasta ahora"""
+    return {grupo: circuito.estado for grupo, circuito in list(_circuitos.items())}
+
+
+# ==================== Plazo ====================
+
+def leer_plazo(request):
+    """Instante límite (``time.monotonic``) que pidió el cliente, o ``None``"""
+    valor = request.headers.get(HEADER_PLAZO)
+    if not valor:
+        return None
+    try:
+        milisegundos = float(valor)
+    except ValueError:
+        return None
+    if milisegundos <= 0:
+        return None
+    return time.monotonic() + milisegundos / 1000
+
+
+def set_plazo(limite):
+    return _plazo.set(limite)
+
+
+def reset_plazo(token):
+    _plazo.reset(token)
+
+
+def restante():
+    """Segundos que quedan del plazo de la petición actual (``None`` si no hay)"""
+    limite = _plazo.get()
+    if limite is None:
+        return None
+    return limite - time.monotonic()
+
+
+def recortar_timeout(conexion, lectura):
+    """
+    Devuelve ``(conexion, lectura, recortado)`` con los timeouts limitados
+    a lo que queda del plazo. Lanza ``PlazoAgotado`` si ya no queda nada.
+    """
+    queda = restante()
+    if queda is None or queda >= lectura:
+        return conexion, lectura, False
+    if queda <= 0:
+        raise PlazoAgotado('Se agotó el tiempo de espera de la petición')
+    return min(conexion, queda), queda, True
+
+
+def headers_plazo(headers=None):
+    """Copia de ``headers`` con lo que queda del plazo para el backend"""
+    queda = restante()
+    if queda is None:
+        return headers
+    return {**(headers or {}), HEADER_PLAZO: str(max(0, int(queda * 1000)))}
+
+
+# ==================== Respuesta ====================
+
+def respuesta_no_disponible(error, clave='error'):
+    """JsonResponse 503/504 con ``Retry-After`` para ``BackendNoDisponible``"""
+    datos = {'success': False, clave: str(error)}
+    if error.reintentar_en is not None:
+        datos['reintentar_en'] = math.ceil(error.reintentar_en)
+    response = JsonResponse(datos, status=error.status)
+    if error.reintentar_en is not None:
+        response['Retry-After'] = str(math.ceil(error.reintentar_en))
+    return response
@@ -0,0 +1,153 @@
+// ✅ CAPTURA DE FOTOS (caja y depósito)
+// Antes de subirla, cada foto se reduce a CAPTURA.ladoMaximo px y se codifica en
+// CAPTURA.formato con CAPTURA.calidad dentro de un Web Worker (captura_worker.js),
+// así la página no se traba mientras comprime. El objeto CAPTURA lo arma el servidor
+// (settings.CAPTURA). Sin Worker u OffscreenCanvas se hace con un canvas de la página.
+
+let workerCaptura = null;
+let siguientePedidoCaptura = 0;
+const pedidosCaptura = new Map();
+// Datos de cada foto comprimida para las métricas: blob -> {original, segundos, capturada}
+const datosCaptura = new WeakMap();
+
+function obtenerWorkerCaptura() {
+    if (workerCaptura === null) {
+        workerCaptura = false;
+        if (window.Worker && window.OffscreenCanvas && window.createImageBitmap) {
+            try {
+                workerCaptura = new Worker(CAPTURA.workerUrl);
+                workerCaptura.onmessage = (evento) => {
+                    const pedido = pedidosCaptura.get(evento.data.id);
+                    pedidosCaptura.delete(evento.data.id);
+                    if (evento.data.error) {
+                        pedido.reject(new Error(evento.data.error));
+                    } else {
+                        pedido.resolve(evento.data.blob);
+                    }
+                };
+            } catch (error) {
+                console.warn('⚠️ No se pudo iniciar el worker de captura:', error);
+                workerCaptura = false;
+            }
+        }
+    }
+    return workerCaptura;
+}
+
+function comprimirEnWorker(worker, imagen) {
+    return new Promise((resolve, reject) => {
+        const id = ++siguientePedidoCaptura;
+        pedidosCaptura.set(id, { resolve, reject });
+        const mensaje = {
+            id,
+            imagen,
+            ladoMaximo: CAPTURA.ladoMaximo,
+            formato: CAPTURA.formato,
+            calidad: CAPTURA.calidad
+        };
+        // El ImageBitmap se transfiere al worker sin copiarlo
+        worker.postMessage(mensaje, imagen instanceof ImageBitmap ? [imagen] : []);
+    });
+}
+
+function canvasABlob(canvas, formato, calidad) {
+    return new Promise(resolve => canvas.toBlob(resolve, formato, calidad));
+}
+
+// Respaldo sin worker: el mismo proceso con un canvas de la página
+async function comprimirEnPagina(fuente) {
+    const imagen = fuente instanceof Blob ? await createImageBitmap(fuente) : fuente;
+    const anchoOriginal = imagen.videoWidth || imagen.width;
+    const altoOriginal = imagen.videoHeight || imagen.height;
+    const escala = Math.min(1, CAPTURA.ladoMaximo / Math.max(anchoOriginal, altoOriginal));
+
+    const canvas = document.createElement('canvas');
+    canvas.width = Math.max(1, Math.round(anchoOriginal * escala));
+    canvas.height = Math.max(1, Math.round(altoOriginal * escala));
+    canvas.getContext('2d').drawImage(imagen, 0, 0, canvas.width, canvas.height);
+
+    let blob = await canvasABlob(canvas, CAPTURA.formato, CAPTURA.calidad);
+    if (!blob || blob.type !== CAPTURA.formato) {
+        blob = await canvasABlob(canvas, 'image/jpeg', CAPTURA.calidad);
+    }
+    return blob;
+}
+
+// Foto lista para subir a partir del <video> de la cámara o de un archivo elegido
+async function comprimirCaptura(fuente) {
+    const inicio = performance.now();
+    const esArchivo = fuente instanceof Blob;
+    let blob = null;
+
+    try {
+        const worker = obtenerWorkerCaptura();
+        if (worker) {
+            // El cuadro del video se toma acá; reducirlo y codificarlo queda para el worker
+            const imagen = esArchivo ? fuente : await createImageBitmap(fuente);
+            blob = await comprimirEnWorker(worker, imagen);
+        } else {
+            blob = await comprimirEnPagina(fuente);
+        }
+    } catch (error) {
+        console.warn('⚠️ No se pudo comprimir en el worker, se usa la página:', error);
+        try {
+            blob = await comprimirEnPagina(fuente);
+        } catch (errorPagina) {
+            console.error('❌ No se pudo comprimir la foto:', errorPagina);
+        }
+    }
+
+    // Un archivo ya chico puede quedar más pesado al recodificarlo: se sube tal cual
+    if (esArchivo && (!blob || blob.size >= fuente.size)) {
+        blob = fuente;
+    }
+    if (!blob) {
+        throw new Error('No se pudo obtener la foto');
+    }
+
+    datosCaptura.set(blob, {
+        original: esArchivo ? fuente.size : null,
+        segundos: (performance.now() - inicio) / 1000,
+        capturada: inicio
+    });
+    return blob;
+}
+
+// Nombre de archivo con la extensión del formato en que quedó la foto
+function nombreCaptura(blob, nombre) {
+    const extensiones = { 'image/webp': 'webp', 'image/png': 'png' };
+    return `${nombre}.${extensiones[blob.type] || 'jpg'}`;
+}
+
+// Informa al servidor lo que se subió y cuánto tardó la respuesta (no frena la página)
+function reportarCaptura(blobs, inicioEnvio) {
+    const ahora = performance.now();
+    const datos = blobs.map(blob => datosCaptura.get(blob) || {});
+    const capturadas = datos.map(d => d.capturada).filter(Boolean);
+
+    const cuerpo = JSON.stringify({
+        pagina: CAPTURA.pagina,
+        imagenes: blobs.map((blob, index) => ({
+            original: datos[index].original,
+            subida: blob.size,
+            segundos_compresion: datos[index].segundos
+        })),
+        segundos_envio: (ahora - inicioEnvio) / 1000,
+        segundos_captura: capturadas.length > 0 ? (ahora - Math.min(...capturadas)) / 1000 : null
+    });
+
+    try {
+        const enviado = navigator.sendBeacon
+            && navigator.sendBeacon(CAPTURA.metricasUrl, new Blob([cuerpo], { type: 'application/json' }));
+        if (!enviado) {
+            fetch(CAPTURA.metricasUrl, {
+                method: 'POST',
+                body: cuerpo,
+                headers: { 'Content-Type': 'application/json' },
+                keepalive: true
+            }).catch(() => {});
+        }
+    } catch (error) {
+        console.warn('⚠️ No se pudieron informar las métricas de captura:', error);
+    }
+}
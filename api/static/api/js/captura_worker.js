@@ -0,0 +1,29 @@
+// ✅ WORKER DE CAPTURA (ver api/static/api/js/captura.js)
+// Reduce la imagen a ladoMaximo px en su lado mayor y la codifica con OffscreenCanvas,
+// fuera del hilo de la página.
+
+self.onmessage = async (evento) => {
+    const { id, imagen, ladoMaximo, formato, calidad } = evento.data;
+    try {
+        // Un cuadro del video llega como ImageBitmap; un archivo, como Blob
+        const bitmap = imagen instanceof ImageBitmap ? imagen : await createImageBitmap(imagen);
+        const escala = Math.min(1, ladoMaximo / Math.max(bitmap.width, bitmap.height));
+        const ancho = Math.max(1, Math.round(bitmap.width * escala));
+        const alto = Math.max(1, Math.round(bitmap.height * escala));
+
+        const canvas = new OffscreenCanvas(ancho, alto);
+        const ctx = canvas.getContext('2d');
+        ctx.imageSmoothingQuality = 'high';
+        ctx.drawImage(bitmap, 0, 0, ancho, alto);
+        bitmap.close();
+
+        let blob = await canvas.convertToBlob({ type: formato, quality: calidad });
+        if (blob.type !== formato) {
+            // El navegador no codifica ese formato (p. ej. WebP en Safari) y devolvió PNG
+            blob = await canvas.convertToBlob({ type: 'image/jpeg', quality: calidad });
+        }
+        self.postMessage({ id, blob, ancho, alto });
+    } catch (error) {
+        self.postMessage({ id, error: error.message || String(error) });
+    }
+};
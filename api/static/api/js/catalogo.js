@@ -0,0 +1,106 @@
+// ✅ CATÁLOGO DE PRODUCTOS (carga manual en caja y depósito)
+// Los productos salen del autocompletado del servidor (PAGINA.buscarProductosUrl):
+// busca por el comienzo del nombre, por palabra o por cualquier parte, sin tildes.
+
+let productosCatalogo = [];
+let selectedProduct = null;
+let busquedaCatalogo = null;
+let temporizadorCatalogo = null;
+
+// ✅ ABRIR CATÁLOGO
+function openProductCatalog() {
+    const buscador = document.getElementById('catalogSearch');
+    buscador.value = '';
+    buscarProductos('');
+
+    document.getElementById('catalogModal').classList.add('active');
+    document.getElementById('manualQuantity').value = 1;
+    buscador.focus();
+}
+
+// Espera a que se deje de escribir un momento antes de consultar
+function filtrarCatalogo(texto) {
+    clearTimeout(temporizadorCatalogo);
+    temporizadorCatalogo = setTimeout(() => buscarProductos(texto), 150);
+}
+
+async function buscarProductos(texto) {
+    // Solo la última búsqueda cuenta: las anteriores se cancelan
+    if (busquedaCatalogo) {
+        busquedaCatalogo.abort();
+    }
+    busquedaCatalogo = new AbortController();
+
+    const params = new URLSearchParams({ q: texto.trim() });
+    try {
+        const response = await fetch(`${PAGINA.buscarProductosUrl}?${params}`, {
+            signal: busquedaCatalogo.signal
+        });
+        const data = await response.json();
+        renderCatalogo(data.success ? data.productos : []);
+    } catch (error) {
+        if (error.name !== 'AbortError') {
+            console.error('❌ Error al buscar productos:', error);
+            renderCatalogo([]);
+        }
+    }
+}
+
+function renderCatalogo(productos) {
+    const catalog = document.getElementById('productCatalog');
+    catalog.innerHTML = '';
+    productosCatalogo = productos;
+    selectedProduct = null;
+
+    if (productos.length === 0) {
+        catalog.innerHTML = '<div class="catalog-vacio">No se encontraron productos</div>';
+        return;
+    }
+
+    productos.forEach((producto, index) => {
+        const item = document.createElement('div');
+        item.className = 'catalog-item';
+        item.onclick = () => selectProduct(index);
+
+        const info = document.createElement('div');
+        info.className = 'catalog-item-info';
+        const nombre = document.createElement('div');
+        nombre.className = 'catalog-item-name';
+        nombre.textContent = producto.nombre;
+        info.appendChild(nombre);
+        if (PAGINA.mostrarPrecios && producto.precio_unitario) {
+            const precio = document.createElement('div');
+            precio.className = 'catalog-item-price';
+            precio.textContent = `$${producto.precio_unitario}`;
+            info.appendChild(precio);
+        }
+
+        const radio = document.createElement('input');
+        radio.type = 'radio';
+        radio.name = 'product';
+        radio.className = 'catalog-item-radio';
+
+        item.appendChild(info);
+        item.appendChild(radio);
+        catalog.appendChild(item);
+    });
+
+    // Seleccionar el primero por defecto
+    selectProduct(0);
+}
+
+// ✅ SELECCIONAR PRODUCTO
+function selectProduct(index) {
+    selectedProduct = productosCatalogo[index];
+
+    const items = document.querySelectorAll('.catalog-item');
+    items.forEach((item, i) => {
+        item.classList.toggle('selected', i === index);
+        item.querySelector('input[type="radio"]').checked = i === index;
+    });
+}
+
+// ✅ CERRAR CATÁLOGO
+function closeCatalog() {
+    document.getElementById('catalogModal').classList.remove('active');
+}
@@ -0,0 +1,98 @@
+// Funciones compartidas por las páginas de caja y depósito
+
+function logout() {
+    if (confirm('¿Estás seguro de que quieres cerrar sesión?')) {
+        window.location.href = '/api/login/';
+    }
+}
+
+function getCookie(name) {
+    let cookieValue = null;
+    if (document.cookie && document.cookie !== '') {
+        const cookies = document.cookie.split(';');
+        for (let i = 0; i < cookies.length; i++) {
+            const cookie = cookies[i].trim();
+            if (cookie.substring(0, name.length + 1) === (name + '=')) {
+                cookieValue = decodeURIComponent(cookie.substring(name.length + 1));
+                break;
+            }
+        }
+    }
+    return cookieValue;
+}
+
+// Clave de idempotencia de una confirmación: se repite en cada reintento
+function nuevaClaveIdempotencia() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    const bytes = crypto.getRandomValues(new Uint8Array(16));
+    return Array.from(bytes, b => b.toString(16).padStart(2, '0')).join('');
+}
+
+// La misma operación con los mismos datos reusa su clave aunque se vuelva a
+// intentar después de un error: si el primer intento llegó a procesarse, el
+// servidor devuelve esa respuesta en lugar de repetir la operación.
+const clavesPendientes = {};
+
+function claveIdempotencia(operacion, datos) {
+    const cuerpo = JSON.stringify(datos);
+    const pendiente = clavesPendientes[operacion];
+    if (!pendiente || pendiente.cuerpo !== cuerpo) {
+        clavesPendientes[operacion] = {
+            cuerpo: cuerpo,
+            clave: nuevaClaveIdempotencia()
+        };
+    }
+    return clavesPendientes[operacion].clave;
+}
+
+function olvidarClaveIdempotencia(operacion) {
+    delete clavesPendientes[operacion];
+}
+
+// POST JSON con clave de idempotencia: si la red falla, se agota el tiempo o el
+// servidor pide esperar (409, 502, 503, 504) se reintenta con la MISMA clave,
+// así el servidor nunca confirma dos veces la misma operación.
+async function postIdempotente(url, datos, clave, opciones = {}) {
+    const intentos = opciones.intentos || 4;
+    const timeoutMs = opciones.timeoutMs || 8000;
+    const cuerpo = JSON.stringify(datos);
+
+    for (let intento = 1; ; intento++) {
+        const controlador = new AbortController();
+        const temporizador = setTimeout(() => controlador.abort(), timeoutMs);
+        let response = null;
+        try {
+            response = await fetch(url, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': getCookie('csrftoken'),
+                    'Idempotency-Key': clave
+                },
+                body: cuerpo,
+                signal: controlador.signal
+            });
+        } catch (error) {
+            if (intento >= intentos) {
+                throw error;
+            }
+            console.warn(`⚠️ Intento ${intento} sin respuesta, reintentando...`, error);
+        } finally {
+            clearTimeout(temporizador);
+        }
+
+        if (response) {
+            if (![409, 502, 503, 504].includes(response.status) || intento >= intentos) {
+                return response;
+            }
+            console.warn(`⚠️ Intento ${intento} respondió ${response.status}, reintentando...`);
+        }
+
+        const espera = response && response.headers.get('Retry-After') ?
+            parseInt(response.headers.get('Retry-After')) * 1000 :
+            500 * 2 ** (intento - 1);
+        await new Promise(resolve => setTimeout(resolve, Math.min(espera, 5000)));
+    }
+}
@@ -0,0 +1,392 @@
+// Transferencias de la página que se está mostrando
+let transferenciasData = [];
+let paginaActual = 1;
+let filtrosCargados = false;
+const POR_PAGINA = 20;
+
+// Catálogo de depósitos
+const DEPOSITOS = [{
+        id: 1,
+        nombre: "Deposito 1"
+    },
+    {
+        id: 2,
+        nombre: "Deposito 2"
+    },
+    {
+        id: 3,
+        nombre: "Deposito 3"
+    },
+    {
+        id: 4,
+        nombre: "Deposito 4"
+    }
+];
+
+window.addEventListener('DOMContentLoaded', function () {
+    const card = document.querySelector('.content-card');
+    card.style.opacity = '0';
+    card.style.transform = 'translateY(20px)';
+
+    setTimeout(() => {
+        card.style.transition = 'all 0.6s ease';
+        card.style.opacity = '1';
+        card.style.transform = 'translateY(0)';
+    }, 100);
+
+    // Cargar transferencias al iniciar
+    loadTransferencias();
+});
+
+async function loadTransferencias(pagina = 1) {
+    const loadingState = document.getElementById('loadingState');
+    const contentState = document.getElementById('contentState');
+    const emptyState = document.getElementById('emptyState');
+    const noResultsState = document.getElementById('noResultsState');
+    const summarySection = document.getElementById('summarySection');
+    const tableContainer = document.querySelector('.table-container');
+    const paginacion = document.getElementById('paginacion');
+
+    // Filtros, conteos y paginación los resuelve el servidor
+    const params = new URLSearchParams({
+        pagina: pagina,
+        por_pagina: POR_PAGINA
+    });
+    const filtros = {
+        origen: document.getElementById('filterOrigen').value,
+        destino: document.getElementById('filterDestino').value,
+        estado: document.getElementById('filterEstado').value,
+        desde: document.getElementById('filterDesde').value,
+        hasta: document.getElementById('filterHasta').value
+    };
+    Object.entries(filtros).forEach(([nombre, valor]) => {
+        if (valor) {
+            params.set(nombre, valor);
+        }
+    });
+
+    try {
+        console.log('🔄 Cargando transferencias...', filtros);
+
+        // Sin cambios en el historial el navegador revalida con If-None-Match y recibe 304
+        const response = await fetch(`${PAGINA.listarTransferenciasUrl}?${params}`);
+
+        const data = await response.json();
+
+        console.log('📥 Respuesta del servidor:', data);
+
+        loadingState.style.display = 'none';
+
+        if (!data.success) {
+            throw new Error(data.error || 'Error desconocido');
+        }
+
+        if (data.total_sin_filtros === 0) {
+            contentState.style.display = 'none';
+            emptyState.style.display = 'block';
+            return;
+        }
+
+        transferenciasData = data.transferencias;
+        paginaActual = data.pagina;
+        populateFilters(data.depositos);
+        contentState.style.display = 'block';
+        emptyState.style.display = 'none';
+
+        console.log(`📊 Transferencias filtradas: ${data.total} de ${data.total_sin_filtros}`);
+
+        if (data.total > 0) {
+            // Hay resultados: mostrar tabla, resumen y paginación
+            renderTransferencias(transferenciasData);
+            renderResumen(data);
+            renderPaginacion(data);
+            summarySection.style.display = 'grid';
+            tableContainer.style.display = 'block';
+            paginacion.style.display = data.paginas > 1 ? 'flex' : 'none';
+            noResultsState.style.display = 'none';
+        } else {
+            // No hay resultados: mostrar mensaje de no resultados
+            summarySection.style.display = 'none';
+            tableContainer.style.display = 'none';
+            paginacion.style.display = 'none';
+            noResultsState.style.display = 'block';
+        }
+
+    } catch (error) {
+        console.error('❌ Error al cargar transferencias:', error);
+        loadingState.style.display = 'none';
+        contentState.style.display = 'none';
+        emptyState.style.display = 'block';
+        alert('Error al conectar con el servidor. Por favor intenta de nuevo.');
+    }
+}
+
+function renderTransferencias(transferencias) {
+    const tbody = document.getElementById('transferenciasBody');
+    tbody.innerHTML = '';
+
+    transferencias.forEach(transferencia => {
+        const row = document.createElement('tr');
+
+        // Formatear fecha
+        const fecha = new Date(transferencia.fecha);
+        const fechaFormateada = fecha.toLocaleString('es-AR', {
+            year: 'numeric',
+            month: '2-digit',
+            day: '2-digit',
+            hour: '2-digit',
+            minute: '2-digit'
+        });
+
+        const estadoClass = transferencia.estado === 'pendiente' ? 'estado-pendiente' :
+            'estado-confirmada';
+        const estadoTexto = transferencia.estado === 'pendiente' ? 'Pendiente' : 'Confirmada';
+
+        const confirmBtnDisabled = transferencia.estado === 'confirmada' ? 'disabled' : '';
+
+        row.innerHTML = `
+            <td><strong>#${transferencia.id}</strong></td>
+            <td>${fechaFormateada}</td>
+            <td>
+                <div class="product-name">${transferencia.deposito_origen.nombre}</div>
+                <div class="product-id">ID: ${transferencia.deposito_origen.id}</div>
+            </td>
+            <td>
+                <div class="product-name">${transferencia.deposito_destino.nombre}</div>
+                <div class="product-id">ID: ${transferencia.deposito_destino.id}</div>
+            </td>
+            <td>
+                <span class="estado-badge ${estadoClass}">${estadoTexto}</span>
+            </td>
+            <td>
+                <div class="action-buttons">
+                    <button class="btn-action btn-details" onclick="showDetails(${transferencia.id})">
+                        <svg width="16" height="16" viewBox="0 0 24 24" fill="none">
+                            <path d="M1 12s4-8 11-8 11 8 11 8-4 8-11 8-11-8-11-8z" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"/>
+                            <circle cx="12" cy="12" r="3" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"/>
+                        </svg>
+                        Detalles
+                    </button>
+                    <button class="btn-action btn-confirm" onclick="confirmTransferencia(${transferencia.id})" ${confirmBtnDisabled}>
+                        <svg width="16" height="16" viewBox="0 0 24 24" fill="none">
+                            <path d="M20 6L9 17L4 12" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"/>
+                        </svg>
+                        Confirmar
+                    </button>
+                </div>
+            </td>
+        `;
+
+        tbody.appendChild(row);
+    });
+}
+
+// Conteos de todas las transferencias que pasan los filtros, no solo de la página
+function renderResumen(data) {
+    document.getElementById('totalTransferencias').textContent = data.total;
+    document.getElementById('totalPendientes').textContent = data.conteos.pendiente;
+    document.getElementById('totalConfirmadas').textContent = data.conteos.confirmada;
+}
+
+function renderPaginacion(data) {
+    document.getElementById('paginaInfo').textContent = `Página ${data.pagina} de ${data.paginas}`;
+    document.getElementById('paginaAnterior').disabled = data.pagina <= 1;
+    document.getElementById('paginaSiguiente').disabled = data.pagina >= data.paginas;
+}
+
+function showDetails(transferenciaId) {
+    const transferencia = transferenciasData.find(t => t.id === transferenciaId);
+
+    if (!transferencia) {
+        alert('No se encontró la transferencia');
+        return;
+    }
+
+    const modal = document.getElementById('detailsModal');
+    const modalInfo = document.getElementById('modalInfo');
+    const productsList = document.getElementById('productsList');
+
+    // Formatear fecha
+    const fecha = new Date(transferencia.fecha);
+    const fechaFormateada = fecha.toLocaleString('es-AR', {
+        year: 'numeric',
+        month: 'long',
+        day: 'numeric',
+        hour: '2-digit',
+        minute: '2-digit'
+    });
+
+    const estadoTexto = transferencia.estado === 'pendiente' ? 'Pendiente' : 'Confirmada';
+    const estadoClass = transferencia.estado === 'pendiente' ? 'estado-pendiente' : 'estado-confirmada';
+
+    // Llenar información general
+    modalInfo.innerHTML = `
+        <div class="modal-info-row">
+            <span class="modal-info-label">ID Transferencia:</span>
+            <span class="modal-info-value">#${transferencia.id}</span>
+        </div>
+        <div class="modal-info-row">
+            <span class="modal-info-label">Fecha:</span>
+            <span class="modal-info-value">${fechaFormateada}</span>
+        </div>
+        <div class="modal-info-row">
+            <span class="modal-info-label">Origen:</span>
+            <span class="modal-info-value">${transferencia.deposito_origen.nombre}</span>
+        </div>
+        <div class="modal-info-row">
+            <span class="modal-info-label">Destino:</span>
+            <span class="modal-info-value">${transferencia.deposito_destino.nombre}</span>
+        </div>
+        <div class="modal-info-row">
+            <span class="modal-info-label">Estado:</span>
+            <span class="estado-badge ${estadoClass}">${estadoTexto}</span>
+        </div>
+    `;
+
+    // Llenar lista de productos
+    productsList.innerHTML = '';
+    transferencia.detalles.forEach(detalle => {
+        const productoItem = document.createElement('div');
+        productoItem.className = 'producto-item';
+        productoItem.innerHTML = `
+            <div class="producto-info">
+                <div class="producto-nombre">${detalle.producto_nombre}</div>
+                <div class="producto-id">ID: ${detalle.producto_id} </div>
+            </div>
+            <div class="producto-cantidad">${detalle.cantidad} un.</div>
+        `;
+        productsList.appendChild(productoItem);
+    });
+
+    modal.classList.add('active');
+}
+
+// Los depósitos salen del historial completo: se cargan una sola vez
+function populateFilters(depositos) {
+    if (filtrosCargados) {
+        return;
+    }
+    filtrosCargados = true;
+
+    [
+        ['filterOrigen', depositos.origen],
+        ['filterDestino', depositos.destino]
+    ].forEach(([id, lista]) => {
+        const select = document.getElementById(id);
+        lista.forEach(dep => {
+            const option = document.createElement('option');
+            option.value = dep.id;
+            option.textContent = dep.nombre;
+            select.appendChild(option);
+        });
+    });
+}
+
+function applyFilters() {
+    // Cualquier cambio de filtro vuelve a la primera página
+    loadTransferencias(1);
+}
+
+function clearFilters() {
+    ['filterOrigen', 'filterDestino', 'filterEstado', 'filterDesde', 'filterHasta'].forEach(id => {
+        document.getElementById(id).value = '';
+    });
+
+    loadTransferencias(1);
+
+    console.log('🧹 Filtros limpiados');
+}
+
+function closeDetailsModal() {
+    document.getElementById('detailsModal').classList.remove('active');
+}
+
+async function confirmTransferencia(transferenciaId) {
+    const transferencia = transferenciasData.find(t => t.id === transferenciaId);
+
+    if (!transferencia) {
+        alert('No se encontró la transferencia');
+        return;
+    }
+
+    if (transferencia.estado === 'confirmada') {
+        alert('Esta transferencia ya está confirmada');
+        return;
+    }
+
+    // Mostrar confirmación
+    const totalProductos = transferencia.detalles.length;
+    const mensaje = `¿Está seguro que desea confirmar la transferencia #${transferenciaId}?\n\n` +
+        `Origen: ${transferencia.deposito_origen.nombre}\n` +
+        `Destino: ${transferencia.deposito_destino.nombre}\n` +
+        `Productos: ${totalProductos}\n\n` +
+        `Esta acción no se puede deshacer.`;
+
+    if (!confirm(mensaje)) {
+        console.log('❌ Confirmación cancelada por el usuario');
+        return;
+    }
+
+    // Preparar datos para enviar
+    const confirmData = {
+        transferencia_id: transferenciaId,
+        detalles: transferencia.detalles.map(detalle => ({
+            detalle_id: detalle.detalle_id,
+            producto_id: detalle.producto_id,
+            cantidad: detalle.cantidad
+        }))
+    };
+
+    console.log('🔄 Confirmando transferencia:', confirmData);
+
+    try {
+        const operacion = `confirmar-${transferenciaId}`;
+        const response = await postIdempotente(PAGINA.confirmarTransferenciaUrl, confirmData,
+            claveIdempotencia(operacion, confirmData));
+
+        const data = await response.json();
+
+        console.log('� Respuesta del backend:', data);
+
+        if (data.success) {
+            olvidarClaveIdempotencia(operacion);
+            console.log('✅ Transferencia confirmada exitosamente');
+            console.log('  - Transferencia ID:', data.transferencia_id);
+            console.log('  - Productos aplicados:', data.applied);
+
+            // El servidor descartó el historial cacheado: recargar la página actual
+            await loadTransferencias(paginaActual);
+
+            // Mostrar mensaje de éxito
+            alert(`✅ Transferencia #${transferenciaId} confirmada exitosamente\n\n${data.message}`);
+
+        } else {
+            // Error del backend
+            console.error('❌ Error al confirmar:', data.message || data.error);
+            alert(
+                `❌ Error al confirmar la transferencia\n\n${data.message || data.error || 'Error desconocido'}`
+                );
+        }
+
+    } catch (error) {
+        console.error('❌ Error de conexión:', error);
+        alert(
+            '❌ Error al conectar con el servidor\n\nPor favor verifica tu conexión e intenta nuevamente.'
+            );
+    }
+}
+
+function nuevaTransferencia() {
+    window.location.href = '/api/deposito/';
+}
+
+function goToHome() {
+    window.location.href = '/api/home/';
+}
+
+// Cerrar modal al hacer clic fuera
+document.getElementById('detailsModal').addEventListener('click', function (e) {
+    if (e.target === this) {
+        closeDetailsModal();
+    }
+});
@@ -0,0 +1,875 @@
+//  FUNCIÓN PARA IMPRIMIR RESUMEN EN CONSOLA
+function logResumenDetalle(evento) {
+    const rows = document.querySelectorAll('#productsBody tr');
+    const productos = [];
+    let total = 0;
+
+    rows.forEach((row, index) => {
+        if (row.querySelector('.qty-input')) {
+            const cantidad = parseInt(row.querySelector('.qty-input').value);
+            const nombre = row.cells[2].textContent.trim();
+            const precioUnit = parseFloat(row.cells[3].textContent.replace('$', '').trim());
+            const subtotal = parseFloat(row.querySelector('.total-cell').textContent.replace('$', '')
+                .trim());
+            const productId = row.getAttribute('data-product-id') || 'sin-id';
+
+            productos.push({
+                id: productId,
+                nombre: nombre,
+                cantidad: cantidad,
+                precio_unitario: precioUnit,
+                subtotal: subtotal
+            });
+
+            total += subtotal;
+        }
+    });
+
+    console.log('═'.repeat(80));
+    console.log(`📊 RESUMEN DE CAJA - ${evento}`);
+    console.log('═'.repeat(80));
+    console.log(`🕐 Timestamp: ${new Date().toLocaleString('es-AR')}`);
+    console.log(`📦 Total productos: ${productos.length}`);
+    console.log('─'.repeat(80));
+
+    if (productos.length > 0) {
+        let productosConId = 0;
+        let productosSinId = 0;
+
+        productos.forEach((p, i) => {
+            const tieneId = p.id && p.id !== 'sin-id' && p.id !== '';
+            if (tieneId) {
+                productosConId++;
+            } else {
+                productosSinId++;
+            }
+
+            const idStatus = tieneId ? `✅ ${p.id}` : '❌ SIN ID';
+            console.log(`${i + 1}. ${p.nombre}`);
+            console.log(
+                `   ID: ${idStatus} | Cant: ${p.cantidad} | P.Unit: $${p.precio_unitario.toFixed(2)} | Subtotal: $${p.subtotal.toFixed(2)}`
+            );
+        });
+        console.log('─'.repeat(80));
+        console.log(`💰 TOTAL: $${total.toFixed(2)}`);
+        console.log('─'.repeat(80));
+        console.log(`🔍 Estado de IDs: ${productosConId} con ID ✅ | ${productosSinId} sin ID ❌`);
+    } else {
+        console.log('⚠️  No hay productos en el resumen');
+    }
+
+    console.log('═'.repeat(80));
+
+    return {
+        productos,
+        total
+    };
+}
+
+window.addEventListener('DOMContentLoaded', function () {
+    const cards = document.querySelectorAll('.photo-card, .table-card');
+    cards.forEach((card, index) => {
+        card.style.opacity = '0';
+        card.style.transform = 'translateY(20px)';
+
+        setTimeout(() => {
+            card.style.transition = 'all 0.6s ease';
+            card.style.opacity = '1';
+            card.style.transform = 'translateY(0)';
+        }, index * 150);
+    });
+
+    updateProductCount();
+    calculateGrandTotal();
+
+    // Log inicial al cargar la página
+    logResumenDetalle('CARGA INICIAL');
+});
+
+function updateTotal(input) {
+    const row = input.closest('tr');
+    const quantity = parseInt(input.value) || 0;
+    const priceText = row.cells[3].textContent;
+    const price = parseFloat(priceText.replace('$', ''));
+    const total = quantity * price;
+
+    row.querySelector('.total-cell').textContent = '$' + total.toFixed(2);
+    calculateGrandTotal();
+
+    // Log cuando se modifica cantidad
+    const nombreProducto = row.cells[2].textContent.trim();
+    console.log(`🔄 Cantidad modificada: ${nombreProducto} -> ${quantity} unidades`);
+    logResumenDetalle('MODIFICACIÓN DE CANTIDAD');
+}
+
+function deleteRow(button) {
+    if (confirm('¿Eliminar este producto?')) {
+        const row = button.closest('tr');
+        const nombreProducto = row.cells[2].textContent.trim();
+
+        console.log(`🗑️ Eliminando producto: ${nombreProducto}`);
+
+        row.style.opacity = '0';
+        row.style.transform = 'translateX(-20px)';
+
+        setTimeout(() => {
+            row.remove();
+            updateRowNumbers();
+            calculateGrandTotal();
+            updateProductCount();
+
+            // Si no quedan productos, mostrar mensaje y deshabilitar botón
+            const tbody = document.getElementById('productsBody');
+            if (tbody.querySelectorAll('tr').length === 0) {
+                tbody.innerHTML =
+                    '<tr><td colspan="6" style="text-align: center; padding: 32px; color: #9ca3af;">No se detectaron productos. Toma una foto o agrega productos manualmente.</td></tr>';
+                const confirmBtn = document.querySelector('.confirm-btn');
+                if (confirmBtn) {
+                    confirmBtn.disabled = true;
+                }
+            }
+
+            // Log después de eliminar
+            logResumenDetalle('ELIMINACIÓN DE PRODUCTO');
+        }, 300);
+    }
+}
+
+function updateRowNumbers() {
+    const rows = document.querySelectorAll('#productsBody tr');
+    rows.forEach((row, index) => {
+        if (row.cells.length > 0 && row.querySelector('.qty-input')) {
+            row.cells[0].textContent = index + 1;
+        }
+    });
+}
+
+function calculateGrandTotal() {
+    const rows = document.querySelectorAll('#productsBody tr');
+    let total = 0;
+
+    rows.forEach(row => {
+        const totalCell = row.querySelector('.total-cell');
+        if (totalCell) {
+            const totalText = totalCell.textContent;
+            total += parseFloat(totalText.replace('$', '')) || 0;
+        }
+    });
+
+    document.getElementById('grandTotal').textContent = '$' + total.toFixed(2);
+}
+
+function updateProductCount() {
+    const rows = document.querySelectorAll('#productsBody tr');
+    let count = 0;
+
+    // Contar solo filas válidas (que tengan input de cantidad)
+    rows.forEach(row => {
+        if (row.querySelector('.qty-input')) {
+            count++;
+        }
+    });
+
+    // Pluralización en español
+    const plural = count !== 1 ? 's' : '';
+    document.getElementById('productCount').textContent = count + ' producto' + plural;
+}
+
+// ✅ AGREGAR PRODUCTO MANUAL
+function addManualProduct() {
+    if (!selectedProduct) {
+        alert('Seleccione un producto');
+        return;
+    }
+
+    const quantity = parseInt(document.getElementById('manualQuantity').value);
+    if (!quantity || quantity < 1) {
+        alert('Ingrese una cantidad válida');
+        return;
+    }
+
+    if (!selectedProduct.precio_unitario) {
+        alert('El producto no tiene precio cargado');
+        return;
+    }
+
+    const precio = parseFloat(selectedProduct.precio_unitario);
+    const subtotal = (precio * quantity).toFixed(2);
+
+    // Agregar a la tabla
+    const tbody = document.getElementById('productsBody');
+
+    // Si la tabla está vacía (muestra mensaje), limpiarla
+    if (tbody.querySelector('td[colspan="6"]')) {
+        tbody.innerHTML = '';
+    }
+
+    const newRow = document.createElement('tr');
+    const rowCount = tbody.querySelectorAll('tr').length + 1;
+
+    // ⚠️ Productos manuales también necesitan ID
+    // Por ahora se deja vacío hasta coordinar con backend
+    newRow.setAttribute('data-product-id', selectedProduct.id || '');
+
+    newRow.innerHTML = `
+        <td>${rowCount}</td>
+        <td><input type="number" value="${quantity}" class="qty-input" min="1" onchange="updateTotal(this)"></td>
+        <td>${selectedProduct.nombre}</td>
+        <td>$${selectedProduct.precio_unitario}</td>
+        <td class="total-cell">$${subtotal}</td>
+        <td>
+            <button class="delete-btn" onclick="deleteRow(this)">
+                <svg width="16" height="16" viewBox="0 0 24 24" fill="none">
+                    <path d="M18 6L6 18M6 6L18 18" stroke="currentColor" stroke-width="2" stroke-linecap="round" />
+                </svg>
+            </button>
+        </td>
+    `;
+
+    tbody.appendChild(newRow);
+
+    // Actualizar totales y contador
+    updateProductCount();
+    calculateGrandTotal();
+
+    // Habilitar botón confirmar
+    const confirmBtn = document.querySelector('.confirm-btn');
+    if (confirmBtn) {
+        confirmBtn.disabled = false;
+    }
+
+    // Cerrar modal
+    closeCatalog();
+
+    console.log('✅ Producto manual agregado:', selectedProduct.nombre, 'x', quantity);
+
+    // Log del resumen actualizado
+    logResumenDetalle('PRODUCTO MANUAL AGREGADO');
+}
+
+function addNewPhoto() {
+    // Guardar productos actuales antes de ir a tomar foto
+    const products = [];
+    const rows = document.querySelectorAll('#productsBody tr');
+
+    rows.forEach((row, index) => {
+        const cells = row.cells;
+        if (cells.length >= 5) {
+            const quantity = parseInt(row.querySelector('.qty-input').value);
+            const nombre = cells[2].textContent.trim();
+            const precioText = cells[3].textContent.replace('$', '').trim();
+            const subtotalText = cells[4].textContent.replace('$', '').trim();
+
+            const productId = row.getAttribute('data-product-id') || null;
+
+            products.push({
+                id: productId,
+                cantidad: quantity,
+                nombre: nombre,
+                precio_unitario: precioText,
+                subtotal: subtotalText
+            });
+        }
+    });
+
+    console.log('🔵 Productos actuales a guardar:', products);
+
+    // Enviar al servidor para guardar en sesión
+    fetch(PAGINA.guardarTemporalesUrl, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': getCookie('csrftoken')
+            },
+            body: JSON.stringify({
+                productos: products
+            })
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                console.log('✅ Productos guardados, redirigiendo...');
+                window.location.href = PAGINA.fotoUrl + '?agregar=true';
+            } else {
+                console.error('❌ Error al guardar:', data.error);
+                alert('Error al guardar productos: ' + data.error);
+            }
+        })
+        .catch(error => {
+            console.error('❌ Error:', error);
+            alert('Error al conectar con el servidor');
+        });
+
+}
+
+function confirmOrder() {
+    const total = document.getElementById('grandTotal').textContent.replace('$', '').trim();
+
+    // Obtener datos del cliente (si están completos)
+    const clientDNI = document.getElementById('clientDNI').value.trim();
+    const clientNombre = document.getElementById('clientNombre').value.trim();
+    const clientTelefono = document.getElementById('clientTelefono').value.trim();
+
+    // Recopilar productos actuales
+    const products = [];
+    const rows = document.querySelectorAll('#productsBody tr');
+
+    rows.forEach(row => {
+        const cells = row.cells;
+        if (cells.length >= 5 && row.querySelector('.qty-input')) {
+            const quantity = parseInt(row.querySelector('.qty-input').value);
+            const nombre = cells[2].textContent.trim();
+            const precioText = cells[3].textContent.replace('$', '').trim();
+            const subtotalText = cells[4].textContent.replace('$', '').trim();
+
+            const productId = row.getAttribute('data-product-id') || null;
+
+            products.push({
+                id: productId,
+                cantidad: quantity,
+                nombre: nombre,
+                precio_unitario: precioText,
+                subtotal: subtotalText
+            });
+        }
+    });
+
+    if (products.length === 0) {
+        alert('No hay productos para confirmar');
+        return;
+    }
+
+    // Log antes de confirmar
+    console.log('🔔 Intentando confirmar orden...');
+    console.log('👤 Datos del cliente:', {
+        dni: clientDNI,
+        nombre: clientNombre,
+        telefono: clientTelefono
+    });
+    logResumenDetalle('PRE-CONFIRMACIÓN');
+
+    if (!confirm('¿Confirmar orden con total de $' + total + '?')) {
+        console.log('❌ Confirmación cancelada por el usuario');
+        return;
+    }
+
+    // Deshabilitar botón para evitar doble click
+    const confirmBtn = document.querySelector('.confirm-btn');
+    confirmBtn.disabled = true;
+    confirmBtn.style.opacity = '0.6';
+    confirmBtn.innerHTML = '⏳ Procesando...';
+
+    // 1️⃣ CONFIRMAR LA COMPRA (Django la manda al backend con el DNI del cajero)
+    const ordenData = {
+        productos: products,
+        cliente_dni: clientDNI || null,
+    };
+
+    console.log('📤 Enviando orden:', ordenData);
+
+    // Los reintentos llevan la misma clave: la compra se cobra una sola vez
+    postIdempotente(PAGINA.confirmarOrdenUrl, ordenData, claveIdempotencia('orden', ordenData))
+        .then(response => response.json())
+        .then(data => {
+            console.log('✅ Respuesta del servidor:', data);
+            if (!data.success) {
+                throw new Error(data.error || 'Error al confirmar la orden');
+            }
+            olvidarClaveIdempotencia('orden');
+
+            // 2️⃣ GENERAR MENSAJE DE WHATSAPP SI HAY TELÉFONO
+            if (clientTelefono) {
+                const message = generateWhatsAppMessage(products, total);
+                // Limpiar el número de teléfono (quitar espacios, guiones, etc)
+                const cleanPhone = clientTelefono.replace(/[\s\-\(\)]/g, '');
+                const whatsappUrl = `https://wa.me/${cleanPhone}?text=${encodeURIComponent(message)}`;
+
+                console.log('📱 Abriendo WhatsApp para:', cleanPhone);
+                window.open(whatsappUrl, '_blank');
+            }
+
+            // Limpiar sesión después de confirmar
+            console.log('🧹 Limpiando sesión...');
+            fetch(PAGINA.limpiarSesionUrl, {
+                    method: 'POST',
+                    headers: {
+                        'X-CSRFToken': getCookie('csrftoken')
+                    }
+                })
+                .then(response => response.json())
+                .then(data => {
+                    console.log('✅ Sesión limpiada:', data);
+
+                    // Redirigir a página de confirmación después de limpiar
+                    setTimeout(() => {
+                        window.location.href = PAGINA.compraConfirmadaUrl;
+                    }, 1000);
+                })
+                .catch(error => {
+                    console.error('❌ Error al limpiar sesión:', error);
+
+                    // Redirigir de todas formas
+                    setTimeout(() => {
+                        window.location.href = PAGINA.compraConfirmadaUrl;
+                    }, 1000);
+                });
+        })
+        .catch(error => {
+            console.error('❌ Error al confirmar compra:', error);
+            alert('Error al confirmar la compra. Por favor, intenta nuevamente.');
+
+            // Rehabilitar botón
+            confirmBtn.disabled = false;
+            confirmBtn.style.opacity = '1';
+            confirmBtn.innerHTML = `
+            <svg width="20" height="20" viewBox="0 0 24 24" fill="none">
+                <path d="M20 6L9 17L4 12" stroke="white" stroke-width="2" stroke-linecap="round" stroke-linejoin="round" />
+            </svg>
+            Confirmar
+        `;
+        });
+}
+
+function generateWhatsAppMessage(products, total) {
+    const now = new Date();
+    const fecha = now.toLocaleDateString('es-AR', {
+        day: '2-digit',
+        month: '2-digit',
+        year: 'numeric'
+    });
+
+    let message = `Hola! 👋\n\n`;
+    message += `🧾 Tu ticket de compra\n`;
+    message += `📅 Fecha: ${fecha}\n\n`;
+    message += `🛒 Detalle de productos:\n`;
+
+    products.forEach(product => {
+        const precio = parseFloat(product.precio_unitario);
+        const subtotal = parseFloat(product.subtotal);
+
+        message += `• ${product.nombre}\n`;
+        message +=
+            `   Cant: ${product.cantidad}  |  $${precio.toFixed(2)} c/u  |  Subtotal: $${subtotal.toFixed(2)}\n\n`;
+    });
+
+    message += `💵 Total a pagar: $${total}\n\n`;
+    message += `¡Gracias por tu compra! 🙌`;
+
+    return message;
+}
+
+// 🔍 BUSCAR CLIENTE POR DNI
+async function buscarCliente() {
+    const dniInput = document.getElementById('clientDNI');
+    const dni = dniInput.value.trim();
+
+    if (!dni) {
+        mostrarMensajeCliente('Por favor ingrese un DNI', 'error');
+        return;
+    }
+
+    console.log('🔍 Buscando cliente con DNI:', dni);
+
+    // Mostrar mensaje de búsqueda
+    mostrarMensajeCliente('Buscando cliente...', 'info');
+
+    try {
+        const response = await fetch(PAGINA.validarClienteUrl, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': getCookie('csrftoken')
+            },
+            body: JSON.stringify({
+                dni: dni
+            })
+        });
+
+        const data = await response.json();
+        console.log('✅ Respuesta del backend:', data);
+
+        // Mostrar campos adicionales
+        document.getElementById('clientAdditionalFields').style.display = 'block';
+
+        if (data.success && data.cliente) {
+            // Cliente encontrado - llenar campos
+            console.log('✅ Cliente encontrado:', data.cliente);
+
+            document.getElementById('clientNombre').value = data.cliente.nombre || '';
+            document.getElementById('clientTelefono').value = data.cliente.telefono || '';
+
+            mostrarMensajeCliente('✅ ' + data.message, 'success');
+
+            // Hacer los campos de solo lectura si el cliente existe
+            document.getElementById('clientNombre').readOnly = true;
+            document.getElementById('clientTelefono').readOnly = true;
+            document.getElementById('clientNombre').style.backgroundColor = '#f9fafb';
+            document.getElementById('clientTelefono').style.backgroundColor = '#f9fafb';
+
+            // Ocultar botón de registro
+            document.getElementById('registerClientContainer').style.display = 'none';
+        } else {
+            // Cliente no encontrado - limpiar campos para nuevo registro
+            console.log('⚠️ Cliente no encontrado');
+
+            document.getElementById('clientNombre').value = '';
+            document.getElementById('clientTelefono').value = '';
+
+            mostrarMensajeCliente('⚠️ ' + data.message + '. Complete los datos para registrar.', 'warning');
+
+            // Hacer los campos editables
+            document.getElementById('clientNombre').readOnly = false;
+            document.getElementById('clientTelefono').readOnly = false;
+            document.getElementById('clientNombre').style.backgroundColor = 'white';
+            document.getElementById('clientTelefono').style.backgroundColor = 'white';
+
+            // Enfocar en el campo nombre
+            document.getElementById('clientNombre').focus();
+
+            // Verificar si se debe mostrar botón de registro
+            verificarCamposCliente();
+        }
+
+    } catch (error) {
+        console.error('❌ Error al buscar cliente:', error);
+        mostrarMensajeCliente('❌ Error al conectar con el servidor', 'error');
+
+        // Mostrar campos para permitir ingreso manual
+        document.getElementById('clientAdditionalFields').style.display = 'block';
+        document.getElementById('clientNombre').value = '';
+        document.getElementById('clientTelefono').value = '';
+        document.getElementById('clientNombre').readOnly = false;
+        document.getElementById('clientTelefono').readOnly = false;
+    }
+}
+
+function mostrarMensajeCliente(mensaje, tipo) {
+    const messageDiv = document.getElementById('clientSearchMessage');
+    messageDiv.textContent = mensaje;
+    messageDiv.style.display = 'block';
+
+    // Estilos según el tipo
+    if (tipo === 'success') {
+        messageDiv.style.backgroundColor = '#d1fae5';
+        messageDiv.style.color = '#065f46';
+        messageDiv.style.border = '2px solid #10b981';
+    } else if (tipo === 'error') {
+        messageDiv.style.backgroundColor = '#fee2e2';
+        messageDiv.style.color = '#991b1b';
+        messageDiv.style.border = '2px solid #ef4444';
+    } else if (tipo === 'warning') {
+        messageDiv.style.backgroundColor = '#fef3c7';
+        messageDiv.style.color = '#92400e';
+        messageDiv.style.border = '2px solid #f59e0b';
+    } else if (tipo === 'info') {
+        messageDiv.style.backgroundColor = '#dbeafe';
+        messageDiv.style.color = '#1e40af';
+        messageDiv.style.border = '2px solid #3b82f6';
+    }
+
+    // Ocultar mensaje después de 5 segundos si no es error
+    if (tipo !== 'error' && tipo !== 'warning') {
+        setTimeout(() => {
+            messageDiv.style.display = 'none';
+        }, 5000);
+    }
+}
+
+// 🔢 VALIDAR DNI - Solo números
+function validarDNI(input) {
+    // Permitir solo números
+    input.value = input.value.replace(/[^0-9]/g, '');
+}
+
+// 📱 VALIDAR TELÉFONO - Solo números y símbolo +
+function validarTelefono(input) {
+    // Permitir solo números y el símbolo + al inicio
+    let value = input.value;
+
+    // Remover todo excepto números y +
+    value = value.replace(/[^0-9+]/g, '');
+
+    // Asegurar que + solo esté al inicio
+    if (value.includes('+')) {
+        const parts = value.split('+');
+        value = '+' + parts.join('').replace(/\+/g, '');
+    }
+
+    input.value = value;
+}
+
+// ✏️ VALIDAR NOMBRE - Solo letras y espacios
+function validarNombre(input) {
+    // Permitir solo letras, espacios y acentos
+    input.value = input.value.replace(/[^a-zA-ZáéíóúÁÉÍÓÚñÑ\s]/g, '');
+}
+
+// ✅ VERIFICAR SI TODOS LOS CAMPOS ESTÁN COMPLETOS
+function verificarCamposCliente() {
+    const dni = document.getElementById('clientDNI').value.trim();
+    const nombre = document.getElementById('clientNombre').value.trim();
+    const telefono = document.getElementById('clientTelefono').value.trim();
+    const nombreReadOnly = document.getElementById('clientNombre').readOnly;
+
+    const registerContainer = document.getElementById('registerClientContainer');
+    const registerBtn = document.getElementById('registerClientBtn');
+
+    // Solo mostrar el botón si el cliente NO existe (campos editables)
+    if (!nombreReadOnly && dni && nombre && telefono) {
+        // Validar longitudes mínimas
+        if (dni.length >= 7 && nombre.length >= 3 && telefono.length >= 8) {
+            registerContainer.style.display = 'block';
+            registerBtn.disabled = false;
+            registerBtn.style.opacity = '1';
+            registerBtn.style.cursor = 'pointer';
+            console.log('✅ Campos completos - Botón habilitado');
+        } else {
+            registerBtn.disabled = true;
+            registerBtn.style.opacity = '0.5';
+            registerBtn.style.cursor = 'not-allowed';
+        }
+    } else {
+        registerContainer.style.display = 'none';
+        console.log('⚠️ Campos incompletos o cliente ya existe');
+    }
+}
+
+// 📝 REGISTRAR CLIENTE
+async function registrarCliente() {
+    const dni = document.getElementById('clientDNI').value.trim();
+    const nombre = document.getElementById('clientNombre').value.trim();
+    const telefono = document.getElementById('clientTelefono').value.trim();
+
+    if (!dni || !nombre || !telefono) {
+        mostrarMensajeCliente('❌ Complete todos los campos', 'error');
+        return;
+    }
+
+    console.log('📝 Registrando cliente:', {
+        dni,
+        nombre,
+        telefono
+    });
+
+    // Deshabilitar botón durante el registro
+    const registerBtn = document.getElementById('registerClientBtn');
+    registerBtn.disabled = true;
+    registerBtn.style.opacity = '0.6';
+    registerBtn.innerHTML = '⏳ Registrando...';
+
+    mostrarMensajeCliente('Registrando cliente...', 'info');
+
+    try {
+        const response = await fetch(PAGINA.registrarClienteUrl, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': getCookie('csrftoken')
+            },
+            body: JSON.stringify({
+                dni: dni,
+                telefono: telefono,
+                nombre: nombre
+            })
+        });
+
+        const data = await response.json();
+        console.log('✅ Respuesta del backend:', data);
+
+        if (data.success || response.ok) {
+            // Registro exitoso
+            mostrarMensajeCliente('✅ Cliente registrado exitosamente', 'success');
+
+            // Hacer los campos de solo lectura
+            document.getElementById('clientNombre').readOnly = true;
+            document.getElementById('clientTelefono').readOnly = true;
+            document.getElementById('clientNombre').style.backgroundColor = '#f9fafb';
+            document.getElementById('clientTelefono').style.backgroundColor = '#f9fafb';
+
+            // Ocultar botón de registro
+            document.getElementById('registerClientContainer').style.display = 'none';
+
+            console.log('✅ Cliente registrado:', {
+                dni,
+                nombre,
+                telefono
+            });
+        } else {
+            // Error en el registro
+            mostrarMensajeCliente('❌ ' + (data.message || 'Error al registrar cliente'), 'error');
+
+            // Rehabilitar botón
+            registerBtn.disabled = false;
+            registerBtn.style.opacity = '1';
+            registerBtn.innerHTML = '✅ Registrar Cliente';
+        }
+
+    } catch (error) {
+        console.error('❌ Error al registrar cliente:', error);
+        mostrarMensajeCliente('❌ Error al conectar con el servidor', 'error');
+
+        // Rehabilitar botón
+        registerBtn.disabled = false;
+        registerBtn.style.opacity = '1';
+        registerBtn.innerHTML = '✅ Registrar Cliente';
+    }
+}
+
+function goBack() {
+    window.location.href = '/api/caja/foto/';
+}
+
+// ✅ DETECCIÓN EN CURSO
+// Tiempo máximo que se consulta un trabajo de detección antes de darlo por perdido
+const TIEMPO_MAXIMO_TRABAJO_MS = 180000;
+const ETAPAS_DETECCION = {
+    recibida: 'recibida',
+    preprocesada: 'preparada',
+    enviada: 'enviada al detector',
+    detectada: 'detectada',
+    error: 'con error'
+};
+
+// Reemplaza las filas de la tabla por el carrito que manda el servidor
+function renderProductos(productos) {
+    const tbody = document.getElementById('productsBody');
+    tbody.innerHTML = '';
+
+    if (!productos || productos.length === 0) {
+        tbody.innerHTML =
+            '<tr><td colspan="6" style="text-align: center; padding: 32px; color: #9ca3af;">No se detectaron productos. Toma una foto o agrega productos manualmente.</td></tr>';
+    }
+
+    (productos || []).forEach((producto, index) => {
+        const row = document.createElement('tr');
+        row.setAttribute('data-product-id', producto.id || '');
+        row.innerHTML = `
+            <td>${index + 1}</td>
+            <td><input type="number" value="${producto.cantidad}" class="qty-input" min="1" onchange="updateTotal(this)"></td>
+            <td></td>
+            <td>$${producto.precio_unitario}</td>
+            <td class="total-cell">$${producto.subtotal}</td>
+            <td>
+                <button class="delete-btn" onclick="deleteRow(this)">
+                    <svg width="16" height="16" viewBox="0 0 24 24" fill="none">
+                        <path d="M18 6L6 18M6 6L18 18" stroke="currentColor" stroke-width="2" stroke-linecap="round" />
+                    </svg>
+                </button>
+            </td>
+        `;
+        // El nombre viene del detector: como texto, no como HTML
+        row.cells[2].textContent = producto.nombre;
+        tbody.appendChild(row);
+    });
+
+    updateProductCount();
+    calculateGrandTotal();
+    const confirmBtn = document.querySelector('.confirm-btn');
+    if (confirmBtn) {
+        confirmBtn.disabled = !productos || productos.length === 0;
+    }
+}
+
+function mostrarProgreso(texto) {
+    const progreso = document.getElementById('progresoDeteccion');
+    progreso.textContent = texto;
+    progreso.style.display = texto ? 'block' : 'none';
+}
+
+// Sigue el trabajo por Server-Sent Events; sin stream (servidor WSGI) consulta el estado
+function seguirTrabajo(trabajo) {
+    const etapas = {};
+    const total = () => Object.keys(etapas).length;
+    const listas = () => Object.values(etapas).filter(e => e === 'detectada' || e === 'error').length;
+
+    const actualizar = (evento, datos) => {
+        etapas[datos.indice] = evento;
+        mostrarProgreso(`🔎 Detectando productos: ${listas()} de ${total()} imágenes listas ` +
+            `(imagen ${datos.indice + 1} ${ETAPAS_DETECCION[evento]})`);
+    };
+
+    if (!trabajo.eventos_url || !window.EventSource) {
+        mostrarProgreso('🔎 Detectando productos...');
+        terminarTrabajo(trabajo.estado_url);
+        return;
+    }
+
+    const eventos = new EventSource(trabajo.eventos_url);
+    ['recibida', 'preprocesada', 'enviada'].forEach(nombre => {
+        eventos.addEventListener(nombre, e => actualizar(nombre, JSON.parse(e.data)));
+    });
+    eventos.addEventListener('detectada', e => {
+        const datos = JSON.parse(e.data);
+        actualizar('detectada', datos);
+        console.log(`📦 Imagen ${datos.indice + 1}: ${datos.productos.length} productos`);
+        if (datos.carrito) {
+            renderProductos(datos.carrito.productos);
+        }
+    });
+    eventos.addEventListener('error', e => {
+        // Sin datos es un error de la conexión: EventSource reconecta solo
+        if (e.data) {
+            const datos = JSON.parse(e.data);
+            actualizar('error', datos);
+            console.warn(`⚠️ Imagen ${datos.indice + 1}: ${datos.error}`);
+        } else if (eventos.readyState === EventSource.CLOSED) {
+            terminarTrabajo(trabajo.estado_url);
+        }
+    });
+    eventos.addEventListener('fin', () => {
+        eventos.close();
+        terminarTrabajo(trabajo.estado_url);
+    });
+}
+
+// El estado final también guarda el carrito en la sesión (sesiones en cookie)
+async function terminarTrabajo(estadoUrl) {
+    const limite = Date.now() + TIEMPO_MAXIMO_TRABAJO_MS;
+    let data = { success: false, error: 'La detección está tardando demasiado' };
+    while (Date.now() < limite) {
+        try {
+            const response = await fetch(`${estadoUrl}?esperar=20`);
+            data = await response.json();
+            if (response.status === 404 || data.estado === 'listo' || data.estado === 'error') {
+                break;
+            }
+        } catch (error) {
+            console.warn('⚠️ Sin conexión consultando el trabajo, reintentando...', error);
+            await new Promise(resolve => setTimeout(resolve, 2000));
+        }
+    }
+
+    mostrarProgreso('');
+    history.replaceState(null, '', window.location.pathname);
+    if (data.success && data.productos) {
+        renderProductos(data.productos);
+        logResumenDetalle('DETECCIÓN TERMINADA');
+    } else if (!data.success) {
+        alert('Error: ' + (data.error || 'No se pudo procesar la imagen'));
+    }
+    if (data.errores && data.errores.length > 0) {
+        alert('Algunas fotos no se pudieron procesar:\n' +
+            data.errores.map(e => `${e.imagen}: ${e.error}`).join('\n'));
+    }
+}
+
+window.addEventListener('DOMContentLoaded', function () {
+    const trabajo = JSON.parse(document.getElementById('trabajoDeteccion').textContent);
+    if (trabajo && trabajo.estado !== 'listo' && trabajo.estado !== 'error') {
+        seguirTrabajo(trabajo);
+    } else if (trabajo) {
+        terminarTrabajo(trabajo.estado_url);
+    }
+});
+
+// Cerrar modal al hacer clic fuera (ejecutar después de DOMContentLoaded)
+window.addEventListener('DOMContentLoaded', function () {
+    const modal = document.getElementById('catalogModal');
+    if (modal) {
+        modal.addEventListener('click', function (e) {
+            if (e.target === this) {
+                closeCatalog();
+            }
+        });
+    }
+});
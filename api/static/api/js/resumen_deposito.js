@@ -0,0 +1,351 @@
+window.addEventListener('DOMContentLoaded', function () {
+    const cards = document.querySelectorAll('.photo-card, .table-card');
+    cards.forEach((card, index) => {
+        card.style.opacity = '0';
+        card.style.transform = 'translateY(20px)';
+
+        setTimeout(() => {
+            card.style.transition = 'all 0.6s ease';
+            card.style.opacity = '1';
+            card.style.transform = 'translateY(0)';
+        }, index * 150);
+    });
+
+    updateProductCount();
+    actualizarTotales();
+
+    // Cerrar modal al hacer clic fuera
+    document.getElementById('catalogModal').addEventListener('click', function (e) {
+        if (e.target === this) {
+            closeCatalog();
+        }
+    });
+});
+
+function actualizarTotales() {
+    const inputs = document.querySelectorAll('.qty-input');
+    let totalCantidad = 0;
+    let totalProductos = 0;
+
+    inputs.forEach(input => {
+        const cantidad = parseInt(input.value) || 0;
+        if (cantidad > 0) {
+            totalCantidad += cantidad;
+            totalProductos++;
+        }
+    });
+
+    document.getElementById('totalCantidad').textContent = totalCantidad;
+    document.getElementById('totalProductos').textContent = totalProductos;
+}
+
+function updateProductCount() {
+    const rows = document.querySelectorAll('#productsBody tr');
+    let count = 0;
+
+    rows.forEach(row => {
+        const input = row.querySelector('.qty-input');
+        if (input) {
+            count++;
+        }
+    });
+
+    const plural = count !== 1 ? 's' : '';
+    document.getElementById('productCount').textContent = count + ' producto' + plural;
+}
+
+function updateRowNumbers() {
+    const rows = document.querySelectorAll('#productsBody tr');
+    rows.forEach((row, index) => {
+        const firstCell = row.cells[0];
+        if (firstCell) {
+            firstCell.textContent = index + 1;
+        }
+    });
+}
+
+// ✅ AGREGAR PRODUCTO MANUAL
+function addManualProduct() {
+    if (!selectedProduct) {
+        alert('Por favor selecciona un producto');
+        return;
+    }
+
+    const quantity = parseInt(document.getElementById('manualQuantity').value);
+    if (!quantity || quantity < 1) {
+        alert('Por favor ingresa una cantidad válida');
+        return;
+    }
+
+    const tbody = document.getElementById('productsBody');
+
+    // Si la tabla está vacía, limpiarla
+    if (tbody.querySelector('td[colspan="4"]')) {
+        tbody.innerHTML = '';
+    }
+
+    const newRow = document.createElement('tr');
+    const rowCount = tbody.querySelectorAll('tr').length + 1;
+
+    newRow.setAttribute('data-id', selectedProduct.id || '');
+    newRow.innerHTML = `
+        <td>${rowCount}</td>
+        <td>
+            <input type="number" 
+                   value="${quantity}" 
+                   class="qty-input" 
+                   min="0"
+                   data-producto-id="${selectedProduct.id}"
+                   data-nombre="${selectedProduct.nombre}"
+                   onchange="actualizarTotales()">
+        </td>
+        <td>${selectedProduct.nombre}</td>
+        <td>
+            <button class="delete-btn" onclick="deleteRow(this)" title="Eliminar producto">
+                <svg width="18" height="18" viewBox="0 0 24 24" fill="none">
+                    <path d="M3 6H5H21" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"/>
+                    <path d="M8 6V4C8 3.46957 8.21071 2.96086 8.58579 2.58579C8.96086 2.21071 9.46957 2 10 2H14C14.5304 2 15.0391 2.21071 15.4142 2.58579C15.7893 2.96086 16 3.46957 16 4V6M19 6V20C19 20.5304 18.7893 21.0391 18.4142 21.4142C18.0391 21.7893 17.5304 22 17 22H7C6.46957 22 5.96086 21.7893 5.58579 21.4142C5.21071 21.0391 5 20.5304 5 20V6H19Z" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"/>
+                </svg>
+            </button>
+        </td>
+    `;
+
+    tbody.appendChild(newRow);
+
+    updateProductCount();
+    actualizarTotales();
+    closeCatalog();
+
+    console.log('✅ Producto manual agregado:', selectedProduct.nombre, 'x', quantity);
+}
+
+// ✅ ELIMINAR PRODUCTO
+function deleteRow(button) {
+    if (confirm('¿Eliminar este producto?')) {
+        const row = button.closest('tr');
+        const nombreProducto = row.cells[2].textContent.trim();
+
+        row.remove();
+
+        const tbody = document.getElementById('productsBody');
+        if (tbody.querySelectorAll('tr').length === 0) {
+            tbody.innerHTML = `
+                <tr>
+                    <td colspan="4" style="text-align: center; color: #9ca3af; padding: 32px;">
+                        No se detectaron productos
+                    </td>
+                </tr>
+            `;
+        }
+
+        updateRowNumbers();
+        updateProductCount();
+        actualizarTotales();
+
+        console.log('🗑️ Producto eliminado:', nombreProducto);
+    }
+}
+
+async function addNewPhoto() {
+    // Guardar productos actuales antes de ir a tomar foto (ACUMULAR)
+    const inputs = document.querySelectorAll('.qty-input');
+    const productosActuales = [];
+
+    inputs.forEach(input => {
+        const cantidad = parseInt(input.value) || 0;
+        const nombre = input.dataset.nombre;
+        const productoId = input.dataset.productoId;
+
+        if (cantidad > 0 && productoId) {
+            productosActuales.push({
+                id: parseInt(productoId),
+                nombre: nombre,
+                cantidad: cantidad
+            });
+        }
+    });
+
+    console.log('📦 Guardando productos actuales antes de agregar más:', productosActuales);
+
+    try {
+        // Guardar en sesión del servidor
+        const response = await fetch('/api/deposito/guardar-temporales/', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': getCookie('csrftoken')
+            },
+            body: JSON.stringify({
+                productos: productosActuales
+            })
+        });
+
+        const data = await response.json();
+
+        if (data.success) {
+            console.log('✅ Productos guardados en sesión');
+            // Redirigir a capturar nueva foto (se acumularán los productos)
+            window.location.href = '/api/deposito/foto/';
+        } else {
+            console.error('❌ Error al guardar productos');
+            alert('Error al guardar los productos actuales');
+        }
+    } catch (error) {
+        console.error('Error:', error);
+        alert('Error de conexión al guardar productos');
+    }
+}
+
+async function confirmTransfer() {
+    debugger;
+    const inputs = document.querySelectorAll('.qty-input');
+    const productos = [];
+
+    inputs.forEach(input => {
+        const cantidad = parseInt(input.value) || 0;
+        const productoId = input.dataset.productoId;
+
+        console.log(`📝 Procesando input:`, {
+            productoId,
+            cantidad,
+            nombre: input.dataset.nombre
+        });
+
+        if (cantidad > 0 && productoId) {
+            productos.push({
+                producto_id: parseInt(productoId),
+                cantidad: cantidad
+            });
+        }
+    });
+
+    console.log('📦 Array productos final:', productos);
+
+    if (productos.length === 0) {
+        alert('Debes tener al menos un producto con cantidad mayor a 0');
+        return;
+    }
+
+    // Obtener IDs de depósitos desde el template (Django)
+    const depositoOrigenId = parseInt(PAGINA.depositoOrigen.id);
+    const depositoDestinoId = parseInt(PAGINA.depositoDestino.id);
+
+    const depositoOrigenNombre = PAGINA.depositoOrigen.nombre;
+    const depositoDestinoNombre = PAGINA.depositoDestino.nombre;
+
+    if (!confirm(
+            `¿Confirmar la transferencia de ${productos.length} producto(s) desde ${depositoOrigenNombre} hacia ${depositoDestinoNombre}?`
+        )) {
+        return;
+    }
+
+    const loadingOverlay = document.getElementById('loadingOverlay');
+    const btnConfirm = document.getElementById('btnConfirm');
+
+    loadingOverlay.classList.add('active');
+    btnConfirm.disabled = true;
+
+    try {
+        // ✅ Preparar datos en el formato correcto que espera el backend
+        const transferData = {
+            depositoOrigen: depositoOrigenId,
+            depositoDestino: depositoDestinoId,
+            productos: productos
+        };
+
+        console.log('🚀 === DATOS ENVIADOS AL BACKEND ===');
+        console.log(JSON.stringify(transferData, null, 2));
+        console.log('====================================');
+
+        // Enviar al backend (a través de Django, que invalida el historial cacheado);
+        // los reintentos llevan la misma clave y la transferencia se crea una sola vez
+        const response = await postIdempotente(PAGINA.crearTransferenciaUrl, transferData,
+            claveIdempotencia('transferencia', transferData));
+
+        const data = await response.json();
+
+        console.log('📥 Respuesta del backend:', data);
+
+        loadingOverlay.classList.remove('active');
+
+        if (data.success) {
+            olvidarClaveIdempotencia('transferencia');
+            console.log('✅ Transferencia creada exitosamente:');
+            console.log('  - ID Transferencia:', data.transferencia_id);
+            console.log('  - Detalles:', data.detalles);
+
+            // Limpiar sesión después de confirmar
+            await fetch('/api/deposito/limpiar-sesion/', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': getCookie('csrftoken')
+                }
+            });
+
+            window.location.href = '/api/deposito/confirmada/';
+        } else {
+            alert('Error al confirmar la transferencia: ' + (data.message || data.error ||
+                'Error desconocido'));
+            btnConfirm.disabled = false;
+        }
+    } catch (error) {
+        loadingOverlay.classList.remove('active');
+        btnConfirm.disabled = false;
+        console.error('❌ Error:', error);
+        alert('Error al conectar con el servidor. Por favor intenta de nuevo.');
+    }
+}
+
+async function goBack() {
+    if (confirm('¿Deseas volver? Los productos actuales se perderán.')) {
+        try {
+            // Limpiar la sesión antes de volver
+            const response = await fetch('/api/deposito/limpiar-sesion/', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': getCookie('csrftoken')
+                }
+            });
+
+            const data = await response.json();
+
+            if (data.success) {
+                console.log('✅ Sesión limpiada al volver');
+            }
+        } catch (error) {
+            console.error('Error al limpiar sesión:', error);
+        }
+
+        // Redirigir de todas formas
+        window.location.href = '/api/deposito/foto/';
+    }
+}
+
+async function limpiarTodo() {
+    if (confirm('¿Estás seguro de que quieres eliminar todos los productos?')) {
+        try {
+            const response = await fetch('/api/deposito/limpiar-sesion/', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': getCookie('csrftoken')
+                }
+            });
+
+            const data = await response.json();
+
+            if (data.success) {
+                console.log('✅ Sesión limpiada completamente');
+                // Recargar la página para ver los cambios
+                window.location.reload();
+            } else {
+                alert('Error al limpiar la sesión');
+            }
+        } catch (error) {
+            console.error('Error:', error);
+            alert('Error de conexión al limpiar');
+        }
+    }
+}
@@ -0,0 +1,564 @@
+"""
+Trabajos de detección en segundo plano (modo ``?modo=trabajo``).
+
+En lugar de mantener la conexión abierta mientras corre el detector, la
+vista de procesar imagen guarda la foto en memoria, encola un ``Trabajo`` y
+responde enseguida con su id. Un pool acotado de threads del proceso corre
+la detección y suma los productos al carrito de la sesión; el navegador
+consulta ``/api/trabajos/<id>/`` (con ``?esperar=N`` espera hasta N
+segundos a que termine, long-polling).
+
+Los trabajos terminados se guardan ``ttl`` segundos y después se descartan;
+``max_pendientes`` limita los que pueden esperar en cola. Configuración en
+``TRABAJOS_DETECCION``.
+
+Un trabajo puede traer varias imágenes (``procesar-imagenes/?modo=trabajo``):
+cada una corre por separado y se suma al carrito apenas vuelve. El progreso
+queda como una lista de eventos (``recibida``, ``preprocesada``, ``enviada``,
+``detectada``, ``error`` y ``fin``) que la vista async
+``/api/trabajos/<id>/eventos/`` transmite como Server-Sent Events; el stream
+se atiende desde el event loop (modo ASGI), sin ocupar un thread por cada
+conexión abierta.
+
+Las imágenes de los trabajos en cola esperan en archivos temporales (no en
+memoria) que se borran cuando termina su detección.
+
+Los trabajos viven en el proceso que los recibió: con varios workers el
+balanceador debe mandar las consultas de un cliente al mismo proceso.
+"""
+import asyncio
+import json
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.backends.base import UpdateError
+from django.db import close_old_connections
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+
+from api import carrito, deteccion, logs, metricas, resiliencia, uploads
+
+logger = logs.get_logger(__name__)
+
+DEFAULT_CONFIG = {
+    'workers': 4,           # detecciones en paralelo
+    'max_pendientes': 100,  # trabajos en cola o en curso; más allá se rechaza
+    'ttl': 300,             # segundos que se guarda un trabajo terminado
+    'max_espera': 25,       # tope de ?esperar= en la consulta
+    'latido': 15,           # segundos entre comentarios keep-alive del stream de eventos
+}
+
+PENDIENTE = 'pendiente'
+PROCESANDO = 'procesando'
+LISTO = 'listo'
+ERROR = 'error'
+
+# Motores de sesión sin almacenamiento en el servidor: el carrito se
+# actualiza cuando el navegador consulta el trabajo
+_SESIONES_EN_COOKIE = ('django.contrib.sessions.backends.signed_cookies',)
+
+_trabajos = {}
+_lock = threading.Lock()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Un lock por sesión: dos trabajos de la misma sesión no pisan el carrito
+_locks_sesion = weakref.WeakValueDictionary()
+
+
+def get_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, 'TRABAJOS_DETECCION', {})}
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=get_config()['workers'],
+                    thread_name_prefix='trabajo_deteccion',
+                )
+    return _pool
+
+
+class ColaLlena(resiliencia.BackendNoDisponible):
+    status = 503
+
+
+class SesionVencida(Exception):
+    """La sesión del trabajo se borró (venció o se cerró) mientras corría la detección"""
+    status = 410
+
+
+class Trabajo:
+    def __init__(self, tipo, dueno, session_key, imagenes=1):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.dueno = dueno
+        self.session_key = session_key
+        self.estado = PENDIENTE
+        self.creado = time.time()
+        self.terminado = None
+        self.resultado = None
+        self.error = None
+        self.status = None
+        self.listo = threading.Event()
+        # Productos aún no sumados al carrito (sesiones en cookie)
+        self.productos_pendientes = None
+        self.imagenes = imagenes
+        self.errores = []
+        # (id, evento, datos); el id de cada evento es su posición + 1
+        self.eventos = []
+        self._faltan = imagenes
+        self._productos_nuevos = 0
+        self._fallas = []
+        self._lock = threading.Lock()
+
+    def emitir(self, evento, **datos):
+        with self._lock:
+            self.eventos.append((len(self.eventos) + 1, evento, datos))
+
+    def a_dict(self):
+        datos = {
+            'success': self.estado != ERROR,
+            'trabajo_id': self.id,
+            'estado': self.estado,
+            'tipo': self.tipo,
+            'estado_url': reverse('estado_trabajo', args=[self.id]),
+        }
+        if getattr(settings, 'ASYNC_VIEWS', False):
+            datos['eventos_url'] = reverse('eventos_trabajo', args=[self.id])
+        if self.estado == LISTO:
+            datos.update(self.resultado)
+            if self.imagenes > 1:
+                datos['errores'] = self.errores
+        elif self.estado == ERROR:
+            datos['error'] = self.error
+            if self.imagenes > 1:
+                datos['errores'] = self.errores
+        return datos
+
+
+# ==================== Registro ====================
+
+def _descartar_vencidos(ahora):
+    ttl = get_config()['ttl']
+    vencidos = [
+        trabajo_id for trabajo_id, trabajo in _trabajos.items()
+        if trabajo.terminado is not None and ahora - trabajo.terminado > ttl
+    ]
+    for trabajo_id in vencidos:
+        del _trabajos[trabajo_id]
+
+
+def obtener(trabajo_id, dueno):
+    """El trabajo con ese id si lo encoló la misma sesión, o ``None``"""
+    with _lock:
+        _descartar_vencidos(time.time())
+        trabajo = _trabajos.get(trabajo_id)
+    if trabajo is None or dueno is None or trabajo.dueno != dueno:
+        return None
+    return trabajo
+
+
+def estadisticas():
+    with _lock:
+        estados = {PENDIENTE: 0, PROCESANDO: 0, LISTO: 0, ERROR: 0}
+        for trabajo in _trabajos.values():
+            estados[trabajo.estado] += 1
+    return estados
+
+
+# ==================== Sesión ====================
+
+# Identifica a la sesión dueña de los trabajos (la clave de sesión cambia
+# con cada escritura cuando la sesión vive en una cookie firmada)
+CLAVE_DUENO = 'trabajos_dueno'
+
+
+def _sesion_en_cookie():
+    return settings.SESSION_ENGINE in _SESIONES_EN_COOKIE
+
+
+def preparar_sesion(session):
+    """
+    Guarda la sesión antes de encolar y devuelve ``(dueno, session_key)``.
+    El worker escribe el carrito directo en el store, así que el middleware
+    no debe volver a guardar esta sesión encima al terminar la petición: queda
+    sin modificar y la cookie de una sesión nueva la pone
+    :func:`respuesta_encolado` (con ``SESSION_SAVE_EVERY_REQUEST`` el
+    middleware la guardaría igual y pisaría el carrito).
+    """
+    dueno = session.get(CLAVE_DUENO)
+    if dueno is None:
+        dueno = session[CLAVE_DUENO] = uuid.uuid4().hex
+    if _sesion_en_cookie():
+        return dueno, None
+    if session.modified or session.session_key is None:
+        session.save()
+        session.modified = False
+    return dueno, session.session_key
+
+
+async def apreparar_sesion(session):
+    """Versión async de :func:`preparar_sesion`"""
+    dueno = await session.aget(CLAVE_DUENO)
+    if dueno is None:
+        dueno = uuid.uuid4().hex
+        await session.aset(CLAVE_DUENO, dueno)
+    if _sesion_en_cookie():
+        return dueno, None
+    if session.modified or session.session_key is None:
+        await session.asave()
+        session.modified = False
+    return dueno, session.session_key
+
+
+# ==================== Encolar y correr ====================
+
+def encolar(tipo, sesion, imagen_file, detector=None):
+    """
+    Copia la imagen a un archivo temporal propio (el del upload se borra al
+    terminar la petición) y la encola. ``sesion`` es lo que devuelve
+    :func:`preparar_sesion`. ``detector`` reemplaza a ``deteccion.detectar``
+    (p. ej. ``mosaico.detectar``). Lanza ``ColaLlena`` si no hay lugar.
+    """
+    return encolar_lote(tipo, sesion, [imagen_file], detector)
+
+
+def encolar_lote(tipo, sesion, imagenes_files, detector=None):
+    """
+    Como :func:`encolar`, con varias imágenes en un solo trabajo. Cada una
+    se detecta por separado y sus productos se suman al carrito apenas
+    vuelve, así el stream de eventos muestra resultados parciales.
+    """
+    config = get_config()
+    imagenes = [_copiar(imagen_file) for imagen_file in imagenes_files]
+
+    trabajo = Trabajo(tipo, *sesion, imagenes=len(imagenes))
+    with _lock:
+        _descartar_vencidos(time.time())
+        en_curso = sum(1 for t in _trabajos.values() if t.terminado is None)
+        if en_curso >= config['max_pendientes']:
+            for imagen in imagenes:
+                imagen.close()
+            raise ColaLlena('Hay demasiadas imágenes en proceso, intente de nuevo en unos segundos',
+                            reintentar_en=5)
+        _trabajos[trabajo.id] = trabajo
+
+    pool = _get_pool()
+    for indice, imagen in enumerate(imagenes):
+        trabajo.emitir('recibida', indice=indice, imagen=imagen.name, bytes=imagen.size)
+        pool.submit(_correr, trabajo, indice, imagen, detector or deteccion.detectar)
+    logger.info('🧾 Trabajo encolado', trabajo=trabajo.id, tipo=tipo, imagenes=len(imagenes),
+                bytes=sum(imagen.size for imagen in imagenes))
+    return trabajo
+
+
+def _copiar(imagen_file):
+    """Copia por chunks a un archivo temporal que se borra al cerrarlo"""
+    disco = tempfile.NamedTemporaryFile(suffix='.upload', dir=settings.FILE_UPLOAD_TEMP_DIR)
+    tamano = 0
+    try:
+        for chunk in imagen_file.chunks():
+            tamano += disco.write(chunk)
+        disco.flush()
+        disco.seek(0)
+    except Exception:
+        disco.close()
+        raise
+    return uploads.ImagenEnDisco(disco, imagen_file.name, imagen_file.content_type, tamano)
+
+
+def _correr(trabajo, indice, imagen, detector):
+    trabajo.estado = PROCESANDO
+    token = metricas.set_vista(f'trabajo_{trabajo.tipo}')
+    inicio = time.perf_counter()
+
+    def progreso(evento, **datos):
+        trabajo.emitir(evento, indice=indice, imagen=imagen.name, **datos)
+
+    try:
+        resultado = detector(imagen, progreso=progreso)
+        if resultado.status_code != 200:
+            _fallar_imagen(trabajo, indice, imagen.name,
+                           'Error, no se han identificado productos en la imagen', 500)
+            return
+        productos_nuevos = resultado.datos.get('productos', [])
+        if trabajo.session_key is None:
+            with _lock_sesion(trabajo.dueno):
+                if trabajo.productos_pendientes is None:
+                    trabajo.productos_pendientes = []
+                trabajo.productos_pendientes.extend(productos_nuevos)
+                trabajo._productos_nuevos += len(productos_nuevos)
+                trabajo.resultado = {'productos_nuevos': trabajo._productos_nuevos}
+            parcial = None
+        else:
+            trabajo.resultado = parcial = _sumar_al_carrito(trabajo, productos_nuevos)
+        progreso('detectada', productos=productos_nuevos, desde_cache=resultado.desde_cache,
+                 carrito=parcial and {'productos': parcial['productos'], 'total': parcial['total']})
+    except (resiliencia.BackendNoDisponible, SesionVencida) as e:
+        _fallar_imagen(trabajo, indice, imagen.name, str(e), e.status)
+    except Exception as e:
+        logger.exception('❌ Error en trabajo de detección', trabajo=trabajo.id, imagen=indice)
+        _fallar_imagen(trabajo, indice, imagen.name, f'Error conectando con el servidor: {str(e)}', 500)
+    finally:
+        metricas.reset_vista(token)
+        # El thread del pool no pasa por el ciclo de request de Django
+        close_old_connections()
+        imagen.close()
+        logger.info('🧾 Imagen procesada', trabajo=trabajo.id, imagen=indice,
+                    segundos=round(time.perf_counter() - inicio, 3))
+        _terminar_imagen(trabajo)
+
+
+def _fallar_imagen(trabajo, indice, nombre, mensaje, status):
+    with trabajo._lock:
+        trabajo.errores.append({'imagen': nombre, 'error': mensaje})
+        trabajo._fallas.append((mensaje, status))
+    trabajo.emitir('error', indice=indice, imagen=nombre, error=mensaje, status=status)
+
+
+def _terminar_imagen(trabajo):
+    """Cierra el trabajo cuando termina su última imagen"""
+    with trabajo._lock:
+        trabajo._faltan -= 1
+        if trabajo._faltan > 0:
+            return
+    if len(trabajo._fallas) == trabajo.imagenes:
+        # Fallaron todas: el error que habría dado la vista (503/504 antes que 500)
+        mensaje, status = max(trabajo._fallas, key=lambda falla: falla[1] in (503, 504))
+        if trabajo.imagenes > 1 and status == 500:
+            mensaje = 'Error, no se han identificado productos en las imágenes'
+        _fallar(trabajo, mensaje, status)
+    else:
+        if trabajo.resultado is None:
+            trabajo.resultado = {'productos_nuevos': 0}
+        trabajo.estado = LISTO
+    trabajo.terminado = time.time()
+    trabajo.emitir('fin', estado=trabajo.estado, errores=trabajo.errores)
+    trabajo.listo.set()
+    logger.info('🧾 Trabajo terminado', trabajo=trabajo.id, estado=trabajo.estado,
+                imagenes=trabajo.imagenes, errores=len(trabajo.errores))
+
+
+def _fallar(trabajo, mensaje, status):
+    trabajo.estado = ERROR
+    trabajo.error = mensaje
+    trabajo.status = status
+
+
+def _lock_sesion(session_key):
+    with _lock:
+        lock = _locks_sesion.get(session_key)
+        if lock is None:
+            lock = _locks_sesion[session_key] = threading.Lock()
+    return lock
+
+
+def _resultado_carrito(carrito_actual, nuevos):
+    return {
+        'productos': carrito_actual.productos(),
+        'total': str(carrito_actual.total),
+        'total_cantidad': carrito_actual.total_cantidad,
+        'productos_nuevos': nuevos,
+    }
+
+
+_SESION_VENCIDA = 'La sesión venció antes de terminar la detección, vuelva a cargar la página'
+
+
+def _sumar_al_carrito(trabajo, productos_nuevos):
+    """Suma los productos al carrito guardado en la sesión (fuera de la petición)"""
+    store = import_module(settings.SESSION_ENGINE).SessionStore
+    with _lock_sesion(trabajo.dueno):
+        session = store(session_key=trabajo.session_key)
+        carrito_actual = carrito.cargar(session, trabajo.tipo)
+        # Si la sesión ya no está, el store la da por nueva (sin clave) y la
+        # guardaría aparte: el carrito no llegaría al navegador
+        if session.session_key != trabajo.session_key:
+            raise SesionVencida(_SESION_VENCIDA)
+        carrito_actual.agregar_varios(productos_nuevos)
+        carrito.guardar(session, trabajo.tipo, carrito_actual)
+        try:
+            session.save(must_create=False)
+        except UpdateError:
+            raise SesionVencida(_SESION_VENCIDA)
+        trabajo._productos_nuevos += len(productos_nuevos)
+        return _resultado_carrito(carrito_actual, trabajo._productos_nuevos)
+
+
+def completar_en_sesion(trabajo, session):
+    """
+    Con sesiones en cookie, suma al carrito de la petición los productos del
+    trabajo (una sola vez) y completa el resultado. La sesión ya está en la
+    cookie, así que también sirve desde las vistas async.
+    """
+    with _lock_sesion(trabajo.dueno):
+        productos = trabajo.productos_pendientes
+        if productos is None:
+            return
+        carrito_actual = carrito.cargar(session, trabajo.tipo)
+        carrito_actual.agregar_varios(productos)
+        carrito.guardar(session, trabajo.tipo, carrito_actual)
+        trabajo.productos_pendientes = None
+        trabajo.resultado = _resultado_carrito(carrito_actual, len(productos))
+
+
+def _carrito_base(trabajo, session):
+    """
+    Con sesiones en cookie el worker no puede escribir el carrito: el stream
+    lo arma sumando a lo que trae la cookie los productos de cada evento.
+    ``None`` si el carrito de los eventos ya viene armado (o ya se completó).
+    """
+    if trabajo.session_key is not None:
+        return None
+    with _lock_sesion(trabajo.dueno):
+        if trabajo.listo.is_set() and trabajo.productos_pendientes is None:
+            return None
+    return carrito.cargar(session, trabajo.tipo)
+
+
+def limitar_espera(valor):
+    """Segundos de ``?esperar=`` acotados a ``max_espera``"""
+    try:
+        segundos = float(valor or 0)
+    except ValueError:
+        return 0
+    return max(0, min(segundos, get_config()['max_espera']))
+
+
+async def aesperar(trabajo, segundos):
+    """Espera a que termine el trabajo sin ocupar un thread (vistas async)"""
+    limite = time.monotonic() + segundos
+    while not trabajo.listo.is_set() and time.monotonic() < limite:
+        await asyncio.sleep(0.1)
+
+
+# ==================== Eventos (SSE) ====================
+
+def leer_ultimo_evento(request):
+    """Id del último evento recibido (``Last-Event-ID`` al reconectar)"""
+    valor = request.headers.get('Last-Event-ID') or request.GET.get('desde')
+    try:
+        return max(0, int(valor or 0))
+    except ValueError:
+        return 0
+
+
+def _formatear_evento(evento_id, evento, datos):
+    return f'id: {evento_id}\nevent: {evento}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n'
+
+
+async def aflujo_eventos(trabajo, base, ultimo=0):
+    """
+    Generador async con los eventos del trabajo en formato SSE, desde el
+    siguiente a ``ultimo``. Termina después de ``fin``. ``base`` es el
+    carrito de :func:`_carrito_base`.
+    """
+    latido = get_config()['latido']
+    metricas.flujos_eventos_abiertos.inc()
+    try:
+        yield 'retry: 2000\n\n'
+        enviados = 0
+        ultimo_envio = time.monotonic()
+        while True:
+            for evento_id, evento, datos in trabajo.eventos[enviados:]:
+                enviados = evento_id
+                if evento == 'detectada' and base is not None:
+                    # Se acumula también lo ya enviado para que el carrito siga completo
+                    base.agregar_varios(datos['productos'])
+                    datos = {**datos, 'carrito': {'productos': base.productos(), 'total': str(base.total)}}
+                elif evento == 'fin':
+                    datos = {**datos, **trabajo.a_dict()}
+                if evento_id > ultimo:
+                    yield _formatear_evento(evento_id, evento, datos)
+                    ultimo_envio = time.monotonic()
+                if evento == 'fin':
+                    return
+            if time.monotonic() - ultimo_envio >= latido:
+                yield ': latido\n\n'
+                ultimo_envio = time.monotonic()
+            await asyncio.sleep(0.1)
+    finally:
+        metricas.flujos_eventos_abiertos.dec()
+
+
+# ==================== Respuestas ====================
+
+def _poner_cookie(response, session):
+    """La cookie de sesión, como la pondría ``SessionMiddleware`` al guardarla"""
+    if session.get_expire_at_browser_close():
+        max_age = expires = None
+    else:
+        max_age = session.get_expiry_age()
+        expires = http_date(time.time() + max_age)
+    response.set_cookie(
+        settings.SESSION_COOKIE_NAME,
+        session.session_key,
+        max_age=max_age,
+        expires=expires,
+        domain=settings.SESSION_COOKIE_DOMAIN,
+        path=settings.SESSION_COOKIE_PATH,
+        secure=settings.SESSION_COOKIE_SECURE or None,
+        httponly=settings.SESSION_COOKIE_HTTPONLY or None,
+        samesite=settings.SESSION_COOKIE_SAMESITE,
+    )
+    patch_vary_headers(response, ('Cookie',))
+
+
+def respuesta_encolado(trabajo, session):
+    """
+    202 con el trabajo. :func:`preparar_sesion` dejó la sesión guardada y sin
+    modificar, así que la cookie se pone acá (una sesión nueva no la tiene)
+    """
+    response = JsonResponse(trabajo.a_dict(), status=202)
+    if trabajo.session_key is not None:
+        _poner_cookie(response, session)
+    return response
+
+
+def respuesta(trabajo, session):
+    """Estado del trabajo; si terminó mal, con el código que habría dado la vista"""
+    if trabajo.listo.is_set() and trabajo.productos_pendientes is not None:
+        completar_en_sesion(trabajo, session)
+    status = trabajo.status if trabajo.estado == ERROR else 200
+    return JsonResponse(trabajo.a_dict(), status=status)
+
+
+def respuesta_eventos(trabajo, session, ultimo=0):
+    """``text/event-stream`` con el progreso del trabajo (solo vistas async)"""
+    response = StreamingHttpResponse(
+        aflujo_eventos(trabajo, _carrito_base(trabajo, session), ultimo),
+        content_type='text/event-stream; charset=utf-8',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Que nginx no acumule los eventos antes de mandarlos
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def respuesta_sin_eventos(trabajo):
+    """Sin ASGI no hay stream: el navegador consulta el estado del trabajo"""
+    return JsonResponse({
+        'success': False,
+        'error': 'El progreso en vivo requiere el servidor ASGI; consulte estado_url',
+        'estado_url': reverse('estado_trabajo', args=[trabajo.id]),
+    }, status=501)
+
+
+def respuesta_inexistente():
+    return JsonResponse({
+        'success': False,
+        'error': 'El trabajo no existe o ya venció'
+    }, status=404)
@@ -0,0 +1,325 @@
+"""
+Historial de transferencias de depósito: paginado, filtrado y con cache.
+
+El listado completo del backend (``listarTransferencia``) se guarda en el
+cache de Django (alias ``HISTORIAL_TRANSFERENCIAS['alias']``) durante ``ttl``
+segundos. Filtrar por estado, origen, destino y fecha, contar pendientes y
+confirmadas y cortar la página se hace sobre esa copia, así el navegador solo
+recibe las filas que muestra.
+
+Cada listado lleva una ``version`` (digest de su contenido). El ETag de una
+respuesta sale de esa versión y de los parámetros de la consulta, así que se
+calcula sin filtrar nada: si el navegador manda ``If-None-Match`` con el
+mismo valor se responde 304 sin cuerpo.
+
+Crear o confirmar una transferencia desde esta app pasa por
+:func:`reenviar`, que llama a :func:`invalidar`: la generación del cache
+avanza y la próxima consulta vuelve a pedir el listado al backend.
+"""
+import hashlib
+import json
+import math
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponseNotModified, JsonResponse
+from django.utils.http import parse_etags
+
+from api import backend_client, coalescencia, metricas
+
+DEFAULT_CONFIG = {
+    'ttl': 60,              # segundos que se reutiliza el listado del backend
+    'por_pagina': 20,
+    'max_por_pagina': 100,
+    'alias': 'default',     # alias de CACHES
+}
+
+ESTADOS = ('pendiente', 'confirmada')
+
+CLAVE_GENERACION = 'transferencias:generacion'
+
+
+def get_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, 'HISTORIAL_TRANSFERENCIAS', {})}
+
+
+def _cache():
+    return caches[get_config()['alias']]
+
+
+def _clave_listado(generacion):
+    return f'transferencias:listado:{generacion}'
+
+
+# ==================== Listado ====================
+
+def _armar_listado(transferencias):
+    """Listado con su versión y los depósitos que aparecen (para los filtros)"""
+    contenido = json.dumps(transferencias, sort_keys=True, ensure_ascii=False, default=str)
+    origenes = {}
+    destinos = {}
+    for transferencia in transferencias:
+        origen = transferencia.get('deposito_origen') or {}
+        destino = transferencia.get('deposito_destino') or {}
+        origenes.setdefault(origen.get('id'), origen)
+        destinos.setdefault(destino.get('id'), destino)
+    return {
+        'version': hashlib.sha256(contenido.encode()).hexdigest()[:20],
+        'transferencias': transferencias,
+        'depositos': {
+            'origen': list(origenes.values()),
+            'destino': list(destinos.values()),
+        },
+    }
+
+
+def _listado_de_respuesta(response):
+    """El listado armado, o ``None`` si el backend no lo devolvió"""
+    if response.status_code != 200:
+        return None
+    datos = response.json()
+    if not datos.get('success'):
+        return None
+    return _armar_listado(datos.get('transferencias') or [])
+
+
+def _nueva_generacion():
+    # Basada en el reloj: si la clave se pierde del cache no se reutiliza
+    # la de un listado viejo que todavía no venció
+    return int(time.time() * 1000)
+
+
+def _generacion(cache):
+    generacion = cache.get(CLAVE_GENERACION)
+    if generacion is None:
+        cache.add(CLAVE_GENERACION, _nueva_generacion(), None)
+        generacion = cache.get(CLAVE_GENERACION)
+    return generacion
+
+
+async def _ageneracion(cache):
+    generacion = await cache.aget(CLAVE_GENERACION)
+    if generacion is None:
+        await cache.aadd(CLAVE_GENERACION, _nueva_generacion(), None)
+        generacion = await cache.aget(CLAVE_GENERACION)
+    return generacion
+
+
+def obtener_listado():
+    """
+    Listado desde el cache o, si no está, desde el backend (una sola
+    llamada aunque lleguen varias consultas a la vez). ``None`` si el
+    backend respondió con error.
+    """
+    cache = _cache()
+    clave = _clave_listado(_generacion(cache))
+    with metricas.etapa('cache'):
+        listado = cache.get(clave)
+    if listado is not None:
+        metricas.historial_transferencias_total.inc(resultado='cache')
+        return listado
+
+    def pedir():
+        with metricas.etapa('backend'):
+            listado = _listado_de_respuesta(backend_client.get('listar_transferencias'))
+        if listado is not None:
+            cache.set(clave, listado, get_config()['ttl'])
+        return listado
+
+    listado, _ = coalescencia.compartir(clave, pedir, endpoint='listar_transferencias')
+    metricas.historial_transferencias_total.inc(resultado='backend')
+    return listado
+
+
+async def aobtener_listado():
+    """Versión async de :func:`obtener_listado`"""
+    cache = _cache()
+    clave = _clave_listado(await _ageneracion(cache))
+    with metricas.etapa('cache'):
+        listado = await cache.aget(clave)
+    if listado is not None:
+        metricas.historial_transferencias_total.inc(resultado='cache')
+        return listado
+
+    async def pedir():
+        with metricas.etapa('backend'):
+            listado = _listado_de_respuesta(await backend_client.aget('listar_transferencias'))
+        if listado is not None:
+            await cache.aset(clave, listado, get_config()['ttl'])
+        return listado
+
+    listado, _ = await coalescencia.acompartir(clave, pedir, endpoint='listar_transferencias')
+    metricas.historial_transferencias_total.inc(resultado='backend')
+    return listado
+
+
+def invalidar():
+    """Descarta el listado cacheado (en todos los procesos que comparten el cache)"""
+    cache = _cache()
+    try:
+        cache.incr(CLAVE_GENERACION)
+    except ValueError:
+        cache.set(CLAVE_GENERACION, _nueva_generacion(), None)
+
+
+async def ainvalidar():
+    """Versión async de :func:`invalidar`"""
+    cache = _cache()
+    try:
+        await cache.aincr(CLAVE_GENERACION)
+    except ValueError:
+        await cache.aset(CLAVE_GENERACION, _nueva_generacion(), None)
+
+
+# ==================== Consulta ====================
+
+def _entero(valor, nombre):
+    if valor in (None, ''):
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        raise ValueError(f'El parámetro {nombre} debe ser un número')
+
+
+def _fecha(valor, nombre):
+    if not valor:
+        return None
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise ValueError(f'El parámetro {nombre} debe ser una fecha AAAA-MM-DD')
+
+
+def leer_consulta(params):
+    """
+    ``(filtros, pagina, por_pagina)`` a partir de ``request.GET``.
+    Lanza ``ValueError`` con un mensaje para el usuario si algo no es válido.
+    """
+    config = get_config()
+    estado = (params.get('estado') or '').lower() or None
+    if estado is not None and estado not in ESTADOS:
+        raise ValueError(f'Estado inválido: {estado}')
+
+    filtros = {
+        'estado': estado,
+        'origen': _entero(params.get('origen'), 'origen'),
+        'destino': _entero(params.get('destino'), 'destino'),
+        'desde': _fecha(params.get('desde'), 'desde'),
+        'hasta': _fecha(params.get('hasta'), 'hasta'),
+    }
+    pagina = max(1, _entero(params.get('pagina'), 'pagina') or 1)
+    por_pagina = _entero(params.get('por_pagina'), 'por_pagina') or config['por_pagina']
+    por_pagina = max(1, min(por_pagina, config['max_por_pagina']))
+    return filtros, pagina, por_pagina
+
+
+def _id_deposito(deposito):
+    try:
+        return int((deposito or {}).get('id'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _estado(transferencia):
+    return str(transferencia.get('estado') or '').lower()
+
+
+def _coincide(transferencia, filtros):
+    if filtros['estado'] and _estado(transferencia) != filtros['estado']:
+        return False
+    if filtros['origen'] is not None and _id_deposito(transferencia.get('deposito_origen')) != filtros['origen']:
+        return False
+    if filtros['destino'] is not None and _id_deposito(transferencia.get('deposito_destino')) != filtros['destino']:
+        return False
+    if filtros['desde'] or filtros['hasta']:
+        # Fechas ISO: los primeros 10 caracteres son el día y se comparan como texto
+        dia = str(transferencia.get('fecha') or '')[:10]
+        if filtros['desde'] and dia < filtros['desde'].isoformat():
+            return False
+        if filtros['hasta'] and dia > filtros['hasta'].isoformat():
+            return False
+    return True
+
+
+def pagina(listado, filtros, numero, por_pagina):
+    """Página ``numero`` de las transferencias que pasan los filtros, con los conteos"""
+    filtradas = [t for t in listado['transferencias'] if _coincide(t, filtros)]
+    conteos = dict.fromkeys(ESTADOS, 0)
+    for transferencia in filtradas:
+        estado = _estado(transferencia)
+        if estado in conteos:
+            conteos[estado] += 1
+
+    paginas = max(1, math.ceil(len(filtradas) / por_pagina))
+    numero = min(numero, paginas)
+    inicio = (numero - 1) * por_pagina
+    return {
+        'success': True,
+        'transferencias': filtradas[inicio:inicio + por_pagina],
+        'pagina': numero,
+        'por_pagina': por_pagina,
+        'paginas': paginas,
+        'total': len(filtradas),
+        'total_sin_filtros': len(listado['transferencias']),
+        'conteos': conteos,
+        'depositos': listado['depositos'],
+    }
+
+
+def etag(listado, filtros, numero, por_pagina):
+    partes = [listado['version'], str(numero), str(por_pagina)]
+    partes.extend(f'{nombre}={valor}' for nombre, valor in sorted(filtros.items()) if valor is not None)
+    return '"%s"' % hashlib.sha256('|'.join(partes).encode()).hexdigest()[:32]
+
+
+# ==================== Respuestas ====================
+
+def respuesta(request, listado, filtros, numero, por_pagina):
+    """JsonResponse de la página con ``ETag``; 304 si el navegador ya la tiene"""
+    valor = etag(listado, filtros, numero, por_pagina)
+    if valor in parse_etags(request.headers.get('If-None-Match', '')):
+        metricas.historial_transferencias_total.inc(resultado='no_modificado')
+        response = HttpResponseNotModified()
+    else:
+        with metricas.etapa('respuesta'):
+            response = JsonResponse(pagina(listado, filtros, numero, por_pagina))
+    response['ETag'] = valor
+    # El navegador puede guardarla pero debe revalidar siempre
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def respuesta_sin_listado():
+    return JsonResponse({
+        'success': False,
+        'error': 'Error al obtener las transferencias del servidor'
+    }, status=500)
+
+
+def _respuesta_reenviada(response):
+    datos = response.json()
+    return JsonResponse(datos, status=response.status_code), response.status_code == 200 and datos.get('success')
+
+
+def reenviar(endpoint, datos, clave_idempotencia=None):
+    """
+    Manda ``datos`` al endpoint de transferencias del backend y devuelve su
+    respuesta tal cual. Si la operación salió bien invalida el listado.
+    """
+    response, ok = _respuesta_reenviada(
+        backend_client.post(endpoint, json=datos, clave_idempotencia=clave_idempotencia))
+    if ok:
+        invalidar()
+    return response
+
+
+async def areenviar(endpoint, datos, clave_idempotencia=None):
+    """Versión async de :func:`reenviar`"""
+    response, ok = _respuesta_reenviada(
+        await backend_client.apost(endpoint, json=datos, clave_idempotencia=clave_idempotencia))
+    if ok:
+        await ainvalidar()
+    return response
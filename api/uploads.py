@@ -0,0 +1,247 @@
+"""
+Recepción y reenvío de imágenes por streaming.
+
+``ImagenUploadHandler`` reemplaza a los upload handlers de Django en las
+vistas de detección: rechaza la petición antes de leer el cuerpo (con WSGI)
+si el Content-Length ya supera el máximo, reconoce el tipo de imagen por los
+magic bytes del primer chunk y corta la subida en cuanto el archivo deja de
+ser válido. Lo aceptado queda en memoria hasta ``FILE_UPLOAD_MAX_MEMORY_SIZE``
+y a partir de ahí en un archivo temporal con nombre (``ImagenEnDisco``), que
+el preprocesamiento abre por su ruta en lugar de copiar el contenido.
+
+``MultipartImagen`` arma el cuerpo multipart/form-data hacia el backend
+leyendo el archivo por chunks, sin materializarlo nunca como ``bytes``.
+"""
+import asyncio
+import io
+import tempfile
+import uuid
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+
+from api import metricas
+
+CHUNK_SIZE = 64 * 2**10
+
+# Margen para las cabeceras multipart y campos de texto que acompañan a la imagen
+MARGEN_MULTIPART = 16 * 2**10
+
+ERROR_TAMANO = 'La imagen supera el tamaño máximo permitido ({mb:g} MB)'
+ERROR_FORMATO = 'El archivo no es una imagen válida (se aceptan JPEG, PNG y WEBP)'
+
+
+def detectar_tipo_imagen(cabecera):
+    """
+    Devuelve el content-type de la imagen según sus magic bytes,
+    o ``None`` si no es un formato aceptado
+    """
+    if cabecera.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if cabecera.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if cabecera[:4] == b'RIFF' and cabecera[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def get_max_bytes():
+    return getattr(settings, 'UPLOAD_IMAGEN_MAX_BYTES', 15 * 2**20)
+
+
+class ImagenEnDisco(UploadedFile):
+    """Imagen subida guardada en un archivo temporal con nombre (se borra al cerrarla)"""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+class ImagenUploadHandler(FileUploadHandler):
+    """
+    Upload handler que valida tamaño y formato mientras se recibe la imagen.
+    Si la subida se rechaza, ``error`` y ``status`` indican el motivo y el
+    archivo no aparece en ``request.FILES``.
+
+    Rechazar por Content-Length sin leer el cuerpo solo vale con WSGI: con
+    ASGI Django recibe el cuerpo entero (en un archivo temporal) antes de
+    llamar a la vista, así que el handler evita parsearlo y guardarlo, pero no
+    recibirlo. Ese límite lo tiene que poner el servidor ASGI o el proxy.
+    """
+    chunk_size = CHUNK_SIZE
+
+    # Bytes necesarios para reconocer cualquiera de los formatos aceptados
+    LARGO_CABECERA = 12
+
+    def __init__(self, request=None, max_bytes=None, max_archivos=1):
+        super().__init__(request)
+        self.max_bytes = max_bytes or get_max_bytes()
+        self.max_archivos = max_archivos
+        self.error = None
+        self.status = None
+        self._archivo = None
+        self._cabecera = b''
+
+    def _rechazar(self, mensaje, status):
+        self.error = mensaje
+        self.status = status
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+        raise StopUpload(connection_reset=True)
+
+    def _mensaje_tamano(self):
+        return ERROR_TAMANO.format(mb=round(self.max_bytes / 2**20, 1))
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # Si el Content-Length ya excede el máximo no se lee nada del cuerpo
+        if content_length > self.max_bytes * self.max_archivos + MARGEN_MULTIPART:
+            self.error = self._mensaje_tamano()
+            self.status = 413
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self._cabecera = b''
+        self._archivo = io.BytesIO()
+
+    def _pasar_a_disco(self):
+        disco = tempfile.NamedTemporaryFile(suffix='.upload', dir=settings.FILE_UPLOAD_TEMP_DIR)
+        disco.write(self._archivo.getbuffer())
+        self._archivo = disco
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_bytes:
+            self._rechazar(self._mensaje_tamano(), 413)
+
+        if len(self._cabecera) < self.LARGO_CABECERA:
+            self._cabecera += raw_data[:self.LARGO_CABECERA - len(self._cabecera)]
+            if len(self._cabecera) >= self.LARGO_CABECERA:
+                self._validar_cabecera()
+
+        if (isinstance(self._archivo, io.BytesIO)
+                and start + len(raw_data) > settings.FILE_UPLOAD_MAX_MEMORY_SIZE):
+            self._pasar_a_disco()
+        self._archivo.write(raw_data)
+        return None
+
+    def _validar_cabecera(self):
+        tipo = detectar_tipo_imagen(self._cabecera)
+        if tipo is None:
+            self._rechazar(ERROR_FORMATO, 415)
+        # El tipo real manda sobre el que declara el navegador
+        self.content_type = tipo
+
+    def file_complete(self, file_size):
+        if len(self._cabecera) < self.LARGO_CABECERA:
+            self._validar_cabecera()
+
+        self._archivo.seek(0)
+        clase = UploadedFile if isinstance(self._archivo, io.BytesIO) else ImagenEnDisco
+        archivo = clase(
+            file=self._archivo,
+            name=self.file_name,
+            content_type=self.content_type,
+            size=file_size,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra,
+        )
+        self._archivo = None
+        return archivo
+
+    def upload_interrupted(self):
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+
+
+def instalar_handler(request, max_archivos=1):
+    """
+    Reemplaza los upload handlers del request por un ``ImagenUploadHandler``.
+    Debe llamarse antes de acceder a ``request.POST`` o ``request.FILES``.
+    """
+    handler = ImagenUploadHandler(request, max_archivos=max_archivos)
+    request.upload_handlers = [handler]
+    return handler
+
+
+def recibir_imagenes(request, campo='image', max_archivos=1):
+    """
+    Instala el handler y devuelve ``(imagenes, error, status)`` con la lista
+    de imágenes subidas en ``campo``. Si algo falla ``imagenes`` es ``None``.
+    """
+    handler = instalar_handler(request, max_archivos=max_archivos)
+    with metricas.etapa('lectura_upload'):
+        imagenes = request.FILES.getlist(campo)
+
+    if handler.error:
+        return None, handler.error, handler.status
+    if not imagenes:
+        return None, 'No se proporcionó ninguna imagen', 400
+    if len(imagenes) > max_archivos:
+        return None, f'Se pueden procesar hasta {max_archivos} imágenes por vez', 400
+    return imagenes, None, None
+
+
+class MultipartImagen:
+    """
+    Cuerpo multipart/form-data con un único archivo, generado por chunks.
+
+    Tiene ``__len__`` para que ``requests`` mande Content-Length en lugar de
+    chunked encoding, y se puede iterar más de una vez (los reintentos del
+    cliente vuelven a empezar desde el principio del archivo).
+    """
+
+    def __init__(self, archivo, campo='image', chunk_size=CHUNK_SIZE):
+        self.archivo = archivo
+        self.chunk_size = chunk_size
+        self.boundary = uuid.uuid4().hex
+
+        nombre = (archivo.name or 'imagen').replace('"', '%22').replace('\r', '').replace('\n', '')
+        content_type = archivo.content_type or 'application/octet-stream'
+        self._apertura = (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{campo}"; filename="{nombre}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'
+        ).encode()
+        self._cierre = f'\r\n--{self.boundary}--\r\n'.encode()
+
+    def __len__(self):
+        return len(self._apertura) + self.archivo.size + len(self._cierre)
+
+    @property
+    def headers(self):
+        return {
+            'Content-Type': f'multipart/form-data; boundary={self.boundary}',
+            'Content-Length': str(len(self)),
+        }
+
+    def __iter__(self):
+        yield self._apertura
+        yield from self.archivo.chunks(self.chunk_size)
+        yield self._cierre
+
+    def asincrono(self):
+        """Versión iterable async del mismo cuerpo, para ``httpx.AsyncClient``"""
+        return _MultipartAsync(self)
+
+
+class _MultipartAsync:
+    # Solo expone __aiter__: httpx trata como sync a cualquier objeto con __iter__
+
+    def __init__(self, cuerpo):
+        self._cuerpo = cuerpo
+
+    async def __aiter__(self):
+        if not hasattr(self._cuerpo.archivo, 'temporary_file_path'):
+            # En memoria: leer un chunk no bloquea
+            for chunk in self._cuerpo:
+                yield chunk
+            return
+        # En disco: cada lectura va a un thread para no frenar el event loop
+        chunks = iter(self._cuerpo)
+        while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+            yield chunk
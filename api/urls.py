@@ -1,10 +1,17 @@
+from django.conf import settings
 from django.urls import path
 from api import views
 
+# En modo ASGI las vistas que esperan al backend se sirven en su versión async
+if getattr(settings, 'ASYNC_VIEWS', False):
+    from api import views_async as backend_views
+else:
+    backend_views = views
+
 urlpatterns = [
     # === AUTENTICACIÓN ===
     path('login/', views.login_page, name='login'),
-    path('login-process/', views.login_process, name='login_process'),
+    path('login-process/', backend_views.login_process, name='login_process'),
     
     # === HOME ===
     path('home/', views.home_page, name='home'),
@@ -13,22 +20,44 @@ urlpatterns = [
     path('caja/', views.caja_page, name='caja'),
     path('caja/foto/', views.foto_caja_page, name='foto_caja'),
     path('caja/resumen/', views.resumen_caja_page, name='resumen_caja'),
-    path('caja/procesar-imagen/', views.procesar_imagen_caja, name='procesar_imagen_caja'),
+    path('caja/procesar-imagen/', backend_views.procesar_imagen_caja, name='procesar_imagen_caja'),
+    path('caja/procesar-imagenes/', backend_views.procesar_imagenes_caja, name='procesar_imagenes_caja'),
     path('caja/guardar-temporales/', views.guardar_productos_temporales, name='guardar_productos_temporales'),    
     path('caja/limpiar-sesion/', views.limpiar_sesion_caja, name='limpiar_sesion_caja'),
-    path('caja/confirmar/', views.confirmar_orden_caja, name='confirmar_orden_caja'),
+    path('caja/confirmar/', backend_views.confirmar_orden_caja, name='confirmar_orden_caja'),
     path('caja/compra-confirmada/', views.compra_confirmada_page, name='compra_confirmada'),
     path('caja/registro-cliente/', views.registro_cliente_page, name='registro_cliente'),
+    path('caja/clientes/validar/', backend_views.validar_cliente, name='validar_cliente'),
+    path('caja/clientes/registrar/', backend_views.registrar_cliente, name='registrar_cliente'),
     
     # === DEPÓSITO ===
     path('deposito/', views.deposito_page, name='deposito'),
     path('deposito/guardar-seleccion/', views.guardar_seleccion_depositos, name='guardar_seleccion_depositos'),
     path('deposito/foto/', views.foto_deposito_page, name='foto_deposito'),
-    path('deposito/procesar-imagen/', views.procesar_imagen_deposito, name='procesar_imagen_deposito'),
+    path('deposito/procesar-imagen/', backend_views.procesar_imagen_deposito, name='procesar_imagen_deposito'),
+    path('deposito/procesar-imagenes/', backend_views.procesar_imagenes_deposito, name='procesar_imagenes_deposito'),
     path('deposito/guardar-temporales/', views.guardar_productos_temporales_deposito, name='guardar_productos_temporales_deposito'),
     path('deposito/limpiar-sesion/', views.limpiar_sesion_deposito, name='limpiar_sesion_deposito'),
     path('deposito/resumen/', views.resumen_deposito_page, name='resumen_deposito'),
     path('deposito/confirmada/', views.deposito_confirmada_page, name='deposito_confirmada'),
+    path('deposito/confirmar-inventario/', views.confirmar_inventario_deposito, name='confirmar_inventario_deposito'),
     path('deposito/historial/', views.historial_deposito_page, name='historial_deposito'),
+    path('deposito/transferencias/', backend_views.listar_transferencias_deposito, name='listar_transferencias_deposito'),
+    path('deposito/transferencias/crear/', backend_views.crear_transferencia_deposito, name='crear_transferencia_deposito'),
+    path('deposito/transferencias/confirmar/', backend_views.confirmar_transferencia_deposito, name='confirmar_transferencia_deposito'),
+
+    # === TRABAJOS DE DETECCIÓN ===
+    path('trabajos/<str:trabajo_id>/', backend_views.estado_trabajo, name='estado_trabajo'),
+    path('trabajos/<str:trabajo_id>/eventos/', backend_views.eventos_trabajo, name='eventos_trabajo'),
+
+    # === CATÁLOGO ===
+    path('catalogo/buscar/', backend_views.buscar_productos, name='buscar_productos'),
+
+    # === VENTAS ===
+    path('ventas/resumen/', views.resumen_ventas, name='resumen_ventas'),
+
+    # === MÉTRICAS ===
+    path('metrics', views.exportar_metricas, name='metrics'),
+    path('metrics/captura', views.registrar_metricas_captura, name='metricas_captura'),
 ]
 
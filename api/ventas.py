@@ -0,0 +1,240 @@
+"""
+Libro de ventas local y totales por día para el inicio.
+
+Cada orden confirmada en caja se anota una vez (:func:`registrar`) como una
+:class:`~api.models.Venta` con sus líneas, identificada por la clave de
+idempotencia de la confirmación: un reintento no la anota de nuevo. En la
+misma transacción se suman sus unidades e importe a los totales de
+:class:`~api.models.ResumenVentas` del día completo, del cajero (``user_dni``)
+y de cada producto, así :func:`resumen` lee unas pocas filas ya sumadas en
+lugar de recorrer las ventas.
+
+Con el outbox activo solo se anota la venta que el backend aceptó: el envío
+guarda el carrito (:func:`para_outbox`) y el entregador la anota al
+entregarlo, con la fecha en que el cajero la confirmó
+(:func:`registrar_entregada`). Un envío rechazado no llega al libro.
+``manage.py reconstruir_resumen_ventas`` vuelve a calcular todos los totales
+desde el libro (:func:`reconstruir`).
+"""
+import uuid
+from datetime import date
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from api import carrito, logs
+from api.models import ResumenVentas, Venta, VentaLinea
+
+logger = logs.get_logger(__name__)
+
+DEFAULT_CONFIG = {
+    'productos': 5,         # productos más vendidos que muestra el resumen
+    'max_productos': 50,
+}
+
+CERO = Decimal('0.00')
+
+# DNI con el que la caja confirma si la sesión no tiene cajero
+CAJERO_POR_DEFECTO = '12345678'
+
+
+def get_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, 'VENTAS', {})}
+
+
+def cajero(session):
+    """DNI del cajero de la sesión: con él se anotan sus ventas y se leen sus totales"""
+    return session.get('user_dni', CAJERO_POR_DEFECTO)
+
+
+async def acajero(session):
+    """Versión async de :func:`cajero`"""
+    return await session.aget('user_dni', CAJERO_POR_DEFECTO)
+
+
+def _clave_producto(producto):
+    if producto['id'] not in (None, '', 0, '0'):
+        return str(producto['id'])[:200]
+    return f"nombre:{producto['nombre']}"[:200]
+
+
+# ==================== Registro ====================
+
+def _sumar(dimension, clave, dia, ventas, unidades, importe, nombre=''):
+    """Suma a los totales de ``(dimension, dia, clave)``, creando la fila si no está"""
+    cambios = {
+        'ventas': F('ventas') + ventas,
+        'unidades': F('unidades') + unidades,
+        'importe': F('importe') + importe,
+    }
+    if nombre:
+        cambios['nombre'] = nombre
+    filtro = ResumenVentas.objects.filter(dimension=dimension, dia=dia, clave=clave)
+    if filtro.update(**cambios):
+        return
+    try:
+        with transaction.atomic():
+            ResumenVentas.objects.create(dimension=dimension, clave=clave, dia=dia, nombre=nombre,
+                                         ventas=ventas, unidades=unidades, importe=importe)
+    except IntegrityError:
+        # Otra venta creó la fila entre el update y el create
+        filtro.update(**cambios)
+
+
+def _anotar(orden, user_dni, cliente_dni, clave, venta_id, fecha):
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                venta = Venta.objects.create(
+                    clave=clave,
+                    venta_id=str(venta_id or ''),
+                    user_dni=user_dni or '',
+                    cliente_dni=cliente_dni or '',
+                    fecha=fecha or timezone.now(),
+                    total=orden.total,
+                    total_cantidad=orden.total_cantidad,
+                )
+        except IntegrityError:
+            return None
+
+        lineas = []
+        for producto in orden.productos():
+            precio = carrito.a_decimal(producto.get('precio_unitario'))
+            lineas.append(VentaLinea(
+                venta=venta,
+                producto=_clave_producto(producto),
+                nombre=(producto['nombre'] or '')[:200],
+                cantidad=max(producto['cantidad'], 0),
+                precio_unitario=precio,
+                subtotal=carrito.a_decimal(producto.get('subtotal')) or CERO,
+            ))
+        VentaLinea.objects.bulk_create(lineas)
+
+        dia = timezone.localdate(venta.fecha)
+        _sumar(ResumenVentas.DIA, '', dia, 1, venta.total_cantidad, venta.total)
+        _sumar(ResumenVentas.CAJERO, venta.user_dni, dia, 1, venta.total_cantidad, venta.total)
+        for linea in lineas:
+            _sumar(ResumenVentas.PRODUCTO, linea.producto, dia, 1, linea.cantidad, linea.subtotal, linea.nombre)
+    return venta
+
+
+def registrar(orden, user_dni, cliente_dni=None, clave=None, venta_id=None, fecha=None):
+    """
+    Anota la venta del carrito ``orden`` y suma sus totales. Devuelve la
+    venta, o ``None`` si esa clave ya estaba anotada o no se pudo guardar
+    (la venta ya está confirmada: el libro no debe hacer fallar la respuesta).
+    """
+    try:
+        venta = _anotar(orden, user_dni, cliente_dni, clave or uuid.uuid4().hex, venta_id, fecha)
+    except DatabaseError:
+        logger.exception("❌ No se pudo anotar la venta en el libro local")
+        return None
+    if venta is not None:
+        logger.info("🧾 Venta anotada", venta=venta.pk, venta_id=venta.venta_id, total=str(venta.total))
+    return venta
+
+
+async def aregistrar(orden, user_dni, cliente_dni=None, clave=None, venta_id=None, fecha=None):
+    """Versión async de :func:`registrar`"""
+    return await sync_to_async(registrar)(orden, user_dni, cliente_dni, clave, venta_id, fecha)
+
+
+def para_outbox(orden, user_dni, cliente_dni=None):
+    """Lo que guarda el envío del outbox para anotar la venta cuando se entregue"""
+    return {'carrito': orden.a_sesion(), 'user_dni': user_dni or '', 'cliente_dni': cliente_dni or ''}
+
+
+def registrar_entregada(datos, clave, venta_id, fecha):
+    """Anota la venta de un envío que el backend aceptó (``datos`` de :func:`para_outbox`)"""
+    orden = carrito.Carrito.desde_sesion(datos['carrito'])
+    return registrar(orden, datos['user_dni'], datos['cliente_dni'], clave, venta_id, fecha)
+
+
+# ==================== Resumen ====================
+
+def leer_consulta(params):
+    """
+    ``(dia, productos)`` a partir de ``request.GET``.
+    Lanza ``ValueError`` con un mensaje para el usuario si algo no es válido.
+    """
+    try:
+        dia = date.fromisoformat(params['dia']) if params.get('dia') else None
+    except ValueError:
+        raise ValueError('El parámetro dia debe ser una fecha AAAA-MM-DD')
+    try:
+        productos = int(params['productos']) if params.get('productos') else None
+    except ValueError:
+        raise ValueError('El parámetro productos debe ser un número')
+    return dia, productos
+
+
+def _totales(fila):
+    if fila is None:
+        return {'ventas': 0, 'unidades': 0, 'importe': str(CERO)}
+    return {'ventas': fila.ventas, 'unidades': fila.unidades, 'importe': str(fila.importe)}
+
+
+def resumen(dia=None, user_dni='', productos=None):
+    """
+    Totales del ``dia`` (hoy si no se indica): del día, del cajero ``user_dni``
+    y los ``productos`` más vendidos. Son dos consultas sobre filas ya sumadas.
+    """
+    config = get_config()
+    dia = dia or timezone.localdate()
+    productos = max(0, min(productos if productos is not None else config['productos'], config['max_productos']))
+
+    filas = ResumenVentas.objects.filter(dia=dia).filter(
+        Q(dimension=ResumenVentas.DIA) | Q(dimension=ResumenVentas.CAJERO, clave=user_dni or '')
+    )
+    por_dimension = {fila.dimension: fila for fila in filas}
+    mas_vendidos = ResumenVentas.objects.filter(
+        dimension=ResumenVentas.PRODUCTO, dia=dia
+    ).order_by('-unidades', '-importe')[:productos]
+
+    return {
+        'dia': dia.isoformat(),
+        'total': _totales(por_dimension.get(ResumenVentas.DIA)),
+        'cajero': _totales(por_dimension.get(ResumenVentas.CAJERO)),
+        'productos': [
+            {'producto': fila.clave, 'nombre': fila.nombre, **_totales(fila)}
+            for fila in mas_vendidos
+        ],
+    }
+
+
+# ==================== Reconstrucción ====================
+
+def _filas_desde_libro():
+    por_venta = Venta.objects.annotate(dia=TruncDate('fecha')).order_by()
+    por_linea = VentaLinea.objects.annotate(dia=TruncDate('venta__fecha')).order_by()
+    filas = []
+    for fila in por_venta.values('dia').annotate(
+            n=Count('id'), unidades=Sum('total_cantidad'), importe=Sum('total')):
+        filas.append(ResumenVentas(dimension=ResumenVentas.DIA, clave='', dia=fila['dia'],
+                                   ventas=fila['n'], unidades=fila['unidades'], importe=fila['importe']))
+    for fila in por_venta.values('dia', 'user_dni').annotate(
+            n=Count('id'), unidades=Sum('total_cantidad'), importe=Sum('total')):
+        filas.append(ResumenVentas(dimension=ResumenVentas.CAJERO, clave=fila['user_dni'], dia=fila['dia'],
+                                   ventas=fila['n'], unidades=fila['unidades'], importe=fila['importe']))
+    for fila in por_linea.values('dia', 'producto').annotate(
+            n=Count('venta', distinct=True), unidades=Sum('cantidad'), importe=Sum('subtotal'),
+            ultimo_nombre=Max('nombre')):
+        filas.append(ResumenVentas(dimension=ResumenVentas.PRODUCTO, clave=fila['producto'], dia=fila['dia'],
+                                   nombre=fila['ultimo_nombre'], ventas=fila['n'], unidades=fila['unidades'],
+                                   importe=fila['importe']))
+    return filas
+
+
+def reconstruir():
+    """Vuelve a calcular todos los totales desde el libro. Devuelve cuántas filas quedaron"""
+    with transaction.atomic():
+        filas = _filas_desde_libro()
+        ResumenVentas.objects.all().delete()
+        ResumenVentas.objects.bulk_create(filas, batch_size=500)
+    logger.info("🧮 Resumen de ventas reconstruido", filas=len(filas))
+    return len(filas)
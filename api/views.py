@@ -3,12 +3,13 @@ from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views import View
-from django.conf import settings 
+from django.db import DatabaseError
 import json
 import requests
 
-# ==================== URL Backend ====================
-BACKEND_URL = getattr(settings, 'BACKEND_API_URL', 'http://localhost:8000')
+from api import backend_client, captura, carrito, catalogo, clientes, deteccion, idempotencia, inventarios, logs, metricas, mosaico, outbox, resiliencia, trabajos, transferencias, uploads, ventas
+
+logger = logs.get_logger(__name__)
 
 # ==================== AUTENTICACIÓN ====================
 
@@ -18,8 +19,15 @@ def login_page(request):
 
 
 def home_page(request):
-    """Renderiza la página de inicio después del login"""
-    return render(request, 'api/home.html')
+    """Renderiza la página de inicio después del login, con las ventas del día"""
+    try:
+        resumen_ventas = ventas.resumen(user_dni=ventas.cajero(request.session))
+    except DatabaseError:
+        # Sin ``manage.py migrate`` la tabla todavía no existe
+        logger.warning("⚠️ No se pudo leer el resumen de ventas")
+        resumen_ventas = None
+    
+    return render(request, 'api/home.html', {'ventas': resumen_ventas})
 
 
 @csrf_exempt
@@ -38,10 +46,9 @@ def login_process(request):
                 })
             
             # ✅ LLAMAR AL BACKEND para autenticación
-            response = requests.post(
-                f'{BACKEND_URL}/api/home/login/',
-                json={'username': dni, 'password': password},
-                timeout=10
+            response = backend_client.post(
+                'login',
+                json={'username': dni, 'password': password}
             )
 
             if response.status_code == 200:
@@ -62,6 +69,8 @@ def login_process(request):
                     'message': 'DNI o clave incorrectos'
                 })
                 
+        except resiliencia.BackendNoDisponible as e:
+            return resiliencia.respuesta_no_disponible(e, clave='message')
         except requests.exceptions.RequestException as e:
             return JsonResponse({
                 'success': False,
@@ -91,35 +100,38 @@ def foto_caja_page(request):
     """Renderiza la página para capturar/subir foto en caja"""
       # Limpiar sesión SOLO si NO viene de "agregar más productos"
     if not request.GET.get('agregar'):
-        request.session.pop('productos_caja', None)
-        request.session.pop('total_caja', None)
-        print("=" * 80)
-        print("🧹 SESIÓN LIMPIADA - Nueva detección")
-        print("=" * 80)
+        carrito.limpiar(request.session, 'caja')
+        logger.debug("🧹 Sesión de caja limpiada - Nueva detección")
     else:
-        print("=" * 80)
-        print("➕ Modo AGREGAR MÁS - Manteniendo productos anteriores")
-        print("=" * 80)
-    return render(request, 'api/foto_caja.html')
+        logger.debug("➕ Modo agregar más - Manteniendo productos anteriores")
+
+    context = {
+        'max_imagenes_lote': deteccion.get_config_lote()['max_imagenes'],
+        'captura_json': json.dumps(captura.config_navegador('caja'))
+    }
+    return render(request, 'api/foto_caja.html', context)
 
 
 def resumen_caja_page(request):
     """Renderiza la página de resumen de caja con productos detectados"""
     
-    # Obtener productos desde la sesión si existen
-    productos = request.session.get('productos_caja', [])
-    total = request.session.get('total_caja', 0)
+    # Obtener productos desde el carrito de la sesión si existen
+    carrito_caja = carrito.cargar(request.session, 'caja')
+    productos = carrito_caja.productos()
+    total = carrito_caja.total
     
-    print("=" * 80)
-    print("📦 RESUMEN CAJA - Productos en sesión:")
-    print(json.dumps(productos, indent=2, ensure_ascii=False))
-    print("=" * 80)
+    logs.payload(logger, "📦 Resumen caja - Productos en sesión", productos,
+                 lineas=len(productos), total=total)
     if not productos:
-        print("⚠️ No se han detectado productos")
+        logger.info("⚠️ Resumen de caja sin productos detectados")
+    
+    # Trabajo de detección en curso (?trabajo=<id>): la página sigue su progreso
+    trabajo = trabajos.obtener(request.GET.get('trabajo', ''), request.session.get(trabajos.CLAVE_DUENO))
     
     context = {
         'productos': productos,
         'total': total,
+        'trabajo': trabajo.a_dict() if trabajo is not None else None,
     }
     return render(request, 'api/resumen_caja.html', context)
 
@@ -140,8 +152,16 @@ def procesar_imagen_caja(request):
     """
     if request.method == 'POST':
         try:
-            # ✅ Obtener archivo de imagen desde FormData
-            imagen_file = request.FILES.get('image')
+            # ✅ Obtener archivo de imagen desde FormData (validado mientras se recibe)
+            handler = uploads.instalar_handler(request)
+            with metricas.etapa('lectura_upload'):
+                imagen_file = request.FILES.get('image')
+            
+            if handler.error:
+                return JsonResponse({
+                    'success': False,
+                    'error': handler.error
+                }, status=handler.status)
             
             if not imagen_file:
                 return JsonResponse({
@@ -149,57 +169,45 @@ def procesar_imagen_caja(request):
                     'error': 'No se proporcionó ninguna imagen'
                 }, status=400)
             
-            user_dni = request.session.get('user_dni', '12345678')
+            # Modo trabajo: se responde enseguida y la detección sigue en segundo plano
+            if request.GET.get('modo') == 'trabajo':
+                sesion = trabajos.preparar_sesion(request.session)
+                return trabajos.respuesta_encolado(trabajos.encolar('caja', sesion, imagen_file), request.session)
             
-            # ✅ LLAMAR AL BACKEND - Detectar objetos enviando el archivo
-            files = {'image': (imagen_file.name, imagen_file.read(), imagen_file.content_type)}
+            user_dni = request.session.get('user_dni', '12345678')
             
-            response = requests.post(
-                f'{BACKEND_URL}/api/caja/detectarobjetos/',
-                files=files,
-                timeout=30
-            )
+            # ✅ DETECTAR OBJETOS - normalización, cache y llamada al backend por streaming
+            resultado = deteccion.detectar(imagen_file)
 
-            if response.status_code == 200:
-                response_json = response.json()
+            if resultado.status_code == 200:
+                response_json = resultado.datos
 
-                print("✅ JSON RECIBIDO:")
-                print(json.dumps(response_json, indent=2, ensure_ascii=False))
-                print("=" * 80)
+                logs.payload(logger, "✅ JSON recibido del backend", response_json,
+                             desde_cache=resultado.desde_cache)
 
                 productos_nuevos = response_json.get('productos', [])
-                total_nuevos = response_json.get('total', 0)
 
-                # Acumular productos anteriores y nuevos
-                productos_anteriores = request.session.get('productos_caja', [])
-                total_anterior = request.session.get('total_caja', 0)
-                
-                # Combinar productos
-                productos_acumulados = productos_anteriores + productos_nuevos
-                
-                total_acumulado = 0
-                for p in productos_acumulados:
-                    subtotal = p.get('subtotal', 0)
-                    # Convertir a float si es string
-                    if isinstance(subtotal, str):
-                        subtotal = float(subtotal)
-                    total_acumulado += subtotal 
-
-                # Guardar productos en la sesión
-                request.session['productos_caja'] = productos_acumulados
-                request.session['total_caja'] = total_acumulado
+                # Sumar los productos nuevos al carrito (mismo producto = misma línea)
+                carrito_caja = carrito.cargar(request.session, 'caja')
+                carrito_caja.agregar_varios(productos_nuevos)
+
+                # Guardar el carrito en la sesión
+                carrito.guardar(request.session, 'caja', carrito_caja)
             
-                return JsonResponse({
-                    'success': True,
-                    'productos': productos_acumulados,
-                    'total': round(total_acumulado, 2)  # Redondear a 2 decimales
-                })
+                with metricas.etapa('respuesta'):
+                    return JsonResponse({
+                        'success': True,
+                        'productos': carrito_caja.productos(),
+                        'total': carrito_caja.total
+                    })
             else:
                 return JsonResponse({
                     'success': False,
                     'error': 'Error, no se han identificado productos en la imagen'
                 }, status=500)
             
+        except resiliencia.BackendNoDisponible as e:
+            return resiliencia.respuesta_no_disponible(e)
         except requests.exceptions.RequestException as e:
             return JsonResponse({
                 'success': False,
@@ -216,6 +224,74 @@ def procesar_imagen_caja(request):
         'error': 'Método no permitido'
     }, status=405)
 
+@csrf_exempt
+def procesar_imagenes_caja(request):
+    """
+    API para procesar varias imágenes de caja en una sola petición
+    Las imágenes se envían al detector en paralelo y los productos se acumulan en la sesión una sola vez
+    """
+    if request.method == 'POST':
+        try:
+            config = deteccion.get_config_lote()
+            imagenes, error, status = uploads.recibir_imagenes(
+                request, max_archivos=config['max_imagenes']
+            )
+            
+            if error:
+                return JsonResponse({
+                    'success': False,
+                    'error': error
+                }, status=status)
+            
+            # Modo trabajo: cada imagen se suma al carrito apenas vuelve (ver eventos_trabajo)
+            if request.GET.get('modo') == 'trabajo':
+                sesion = trabajos.preparar_sesion(request.session)
+                return trabajos.respuesta_encolado(trabajos.encolar_lote('caja', sesion, imagenes), request.session)
+            
+            # ✅ DETECTAR OBJETOS - todas las imágenes en paralelo
+            resultados = deteccion.detectar_lote(imagenes, config['concurrencia'])
+            productos_nuevos, errores = deteccion.combinar_lote(imagenes, resultados)
+            
+            logger.info("📸 Caja - Lote procesado", imagenes=len(imagenes),
+                        productos=len(productos_nuevos), errores=len(errores))
+            
+            if len(errores) == len(imagenes):
+                no_disponible = [r for r in resultados if isinstance(r, resiliencia.BackendNoDisponible)]
+                if no_disponible:
+                    return resiliencia.respuesta_no_disponible(no_disponible[0])
+
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Error, no se han identificado productos en las imágenes',
+                    'errores': errores
+                }, status=500)
+            
+            # Sumar los productos nuevos al carrito (mismo producto = misma línea)
+            carrito_caja = carrito.cargar(request.session, 'caja')
+            carrito_caja.agregar_varios(productos_nuevos)
+            carrito.guardar(request.session, 'caja', carrito_caja)
+            
+            with metricas.etapa('respuesta'):
+                return JsonResponse({
+                    'success': True,
+                    'productos': carrito_caja.productos(),
+                    'total': carrito_caja.total,
+                    'errores': errores
+                })
+            
+        except resiliencia.BackendNoDisponible as e:
+            return resiliencia.respuesta_no_disponible(e)
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+    
+    return JsonResponse({
+        'success': False,
+        'error': 'Método no permitido'
+    }, status=405)
+
 @csrf_exempt
 def guardar_productos_temporales(request):
     """
@@ -226,24 +302,12 @@ def guardar_productos_temporales(request):
             data = json.loads(request.body)
             productos = data.get('productos', [])
             
-            # Guardar en sesión
-            request.session['productos_caja'] = productos
-            
-            # Calcular total
-            total = 0
-            for p in productos:
-                subtotal = p.get('subtotal', 0)
-                if isinstance(subtotal, str):
-                    subtotal = float(subtotal)
-                total += subtotal
-            
-            request.session['total_caja'] = total
+            # Reemplazar el carrito por los productos editados en el resumen
+            carrito_caja = carrito.Carrito.desde_productos(productos)
+            carrito.guardar(request.session, 'caja', carrito_caja)
             
-            print("=" * 80)
-            print("💾 PRODUCTOS GUARDADOS TEMPORALMENTE:")
-            print(f"Cantidad: {len(productos)}")
-            print(f"Total: ${total}")
-            print("=" * 80)
+            logger.info("💾 Productos de caja guardados temporalmente",
+                        lineas=len(carrito_caja), total=carrito_caja.total)
             
             return JsonResponse({
                 'success': True,
@@ -251,7 +315,7 @@ def guardar_productos_temporales(request):
             })
             
         except Exception as e:
-            print(f"❌ ERROR al guardar: {e}")
+            logger.exception("❌ Error al guardar productos de caja")
             return JsonResponse({
                 'success': False,
                 'error': str(e)
@@ -263,16 +327,25 @@ def guardar_productos_temporales(request):
     }, status=405)
 
 def historial_deposito_page(request):
-    """Renderiza la página de historial de depósito"""
-    # Obtener el historial de la sesión
-    productos = request.session.get('historial_deposito', [])
+    """
+    Renderiza la página de historial de depósito. Las transferencias del
+    backend las carga el navegador; los inventarios confirmados en esta app
+    salen de la base, una página por vez (``?pagina=``).
+    """
+    try:
+        consulta = inventarios.leer_consulta(request.GET)
+    except ValueError:
+        consulta = inventarios.leer_consulta({})
     
-    # Calcular el total de cantidades
-    total_cantidad = sum(p['cantidad'] for p in productos)
+    try:
+        pagina_inventarios = inventarios.pagina(*consulta)
+    except DatabaseError:
+        # Sin ``manage.py migrate`` la tabla todavía no existe
+        logger.warning("⚠️ No se pudo leer el historial de inventarios")
+        pagina_inventarios = None
     
     context = {
-        'productos': productos,
-        'total_cantidad': total_cantidad
+        'inventarios': pagina_inventarios
     }
     
     return render(request, 'api/historial_deposito.html', context)
@@ -285,16 +358,13 @@ def limpiar_sesion_caja(request):
     if request.method == 'POST':
         try:
             # Limpiar todos los datos de la sesión de caja
-            request.session.pop('productos_caja', None)
-            request.session.pop('total_caja', None)
+            carrito.limpiar(request.session, 'caja')
             request.session.pop('imagen_caja', None)
             request.session.pop('clientDNI', None)
             request.session.pop('clientNombre', None)
             request.session.pop('clientTelefono', None)
             
-            print("=" * 80)
-            print("🧹 SESIÓN LIMPIADA COMPLETAMENTE")
-            print("=" * 80)
+            logger.info("🧹 Sesión de caja limpiada completamente")
             
             return JsonResponse({
                 'success': True,
@@ -302,7 +372,7 @@ def limpiar_sesion_caja(request):
             })
             
         except Exception as e:
-            print(f"❌ ERROR al limpiar sesión: {e}")
+            logger.exception("❌ Error al limpiar la sesión de caja")
             return JsonResponse({
                 'success': False,
                 'error': str(e)
@@ -314,17 +384,19 @@ def limpiar_sesion_caja(request):
     }, status=405)
 
 @csrf_exempt
+@idempotencia.idempotente('confirmar_orden_caja')
 def confirmar_orden_caja(request):
     """
     API para confirmar la orden de caja
     Recibe los productos finales y procesa la orden
+    Con ``Idempotency-Key`` los reintentos reciben la misma respuesta sin volver a cobrar
     """
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
             productos = data.get('productos', [])
             cliente_dni = data.get('cliente_dni', None)
-            user_dni = request.session.get('user_dni', '12345678')
+            user_dni = ventas.cajero(request.session)
             
             if not productos:
                 return JsonResponse({
@@ -332,26 +404,34 @@ def confirmar_orden_caja(request):
                     'error': 'No hay productos para confirmar'
                 }, status=400)
             
-            # ✅ LLAMAR AL BACKEND - Confirmar compra
+            # ✅ LLAMAR AL BACKEND - Confirmar compra (una línea por producto)
+            orden = carrito.Carrito.desde_productos(productos)
             backend_data = {
                 'usuarioDNI': user_dni,
-                'productos': productos
+                'productos': orden.para_backend()
             }
             
             if cliente_dni:
                 backend_data['clienteDNI'] = cliente_dni
-                endpoint = f'{BACKEND_URL}/api/caja/confirmarcompra/'
+                endpoint = 'confirmar_compra'
             else:
-                endpoint = f'{BACKEND_URL}/api/caja/confirmarsincliente/'
+                endpoint = 'confirmar_sin_cliente'
             
-            response = requests.post(
-                endpoint,
-                json=backend_data,
-                timeout=10
-            )
+            if outbox.activo():
+                # Write-behind: la orden queda guardada en la base y se entrega al backend después
+                # La venta entra al libro local recién cuando el backend la acepta
+                envio = outbox.encolar(endpoint, f'caja:{user_dni}', backend_data, idempotencia.clave(request),
+                                       venta=ventas.para_outbox(orden, user_dni, cliente_dni))
+                return outbox.respuesta_encolada(envio, 'Orden registrada, se enviará al servidor',
+                                                 orden_id=None, total=orden.total)
+
+            response = backend_client.post(endpoint, json=backend_data,
+                                           clave_idempotencia=idempotencia.clave(request))
             
             if response.status_code == 200:
                 backend_response = response.json()
+                ventas.registrar(orden, user_dni, cliente_dni, clave=idempotencia.clave(request),
+                                 venta_id=backend_response.get('venta_id'))
                 return JsonResponse({
                     'success': True,
                     'message': 'Orden confirmada exitosamente',
@@ -364,6 +444,8 @@ def confirmar_orden_caja(request):
                     'error': 'Error al confirmar la orden en el servidor'
                 }, status=500)
             
+        except resiliencia.BackendNoDisponible as e:
+            return resiliencia.respuesta_no_disponible(e)
         except requests.exceptions.RequestException as e:
             return JsonResponse({
                 'success': False,
@@ -386,6 +468,95 @@ def confirmar_orden_caja(request):
     }, status=405)
 
 
+@csrf_exempt
+def validar_cliente(request):
+    """
+    API para buscar un cliente por DNI en el cobro
+    Los clientes encontrados (y por menos tiempo los DNIs inexistentes) se
+    responden desde el cache de ``api/clientes.py`` sin ir al backend
+    """
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            dni = clientes.normalizar_dni(data.get('dni'))
+        except json.JSONDecodeError:
+            return JsonResponse({
+                'success': False,
+                'message': 'Error en los datos enviados'
+            }, status=400)
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'message': str(e)
+            }, status=400)
+        
+        try:
+            status, respuesta = clientes.buscar(dni)
+            return JsonResponse(respuesta, status=status)
+            
+        except resiliencia.BackendNoDisponible as e:
+            return resiliencia.respuesta_no_disponible(e, clave='message')
+        except requests.exceptions.RequestException as e:
+            return JsonResponse({
+                'success': False,
+                'message': f'Error conectando con el servidor: {str(e)}'
+            }, status=500)
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'message': str(e)
+            }, status=500)
+    
+    return JsonResponse({
+        'success': False,
+        'message': 'Método no permitido'
+    }, status=405)
+
+
+@csrf_exempt
+def registrar_cliente(request):
+    """
+    API para dar de alta un cliente en el backend
+    Si se registró, queda en el cache de clientes para la próxima búsqueda
+    """
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            datos = clientes.leer_registro(data)
+        except json.JSONDecodeError:
+            return JsonResponse({
+                'success': False,
+                'message': 'Error en los datos enviados'
+            }, status=400)
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'message': str(e)
+            }, status=400)
+        
+        try:
+            status, respuesta = clientes.registrar(datos)
+            return JsonResponse(respuesta, status=status)
+            
+        except resiliencia.BackendNoDisponible as e:
+            return resiliencia.respuesta_no_disponible(e, clave='message')
+        except requests.exceptions.RequestException as e:
+            return JsonResponse({
+                'success': False,
+                'message': f'Error conectando con el servidor: {str(e)}'
+            }, status=500)
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'message': str(e)
+            }, status=500)
+    
+    return JsonResponse({
+        'success': False,
+        'message': 'Método no permitido'
+    }, status=405)
+
+
 # ==================== DEPÓSITO ====================
 
 def deposito_page(request):
@@ -399,14 +570,16 @@ def foto_deposito_page(request):
     
     context = {
         'deposito_origen': deposito_origen,
-        'deposito_destino': deposito_destino
+        'deposito_destino': deposito_destino,
+        'max_imagenes_lote': deteccion.get_config_lote()['max_imagenes'],
+        'captura_json': json.dumps(captura.config_navegador('deposito'))
     }
     return render(request, 'api/foto_deposito.html', context)
 
 
 def resumen_deposito_page(request):
-    # Obtener productos desde la sesión si existen
-    productos = request.session.get('productos_deposito', [])
+    # Obtener productos desde el carrito de la sesión si existen
+    productos = carrito.cargar(request.session, 'deposito').productos()
     
     # Obtener depósitos seleccionados (ahora son objetos con id y nombre)
     deposito_origen = request.session.get('deposito_origen', {'id': 1, 'nombre': 'Deposito 1'})
@@ -465,11 +638,8 @@ def guardar_seleccion_depositos(request):
             request.session['deposito_origen'] = deposito_origen
             request.session['deposito_destino'] = deposito_destino
             
-            print("=" * 80)
-            print("🏢 DEPÓSITOS SELECCIONADOS:")
-            print(f"   Origen: {deposito_origen['nombre']} (ID: {deposito_origen['id']})")
-            print(f"   Destino: {deposito_destino['nombre']} (ID: {deposito_destino['id']})")
-            print("=" * 80)
+            logger.info("🏢 Depósitos seleccionados",
+                        origen=deposito_origen['id'], destino=deposito_destino['id'])
             
             return JsonResponse({
                 'success': True,
@@ -477,7 +647,7 @@ def guardar_seleccion_depositos(request):
             })
             
         except Exception as e:
-            print(f"❌ ERROR al guardar selección de depósitos: {e}")
+            logger.exception("❌ Error al guardar la selección de depósitos")
             return JsonResponse({
                 'success': False,
                 'error': str(e)
@@ -496,15 +666,12 @@ def limpiar_sesion_deposito(request):
     if request.method == 'POST':
         try:
             # Limpiar todos los datos de la sesión de depósito
-            request.session.pop('productos_deposito', None)
-            request.session.pop('total_deposito', None)
+            carrito.limpiar(request.session, 'deposito')
             request.session.pop('imagen_deposito', None)
             request.session.pop('deposito_origen', None)
             request.session.pop('deposito_destino', None)
             
-            print("=" * 80)
-            print("🧹 DEPÓSITO - SESIÓN LIMPIADA COMPLETAMENTE")
-            print("=" * 80)
+            logger.info("🧹 Sesión de depósito limpiada completamente")
             
             return JsonResponse({
                 'success': True,
@@ -512,7 +679,7 @@ def limpiar_sesion_deposito(request):
             })
             
         except Exception as e:
-            print(f"❌ ERROR al limpiar sesión de depósito: {e}")
+            logger.exception("❌ Error al limpiar la sesión de depósito")
             return JsonResponse({
                 'success': False,
                 'error': str(e)
@@ -534,20 +701,13 @@ def guardar_productos_temporales_deposito(request):
             data = json.loads(request.body)
             productos = data.get('productos', [])
             
-            # Guardar en sesión
-            request.session['productos_deposito'] = productos
+            # Reemplazar el carrito por los productos editados en el resumen
+            carrito_deposito = carrito.Carrito.desde_productos(productos)
+            carrito.guardar(request.session, 'deposito', carrito_deposito)
             
-            # Calcular total de cantidades
-            total_cantidad = sum(p.get('cantidad', 0) for p in productos)
-            request.session['total_deposito'] = total_cantidad
-            
-            print("=" * 80)
-            print("💾 DEPÓSITO - PRODUCTOS GUARDADOS TEMPORALMENTE:")
-            print(f"Cantidad de productos: {len(productos)}")
-            print(f"Total cantidad: {total_cantidad}")
-            for p in productos:
-                print(f"  - {p.get('nombre')}: {p.get('cantidad')} unidades")
-            print("=" * 80)
+            logger.info("💾 Productos de depósito guardados temporalmente",
+                        lineas=len(carrito_deposito), cantidad=carrito_deposito.total_cantidad)
+            logs.payload(logger, "💾 Carrito de depósito", carrito_deposito.productos())
             
             return JsonResponse({
                 'success': True,
@@ -555,7 +715,7 @@ def guardar_productos_temporales_deposito(request):
             })
             
         except Exception as e:
-            print(f"❌ ERROR al guardar productos de depósito: {e}")
+            logger.exception("❌ Error al guardar productos de depósito")
             return JsonResponse({
                 'success': False,
                 'error': str(e)
@@ -575,7 +735,15 @@ def procesar_imagen_deposito(request):
     """
     if request.method == 'POST':
         try:
-            imagen_file = request.FILES.get('image')
+            handler = uploads.instalar_handler(request)
+            with metricas.etapa('lectura_upload'):
+                imagen_file = request.FILES.get('image')
+            
+            if handler.error:
+                return JsonResponse({
+                    'success': False,
+                    'error': handler.error
+                }, status=handler.status)
             
             if not imagen_file:
                 return JsonResponse({
@@ -583,73 +751,61 @@ def procesar_imagen_deposito(request):
                     'error': 'No se proporcionó ninguna imagen'
                 }, status=400)
             
-            print("=" * 80)
-            print("📸 DEPÓSITO - Procesando imagen")
-            print(f"Nombre del archivo: {imagen_file.name}")
-            print(f"Content-Type: {imagen_file.content_type}")
-            print(f"Tamaño: {imagen_file.size} bytes")
+            # Fotos de estantes en alta resolución: detección por teselas (api/mosaico.py)
+            detector = mosaico.detectar if mosaico.pedido(request) else deteccion.detectar
             
-            # URL del backend FastAPI
-            BACKEND_URL = getattr(settings, 'BACKEND_URL', 'http://localhost:8000')
+            if request.GET.get('modo') == 'trabajo':
+                sesion = trabajos.preparar_sesion(request.session)
+                return trabajos.respuesta_encolado(trabajos.encolar('deposito', sesion, imagen_file, detector), request.session)
             
-            # Preparar la imagen para el backend
-            files = {
-                'image': (imagen_file.name, imagen_file.read(), imagen_file.content_type)
-            }
+            logger.debug("📸 Depósito - Procesando imagen", archivo=imagen_file.name,
+                         content_type=imagen_file.content_type, bytes=imagen_file.size)
             
-            # Enviar al backend FastAPI
-            print(f"🚀 Enviando imagen al backend: {BACKEND_URL}/api/caja/detectarobjetos/")
-            response = requests.post(
-                f'{BACKEND_URL}/api/caja/detectarobjetos/',
-                files=files,
-                timeout=30
-            )
+            # Detectar: normalización, cache y envío al backend FastAPI por streaming
+            resultado = detector(imagen_file)
             
-            print(f"📥 Respuesta del backend: Status {response.status_code}")
+            logger.info("📥 Respuesta del backend", status=resultado.status_code,
+                        desde_cache=resultado.desde_cache)
             
-            if response.status_code != 200:
+            if resultado.status_code != 200:
                 return JsonResponse({
                     'success': False,
                     'error': 'Error al procesar la imagen en el backend'
                 }, status=500)
             
-            response_json = response.json()
+            response_json = resultado.datos
             productos_nuevos = response_json.get('productos', [])
             
-            print(f"✅ Productos detectados en imagen: {len(productos_nuevos)}")
-            
-            # ✅ ACUMULAR productos si hay productos anteriores en la sesión
-            productos_anteriores = request.session.get('productos_deposito', [])
-            print(f"📦 Productos anteriores en sesión: {len(productos_anteriores)}")
+            logger.debug("✅ Productos detectados en imagen", productos=len(productos_nuevos))
             
-            # Combinar productos (acumulación)
-            productos_acumulados = productos_anteriores + productos_nuevos
+            # ✅ ACUMULAR productos en el carrito de la sesión (mismo producto = misma línea)
+            carrito_deposito = carrito.cargar(request.session, 'deposito')
+            lineas_anteriores = len(carrito_deposito)
             
-            # Guardar productos acumulados en sesión
-            request.session['productos_deposito'] = productos_acumulados
+            carrito_deposito.agregar_varios(productos_nuevos)
+            carrito.guardar(request.session, 'deposito', carrito_deposito)
             
-            # Calcular total de cantidades (no precio en depósito)
-            total_cantidad = sum(p.get('cantidad', 0) for p in productos_acumulados)
-            request.session['total_deposito'] = total_cantidad
+            logger.info("💾 Carrito de depósito actualizado", lineas=len(carrito_deposito),
+                        lineas_anteriores=lineas_anteriores, nuevos=len(productos_nuevos),
+                        cantidad=carrito_deposito.total_cantidad)
             
-            print(f"💾 Total productos en sesión: {len(productos_acumulados)} (anteriores: {len(productos_anteriores)} + nuevos: {len(productos_nuevos)})")
-            print(f"📊 Total cantidad: {total_cantidad}")
-            print("=" * 80)
-            
-            return JsonResponse({
-                'success': True,
-                'productos': productos_acumulados,
-                'total_cantidad': total_cantidad
-            })
+            with metricas.etapa('respuesta'):
+                return JsonResponse({
+                    'success': True,
+                    'productos': carrito_deposito.productos(),
+                    'total_cantidad': carrito_deposito.total_cantidad
+                })
             
+        except resiliencia.BackendNoDisponible as e:
+            return resiliencia.respuesta_no_disponible(e)
         except requests.exceptions.RequestException as e:
-            print(f"❌ Error de conexión con backend: {str(e)}")
+            logger.error("❌ Error de conexión con backend", error=str(e))
             return JsonResponse({
                 'success': False,
                 'error': f'Error al conectar con el backend: {str(e)}'
             }, status=500)
         except Exception as e:
-            print(f"❌ Error inesperado: {str(e)}")
+            logger.exception("❌ Error inesperado procesando imagen de depósito")
             return JsonResponse({
                 'success': False,
                 'error': f'Error inesperado: {str(e)}'
@@ -662,17 +818,84 @@ def procesar_imagen_deposito(request):
 
 
 @csrf_exempt
+def procesar_imagenes_deposito(request):
+    """
+    API para procesar varias imágenes de depósito en una sola petición
+    Las imágenes se envían al detector en paralelo y los productos se acumulan en la sesión una sola vez
+    """
+    if request.method == 'POST':
+        try:
+            config = deteccion.get_config_lote()
+            imagenes, error, status = uploads.recibir_imagenes(
+                request, max_archivos=config['max_imagenes']
+            )
+            
+            if error:
+                return JsonResponse({
+                    'success': False,
+                    'error': error
+                }, status=status)
+            
+            # Modo trabajo: cada imagen se suma al carrito apenas vuelve (ver eventos_trabajo)
+            if request.GET.get('modo') == 'trabajo':
+                sesion = trabajos.preparar_sesion(request.session)
+                return trabajos.respuesta_encolado(trabajos.encolar_lote('deposito', sesion, imagenes), request.session)
+            
+            resultados = deteccion.detectar_lote(imagenes, config['concurrencia'])
+            productos_nuevos, errores = deteccion.combinar_lote(imagenes, resultados)
+            
+            logger.info("📸 Depósito - Lote procesado", imagenes=len(imagenes),
+                        productos=len(productos_nuevos), errores=len(errores))
+            
+            if len(errores) == len(imagenes):
+                no_disponible = [r for r in resultados if isinstance(r, resiliencia.BackendNoDisponible)]
+                if no_disponible:
+                    return resiliencia.respuesta_no_disponible(no_disponible[0])
+
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Error al procesar las imágenes en el backend',
+                    'errores': errores
+                }, status=500)
+            
+            # Acumular en el carrito de la sesión
+            carrito_deposito = carrito.cargar(request.session, 'deposito')
+            carrito_deposito.agregar_varios(productos_nuevos)
+            carrito.guardar(request.session, 'deposito', carrito_deposito)
+            
+            with metricas.etapa('respuesta'):
+                return JsonResponse({
+                    'success': True,
+                    'productos': carrito_deposito.productos(),
+                    'total_cantidad': carrito_deposito.total_cantidad,
+                    'errores': errores
+                })
+            
+        except resiliencia.BackendNoDisponible as e:
+            return resiliencia.respuesta_no_disponible(e)
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'error': f'Error inesperado: {str(e)}'
+            }, status=500)
+    
+    return JsonResponse({
+        'success': False,
+        'error': 'Método no permitido'
+    }, status=405)
+
+
+@csrf_exempt
+@idempotencia.idempotente('confirmar_inventario_deposito')
 def confirmar_inventario_deposito(request):
     """
     API para confirmar inventario de depósito
-    Recibe los productos finales y procesa la transferencia
+    Recibe los productos finales y guarda la transferencia con sus líneas
     """
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
             productos = data.get('productos', [])
-            almacen_origen = data.get('almacen_origen', '')
-            almacen_destino = data.get('almacen_destino', '')
             
             if not productos:
                 return JsonResponse({
@@ -680,33 +903,29 @@ def confirmar_inventario_deposito(request):
                     'error': 'No hay productos para confirmar'
                 }, status=400)
             
-            # Calcular total de cantidades
-            total_cantidad = sum(p['cantidad'] for p in productos)
+            # Sin almacenes en el JSON se usan los elegidos en la sesión
+            almacen_origen = inventarios.leer_deposito(data.get('almacen_origen'),
+                                                       request.session.get('deposito_origen'))
+            almacen_destino = inventarios.leer_deposito(data.get('almacen_destino'),
+                                                        request.session.get('deposito_destino'))
             
-            # Guardar en historial de depósito
-            historial = request.session.get('historial_deposito', [])
-            
-            # Agregar nuevos productos al historial
-            for producto in productos:
-                historial.append({
-                    'id': len(historial) + 1,
-                    'cantidad': producto['cantidad'],
-                    'nombre': producto['nombre']
-                })
+            # Unificar las líneas del mismo producto y calcular el total de cantidades
+            inventario = carrito.Carrito.desde_productos(productos)
+            transferencia = inventarios.registrar(inventario, almacen_origen, almacen_destino,
+                                                  request.session.get('user_dni', ''))
             
-            request.session['historial_deposito'] = historial
+            logger.info("📦 Inventario de depósito confirmado",
+                        transferencia_id=transferencia.id, productos=len(inventario))
             
-            # TODO: Aquí guardarías la transferencia en la base de datos
-            # Por ahora solo limpiamos los datos temporales
-            request.session.pop('productos_deposito', None)
+            carrito.limpiar(request.session, 'deposito')
             request.session.pop('imagen_deposito', None)
             
             return JsonResponse({
                 'success': True,
                 'message': 'Transferencia confirmada exitosamente',
-                'transferencia_id': 12345,  # ID de ejemplo
-                'total_productos': len(productos),
-                'total_cantidad': total_cantidad
+                'transferencia_id': transferencia.id,
+                'total_productos': len(inventario),
+                'total_cantidad': inventario.total_cantidad
             })
             
         except json.JSONDecodeError:
@@ -715,6 +934,172 @@ def confirmar_inventario_deposito(request):
                 'error': 'Error al procesar los datos'
             }, status=400)
         except Exception as e:
+            logger.exception("❌ Error al confirmar el inventario de depósito")
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+    
+    return JsonResponse({
+        'success': False,
+        'error': 'Método no permitido'
+    }, status=405)
+
+
+def listar_transferencias_deposito(request):
+    """
+    API del historial de transferencias: una página filtrada por estado,
+    origen, destino y fecha (desde/hasta), con los conteos por estado.
+    Responde 304 si el navegador manda el ETag de la página que ya tiene.
+    """
+    if request.method == 'GET':
+        try:
+            consulta = transferencias.leer_consulta(request.GET)
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=400)
+        
+        try:
+            listado = transferencias.obtener_listado()
+            if listado is None:
+                return transferencias.respuesta_sin_listado()
+            
+            return transferencias.respuesta(request, listado, *consulta)
+            
+        except resiliencia.BackendNoDisponible as e:
+            return resiliencia.respuesta_no_disponible(e)
+        except requests.exceptions.RequestException as e:
+            return JsonResponse({
+                'success': False,
+                'error': f'Error conectando con el servidor: {str(e)}'
+            }, status=500)
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+    
+    return JsonResponse({
+        'success': False,
+        'error': 'Método no permitido'
+    }, status=405)
+
+
+def _reenviar_transferencia(request, endpoint):
+    """Crear y confirmar: el JSON del navegador va al backend tal cual"""
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            if endpoint == 'crear_transferencia' and outbox.activo():
+                # Write-behind: la transferencia queda guardada y se entrega al backend después
+                terminal = f"deposito:{request.session.get('user_dni', '')}"
+                envio = outbox.encolar(endpoint, terminal, data, idempotencia.clave(request))
+                return outbox.respuesta_encolada(envio, 'Transferencia registrada, se enviará al servidor',
+                                                 transferencia_id=None, detalles=[])
+            return transferencias.reenviar(endpoint, data, idempotencia.clave(request))
+            
+        except resiliencia.BackendNoDisponible as e:
+            return resiliencia.respuesta_no_disponible(e)
+        except requests.exceptions.RequestException as e:
+            return JsonResponse({
+                'success': False,
+                'error': f'Error conectando con el servidor: {str(e)}'
+            }, status=500)
+        except json.JSONDecodeError:
+            return JsonResponse({
+                'success': False,
+                'error': 'Error al procesar los datos'
+            }, status=400)
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+    
+    return JsonResponse({
+        'success': False,
+        'error': 'Método no permitido'
+    }, status=405)
+
+
+@csrf_exempt
+@idempotencia.idempotente('crear_transferencia_deposito')
+def crear_transferencia_deposito(request):
+    """
+    API para crear una transferencia entre depósitos en el backend
+    Invalida el historial cacheado si se creó
+    """
+    return _reenviar_transferencia(request, 'crear_transferencia')
+
+
+@csrf_exempt
+@idempotencia.idempotente('confirmar_transferencia_deposito')
+def confirmar_transferencia_deposito(request):
+    """
+    API para confirmar una transferencia pendiente en el backend
+    Invalida el historial cacheado si se confirmó
+    """
+    return _reenviar_transferencia(request, 'confirmar_transferencia')
+
+
+# ==================== CATÁLOGO ====================
+
+def buscar_productos(request):
+    """
+    Autocompletado de la carga manual: productos del catálogo en memoria cuyo
+    nombre empieza con ``q``, tiene una palabra que empieza con ``q`` o lo
+    contiene (sin distinguir tildes ni mayúsculas). Sin ``q``, los primeros.
+    """
+    if request.method == 'GET':
+        try:
+            limite = catalogo.leer_limite(request.GET)
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=400)
+        
+        try:
+            return catalogo.respuesta(catalogo.obtener(), request.GET.get('q', ''), limite)
+            
+        except Exception as e:
+            logger.exception("❌ Error al buscar en el catálogo")
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+    
+    return JsonResponse({
+        'success': False,
+        'error': 'Método no permitido'
+    }, status=405)
+
+
+# ==================== VENTAS ====================
+
+def resumen_ventas(request):
+    """
+    API del resumen de ventas de un día (``dia``, hoy por defecto): totales
+    del día, del cajero de la sesión y los ``productos`` más vendidos, leídos
+    de los totales ya sumados.
+    """
+    if request.method == 'GET':
+        try:
+            dia, productos = ventas.leer_consulta(request.GET)
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=400)
+        
+        try:
+            resumen = ventas.resumen(dia, ventas.cajero(request.session), productos)
+            return JsonResponse({'success': True, **resumen})
+            
+        except Exception as e:
+            logger.exception("❌ Error al leer el resumen de ventas")
             return JsonResponse({
                 'success': False,
                 'error': str(e)
@@ -725,3 +1110,65 @@ def confirmar_inventario_deposito(request):
         'error': 'Método no permitido'
     }, status=405)
 
+
+# ==================== MÉTRICAS ====================
+
+def estado_trabajo(request, trabajo_id):
+    """
+    Estado de un trabajo de detección encolado con ``?modo=trabajo``
+    Con ``?esperar=N`` espera hasta N segundos a que termine (long-polling)
+    """
+    trabajo = trabajos.obtener(trabajo_id, request.session.get(trabajos.CLAVE_DUENO))
+    if trabajo is None:
+        return trabajos.respuesta_inexistente()
+    
+    espera = trabajos.limitar_espera(request.GET.get('esperar'))
+    if espera:
+        trabajo.listo.wait(espera)
+    
+    return trabajos.respuesta(trabajo, request.session)
+
+
+def eventos_trabajo(request, trabajo_id):
+    """
+    Progreso del trabajo como Server-Sent Events; solo en modo ASGI (cada
+    conexión abierta ocuparía un worker sync). Acá se responde 501 y el
+    navegador consulta ``estado_trabajo``.
+    """
+    trabajo = trabajos.obtener(trabajo_id, request.session.get(trabajos.CLAVE_DUENO))
+    if trabajo is None:
+        return trabajos.respuesta_inexistente()
+    
+    return trabajos.respuesta_sin_eventos(trabajo)
+
+
+def exportar_metricas(request):
+    """Métricas del proceso en formato de texto de Prometheus"""
+    return HttpResponse(
+        metricas.exportar(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+@csrf_exempt
+def registrar_metricas_captura(request):
+    """
+    Recibe del navegador (``sendBeacon``) los tamaños y tiempos de un envío de
+    fotos y los suma a las métricas del proceso
+    """
+    if request.method == 'POST':
+        try:
+            captura.registrar(json.loads(request.body))
+        except (ValueError, TypeError) as e:
+            # json.JSONDecodeError también es un ValueError
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=400)
+        
+        return HttpResponse(status=204)
+    
+    return JsonResponse({
+        'success': False,
+        'error': 'Método no permitido'
+    }, status=405)
@@ -0,0 +1,666 @@
+"""
+Vistas async para el modo ASGI (``api_reconocimiento/asgi.py``).
+
+Mismo contrato que las vistas equivalentes de ``api/views.py``, pero la
+llamada al backend se hace con el AsyncClient compartido y la sesión se
+lee/escribe con la API async de Django, así que un detector lento no bloquea
+un worker: mientras se espera la respuesta el event loop atiende otras
+peticiones. Se activan con ``ASYNC_VIEWS = True`` en settings.
+"""
+import json
+
+import httpx
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from api import backend_client, carrito, catalogo, clientes, deteccion, idempotencia, metricas, mosaico, outbox, resiliencia, trabajos, transferencias, uploads, ventas
+
+
+# ==================== AUTENTICACIÓN ====================
+
+@csrf_exempt
+async def login_process(request):
+    """Maneja el proceso de autenticación"""
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            dni = data.get('dni')
+            password = data.get('password')
+
+            if not dni or not password:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Por favor complete todos los campos'
+                })
+
+            response = await backend_client.apost(
+                'login',
+                json={'username': dni, 'password': password}
+            )
+
+            if response.status_code == 200:
+                backend_data = response.json()
+
+                await request.session.aset('user_dni', dni)
+                await request.session.aset(
+                    'user_nombre', backend_data.get('usuario', {}).get('nombre', '')
+                )
+
+                return JsonResponse({
+                    'success': True,
+                    'message': '¡Login exitoso! Redirigiendo...',
+                    'redirect_url': '/api/home/'
+                })
+            else:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'DNI o clave incorrectos'
+                })
+
+        except resiliencia.BackendNoDisponible as e:
+            return resiliencia.respuesta_no_disponible(e, clave='message')
+        except httpx.HTTPError as e:
+            return JsonResponse({
+                'success': False,
+                'message': f'Error conectando con el servidor: {str(e)}'
+            })
+
+        except json.JSONDecodeError:
+            return JsonResponse({
+                'success': False,
+                'message': 'Error en los datos enviados'
+            })
+
+    return JsonResponse({
+        'success': False,
+        'message': 'Método no permitido'
+    })
+
+
+# ==================== CAJA ====================
+
+@csrf_exempt
+async def procesar_imagen_caja(request):
+    """
+    API para procesar la imagen de caja y detectar productos
+    Recibe una imagen como archivo multipart/form-data y retorna los productos detectados
+    """
+    if request.method == 'POST':
+        try:
+            handler = uploads.instalar_handler(request)
+            with metricas.etapa('lectura_upload'):
+                imagen_file = request.FILES.get('image')
+
+            if handler.error:
+                return JsonResponse({
+                    'success': False,
+                    'error': handler.error
+                }, status=handler.status)
+
+            if not imagen_file:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'No se proporcionó ninguna imagen'
+                }, status=400)
+
+            # Modo trabajo: se responde enseguida y la detección sigue en segundo plano
+            if request.GET.get('modo') == 'trabajo':
+                sesion = await trabajos.apreparar_sesion(request.session)
+                return trabajos.respuesta_encolado(trabajos.encolar('caja', sesion, imagen_file), request.session)
+
+            # Normalización, cache y llamada al backend por streaming
+            resultado = await deteccion.adetectar(imagen_file)
+
+            if resultado.status_code == 200:
+                productos_nuevos = resultado.datos.get('productos', [])
+
+                # Sumar los productos nuevos al carrito (mismo producto = misma línea)
+                carrito_caja = await carrito.acargar(request.session, 'caja')
+                carrito_caja.agregar_varios(productos_nuevos)
+                await carrito.aguardar(request.session, 'caja', carrito_caja)
+
+                with metricas.etapa('respuesta'):
+                    return JsonResponse({
+                        'success': True,
+                        'productos': carrito_caja.productos(),
+                        'total': carrito_caja.total
+                    })
+            else:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Error, no se han identificado productos en la imagen'
+                }, status=500)
+
+        except resiliencia.BackendNoDisponible as e:
+            return resiliencia.respuesta_no_disponible(e)
+        except httpx.HTTPError as e:
+            return JsonResponse({
+                'success': False,
+                'error': f'Error conectando con el servidor: {str(e)}'
+            }, status=500)
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+
+    return JsonResponse({
+        'success': False,
+        'error': 'Método no permitido'
+    }, status=405)
+
+
+@csrf_exempt
+async def procesar_imagenes_caja(request):
+    """
+    API para procesar varias imágenes de caja en una sola petición
+    Las imágenes se envían al detector en paralelo y los productos se acumulan en la sesión una sola vez
+    """
+    if request.method == 'POST':
+        try:
+            config = deteccion.get_config_lote()
+            imagenes, error, status = uploads.recibir_imagenes(
+                request, max_archivos=config['max_imagenes']
+            )
+
+            if error:
+                return JsonResponse({
+                    'success': False,
+                    'error': error
+                }, status=status)
+
+            # Modo trabajo: cada imagen se suma al carrito apenas vuelve (ver eventos_trabajo)
+            if request.GET.get('modo') == 'trabajo':
+                sesion = await trabajos.apreparar_sesion(request.session)
+                return trabajos.respuesta_encolado(trabajos.encolar_lote('caja', sesion, imagenes), request.session)
+
+            resultados = await deteccion.adetectar_lote(imagenes, config['concurrencia'])
+            productos_nuevos, errores = deteccion.combinar_lote(imagenes, resultados)
+
+            if len(errores) == len(imagenes):
+                no_disponible = [r for r in resultados if isinstance(r, resiliencia.BackendNoDisponible)]
+                if no_disponible:
+                    return resiliencia.respuesta_no_disponible(no_disponible[0])
+
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Error, no se han identificado productos en las imágenes',
+                    'errores': errores
+                }, status=500)
+
+            carrito_caja = await carrito.acargar(request.session, 'caja')
+            carrito_caja.agregar_varios(productos_nuevos)
+            await carrito.aguardar(request.session, 'caja', carrito_caja)
+
+            with metricas.etapa('respuesta'):
+                return JsonResponse({
+                    'success': True,
+                    'productos': carrito_caja.productos(),
+                    'total': carrito_caja.total,
+                    'errores': errores
+                })
+
+        except resiliencia.BackendNoDisponible as e:
+            return resiliencia.respuesta_no_disponible(e)
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+
+    return JsonResponse({
+        'success': False,
+        'error': 'Método no permitido'
+    }, status=405)
+
+
+@csrf_exempt
+@idempotencia.idempotente('confirmar_orden_caja')
+async def confirmar_orden_caja(request):
+    """
+    API para confirmar la orden de caja
+    Recibe los productos finales y procesa la orden
+    Con ``Idempotency-Key`` los reintentos reciben la misma respuesta sin volver a cobrar
+    """
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            productos = data.get('productos', [])
+            cliente_dni = data.get('cliente_dni', None)
+            user_dni = await ventas.acajero(request.session)
+
+            if not productos:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'No hay productos para confirmar'
+                }, status=400)
+
+            orden = carrito.Carrito.desde_productos(productos)
+            backend_data = {
+                'usuarioDNI': user_dni,
+                'productos': orden.para_backend()
+            }
+
+            if cliente_dni:
+                backend_data['clienteDNI'] = cliente_dni
+                endpoint = 'confirmar_compra'
+            else:
+                endpoint = 'confirmar_sin_cliente'
+
+            if outbox.activo():
+                # Write-behind: la orden queda guardada en la base y se entrega al backend después
+                # La venta entra al libro local recién cuando el backend la acepta
+                envio = await outbox.aencolar(endpoint, f'caja:{user_dni}', backend_data, idempotencia.clave(request),
+                                              venta=ventas.para_outbox(orden, user_dni, cliente_dni))
+                return outbox.respuesta_encolada(envio, 'Orden registrada, se enviará al servidor',
+                                                 orden_id=None, total=orden.total)
+
+            response = await backend_client.apost(endpoint, json=backend_data,
+                                                  clave_idempotencia=idempotencia.clave(request))
+
+            if response.status_code == 200:
+                backend_response = response.json()
+                await ventas.aregistrar(orden, user_dni, cliente_dni, clave=idempotencia.clave(request),
+                                        venta_id=backend_response.get('venta_id'))
+                return JsonResponse({
+                    'success': True,
+                    'message': 'Orden confirmada exitosamente',
+                    'orden_id': backend_response.get('venta_id'),
+                    'total': backend_response.get('total')
+                })
+            else:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Error al confirmar la orden en el servidor'
+                }, status=500)
+
+        except resiliencia.BackendNoDisponible as e:
+            return resiliencia.respuesta_no_disponible(e)
+        except httpx.HTTPError as e:
+            return JsonResponse({
+                'success': False,
+                'error': f'Error conectando con el servidor: {str(e)}'
+            }, status=500)
+        except json.JSONDecodeError:
+            return JsonResponse({
+                'success': False,
+                'error': 'Error al procesar los datos'
+            }, status=400)
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+
+    return JsonResponse({
+        'success': False,
+        'error': 'Método no permitido'
+    }, status=405)
+
+
+@csrf_exempt
+async def validar_cliente(request):
+    """Versión async de la búsqueda de clientes por DNI"""
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            dni = clientes.normalizar_dni(data.get('dni'))
+        except json.JSONDecodeError:
+            return JsonResponse({
+                'success': False,
+                'message': 'Error en los datos enviados'
+            }, status=400)
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'message': str(e)
+            }, status=400)
+
+        try:
+            status, respuesta = await clientes.abuscar(dni)
+            return JsonResponse(respuesta, status=status)
+
+        except resiliencia.BackendNoDisponible as e:
+            return resiliencia.respuesta_no_disponible(e, clave='message')
+        except httpx.HTTPError as e:
+            return JsonResponse({
+                'success': False,
+                'message': f'Error conectando con el servidor: {str(e)}'
+            }, status=500)
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'message': str(e)
+            }, status=500)
+
+    return JsonResponse({
+        'success': False,
+        'message': 'Método no permitido'
+    }, status=405)
+
+
+@csrf_exempt
+async def registrar_cliente(request):
+    """Versión async del alta de clientes"""
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            datos = clientes.leer_registro(data)
+        except json.JSONDecodeError:
+            return JsonResponse({
+                'success': False,
+                'message': 'Error en los datos enviados'
+            }, status=400)
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'message': str(e)
+            }, status=400)
+
+        try:
+            status, respuesta = await clientes.aregistrar(datos)
+            return JsonResponse(respuesta, status=status)
+
+        except resiliencia.BackendNoDisponible as e:
+            return resiliencia.respuesta_no_disponible(e, clave='message')
+        except httpx.HTTPError as e:
+            return JsonResponse({
+                'success': False,
+                'message': f'Error conectando con el servidor: {str(e)}'
+            }, status=500)
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'message': str(e)
+            }, status=500)
+
+    return JsonResponse({
+        'success': False,
+        'message': 'Método no permitido'
+    }, status=405)
+
+
+# ==================== DEPÓSITO ====================
+
+@csrf_exempt
+async def procesar_imagen_deposito(request):
+    """
+    API para procesar la imagen de depósito y detectar productos
+    Recibe una imagen como archivo multipart/form-data y retorna los productos detectados
+    """
+    if request.method == 'POST':
+        try:
+            handler = uploads.instalar_handler(request)
+            with metricas.etapa('lectura_upload'):
+                imagen_file = request.FILES.get('image')
+
+            if handler.error:
+                return JsonResponse({
+                    'success': False,
+                    'error': handler.error
+                }, status=handler.status)
+
+            if not imagen_file:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'No se proporcionó ninguna imagen'
+                }, status=400)
+
+            # Fotos de estantes en alta resolución: detección por teselas (api/mosaico.py)
+            usar_mosaico = mosaico.pedido(request)
+
+            if request.GET.get('modo') == 'trabajo':
+                sesion = await trabajos.apreparar_sesion(request.session)
+                detector = mosaico.detectar if usar_mosaico else deteccion.detectar
+                return trabajos.respuesta_encolado(trabajos.encolar('deposito', sesion, imagen_file, detector), request.session)
+
+            # Normalización, cache y llamada al backend por streaming
+            if usar_mosaico:
+                resultado = await mosaico.adetectar(imagen_file)
+            else:
+                resultado = await deteccion.adetectar(imagen_file)
+
+            if resultado.status_code != 200:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Error al procesar la imagen en el backend'
+                }, status=500)
+
+            productos_nuevos = resultado.datos.get('productos', [])
+
+            # Acumular productos en el carrito de la sesión (mismo producto = misma línea)
+            carrito_deposito = await carrito.acargar(request.session, 'deposito')
+            carrito_deposito.agregar_varios(productos_nuevos)
+            await carrito.aguardar(request.session, 'deposito', carrito_deposito)
+
+            with metricas.etapa('respuesta'):
+                return JsonResponse({
+                    'success': True,
+                    'productos': carrito_deposito.productos(),
+                    'total_cantidad': carrito_deposito.total_cantidad
+                })
+
+        except resiliencia.BackendNoDisponible as e:
+            return resiliencia.respuesta_no_disponible(e)
+        except httpx.HTTPError as e:
+            return JsonResponse({
+                'success': False,
+                'error': f'Error al conectar con el backend: {str(e)}'
+            }, status=500)
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'error': f'Error inesperado: {str(e)}'
+            }, status=500)
+
+    return JsonResponse({
+        'success': False,
+        'error': 'Método no permitido'
+    }, status=405)
+
+
+@csrf_exempt
+async def procesar_imagenes_deposito(request):
+    """
+    API para procesar varias imágenes de depósito en una sola petición
+    Las imágenes se envían al detector en paralelo y los productos se acumulan en la sesión una sola vez
+    """
+    if request.method == 'POST':
+        try:
+            config = deteccion.get_config_lote()
+            imagenes, error, status = uploads.recibir_imagenes(
+                request, max_archivos=config['max_imagenes']
+            )
+
+            if error:
+                return JsonResponse({
+                    'success': False,
+                    'error': error
+                }, status=status)
+
+            # Modo trabajo: cada imagen se suma al carrito apenas vuelve (ver eventos_trabajo)
+            if request.GET.get('modo') == 'trabajo':
+                sesion = await trabajos.apreparar_sesion(request.session)
+                return trabajos.respuesta_encolado(trabajos.encolar_lote('deposito', sesion, imagenes), request.session)
+
+            resultados = await deteccion.adetectar_lote(imagenes, config['concurrencia'])
+            productos_nuevos, errores = deteccion.combinar_lote(imagenes, resultados)
+
+            if len(errores) == len(imagenes):
+                no_disponible = [r for r in resultados if isinstance(r, resiliencia.BackendNoDisponible)]
+                if no_disponible:
+                    return resiliencia.respuesta_no_disponible(no_disponible[0])
+
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Error al procesar las imágenes en el backend',
+                    'errores': errores
+                }, status=500)
+
+            carrito_deposito = await carrito.acargar(request.session, 'deposito')
+            carrito_deposito.agregar_varios(productos_nuevos)
+            await carrito.aguardar(request.session, 'deposito', carrito_deposito)
+
+            with metricas.etapa('respuesta'):
+                return JsonResponse({
+                    'success': True,
+                    'productos': carrito_deposito.productos(),
+                    'total_cantidad': carrito_deposito.total_cantidad,
+                    'errores': errores
+                })
+
+        except resiliencia.BackendNoDisponible as e:
+            return resiliencia.respuesta_no_disponible(e)
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'error': f'Error inesperado: {str(e)}'
+            }, status=500)
+
+    return JsonResponse({
+        'success': False,
+        'error': 'Método no permitido'
+    }, status=405)
+
+
+async def listar_transferencias_deposito(request):
+    """Versión async del historial de transferencias paginado"""
+    if request.method == 'GET':
+        try:
+            consulta = transferencias.leer_consulta(request.GET)
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=400)
+
+        try:
+            listado = await transferencias.aobtener_listado()
+            if listado is None:
+                return transferencias.respuesta_sin_listado()
+
+            return transferencias.respuesta(request, listado, *consulta)
+
+        except resiliencia.BackendNoDisponible as e:
+            return resiliencia.respuesta_no_disponible(e)
+        except httpx.HTTPError as e:
+            return JsonResponse({
+                'success': False,
+                'error': f'Error conectando con el servidor: {str(e)}'
+            }, status=500)
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+
+    return JsonResponse({
+        'success': False,
+        'error': 'Método no permitido'
+    }, status=405)
+
+
+async def _reenviar_transferencia(request, endpoint):
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            if endpoint == 'crear_transferencia' and outbox.activo():
+                # Write-behind: la transferencia queda guardada y se entrega al backend después
+                terminal = f"deposito:{await request.session.aget('user_dni', '')}"
+                envio = await outbox.aencolar(endpoint, terminal, data, idempotencia.clave(request))
+                return outbox.respuesta_encolada(envio, 'Transferencia registrada, se enviará al servidor',
+                                                 transferencia_id=None, detalles=[])
+            return await transferencias.areenviar(endpoint, data, idempotencia.clave(request))
+
+        except resiliencia.BackendNoDisponible as e:
+            return resiliencia.respuesta_no_disponible(e)
+        except httpx.HTTPError as e:
+            return JsonResponse({
+                'success': False,
+                'error': f'Error conectando con el servidor: {str(e)}'
+            }, status=500)
+        except json.JSONDecodeError:
+            return JsonResponse({
+                'success': False,
+                'error': 'Error al procesar los datos'
+            }, status=400)
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+
+    return JsonResponse({
+        'success': False,
+        'error': 'Método no permitido'
+    }, status=405)
+
+
+@csrf_exempt
+@idempotencia.idempotente('crear_transferencia_deposito')
+async def crear_transferencia_deposito(request):
+    """Versión async de la creación de transferencias"""
+    return await _reenviar_transferencia(request, 'crear_transferencia')
+
+
+@csrf_exempt
+@idempotencia.idempotente('confirmar_transferencia_deposito')
+async def confirmar_transferencia_deposito(request):
+    """Versión async de la confirmación de transferencias"""
+    return await _reenviar_transferencia(request, 'confirmar_transferencia')
+
+
+# ==================== CATÁLOGO ====================
+
+async def buscar_productos(request):
+    """Versión async del autocompletado: la primera carga del catálogo no ocupa un thread"""
+    if request.method == 'GET':
+        try:
+            limite = catalogo.leer_limite(request.GET)
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=400)
+
+        try:
+            return catalogo.respuesta(await catalogo.aobtener(), request.GET.get('q', ''), limite)
+
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=500)
+
+    return JsonResponse({
+        'success': False,
+        'error': 'Método no permitido'
+    }, status=405)
+
+
+# ==================== TRABAJOS ====================
+
+async def estado_trabajo(request, trabajo_id):
+    """Versión async: el long-polling no ocupa un thread mientras espera"""
+    trabajo = trabajos.obtener(trabajo_id, await request.session.aget(trabajos.CLAVE_DUENO))
+    if trabajo is None:
+        return trabajos.respuesta_inexistente()
+
+    espera = trabajos.limitar_espera(request.GET.get('esperar'))
+    if espera:
+        await trabajos.aesperar(trabajo, espera)
+
+    return trabajos.respuesta(trabajo, request.session)
+
+
+async def eventos_trabajo(request, trabajo_id):
+    """
+    Progreso del trabajo como Server-Sent Events: imagen recibida,
+    preprocesada, enviada al detector y detectada (con el carrito parcial).
+    El stream lo atiende el event loop, no ocupa un thread por conexión.
+    """
+    trabajo = trabajos.obtener(trabajo_id, await request.session.aget(trabajos.CLAVE_DUENO))
+    if trabajo is None:
+        return trabajos.respuesta_inexistente()
+
+    return trabajos.respuesta_eventos(trabajo, request.session, trabajos.leer_ultimo_evento(request))
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_reconocimiento.settings')
+# Servir las vistas que esperan al backend en su versión async (api/views_async.py)
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
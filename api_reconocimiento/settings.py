@@ -24,13 +24,191 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-yg(@(xz9@r^pxaboakns_n!5%g)wj@a3r_((m#flfx2#c&&kla'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# DJANGO_DEBUG=0 para probar como en producción (estáticos con hash, templates cacheados)
+DEBUG = os.environ.get('DJANGO_DEBUG', '1') == '1'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [] if DEBUG else os.environ.get('DJANGO_ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
 
 #Configuración del Backend API
 BACKEND_API_URL = 'http://localhost:8000'
 
+# Pool de conexiones keep-alive hacia el backend (ver api/backend_client.py)
+BACKEND_POOL_SIZE = 10
+
+# Timeouts (conexión, lectura) en segundos por grupo de endpoints
+BACKEND_TIMEOUTS = {
+    'auth': (3.05, 10),
+    'deteccion': (3.05, 30),
+    'ventas': (3.05, 10),
+    'deposito': (3.05, 10),
+    'catalogo': (3.05, 10),
+    'clientes': (3.05, 5),
+}
+
+# Reintentos para llamadas idempotentes (login, detección) y backoff base en segundos
+BACKEND_REINTENTOS = 2
+BACKEND_BACKOFF = 0.2
+
+# Si el backend descarta las ventas repetidas por Idempotency-Key: entonces las
+# confirmaciones con clave se reintentan también ante 502/503/504 y conexiones
+# cortadas. Sin eso solo se reintentan si no se pudo conectar (no llegaron)
+BACKEND_RESPETA_IDEMPOTENCIA = os.environ.get('BACKEND_RESPETA_IDEMPOTENCIA', '0') == '1'
+
+# Circuit breaker por grupo de endpoints (ver api/resiliencia.py): se abre tras
+# 'fallas' errores consecutivos y prueba de nuevo pasados 'espera' segundos
+BACKEND_CIRCUITO = {
+    'fallas': 5,
+    'espera': 15,
+    'sondas': 1,
+}
+
+# Vistas async (api/views_async.py) para las llamadas al backend.
+# asgi.py las activa por defecto; requieren el paquete httpx.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '0') == '1'
+
+# Tamaño máximo de cada imagen subida para detección (api/uploads.py)
+UPLOAD_IMAGEN_MAX_BYTES = 15 * 1024 * 1024
+
+# Reducción y compresión de las fotos en el navegador antes de subirlas (api/captura.py)
+CAPTURA = {
+    'lado_maximo': 1280,       # píxeles del lado mayor
+    'formato': 'image/jpeg',   # 'image/jpeg' o 'image/webp'
+    'calidad': 0.8,
+}
+
+# Normalización de imágenes antes de la detección (api/preprocesamiento.py, requiere Pillow)
+PREPROCESAR_IMAGENES = False
+PREPROCESAMIENTO = {
+    'lado_maximo': 1280,
+    'formato': 'JPEG',   # 'JPEG' o 'WEBP'
+    'calidad': 85,
+    'workers': 2,
+}
+
+# Detección por teselas de las fotos de estantes de depósito (api/mosaico.py, requiere Pillow)
+MOSAICO = {
+    'activo': False,       # ?mosaico=1 lo usa en una petición aunque esté desactivado
+    'lado': 1280,          # píxeles del lado de cada tesela
+    'solape': 0.2,         # fracción del lado; más que el producto más grande del estante
+    'max_teselas': 16,
+    'concurrencia': 4,     # teselas en el detector a la vez
+    'iou': 0.5,
+    'contencion': 0.6,
+    'lado_captura': 4096,  # lado máximo de la foto que sube la página de depósito
+}
+
+# Cache de resultados de detección por hash de imagen (api/cache_deteccion.py)
+# backend: 'memoria' (por proceso), 'archivo' (compartido entre workers),
+# 'django' (un alias de CACHES) o None para desactivarlo
+CACHE_DETECCION = {
+    'backend': 'memoria',
+    'ttl': 300,
+    'max_bytes': 32 * 1024 * 1024,
+    'directorio': BASE_DIR / 'cache_deteccion',
+    'alias': 'default',
+}
+
+# Trabajos de detección en segundo plano (?modo=trabajo, ver api/trabajos.py)
+TRABAJOS_DETECCION = {
+    'workers': 4,
+    'max_pendientes': 100,
+    'ttl': 300,
+    'max_espera': 25,
+    'latido': 15,
+}
+
+# Historial de transferencias de depósito (api/transferencias.py): el listado
+# del backend se cachea 'ttl' segundos y se invalida al crear o confirmar
+HISTORIAL_TRANSFERENCIAS = {
+    'ttl': 60,
+    'por_pagina': 20,
+    'max_por_pagina': 100,
+    'alias': 'default',
+}
+
+# Catálogo de productos en memoria para el autocompletado (ver api/catalogo.py)
+CATALOGO_PRODUCTOS = {
+    'refresco': 300,     # segundos entre actualizaciones incrementales
+    'reintento': 30,     # segundos hasta reintentar si el backend falló
+    'limite': 10,
+    'max_limite': 50,
+}
+
+# Claves de idempotencia de las confirmaciones (ver api/idempotencia.py). Con
+# varios workers el alias tiene que ser un cache compartido (redis, memcached...)
+IDEMPOTENCIA = {
+    'retencion': 24 * 3600,   # segundos que se repite la respuesta de una clave
+    'en_curso': 60,           # segundos que se reserva la clave mientras dura la llamada
+    'alias': 'idempotencia',
+}
+
+# Outbox de confirmaciones (ver api/outbox.py): con 'activo' las ventas y las
+# transferencias se guardan en la base y se responden enseguida; un entregador
+# las manda al backend con reintentos. Con 'hilo' False hay que correr
+# 'python manage.py entregar_outbox' aparte.
+OUTBOX = {
+    'activo': os.environ.get('OUTBOX_ACTIVO', '0') == '1',
+    'hilo': True,
+    'lote': 50,
+    'concurrencia': 4,
+    'intervalo': 1.0,
+    'max_intentos': 10,
+    'backoff': 2,
+    'max_backoff': 300,
+    'reserva': 60,
+}
+
+# Cache de búsquedas de clientes por DNI en la caja (ver api/clientes.py)
+CLIENTES = {
+    'ttl': 600,           # segundos que se reutiliza un cliente encontrado
+    'ttl_negativo': 30,   # segundos que se recuerda que un DNI no existe
+    'max_entradas': 5000,
+}
+
+# Libro de ventas local y totales del inicio (ver api/ventas.py)
+VENTAS = {
+    'productos': 5,       # productos más vendidos en el resumen
+    'max_productos': 50,
+}
+
+# Logging de la app (api/logs.py). En producción LOG_NIVEL=INFO: sin payloads.
+LOG_NIVEL = os.environ.get('LOG_NIVEL', 'DEBUG' if DEBUG else 'INFO')
+LOG_PAYLOADS = {
+    'muestreo': 1.0,         # fracción de payloads (JSON del backend, carrito) que se registran
+    'max_caracteres': 4000,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'estructurado': {
+            '()': 'api.logs.FormatoEstructurado',
+            'format': '%(asctime)s %(levelname)s %(name)s %(message)s',
+            'como_json': os.environ.get('LOG_FORMATO') == 'json',
+        },
+    },
+    'handlers': {
+        'cola': {
+            'class': 'api.logs.ColaHandler',
+            'formatter': 'estructurado',
+        },
+    },
+    'loggers': {
+        'api': {
+            'handlers': ['cola'],
+            'level': LOG_NIVEL,
+            'propagate': False,
+        },
+    },
+}
+
+# Detección de varias imágenes por petición (caja/procesar-imagenes/, deposito/procesar-imagenes/)
+DETECCION_LOTE = {
+    'max_imagenes': 10,
+    'concurrencia': 4,   # llamadas simultáneas al detector por petición
+}
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -47,9 +225,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Sin DEBUG sirve los estáticos con hash antes de todo lo demás (ver api/estaticos.py)
+    'api.estaticos.EstaticosMiddleware',
+    # Primero de la app, para medir la petición completa (ver /api/metrics)
+    'api.middleware.MetricasMiddleware',
+    'api.middleware.PlazoMiddleware',
+    # Solo arranca el entregador del outbox al levantar el servidor (ver api/outbox.py)
+    'api.outbox.OutboxMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    # SessionMiddleware de Django que mide el guardado de la sesión
+    'api.middleware.SesionMedidaMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -83,20 +269,89 @@ TEMPLATES = [
     },
 ]
 
+# Sin DEBUG cada template se compila una sola vez por proceso
+if not DEBUG:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'api_reconocimiento.wsgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Perfiles de conexión a SQLite. 'wal' es el recomendado con varias terminales:
+# - journal_mode=WAL: las lecturas no bloquean a la escritura de la sesión
+# - synchronous=NORMAL: con WAL solo hace fsync en los checkpoints
+# - timeout: espera el lock de escritura en lugar de fallar con "database is locked"
+# - transaction_mode=IMMEDIATE: toma el lock al empezar la transacción y evita
+#   el error al pasar de lectura a escritura
+# - CONN_MAX_AGE: reutiliza la conexión entre peticiones (y los PRAGMA aplicados)
+SQLITE_PERFILES = {
+    'default': {},
+    'wal': {
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+        },
+    },
+}
+SQLITE_PERFIL = os.environ.get('SQLITE_PERFIL', 'wal')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        **SQLITE_PERFILES[SQLITE_PERFIL],
     }
 }
 
 
+# Caches locales del proceso. 'sesiones' guarda las sesiones cuando
+# SESSION_ESTRATEGIA es 'cache' o 'cached_db'; con varios procesos y la
+# estrategia 'cache' hay que apuntarlo a un cache compartido (memcached, redis).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sesiones': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sesiones',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Respuestas de las confirmaciones por clave de idempotencia (api/idempotencia.py)
+    'idempotencia': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'idempotencia',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+
+# Dónde se guardan las sesiones:
+# - 'db': tabla django_session, una escritura en SQLite por cada cambio
+# - 'cached_db': lecturas desde el cache, escrituras en cache y en la tabla
+# - 'cache': solo en el cache, sin tocar SQLite
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+}
+SESSION_ESTRATEGIA = os.environ.get('SESSION_ESTRATEGIA', 'cached_db')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_ESTRATEGIA]
+SESSION_CACHE_ALIAS = 'sesiones'
+
+# La sesión se guarda solo si cambió (api/carrito.py no la toca si el carrito es igual)
+SESSION_SAVE_EVERY_REQUEST = False
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -141,6 +396,23 @@ STATIC_URL = '/static/'
 
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# collectstatic deja los archivos con hash en el nombre y sus copias .gz/.br
+# (ver api/estaticos.py); sin DEBUG hay que correrlo antes de levantar el server
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'api.estaticos.AlmacenamientoComprimido',
+    },
+}
+
+ESTATICOS = {
+    'max_age_hash': 31536000,   # un año: el nombre cambia cuando cambia el contenido
+    'max_age': 300,             # archivos pedidos por su nombre sin hash
+    'min_bytes': 512,           # no se comprimen archivos más chicos
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,134 @@
+"""
+Benchmark: subidas concurrentes en modo sync (WSGI) vs async (ASGI).
+
+Levanta el backend falso con un detector lento y manda N subidas simultáneas
+a ``/api/caja/procesar-imagen/`` dentro de un solo proceso:
+
+- sync: las vistas de ``api/views.py`` atendidas por un pool fijo de threads,
+  como un worker WSGI con ``--threads``.
+- async: las vistas de ``api/views_async.py`` atendidas por el handler ASGI
+  de Django en un único event loop.
+
+Cada modo corre en un subproceso propio porque las URLs eligen las vistas al
+importarse. Uso:
+
+    python -m benchmarks.bench_async_views --latencia 0.5 --workers 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+CONCURRENCIAS = (1, 4, 16, 32, 64)
+URL = '/api/caja/procesar-imagen/'
+
+
+def _imagen(tamano):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    return SimpleUploadedFile('foto_caja.jpg', b'\xff\xd8\xff' + b'\0' * tamano, 'image/jpeg')
+
+
+def _medir_sync(concurrencia, workers, tamano):
+    from django.test import Client
+
+    def subir(_):
+        return Client().post(URL, {'image': _imagen(tamano)}).status_code
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        estados = list(pool.map(subir, range(concurrencia)))
+    return time.perf_counter() - inicio, estados
+
+
+async def _medir_async(concurrencia, tamano):
+    from django.test import AsyncClient
+    from api import backend_client
+
+    async def subir():
+        response = await AsyncClient().post(URL, {'image': _imagen(tamano)})
+        return response.status_code
+
+    inicio = time.perf_counter()
+    estados = await asyncio.gather(*(subir() for _ in range(concurrencia)))
+    duracion = time.perf_counter() - inicio
+    await backend_client.aclose_async_client()
+    return duracion, estados
+
+
+def correr_modo(modo, concurrencias, workers, latencia, tamano):
+    """Corre todas las concurrencias de un modo y devuelve los resultados"""
+    os.environ['ASYNC_VIEWS'] = '1' if modo == 'async' else '0'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_reconocimiento.settings')
+
+    import django
+    django.setup()
+    from django.conf import settings
+    from benchmarks.fake_backend import FakeBackend
+
+    settings.ALLOWED_HOSTS = ['testserver']
+    # Sesiones en cookie firmada para no medir los bloqueos de SQLite
+    settings.SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+    settings.BACKEND_POOL_SIZE = max(concurrencias)
+
+    resultados = []
+    with FakeBackend(latencia=latencia) as backend:
+        settings.BACKEND_API_URL = backend.url
+        for concurrencia in concurrencias:
+            if modo == 'sync':
+                duracion, estados = _medir_sync(concurrencia, workers, tamano)
+            else:
+                duracion, estados = asyncio.run(_medir_async(concurrencia, tamano))
+            resultados.append({
+                'concurrencia': concurrencia,
+                'segundos': round(duracion, 3),
+                'req_por_seg': round(concurrencia / duracion, 2),
+                'errores': sum(1 for e in estados if e != 200),
+            })
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Subidas concurrentes sync vs async')
+    parser.add_argument('--latencia', type=float, default=0.5,
+                        help='latencia del detector falso en segundos')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='threads del worker sync')
+    parser.add_argument('--tamano', type=int, default=200_000,
+                        help='bytes de cada imagen subida')
+    parser.add_argument('--concurrencias', type=int, nargs='+', default=CONCURRENCIAS)
+    parser.add_argument('--modo', choices=('sync', 'async'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo:
+        resultados = correr_modo(args.modo, args.concurrencias, args.workers,
+                                 args.latencia, args.tamano)
+        print(json.dumps(resultados))
+        return
+
+    por_modo = {}
+    for modo in ('sync', 'async'):
+        salida = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_async_views', '--modo', modo,
+             '--latencia', str(args.latencia), '--workers', str(args.workers),
+             '--tamano', str(args.tamano),
+             '--concurrencias', *map(str, args.concurrencias)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        por_modo[modo] = json.loads(salida.strip().splitlines()[-1])
+
+    print(f'Detector falso: {args.latencia}s por imagen | worker sync: {args.workers} threads')
+    print(f'{"concurrencia":>12} | {"sync s":>8} {"sync req/s":>11} | {"async s":>8} {"async req/s":>12}')
+    for sync, asinc in zip(por_modo['sync'], por_modo['async']):
+        print(f'{sync["concurrencia"]:>12} | {sync["segundos"]:>8} {sync["req_por_seg"]:>11} | '
+              f'{asinc["segundos"]:>8} {asinc["req_por_seg"]:>12}')
+    errores = sum(r['errores'] for filas in por_modo.values() for r in filas)
+    if errores:
+        print(f'⚠️ {errores} subidas fallaron')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmark: detección por teselas (modo mosaico) vs la foto entera.
+
+Genera fotos sintéticas de estanterías en alta resolución con productos de
+tamaños variados (muchos chicos) y cantidades conocidas, y las detecta con
+el backend falso en modo ``estantes``, que cuenta lo que ve en la imagen con
+una entrada de 640 píxeles como un detector real:
+
+- entera: ``deteccion.detectar``, una llamada con la foto completa.
+- mosaico: ``mosaico.detectar`` con varias concurrencias, teselas solapadas
+  y deduplicación por cajas.
+
+Para cada modo reporta cuántos productos contó contra los reales, en
+cuántas fotos acertó la cantidad de cada producto, cuántas detecciones del
+solape descartó por repetidas y el tiempo por foto. Requiere Pillow. Uso:
+
+    python -m benchmarks.bench_mosaico --fotos 3 --latencia 0.3
+"""
+import argparse
+import io
+import os
+import random
+import time
+from collections import Counter
+
+CONCURRENCIAS = (1, 4, 8)
+FONDO = (245, 245, 240)
+ESTANTE = (90, 90, 90)
+
+
+def generar_estante(ancho, alto, estantes, lado_min, lado_max, semilla):
+    """
+    Foto JPEG de una estantería con productos de los colores del backend
+    falso. Devuelve ``(bytes, Counter(producto_id -> cantidad))``.
+    """
+    from PIL import Image, ImageDraw
+    from benchmarks.fake_backend import COLORES
+
+    aleatorio = random.Random(semilla)
+    imagen = Image.new('RGB', (ancho, alto), FONDO)
+    dibujo = ImageDraw.Draw(imagen)
+    reales = Counter()
+    alto_estante = alto // estantes
+    for fila in range(estantes):
+        piso = (fila + 1) * alto_estante - 20
+        dibujo.rectangle((0, piso, ancho, piso + 12), fill=ESTANTE)
+        x = aleatorio.randint(20, 60)
+        while True:
+            lado_x = aleatorio.randint(lado_min, lado_max)
+            lado_y = min(aleatorio.randint(lado_min, lado_max), alto_estante - 60)
+            if x + lado_x > ancho - 20:
+                break
+            producto_id = aleatorio.choice(list(COLORES))
+            dibujo.rectangle((x, piso - 4 - lado_y, x + lado_x - 1, piso - 5), fill=COLORES[producto_id])
+            reales[producto_id] += 1
+            x += lado_x + aleatorio.randint(20, 60)
+
+    salida = io.BytesIO()
+    imagen.save(salida, format='JPEG', quality=92)
+    return salida.getvalue(), reales
+
+
+def _detectados(resultado):
+    contados = Counter()
+    for producto in resultado.datos.get('productos', []):
+        contados[producto['id']] += producto['cantidad']
+    return contados
+
+
+def _medir(detector, fotos):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    fila = {'detectados': 0, 'reales': 0, 'exactas': 0, 'duplicadas': 0, 'teselas': 1, 'segundos': 0.0}
+    for indice, (datos, reales) in enumerate(fotos):
+        imagen = SimpleUploadedFile(f'estante_{indice}.jpg', datos, 'image/jpeg')
+        inicio = time.perf_counter()
+        resultado = detector(imagen)
+        fila['segundos'] += time.perf_counter() - inicio
+        if resultado.status_code != 200:
+            raise RuntimeError(f'El detector respondió {resultado.status_code}')
+
+        detectados = _detectados(resultado)
+        fila['detectados'] += sum(detectados.values())
+        fila['reales'] += sum(reales.values())
+        fila['exactas'] += detectados == reales
+        mosaico = resultado.datos.get('mosaico', {})
+        fila['duplicadas'] += mosaico.get('duplicadas', 0)
+        fila['teselas'] = mosaico.get('teselas', 1)
+    fila['segundos'] = round(fila['segundos'] / len(fotos), 3)
+    return fila
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Detección por teselas vs foto entera')
+    parser.add_argument('--fotos', type=int, default=3)
+    parser.add_argument('--ancho', type=int, default=4000)
+    parser.add_argument('--alto', type=int, default=3000)
+    parser.add_argument('--estantes', type=int, default=5)
+    parser.add_argument('--lado-min', type=int, default=50, help='píxeles del producto más chico')
+    parser.add_argument('--lado-max', type=int, default=220,
+                        help='píxeles del producto más grande (menos que el solape)')
+    parser.add_argument('--latencia', type=float, default=0.3,
+                        help='latencia del detector falso por llamada, en segundos')
+    parser.add_argument('--concurrencias', type=int, nargs='+', default=CONCURRENCIAS)
+    parser.add_argument('--semilla', type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_reconocimiento.settings')
+    import django
+    django.setup()
+    from django.conf import settings
+    from api import deteccion, mosaico
+    from benchmarks.fake_backend import FakeBackend
+
+    # Sin cache: cada modo tiene que llamar al detector
+    settings.CACHE_DETECCION = {**settings.CACHE_DETECCION, 'backend': None}
+    settings.BACKEND_POOL_SIZE = max(args.concurrencias)
+
+    fotos = [
+        generar_estante(args.ancho, args.alto, args.estantes, args.lado_min, args.lado_max, args.semilla + i)
+        for i in range(args.fotos)
+    ]
+
+    filas = []
+    with FakeBackend(latencia=args.latencia, detector='estantes') as backend:
+        settings.BACKEND_API_URL = backend.url
+        filas.append(('entera', _medir(deteccion.detectar, fotos)))
+        for concurrencia in args.concurrencias:
+            settings.MOSAICO = {**getattr(settings, 'MOSAICO', {}), 'concurrencia': concurrencia}
+            filas.append((f'mosaico x{concurrencia}', _medir(mosaico.detectar, fotos)))
+
+    print(f'{args.fotos} fotos de {args.ancho}x{args.alto} | productos de {args.lado_min} a '
+          f'{args.lado_max} px | detector falso: {args.latencia}s por llamada')
+    print(f'{"modo":>12} | {"teselas":>7} | {"contados":>8} {"reales":>6} {"error %":>8} | '
+          f'{"fotos exactas":>13} | {"repetidas":>9} | {"s/foto":>7}')
+    for modo, fila in filas:
+        error = 100 * (fila['detectados'] - fila['reales']) / max(fila['reales'], 1)
+        print(f'{modo:>12} | {fila["teselas"]:>7} | {fila["detectados"]:>8} {fila["reales"]:>6} {error:>8.1f} | '
+              f'{fila["exactas"]:>6}/{args.fotos:<6} | {fila["duplicadas"]:>9} | {fila["segundos"]:>7}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+Benchmark: peso de las páginas de resumen/historial y tiempo estimado hasta
+que son interactivas.
+
+Cada página se pide con ``DEBUG`` apagado (estáticos con hash servidos por
+``api.estaticos.EstaticosMiddleware`` y templates cacheados) sobre una copia
+temporal de ``db.sqlite3`` y con unos productos en la sesión. Se miden:
+
+* el HTML tal como lo manda Django y el tiempo de render en el servidor (p50);
+* los CSS/JS que la página enlaza desde ``STATIC_URL``, pedidos como los pide
+  el navegador (``Accept-Encoding: gzip, br``);
+* primera visita (HTML + estáticos) y visita repetida (solo el HTML: los
+  estáticos tienen ``Cache-Control: immutable`` y no se vuelven a pedir).
+
+El tiempo hasta interactiva se estima para cada perfil de red como
+``RTT + render + HTML/ancho`` más, si hay estáticos, otro ``RTT + estáticos/ancho``
+(se piden en paralelo). No incluye el parseo ni la ejecución del JS en el
+navegador; para eso hace falta medir con un navegador real. Uso:
+
+    python -m benchmarks.bench_paginas --repeticiones 50
+"""
+import argparse
+import io
+import json
+import os
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+PAGINAS = (
+    ('resumen_caja', '/api/caja/resumen/'),
+    ('resumen_deposito', '/api/deposito/resumen/'),
+    ('historial_deposito', '/api/deposito/historial/'),
+)
+
+# (nombre, kbit/s de bajada, RTT en ms)
+PERFILES = (
+    ('4g_lento', 1600, 150),
+    ('wifi', 30000, 20),
+)
+
+ESTATICO = re.compile(r'<(?:link[^>]+href|script[^>]+src)="([^"]+)"')
+
+
+def _preparar_sesion(client):
+    productos = [
+        {'id': i, 'nombre': f'Producto {i}', 'cantidad': 2,
+         'precio_unitario': '1200.00', 'subtotal': '2400.00'}
+        for i in range(1, 9)
+    ]
+    client.post('/api/caja/guardar-temporales/', json.dumps({'productos': productos}),
+                content_type='application/json')
+    client.post('/api/deposito/guardar-temporales/', json.dumps({'productos': productos}),
+                content_type='application/json')
+
+
+def _transferidos(response):
+    """Bytes que viajan por la red (el cuerpo tal cual, comprimido o no)"""
+    if response.streaming:
+        return len(b''.join(response.streaming_content))
+    return len(response.content)
+
+
+def medir(repeticiones):
+    os.environ['DJANGO_DEBUG'] = '0'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_reconocimiento.settings')
+    from django.conf import settings
+
+    directorio = tempfile.mkdtemp(prefix='bench_paginas_')
+    base = os.path.join(directorio, 'db.sqlite3')
+    shutil.copy(settings.BASE_DIR / 'db.sqlite3', base)
+    settings.DATABASES['default']['NAME'] = base
+    settings.STATIC_ROOT = os.path.join(directorio, 'static')
+
+    import django
+    django.setup()
+    from django.core.management import call_command
+    from django.test import Client
+
+    settings.ALLOWED_HOSTS = ['testserver']
+    call_command('migrate', verbosity=0)
+    call_command('collectstatic', interactive=False, verbosity=0)
+
+    salida = sys.stdout
+    sys.stdout = io.StringIO()
+    try:
+        client = Client()
+        _preparar_sesion(client)
+        resultados = {}
+        for nombre, url in PAGINAS:
+            client.get(url)  # la primera vez compila el template
+            tiempos = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                response = client.get(url, headers={'Accept-Encoding': 'gzip, br'})
+                tiempos.append(time.perf_counter() - inicio)
+            html = response.content
+
+            estaticos = crudos = 0
+            for ruta in ESTATICO.findall(html.decode()):
+                if not ruta.startswith(settings.STATIC_URL):
+                    continue
+                plano = client.get(ruta)
+                crudos += _transferidos(plano)
+                estaticos += _transferidos(client.get(ruta, headers={'Accept-Encoding': 'gzip, br'}))
+
+            resultados[nombre] = {
+                'render_ms': statistics.median(tiempos) * 1000,
+                'html': len(html),
+                'estaticos': crudos,
+                'estaticos_comprimidos': estaticos,
+            }
+    finally:
+        sys.stdout = salida
+        shutil.rmtree(directorio, ignore_errors=True)
+    return resultados
+
+
+def tiempo_interactiva(resultado, kbps, rtt_ms, repetida=False):
+    """Milisegundos estimados hasta que la página es interactiva"""
+    bytes_por_ms = kbps * 1000 / 8 / 1000
+    total = rtt_ms + resultado['render_ms'] + resultado['html'] / bytes_por_ms
+    if resultado['estaticos'] and not repetida:
+        total += rtt_ms + resultado['estaticos_comprimidos'] / bytes_por_ms
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Peso y tiempo hasta interactiva por página')
+    parser.add_argument('--repeticiones', type=int, default=50,
+                        help='renders por página para el p50')
+    parser.add_argument('--json', action='store_true', help='imprimir los resultados como JSON')
+    args = parser.parse_args()
+
+    resultados = medir(args.repeticiones)
+    if args.json:
+        print(json.dumps(resultados, indent=2))
+        return
+
+    print(f'{"página":>20} | {"HTML":>7} {"estát.":>7} {"comp.":>6} '
+          f'{"1ª vis.":>8} {"repet.":>7} {"render":>7} | ' +
+          ' '.join(f'{f"TTI {nombre} 1ª/rep ms":>24}' for nombre, _, _ in PERFILES))
+    for nombre, r in resultados.items():
+        primera = r['html'] + r['estaticos_comprimidos']
+        tti = ' '.join(
+            f'{tiempo_interactiva(r, kbps, rtt):>11.0f}/{tiempo_interactiva(r, kbps, rtt, True):<12.0f}'
+            for _, kbps, rtt in PERFILES
+        )
+        print(f'{nombre:>20} | {r["html"]:>7} {r["estaticos"]:>7} '
+              f'{r["estaticos_comprimidos"]:>6} {primera:>8} {r["html"]:>7} '
+              f'{r["render_ms"]:>6.1f}ms | {tti}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""
+Benchmark: latencia del flujo de caja según la estrategia de sesión y el
+perfil de SQLite.
+
+N clientes en paralelo repiten el recorrido de un cajero contra el backend
+falso (sin latencia de detector, para que domine el costo de la sesión):
+
+    login → foto → procesar imagen → resumen → guardar temporales →
+    foto (agregar) → procesar imagen → resumen → confirmar → limpiar sesión
+
+Cada configuración corre en un subproceso propio sobre una copia temporal de
+``db.sqlite3`` y reporta p50/p99 por petición y las respuestas con error
+(p. ej. "database is locked"). Uso:
+
+    python -m benchmarks.bench_sesiones --clientes 16 --vueltas 5
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# (estrategia de sesión, perfil de SQLite)
+CONFIGURACIONES = (
+    ('db', 'default'),
+    ('db', 'wal'),
+    ('cached_db', 'wal'),
+    ('cache', 'wal'),
+)
+
+
+def _imagen():
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    return SimpleUploadedFile('foto_caja.jpg', b'\xff\xd8\xff' + b'\0' * 20_000, 'image/jpeg')
+
+
+def _flujo_caja(client):
+    """Recorrido de un cajero; devuelve una lista de (latencia, status)"""
+    productos = [{'id': 1, 'nombre': 'Coca Cola 500ml', 'cantidad': 2,
+                  'precio_unitario': '1200.00', 'subtotal': '2400.00'}]
+    pasos = (
+        lambda: client.post('/api/login-process/', json.dumps({'dni': '1', 'password': 'x'}),
+                            content_type='application/json'),
+        lambda: client.get('/api/caja/foto/'),
+        lambda: client.post('/api/caja/procesar-imagen/', {'image': _imagen()}),
+        lambda: client.get('/api/caja/resumen/'),
+        lambda: client.post('/api/caja/guardar-temporales/', json.dumps({'productos': productos}),
+                            content_type='application/json'),
+        lambda: client.get('/api/caja/foto/?agregar=true'),
+        lambda: client.post('/api/caja/procesar-imagen/', {'image': _imagen()}),
+        lambda: client.get('/api/caja/resumen/'),
+        lambda: client.post('/api/caja/confirmar/',
+                            json.dumps({'productos': [{'id': 1, 'cantidad': 3}]}),
+                            content_type='application/json'),
+        lambda: client.post('/api/caja/limpiar-sesion/'),
+    )
+    mediciones = []
+    for paso in pasos:
+        inicio = time.perf_counter()
+        try:
+            status = paso().status_code
+        except Exception:
+            status = 599
+        mediciones.append((time.perf_counter() - inicio, status))
+    return mediciones
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, round(p / 100 * (len(ordenados) - 1)))
+    return ordenados[indice]
+
+
+def correr_configuracion(clientes, vueltas):
+    """Corre el flujo con la configuración de las variables de entorno"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_reconocimiento.settings')
+    from django.conf import settings
+
+    # Copia de la base para no tocar db.sqlite3 (y sin archivos WAL previos)
+    directorio = tempfile.mkdtemp(prefix='bench_sesiones_')
+    base = os.path.join(directorio, 'db.sqlite3')
+    shutil.copy(settings.BASE_DIR / 'db.sqlite3', base)
+    settings.DATABASES['default']['NAME'] = base
+
+    import django
+    django.setup()
+    from django.core.management import call_command
+    from django.test import Client
+    from benchmarks.fake_backend import FakeBackend
+
+    settings.ALLOWED_HOSTS = ['testserver']
+    settings.CACHE_DETECCION = {'backend': None}
+    call_command('migrate', verbosity=0)
+
+    def cliente(_):
+        client = Client()
+        mediciones = []
+        for _ in range(vueltas):
+            mediciones.extend(_flujo_caja(client))
+        return mediciones
+
+    # Los prints de las vistas no son parte de la medición
+    salida = sys.stdout
+    sys.stdout = io.StringIO()
+    try:
+        with FakeBackend() as backend:
+            settings.BACKEND_API_URL = backend.url
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=clientes) as pool:
+                mediciones = [m for resultado in pool.map(cliente, range(clientes))
+                              for m in resultado]
+            duracion = time.perf_counter() - inicio
+    finally:
+        sys.stdout = salida
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    latencias = [latencia for latencia, _ in mediciones]
+    return {
+        'peticiones': len(mediciones),
+        'req_por_seg': round(len(mediciones) / duracion, 1),
+        'p50_ms': round(_percentil(latencias, 50) * 1000, 1),
+        'p99_ms': round(_percentil(latencias, 99) * 1000, 1),
+        'errores': sum(1 for _, status in mediciones if status >= 500),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Flujo de caja por estrategia de sesión')
+    parser.add_argument('--clientes', type=int, default=16,
+                        help='cajeros simultáneos')
+    parser.add_argument('--vueltas', type=int, default=5,
+                        help='veces que cada cajero repite el flujo')
+    parser.add_argument('--interno', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.interno:
+        print(json.dumps(correr_configuracion(args.clientes, args.vueltas)))
+        return
+
+    print(f'{args.clientes} cajeros x {args.vueltas} vueltas del flujo de caja')
+    print(f'{"sesión":>10} {"sqlite":>8} | {"req/s":>7} {"p50 ms":>8} {"p99 ms":>8} {"errores":>8}')
+    for estrategia, perfil in CONFIGURACIONES:
+        entorno = dict(os.environ, SESSION_ESTRATEGIA=estrategia, SQLITE_PERFIL=perfil)
+        salida = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_sesiones', '--interno',
+             '--clientes', str(args.clientes), '--vueltas', str(args.vueltas)],
+            check=True, capture_output=True, text=True, env=entorno,
+        ).stdout
+        r = json.loads(salida.strip().splitlines()[-1])
+        print(f'{estrategia:>10} {perfil:>8} | {r["req_por_seg"]:>7} {r["p50_ms"]:>8} '
+              f'{r["p99_ms"]:>8} {r["errores"]:>8}')
+
+
+if __name__ == '__main__':
+    main()
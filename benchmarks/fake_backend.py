@@ -0,0 +1,540 @@
+"""
+Backend falso para benchmarks y pruebas de carga.
+
+Imita los endpoints del backend FastAPI que usa esta app (login, detección,
+confirmación de ventas, clientes, transferencias de depósito y catálogo de productos) con latencia, tasa de
+error y tamaño de respuesta configurables. Se puede levantar por línea de
+comandos o embebido en un thread desde un benchmark:
+
+    python -m benchmarks.fake_backend --port 8000 --latencia lognormal:0.4,0.5 \\
+        --tasa-error 0.02 --productos 8
+
+Con ``--detector estantes`` la detección mira la imagen: cuenta los
+rectángulos de los colores de ``COLORES`` (un color por producto del
+catálogo) como lo haría un detector con entrada de ``entrada`` píxeles, así
+que los productos chicos de una foto grande se pierden al achicarla. Lo usa
+``benchmarks/bench_mosaico.py``; requiere Pillow.
+
+Las latencias se describen como ``distribución:parámetros``:
+
+    fija:0.5            siempre 0.5 s (o simplemente ``0.5``)
+    uniforme:0.2,0.8    entre 0.2 y 0.8 s
+    normal:0.5,0.1      media 0.5 s, desvío 0.1 s (sin valores negativos)
+    lognormal:0.5,0.6   mediana 0.5 s, sigma 0.6 (cola larga, como un detector real)
+"""
+import argparse
+import io
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+try:
+    from PIL import Image
+except ImportError:  # solo lo necesita el detector de estantes
+    Image = None
+
+PRODUCTO_EJEMPLO = {
+    'id': 1,
+    'nombre': 'Coca Cola 500ml',
+    'cantidad': 1,
+    'precio_unitario': '1200.00',
+    'subtotal': '1200.00',
+}
+
+# Catálogo del que salen los productos detectados cuando se piden varios
+CATALOGO = [
+    PRODUCTO_EJEMPLO,
+    {'id': 2, 'nombre': 'Agua Mineral 1.5L', 'precio_unitario': '850.00'},
+    {'id': 3, 'nombre': 'Galletitas de Agua', 'precio_unitario': '640.50'},
+    {'id': 4, 'nombre': 'Yerba Mate 1kg', 'precio_unitario': '3200.00'},
+    {'id': 5, 'nombre': 'Alfajor Triple', 'precio_unitario': '450.00'},
+    {'id': 6, 'nombre': 'Leche Entera 1L', 'precio_unitario': '990.00'},
+    {'id': 7, 'nombre': 'Papas Fritas 150g', 'precio_unitario': '1500.00'},
+    {'id': 8, 'nombre': 'Jugo de Naranja 1L', 'precio_unitario': '1100.00'},
+]
+
+# Color de cada producto del catálogo en las fotos de estantes (--detector estantes)
+COLORES = {
+    1: (220, 30, 30),
+    2: (30, 90, 220),
+    3: (240, 170, 20),
+    4: (20, 150, 60),
+    5: (140, 40, 170),
+    6: (20, 170, 190),
+    7: (120, 70, 20),
+    8: (230, 60, 160),
+}
+
+# Ruta -> nombre del endpoint (el mismo que usa api/backend_client.py)
+RUTAS_POST = {
+    '/api/home/login/': 'login',
+    '/api/caja/detectarobjetos/': 'detectar_objetos',
+    '/api/caja/confirmarcompra/': 'confirmar_compra',
+    '/api/caja/confirmarsincliente/': 'confirmar_sin_cliente',
+    '/api/caja/validarcliente/': 'validar_cliente',
+    '/api/caja/registrarcliente/': 'registrar_cliente',
+    '/api/deposito/crearTransferencia/': 'crear_transferencia',
+    '/api/deposito/confirmarTransferencia/': 'confirmar_transferencia',
+}
+RUTAS_GET = {
+    '/api/deposito/listarTransferencia/': 'listar_transferencias',
+    '/api/productos/listarProductos/': 'listar_productos',
+}
+
+
+def imagen_multipart(content_type, cuerpo):
+    """Bytes del primer archivo de un cuerpo multipart/form-data, o ``None``"""
+    mensaje = BytesParser(policy=policy.HTTP).parsebytes(
+        f'Content-Type: {content_type}\r\n\r\n'.encode() + cuerpo
+    )
+    if not mensaje.is_multipart():
+        return None
+    for parte in mensaje.iter_parts():
+        if parte.get_filename() is not None:
+            return parte.get_payload(decode=True)
+    return None
+
+
+def detectar_estantes(datos, entrada=640, celda=4, min_celdas=3, tolerancia=40):
+    """
+    Detector de juguete para fotos de estantes. Achica la imagen a ``entrada``
+    píxeles de lado mayor (como la entrada de un detector real), la reduce a
+    una grilla de celdas de ``celda`` píxeles y busca regiones conexas del
+    color de cada producto. Las de menos de ``min_celdas`` de ancho o de alto
+    no se detectan. Devuelve ``[(producto_id, [x1, y1, x2, y2], confianza)]``
+    con las cajas en píxeles de la imagen recibida.
+    """
+    with Image.open(io.BytesIO(datos)) as imagen:
+        imagen = imagen.convert('RGB')
+        ancho, alto = imagen.size
+        escala = min(1.0, entrada / max(ancho, alto))
+        columnas = max(1, round(ancho * escala / celda))
+        filas = max(1, round(alto * escala / celda))
+        pixeles = list(imagen.resize((columnas, filas), Image.Resampling.BOX).getdata())
+
+    colores = {}
+
+    def color(rgb):
+        if rgb not in colores:
+            colores[rgb] = next((
+                producto_id for producto_id, (r, g, b) in COLORES.items()
+                if abs(rgb[0] - r) <= tolerancia and abs(rgb[1] - g) <= tolerancia and abs(rgb[2] - b) <= tolerancia
+            ), None)
+        return colores[rgb]
+
+    etiquetas = [color(rgb) for rgb in pixeles]
+    visto = [False] * len(etiquetas)
+    detecciones = []
+    for inicio, producto_id in enumerate(etiquetas):
+        if producto_id is None or visto[inicio]:
+            continue
+        visto[inicio] = True
+        pendientes = deque([inicio])
+        x1 = x2 = inicio % columnas
+        y1 = y2 = inicio // columnas
+        celdas = 0
+        while pendientes:
+            actual = pendientes.popleft()
+            x, y = actual % columnas, actual // columnas
+            celdas += 1
+            x1, x2, y1, y2 = min(x1, x), max(x2, x), min(y1, y), max(y2, y)
+            for vecino, valido in ((actual - 1, x > 0), (actual + 1, x < columnas - 1),
+                                   (actual - columnas, y > 0), (actual + columnas, y < filas - 1)):
+                if valido and not visto[vecino] and etiquetas[vecino] == producto_id:
+                    visto[vecino] = True
+                    pendientes.append(vecino)
+        ancho_celdas, alto_celdas = x2 - x1 + 1, y2 - y1 + 1
+        if ancho_celdas < min_celdas or alto_celdas < min_celdas:
+            continue
+        caja = [round(x1 * ancho / columnas), round(y1 * alto / filas),
+                round((x2 + 1) * ancho / columnas), round((y2 + 1) * alto / filas)]
+        detecciones.append((producto_id, caja, round(celdas / (ancho_celdas * alto_celdas), 3)))
+    return detecciones
+
+
+def distribucion(spec):
+    """
+    Convierte ``'lognormal:0.5,0.6'`` (o un número) en una función sin
+    argumentos que devuelve una latencia en segundos
+    """
+    if isinstance(spec, (int, float)):
+        spec = f'fija:{spec}'
+    nombre, _, parametros = str(spec).partition(':')
+    if not parametros:
+        nombre, parametros = 'fija', nombre
+    try:
+        valores = [float(v) for v in parametros.split(',')]
+    except ValueError:
+        raise ValueError(f'Latencia inválida: {spec!r}')
+
+    if nombre == 'fija' and len(valores) == 1:
+        return lambda: valores[0]
+    if nombre == 'uniforme' and len(valores) == 2:
+        return lambda: random.uniform(*valores)
+    if nombre == 'normal' and len(valores) == 2:
+        return lambda: max(0.0, random.gauss(*valores))
+    if nombre == 'lognormal' and len(valores) == 2:
+        mediana, sigma = valores
+        if mediana <= 0:
+            return lambda: 0.0
+        mu = math.log(mediana)
+        return lambda: random.lognormvariate(mu, sigma)
+    raise ValueError(f'Latencia inválida: {spec!r}')
+
+
+class FakeBackendHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    # Configurado por FakeBackend
+    latencias = {}         # endpoint -> función de latencia ('*' para el resto)
+    tasas_error = {}       # endpoint -> probabilidad de responder 503 ('*' para el resto)
+    productos = 1          # productos por detección
+    detector = 'fijo'      # 'fijo' (siempre los mismos productos) o 'estantes'
+    estado = None          # EstadoBackend compartido
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        endpoint = RUTAS_GET.get(url.path)
+        if endpoint is None:
+            self._responder(404, {'detail': 'Not Found'})
+            return
+        # Los GET reciben los parámetros de la URL en lugar del cuerpo
+        self._atender(endpoint, {clave: valores[-1] for clave, valores in parse_qs(url.query).items()})
+
+    def do_POST(self):
+        largo = int(self.headers.get('Content-Length', 0))
+        cuerpo = self.rfile.read(largo)
+
+        endpoint = RUTAS_POST.get(self.path)
+        if endpoint is None:
+            self._responder(404, {'detail': 'Not Found'})
+            return
+        self._atender(endpoint, cuerpo)
+
+    def _atender(self, endpoint, cuerpo):
+        latencia = self.latencias.get(endpoint) or self.latencias.get('*')
+        if latencia is not None:
+            time.sleep(latencia())
+
+        tasa = self.tasas_error.get(endpoint, self.tasas_error.get('*', 0.0))
+        if tasa and random.random() < tasa:
+            self.estado.contar(endpoint, 503)
+            self._responder(503, {'detail': 'Servicio no disponible (error simulado)'})
+            return
+
+        # Con Idempotency-Key la misma operación repetida devuelve la primera respuesta
+        funcion = getattr(self, f'_{endpoint}')
+        data = self.estado.idempotente(self.headers.get('Idempotency-Key'), lambda: funcion(cuerpo))
+        self.estado.contar(endpoint, 200)
+        self._responder(200, data)
+
+    # ==================== Endpoints ====================
+
+    def _login(self, cuerpo):
+        return {'usuario': {'nombre': 'Cajero Benchmark'}}
+
+    def _detectar_objetos(self, cuerpo):
+        if self.detector == 'estantes':
+            return self._detectar_estantes(cuerpo)
+        productos = []
+        for i in range(self.productos):
+            base = CATALOGO[i % len(CATALOGO)]
+            producto = {**base, 'cantidad': 1, 'subtotal': base['precio_unitario']}
+            if i >= len(CATALOGO):
+                # Más productos que el catálogo: ids nuevos para que no se unifiquen
+                producto['id'] = i + 1
+                producto['nombre'] = f'{base["nombre"]} #{i + 1}'
+            productos.append(producto)
+        total = sum(float(p['precio_unitario']) for p in productos)
+        return {'productos': productos, 'total': total}
+
+    def _detectar_estantes(self, cuerpo):
+        datos = imagen_multipart(self.headers.get('Content-Type', ''), cuerpo)
+        productos = []
+        for producto_id, caja, confianza in detectar_estantes(datos) if datos else ():
+            base = CATALOGO[producto_id - 1]
+            productos.append({**base, 'cantidad': 1, 'subtotal': base['precio_unitario'],
+                              'bbox': caja, 'confianza': confianza})
+        total = sum(float(p['precio_unitario']) for p in productos)
+        return {'productos': productos, 'total': total}
+
+    def _confirmar_compra(self, cuerpo):
+        return {'venta_id': self.estado.siguiente_id(), 'total': 1200.0}
+
+    _confirmar_sin_cliente = _confirmar_compra
+
+    def _validar_cliente(self, cuerpo):
+        cliente = self.estado.cliente(_json(cuerpo).get('dni'))
+        if cliente is None:
+            return {'success': False, 'message': 'Cliente no encontrado'}
+        return {'success': True, 'cliente': cliente, 'message': 'Cliente encontrado'}
+
+    def _registrar_cliente(self, cuerpo):
+        datos = _json(cuerpo)
+        cliente = self.estado.registrar_cliente(datos)
+        if cliente is None:
+            return {'success': False, 'message': 'El cliente ya existe'}
+        return {'success': True, 'cliente': cliente, 'message': 'Cliente registrado'}
+
+    def _crear_transferencia(self, cuerpo):
+        datos = _json(cuerpo)
+        transferencia = self.estado.crear_transferencia(datos)
+        return {
+            'success': True,
+            'transferencia_id': transferencia['id'],
+            'detalles': transferencia['detalles'],
+        }
+
+    def _confirmar_transferencia(self, cuerpo):
+        datos = _json(cuerpo)
+        aplicados = self.estado.confirmar_transferencia(datos.get('transferencia_id'))
+        if aplicados is None:
+            return {'success': False, 'error': 'Transferencia inexistente'}
+        return {'success': True, 'transferencia_id': datos['transferencia_id'], 'applied': aplicados}
+
+    def _listar_transferencias(self, cuerpo):
+        return {'success': True, 'transferencias': self.estado.transferencias()}
+
+    def _listar_productos(self, parametros):
+        try:
+            desde = int(parametros['desde'])
+        except (KeyError, ValueError):
+            desde = None
+        version, productos = self.estado.productos(desde)
+        return {'success': True, 'version': version, 'completo': desde is None, 'productos': productos}
+
+    def _responder(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _json(cuerpo):
+    try:
+        return json.loads(cuerpo or b'{}')
+    except ValueError:
+        return {}
+
+
+class EstadoBackend:
+    """Transferencias, clientes y catálogo en memoria y conteo de respuestas por endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._transferencias = {}
+        self._clientes = {}
+        self._idempotencia = {}
+        # id -> (versión en que cambió, producto); la versión crece con cada cambio
+        self._version = 1
+        self._productos = {
+            producto['id']: (1, {'id': producto['id'], 'nombre': producto['nombre'],
+                                 'precio_unitario': producto['precio_unitario'], 'activo': True})
+            for producto in CATALOGO
+        }
+        self.respuestas = {}
+
+    def siguiente_id(self):
+        with self._lock:
+            return next(self._ids)
+
+    def idempotente(self, clave, funcion):
+        """``funcion()`` una sola vez por clave; sin clave, siempre"""
+        if clave is None:
+            return funcion()
+        with self._lock:
+            if clave not in self._idempotencia:
+                self._idempotencia[clave] = threading.Event()
+                lider = True
+            else:
+                lider = False
+            evento = self._idempotencia[clave]
+        if lider:
+            try:
+                evento.respuesta = funcion()
+            finally:
+                evento.set()
+        evento.wait()
+        return getattr(evento, 'respuesta', None)
+
+    def contar(self, endpoint, status):
+        with self._lock:
+            clave = f'{endpoint}:{status}'
+            self.respuestas[clave] = self.respuestas.get(clave, 0) + 1
+
+    def cliente(self, dni):
+        with self._lock:
+            return self._clientes.get(str(dni))
+
+    def registrar_cliente(self, datos):
+        """El cliente nuevo, o ``None`` si el DNI ya estaba registrado"""
+        with self._lock:
+            dni = str(datos.get('dni'))
+            if dni in self._clientes:
+                return None
+            cliente = {'dni': dni, 'nombre': datos.get('nombre', ''), 'telefono': datos.get('telefono', '')}
+            self._clientes[dni] = cliente
+            return cliente
+
+    def crear_transferencia(self, datos):
+        with self._lock:
+            transferencia_id = next(self._ids)
+            transferencia = {
+                'id': transferencia_id,
+                'fecha': datetime.now().isoformat(timespec='seconds'),
+                'estado': 'pendiente',
+                'deposito_origen': {'id': datos.get('depositoOrigen'), 'nombre': 'Deposito Origen'},
+                'deposito_destino': {'id': datos.get('depositoDestino'), 'nombre': 'Deposito Destino'},
+                'detalles': [
+                    {
+                        'detalle_id': i,
+                        'producto_id': producto.get('id'),
+                        'producto_nombre': producto.get('nombre', ''),
+                        'cantidad': producto.get('cantidad', 1),
+                    }
+                    for i, producto in enumerate(datos.get('productos', []), start=1)
+                ],
+            }
+            self._transferencias[transferencia_id] = transferencia
+            return transferencia
+
+    def confirmar_transferencia(self, transferencia_id):
+        with self._lock:
+            transferencia = self._transferencias.get(transferencia_id)
+            if transferencia is None:
+                return None
+            transferencia['estado'] = 'confirmada'
+            return len(transferencia['detalles'])
+
+    def transferencias(self):
+        with self._lock:
+            return list(self._transferencias.values())
+
+    def productos(self, desde=None):
+        """``(version, productos)``: todos, o los que cambiaron después de ``desde``"""
+        with self._lock:
+            if desde is None:
+                return self._version, [p for _, p in self._productos.values() if p['activo']]
+            return self._version, [p for version, p in self._productos.values() if version > desde]
+
+    def cambiar_producto(self, producto_id, **cambios):
+        """Alta o modificación (``activo=False`` lo da de baja) de un producto del catálogo"""
+        with self._lock:
+            self._version += 1
+            _, producto = self._productos.get(producto_id, (None, {'id': producto_id, 'activo': True}))
+            self._productos[producto_id] = (self._version, {**producto, **cambios})
+
+
+class FakeBackendServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # El backlog por defecto (5) descarta conexiones en ráfagas concurrentes
+    request_queue_size = 1024
+
+
+class FakeBackend:
+    """
+    Servidor falso que corre en un thread en segundo plano.
+
+    ``latencia`` es la del detector (``detectar_objetos``); ``latencias`` y
+    ``tasas_error`` se indexan por nombre de endpoint, con ``'*'`` como valor
+    para los que no aparecen.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latencia=0.0, latencias=None,
+                 tasas_error=None, productos=1, detector='fijo'):
+        latencias = {'detectar_objetos': latencia, **(latencias or {})}
+        atributos = {
+            'latencias': {endpoint: distribucion(spec) for endpoint, spec in latencias.items()},
+            'tasas_error': dict(tasas_error or {}),
+            'productos': productos,
+            'detector': detector,
+            'estado': EstadoBackend(),
+        }
+        handler = type('Handler', (FakeBackendHandler,), atributos)
+        self.estado = atributos['estado']
+        self.server = FakeBackendServer((host, port), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def parsear_por_endpoint(valores, convertir=str):
+    """``['detectar_objetos=0.3', '0.01']`` -> ``{'detectar_objetos': 0.3, '*': 0.01}``"""
+    resultado = {}
+    for valor in valores or ():
+        endpoint, _, dato = valor.rpartition('=')
+        resultado[endpoint or '*'] = convertir(dato)
+    return resultado
+
+
+def agregar_argumentos(parser):
+    """Opciones del backend falso, compartidas con ``manage.py prueba_carga``"""
+    parser.add_argument('--latencia', default='0.5',
+                        help='latencia de detectarobjetos (p. ej. 0.5 o lognormal:0.4,0.5)')
+    parser.add_argument('--latencia-endpoint', action='append', metavar='ENDPOINT=DIST',
+                        help='latencia de otro endpoint (login, confirmar_compra, '
+                             'crear_transferencia, ...; "*" para todos); se puede repetir')
+    parser.add_argument('--tasa-error', action='append', metavar='[ENDPOINT=]PROB',
+                        help='probabilidad de responder 503, global o por endpoint; '
+                             'se puede repetir')
+    parser.add_argument('--productos', type=int, default=1,
+                        help='productos por respuesta de detección (tamaño de respuesta)')
+    parser.add_argument('--detector', choices=('fijo', 'estantes'), default='fijo',
+                        help='fijo: siempre los mismos productos; estantes: cuenta los de la foto '
+                             '(requiere Pillow)')
+
+
+def desde_argumentos(args, host='127.0.0.1', port=0):
+    return FakeBackend(
+        host, port,
+        latencia=args.latencia,
+        latencias=parsear_por_endpoint(args.latencia_endpoint),
+        tasas_error=parsear_por_endpoint(args.tasa_error, float),
+        productos=args.productos,
+        detector=args.detector,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    agregar_argumentos(parser)
+    args = parser.parse_args()
+
+    with desde_argumentos(args, args.host, args.port) as backend:
+        print(f'Backend falso escuchando en {backend.url} (latencia {args.latencia})')
+        try:
+            backend.thread.join()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()